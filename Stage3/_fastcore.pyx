@@ -0,0 +1,236 @@
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+"""
+Compiled version of the hot bitboard and evaluation functions for 8x8 boards.
+
+Every function does exactly the same steps as its pure Python version in
+'bitboard' or 'evaluation', which stay the reference and are used for other
+board sizes or when this module has not been built. The masks are held in
+64 bit integers instead of Python ints so each shift is one machine instruction.
+
+Build it from the Stage3 folder with:
+    python build_fastcore.py build_ext --inplace
+"""
+
+from libc.stdint cimport uint64_t
+
+# The squares of every column except the first and except the last, used to
+# stop counters wrapping around the side of the board
+cdef uint64_t NOT_FIRST = 0xfefefefefefefefe
+cdef uint64_t NOT_LAST = 0x7f7f7f7f7f7f7f7f
+cdef uint64_t FULL = 0xffffffffffffffff
+
+# Shift amount and wrap around mask of each direction, in the order of bitboard.DIRECTIONS
+cdef int AMOUNTS[8]
+cdef uint64_t MASKS[8]
+AMOUNTS[:] = [-9, -8, -7, -1, 1, 7, 8, 9]
+MASKS[:] = [NOT_LAST, FULL, NOT_FIRST, NOT_LAST, NOT_FIRST, NOT_LAST, FULL, NOT_FIRST]
+
+cdef uint64_t CORNERS = 0x8100000000000081
+cdef uint64_t BORDER = 0xff818181818181ff
+
+# Each corner with its X-square and with its C-squares, in the order of Geometry.x_squares
+cdef uint64_t CORNER_SQUARES[4]
+cdef uint64_t X_SQUARES[4]
+cdef uint64_t C_SQUARES[4]
+CORNER_SQUARES[:] = [1ULL << 0, 1ULL << 7, 1ULL << 56, 1ULL << 63]
+X_SQUARES[:] = [1ULL << 9, 1ULL << 14, 1ULL << 49, 1ULL << 54]
+C_SQUARES[:] = [(1ULL << 1) | (1ULL << 8), (1ULL << 6) | (1ULL << 15),
+                (1ULL << 57) | (1ULL << 48), (1ULL << 62) | (1ULL << 55)]
+
+# Every line along each axis (8 rows, 8 columns, 15 of each diagonal) and the
+# squares touching the outside of the board along that axis, as in Geometry.axis_lines
+cdef uint64_t AXIS_LINES[4][15]
+cdef int AXIS_COUNTS[4]
+cdef uint64_t AXIS_EDGES[4]
+# The two opposite directions of each axis
+cdef int AXIS_DIRECTIONS[4][2]
+
+def _build_axes():
+    """
+    Fills in the line masks, in the same way as Geometry.__init__.
+    """
+    cdef int i, total, x, y
+    cdef uint64_t diagonal, anti_diagonal
+    for i in range(8):
+        AXIS_LINES[0][i] = 0xffULL << (i * 8)
+        AXIS_LINES[1][i] = 0x0101010101010101ULL << i
+    for total in range(15):
+        diagonal = 0
+        anti_diagonal = 0
+        for x in range(8):
+            y = total - x
+            if 0 <= y < 8:
+                anti_diagonal |= 1ULL << (y * 8 + x)
+            y = x - total + 7
+            if 0 <= y < 8:
+                diagonal |= 1ULL << (y * 8 + x)
+        AXIS_LINES[2][total] = diagonal
+        AXIS_LINES[3][total] = anti_diagonal
+    AXIS_COUNTS[:] = [8, 8, 15, 15]
+    AXIS_EDGES[:] = [0x8181818181818181ULL, 0xff000000000000ffULL, BORDER, BORDER]
+    AXIS_DIRECTIONS[0][:] = [3, 4]
+    AXIS_DIRECTIONS[1][:] = [1, 6]
+    AXIS_DIRECTIONS[2][:] = [0, 7]
+    AXIS_DIRECTIONS[3][:] = [2, 5]
+
+_build_axes()
+
+cdef inline uint64_t shift(uint64_t bits, int direction) nogil:
+    if AMOUNTS[direction] > 0:
+        return (bits << AMOUNTS[direction]) & MASKS[direction]
+    return (bits >> -AMOUNTS[direction]) & MASKS[direction]
+
+cdef extern from *:
+    int __builtin_popcountll(unsigned long long) nogil
+
+cdef inline int count(uint64_t bits) nogil:
+    return __builtin_popcountll(bits)
+
+cdef uint64_t c_neighbours(uint64_t bits) nogil:
+    cdef uint64_t result = 0
+    cdef int direction
+    for direction in range(8):
+        result |= shift(bits, direction)
+    return result
+
+cdef uint64_t c_legal_moves(uint64_t player, uint64_t opponent) nogil:
+    cdef uint64_t empty = ~(player | opponent)
+    cdef uint64_t moves = 0
+    cdef uint64_t run
+    cdef int direction
+    for direction in range(8):
+        run = shift(player, direction) & opponent
+        while run:
+            run = shift(run, direction)
+            moves |= run & empty
+            run &= opponent
+    return moves
+
+cdef uint64_t c_flips(uint64_t player, uint64_t opponent, uint64_t move) nogil:
+    cdef uint64_t flipped = 0
+    cdef uint64_t line, check
+    cdef int direction
+    for direction in range(8):
+        line = 0
+        check = shift(move, direction) & opponent
+        while check:
+            line |= check
+            check = shift(check, direction)
+            if check & player:
+                flipped |= line
+                break
+            check &= opponent
+    return flipped
+
+cdef uint64_t c_stable(uint64_t player, uint64_t opponent) nogil:
+    cdef uint64_t filled = player | opponent
+    cdef uint64_t axis_safe[4]
+    cdef uint64_t safe, line, result, grown
+    cdef int axis, i
+    for axis in range(4):
+        safe = AXIS_EDGES[axis]
+        for i in range(AXIS_COUNTS[axis]):
+            line = AXIS_LINES[axis][i]
+            if filled & line == line:
+                safe |= line
+        axis_safe[axis] = safe
+
+    result = 0
+    while True:
+        grown = player
+        for axis in range(4):
+            grown &= (axis_safe[axis] | shift(result, AXIS_DIRECTIONS[axis][0])
+                      | shift(result, AXIS_DIRECTIONS[axis][1]))
+        if grown == result:
+            return result
+        result = grown
+
+cdef inline double ratio(int mine, int theirs) nogil:
+    cdef int total = mine + theirs
+    if total == 0:
+        return 0
+    return <double>(100 * (mine - theirs)) / <double>total
+
+cdef double term(int index, uint64_t player, uint64_t opponent) nogil:
+    """
+    Works out one evaluation term, numbered in the order of evaluation.TERMS.
+    """
+    cdef uint64_t empty, risky_x, risky_c, filled
+    cdef int i, mine, theirs
+    if index == 0:
+        return ratio(count(c_legal_moves(player, opponent)), count(c_legal_moves(opponent, player)))
+    if index == 1:
+        empty = ~(player | opponent)
+        return ratio(count(c_neighbours(opponent) & empty), count(c_neighbours(player) & empty))
+    if index == 2:
+        empty = c_neighbours(~(player | opponent))
+        return -ratio(count(player & empty), count(opponent & empty))
+    if index == 3:
+        return ratio(count(c_stable(player, opponent)), count(c_stable(opponent, player)))
+    if index == 4:
+        return 25 * (count(player & CORNERS) - count(opponent & CORNERS))
+    if index == 5:
+        filled = player | opponent
+        risky_x = 0
+        risky_c = 0
+        for i in range(4):
+            if not filled & CORNER_SQUARES[i]:
+                risky_x |= X_SQUARES[i]
+                risky_c |= C_SQUARES[i]
+        mine = 2 * count(player & risky_x) + count(player & risky_c)
+        theirs = 2 * count(opponent & risky_x) + count(opponent & risky_c)
+        return -ratio(mine, theirs)
+    if index == 6:
+        return 100 if (64 - count(player | opponent)) % 2 == 1 else -100
+    return ratio(count(player), count(opponent))
+
+def legal_moves(uint64_t player, uint64_t opponent):
+    """
+    Gets every square the player can legally place a counter on (see bitboard.legal_moves).
+    """
+    return c_legal_moves(player, opponent)
+
+def flips(uint64_t player, uint64_t opponent, uint64_t move):
+    """
+    Gets the opponent counters that would be outflanked by placing a counter (see bitboard.flips).
+    """
+    return c_flips(player, opponent, move)
+
+def play(uint64_t player, uint64_t opponent, uint64_t move):
+    """
+    Places a counter and flips the outflanked counters (see bitboard.play).
+    """
+    cdef uint64_t flipped = c_flips(player, opponent, move)
+    return player | move | flipped, opponent & ~flipped
+
+def stable(uint64_t player, uint64_t opponent):
+    """
+    Gets the player's counters that can never be flipped again (see bitboard.stable).
+    """
+    return c_stable(player, opponent)
+
+def evaluate(uint64_t player, uint64_t opponent, tuple tables):
+    """
+    Scores a position with phase weighted terms (see evaluation.evaluate).
+
+    Parameters:
+        player (int): Mask of the counters of the player the score is for.
+        opponent (int): Mask of the other player's counters.
+        tables (tuple): For the opening, midgame and endgame, the (term number, weight)
+            pairs in the order they are added up.
+
+    Returns:
+        float: The score of the position. Higher is better for the player.
+    """
+    cdef int filled = count(player | opponent)
+    cdef int phase
+    cdef double score = 0
+    if filled * 16 < 64 * 5:
+        phase = 0
+    elif (64 - filled) * 16 <= 64 * 5:
+        phase = 2
+    else:
+        phase = 1
+    for index, weight in tables[phase]:
+        score += <double>weight * term(index, player, opponent)
+    return score
@@ -0,0 +1,222 @@
+"""
+Admission control for AI work.
+
+Every '/ai_move' request is charged its expected CPU cost in milliseconds (the
+cost of its difficulty tier, or an estimate from its engine settings), and every
+'/analyse' batch that cost for each of its positions, against
+two token buckets: one for the client that sent it and one shared by the whole
+server. Buckets refill at a steady rate of milliseconds of AI work per second
+and hold up to BURST_SECONDS of it, so a client can make a few expensive moves
+in a row but cannot keep the AI workers busy on its own.
+
+A request that does not fit is not rejected straight away. It is downgraded to
+the most expensive cheaper difficulty tier that still fits, and is only shed
+(answered with 429 Too Many Requests) when even the cheapest tier does not.
+Admitted, downgraded and shed requests are counted in
+'reversi_ai_admissions_total' on '/metrics'.
+
+Admission control is off unless REVERSI_ADMISSION=1.
+"""
+
+import collections
+import os
+import threading
+import time
+import analysis
+import difficulty
+import metrics
+import search
+
+# Whether AI requests go through admission control at all
+ENABLED = os.environ.get("REVERSI_ADMISSION") == "1"
+
+# Milliseconds of AI work each client may use per second
+CLIENT_RATE = float(os.environ.get("REVERSI_ADMISSION_CLIENT_RATE", "500"))
+
+# Milliseconds of AI work the whole server may use per second (defaults to 80% of the AI workers)
+GLOBAL_RATE = float(os.environ.get("REVERSI_ADMISSION_GLOBAL_RATE", "0")) or 800.0 * analysis.AI_WORKERS
+
+# Seconds of work a full bucket holds
+BURST_SECONDS = 5
+
+# Most client buckets kept, the least recently used are dropped first
+MAX_CLIENTS = 10000
+
+# Expected milliseconds per node of a budgeted search and per move of the greedy engine,
+# from the costs of the "expert" and "beginner" tiers
+NODE_COST = 0.04
+GREEDY_COST = 0.05
+
+ADMISSIONS = metrics.Counter("reversi_ai_admissions_total", "AI requests admitted, downgraded to a cheaper tier or shed", ["outcome"])
+ADMITTED = ADMISSIONS.labels("admitted")
+DOWNGRADED = ADMISSIONS.labels("downgraded")
+SHED = ADMISSIONS.labels("shed")
+
+
+class Overloaded(Exception):
+    """
+    Raised when an AI request does not fit even when downgraded to the cheapest tier.
+
+    Attributes:
+        retry_after (float): Seconds until the request would fit.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__("The server is busy, please try again shortly")
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Milliseconds of AI work that can be spent, refilled at a steady rate.
+
+    Attributes:
+        rate (float): Milliseconds added per second.
+        capacity (float): Most milliseconds the bucket holds.
+        tokens (float): Milliseconds in the bucket at 'updated'.
+        updated (float): The time.monotonic() of the last refill.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        """
+        Adds the tokens earned since the last refill.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, cost):
+        """
+        Seconds until the bucket holds 'cost' tokens, 0 if it already does.
+        """
+        return max(0.0, cost - self.tokens) / self.rate
+
+
+def estimate_cost(settings, tier=None, count=1, positions=1):
+    """
+    Works out the expected CPU cost of an AI move.
+
+    Parameters:
+        settings (dict): Complete engine settings.
+        tier (dict | None): The difficulty tier, whose measured cost is used if given.
+        count (int): How many moves are ranked ('multipv'), 1 for just the best move.
+        positions (int): How many positions are searched, such as the size of an '/analyse' batch.
+
+    Returns:
+        float: The expected milliseconds of CPU time.
+    """
+    factor = search.ranking_factor(settings, count)
+    if tier is not None:
+        return tier["cost"] * factor * positions
+    if settings["engine"] == "greedy":
+        return GREEDY_COST * positions
+    # Matches the measured tiers: 2 ms at depth 2 and 50 ms at depth 4
+    cost = 2.0 * 5 ** (settings["depth"] - 2) * factor
+    if "nodes" in settings:
+        cost = min(cost, settings["nodes"] * NODE_COST)
+    if "time" in settings:
+        cost = min(cost, settings["time"])
+    return cost * positions
+
+
+class AdmissionControl:
+    """
+    The per-client and global token buckets of a server.
+
+    Attributes:
+        client_rate (float): Milliseconds of AI work each client may use per second.
+        global_rate (float): Milliseconds of AI work the server may use per second.
+        burst (float): Seconds of work a full bucket holds.
+        max_clients (int): Most client buckets kept.
+    """
+
+    def __init__(self, client_rate=CLIENT_RATE, global_rate=GLOBAL_RATE, burst=BURST_SECONDS,
+                 max_clients=MAX_CLIENTS, clock=time.monotonic):
+        self.client_rate = client_rate
+        self.global_rate = global_rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._global = TokenBucket(global_rate, global_rate * burst, clock())
+        # Client buckets, least recently used first
+        self._clients = collections.OrderedDict()
+
+    def _client_bucket(self, client, now):
+        """
+        Gets a client's bucket, making a full one for a new client.
+        """
+        bucket = self._clients.get(client)
+        if bucket is None:
+            bucket = self._clients[client] = TokenBucket(self.client_rate, self.client_rate * self.burst, now)
+            if len(self._clients) > self.max_clients:
+                # A client that has not been seen for a while would have a full bucket again anyway
+                self._clients.popitem(last=False)
+        else:
+            self._clients.move_to_end(client)
+        return bucket
+
+    def admit(self, client, settings, tier=None, count=1, positions=1):
+        """
+        Charges an AI request to its client and the server, downgrading it to a
+        cheaper difficulty tier if it does not fit.
+
+        Parameters:
+            client (str): Who sent the request, such as the session id or the address.
+            settings (dict): The complete engine settings that were asked for.
+            tier (dict | None): The difficulty tier that was asked for, if any.
+            count (int): How many moves are ranked ('multipv'), 1 for just the best move.
+            positions (int): How many positions are searched, such as the size of an '/analyse' batch.
+
+        Returns:
+            tuple(dict, dict|None, bool): The engine settings and tier to play with, and
+                whether the request was downgraded.
+
+        Raises:
+            Overloaded: If even the cheapest tier does not fit.
+        """
+        cost = estimate_cost(settings, tier, count, positions)
+        # The request itself, then every cheaper tier from the most to the least expensive
+        # (the harder of two tiers with the same cost first)
+        options = [(settings, tier, cost)]
+        cheaper_tiers = [(difficulty.TIERS[name], estimate_cost(difficulty.TIERS[name]["settings"], difficulty.TIERS[name], count, positions))
+                         for name in reversed(difficulty.AVAILABLE)]
+        for cheaper, cheaper_cost in sorted(cheaper_tiers, key=lambda option: -option[1]):
+            if cheaper_cost < cost:
+                options.append((cheaper["settings"], cheaper, cheaper_cost))
+
+        with self._lock:
+            now = self._clock()
+            bucket = self._client_bucket(client, now)
+            bucket.refill(now)
+            self._global.refill(now)
+            for number, (option_settings, option_tier, option_cost) in enumerate(options):
+                if bucket.tokens >= option_cost and self._global.tokens >= option_cost:
+                    bucket.tokens -= option_cost
+                    self._global.tokens -= option_cost
+                    (DOWNGRADED if number else ADMITTED).inc()
+                    return option_settings, option_tier, number > 0
+            cheapest = options[-1][2]
+            retry_after = max(bucket.wait(cheapest), self._global.wait(cheapest))
+        SHED.inc()
+        raise Overloaded(retry_after)
+
+
+# The admission control of this server
+control = AdmissionControl()
+
+def admit(client, settings, tier=None, count=1, positions=1):
+    """
+    Runs an AI request through the server's admission control when it is enabled
+    (see AdmissionControl.admit). Requests are always admitted unchanged when it is not.
+    """
+    if not ENABLED:
+        return settings, tier, False
+    return control.admit(client, settings, tier, count, positions)
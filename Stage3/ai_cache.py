@@ -0,0 +1,357 @@
+"""
+Server-wide cache of AI moves.
+
+Many games go through the same positions (especially the openings) so the
+move chosen for a position is remembered and reused. Positions are stored in
+their canonical form (the smallest of the 8 rotations and reflections) so
+symmetric positions share one entry. Entries are keyed by the canonical board,
+the colour to move and the engine settings, and the least recently used entry
+is removed once the cache is full. The cache can be saved to and loaded from a
+file so it survives a restart.
+
+The greedy engine breaks ties by the order it scans the board, so its moves
+would change with the symmetry. It is searched and cached on the real board.
+"""
+
+import collections
+import json
+import os
+import threading
+import bitboard
+import metrics
+import search
+
+DEFAULT_MAX_SIZE = 100000
+
+# File the cache is loaded from at startup and saved to at exit (disabled if not set)
+CACHE_PATH = os.environ.get("REVERSI_AI_CACHE")
+
+
+class LRUCache:
+    """
+    Dictionary with a size limit that removes the least recently used entry when full.
+
+    Attributes:
+        max_size (int): The most entries kept at once.
+        hits (int): How many lookups found an entry.
+        misses (int): How many lookups did not find an entry.
+        evictions (int): How many entries were removed to make space.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """
+        Looks up an entry and marks it as the most recently used.
+
+        Parameters:
+            key (tuple): The key of the entry.
+
+        Returns:
+            The stored value, or None if there is no entry for the key.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        Stores an entry, removing the least recently used entries if the cache is full.
+
+        Parameters:
+            key (tuple): The key of the entry.
+            value: The value to store. Must not be None.
+        """
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Gets the counters of the cache.
+
+        Returns:
+            dict: The number of entries, the size limit, hits, misses and evictions.
+        """
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def save(self, path):
+        """
+        Writes every entry to a JSON file, least recently used first.
+
+        Parameters:
+            path (str): The path of the file to write.
+        """
+        with self._lock:
+            entries = [[list(key), value] for key, value in self._entries.items()]
+
+        # Write to a temporary file first so a crash never leaves half a file behind
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(entries, file)
+        os.replace(temporary_path, path)
+
+    def load(self, path):
+        """
+        Adds the entries from a file written by save.
+
+        Parameters:
+            path (str): The path of the file to read.
+        """
+        with open(path, encoding="utf-8") as file:
+            entries = json.load(file)
+        for key, value in entries:
+            self.put(_to_tuple(key), _to_tuple(value))
+
+
+def _to_tuple(value):
+    """
+    Turns lists read back from JSON into tuples so they can be used as keys again.
+    """
+    if isinstance(value, list):
+        return tuple(_to_tuple(item) for item in value)
+    return value
+
+
+# The cache shared by every request to the server
+cache = LRUCache()
+
+AI_PHASE_SECONDS = metrics.Histogram("reversi_ai_phase_seconds", "Time spent in each phase of choosing an AI move", ["phase"])
+LOOKUP_TIME = AI_PHASE_SECONDS.labels("cache_lookup")
+SEARCH_TIME = AI_PHASE_SECONDS.labels("search")
+AI_NODES = metrics.Counter("reversi_ai_nodes_total", "Positions visited by AI searches", ["engine"])
+metrics.Gauge("reversi_ai_cache_entries", "Moves held in the AI cache", lambda: len(cache))
+metrics.Gauge("reversi_ai_cache_hits_total", "AI cache lookups that found a move", lambda: cache.hits, "counter")
+metrics.Gauge("reversi_ai_cache_misses_total", "AI cache lookups that needed a search", lambda: cache.misses, "counter")
+metrics.Gauge("reversi_ai_cache_evictions_total", "Moves removed from the full AI cache", lambda: cache.evictions, "counter")
+
+def record_search(result, settings):
+    """
+    Counts the positions visited by a search in the metrics.
+
+    Parameters:
+        result (dict): The result of search.best_move.
+        settings (dict): The engine settings the search used.
+    """
+    AI_NODES.labels(settings["engine"]).inc(result["nodes"])
+
+def canonical_position(dark, light, colour, size, settings):
+    """
+    Turns a position into its canonical form, or leaves it as it is for engines
+    that are not symmetric (see search.symmetric).
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour of the player to move.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from search.normalise_settings.
+
+    Returns:
+        tuple: The symmetry that gives the canonical position, the cache key, and the
+            masks of the player to move and of the opponent in the canonical position.
+    """
+    if search.symmetric(settings):
+        symmetry, dark, light = bitboard.canonical(dark, light, size)
+    else:
+        # Symmetry 0 leaves the board as it is
+        symmetry = 0
+    key = (size, dark, light, colour, search.settings_key(settings))
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    return symmetry, key, player, opponent
+
+def canonical_lookup(dark, light, colour, size, settings):
+    """
+    Turns a position into its canonical form and looks it up in the cache.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour of the player to move.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from search.normalise_settings.
+
+    Returns:
+        tuple: The symmetry that gives the canonical position, the cache key, the
+            masks of the player to move and of the opponent in the canonical position,
+            and the cached (square, score) entry or None on a miss.
+    """
+    symmetry, key, player, opponent = canonical_position(dark, light, colour, size, settings)
+    # Moves from time limited searches are never cached so there is nothing to find
+    entry = cache.get(key) if search.deterministic(settings) else None
+    return symmetry, key, player, opponent, entry
+
+def remember(key, entry, settings):
+    """
+    Puts a move in the cache unless the settings could choose a different move for
+    the same position next time (see search.deterministic).
+
+    Parameters:
+        key (tuple): The cache key from canonical_lookup.
+        entry (tuple(int|None, float|None)): The square and score of the move in the canonical position.
+        settings (dict): The engine settings of the search.
+    """
+    if search.deterministic(settings):
+        cache.put(key, entry)
+
+def real_move(entry, symmetry, size):
+    """
+    Maps a cached (square, score) entry from the canonical position back onto the real board.
+
+    Returns:
+        tuple(int|None, float|None): The square (y * size + x) on the real board and its score,
+            or None and None if there are no legal moves.
+    """
+    square, score = entry
+    if square is None:
+        return None, None
+    return bitboard.untransform_square(square, symmetry, size), score
+
+def cached_best_move(dark, light, colour, size, settings, pondered=None):
+    """
+    Chooses a move for the player to move, reusing the answer for the same
+    (or a symmetric) position if it has been worked out before.
+
+    The search always runs on the canonical position so the same move is chosen
+    whether or not the answer came from the cache. The greedy engine runs on the
+    real board so its choice between equal squares is the same as without the cache.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour of the player to move.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from search.normalise_settings.
+        pondered (callable | None): Called with the cache key when the position is not
+            in the cache, before searching, to get the entry of a search that was already
+            done (see ponder.collect). It returns None if there is not one.
+
+    Returns:
+        tuple(int|None, float|None): The square (y * size + x) of the chosen move
+            on the real board and its score, or None and None if there are no legal moves.
+    """
+    with LOOKUP_TIME.time():
+        symmetry, key, player, opponent, entry = canonical_lookup(dark, light, colour, size, settings)
+    if entry is None and pondered is not None:
+        entry = pondered(key)
+    if entry is None:
+        with SEARCH_TIME.time():
+            result = search.best_move(player, opponent, size, settings)
+        record_search(result, settings)
+        entry = (result["square"], result["score"])
+        remember(key, entry, settings)
+    return real_move(entry, symmetry, size)
+
+def store_ranking(result, symmetry, key, settings, size):
+    """
+    Finishes a multi-PV search of a canonical position: counts its nodes, caches its
+    best move for '/ai_move' when best_move would choose the same one (see
+    search.ranking_agrees) and maps every move back onto the real board.
+
+    Parameters:
+        result (dict): The result of search.ranked_moves on the canonical position.
+        symmetry (int): The symmetry from canonical_lookup.
+        key (tuple): The cache key from canonical_lookup.
+        settings (dict): Complete engine settings.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        list[dict]: The ranked moves with their squares on the real board.
+    """
+    record_search(result, settings)
+    moves = result["moves"]
+    if search.ranking_agrees(settings):
+        remember(key, (moves[0]["square"], moves[0]["score"]) if moves else (None, None), settings)
+    return [{"square": bitboard.untransform_square(move["square"], symmetry, size), "score": move["score"],
+             "pv": [None if square is None else bitboard.untransform_square(square, symmetry, size)
+                    for square in move["pv"]]}
+            for move in moves]
+
+def ranked_moves(dark, light, colour, size, settings, count):
+    """
+    Ranks the best moves for the player to move with their scores and principal variations.
+
+    Rankings are not cached (only single best moves are) but the search runs on the
+    canonical position, so without a budget or ProbCut its best move is the one
+    cached_best_move would choose and it is added to the cache.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour of the player to move.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from search.normalise_settings.
+        count (int): How many moves to rank.
+
+    Returns:
+        list[dict]: Up to 'count' moves, best first, as in search.ranked_moves but with
+            squares on the real board.
+    """
+    symmetry, key, player, opponent = canonical_position(dark, light, colour, size, settings)
+    with SEARCH_TIME.time():
+        result = search.ranked_moves(player, opponent, size, settings, count)
+    return store_ranking(result, symmetry, key, settings, size)
+
+def load_cache():
+    """
+    Loads the cache from CACHE_PATH if it is set and the file exists.
+    """
+    if CACHE_PATH and os.path.exists(CACHE_PATH):
+        cache.load(CACHE_PATH)
+
+# Thread loading the cache file, see load_cache_in_background
+_loader = None
+
+def load_cache_in_background():
+    """
+    Starts loading the cache from CACHE_PATH on another thread so a large file does
+    not hold up the server starting. AI moves asked for meanwhile are searched as normal.
+    """
+    global _loader
+    if CACHE_PATH and os.path.exists(CACHE_PATH):
+        _loader = threading.Thread(target=load_cache, name="ai-cache-load", daemon=True)
+        _loader.start()
+
+def save_cache():
+    """
+    Saves the cache to CACHE_PATH if it is set, once any background load has finished.
+    """
+    if _loader is not None:
+        _loader.join()
+    if CACHE_PATH:
+        cache.save(CACHE_PATH)
@@ -0,0 +1,191 @@
+"""
+Batch analysis of many positions in one request.
+
+A batch is a list of positions, each a board in any of the encodings from the
+'encoding' module and the colour to move. Every position gets its best move,
+the engine's score and its legal moves. Positions already in the AI cache are
+answered straight away and the rest are searched in a shared pool of worker
+processes, with each result handed back as soon as it is ready.
+
+Results are dictionaries such as
+{"index": 3, "status": "success", "best_move": [4, 6], "score": 2.5, "legal_moves": [[4, 6], [3, 5]]}
+and are sent to the client as newline-delimited JSON.
+"""
+
+import concurrent.futures
+import os
+import ai_cache
+import bitboard
+import encoding
+import savefile
+import search
+
+# Most positions accepted in one batch
+MAX_POSITIONS = 256
+
+# Number of processes used for AI searches (defaults to the number of CPU cores)
+AI_WORKERS = int(os.environ.get("REVERSI_AI_WORKERS", "0")) or os.cpu_count() or 1
+
+# Worker processes for AI searches, made the first time one is needed
+_pool = None
+
+def get_pool():
+    """
+    Gets the pool of worker processes for AI searches, making it if needed.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: The pool.
+    """
+    global _pool
+    if _pool is None:
+        _pool = concurrent.futures.ProcessPoolExecutor(max_workers=AI_WORKERS)
+    return _pool
+
+def shutdown_pool():
+    """
+    Stops the worker processes if they were started.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def parse_colour(value):
+    """
+    Reads the colour to move of a position.
+
+    Parameters:
+        value (str): "Dark" or "Light", in any case and with or without padding.
+
+    Returns:
+        str: "Dark " or "Light".
+    """
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value == "dark":
+            return "Dark "
+        if value == "light":
+            return "Light"
+    raise ValueError("Player must be 'Dark' or 'Light'")
+
+def parse_batch(data):
+    """
+    Checks the shape of a batch request and reads its engine settings.
+
+    Parameters:
+        data (dict): The JSON body, with "positions" and optionally "engine", "evaluator" and "depth".
+
+    Returns:
+        tuple(list, dict): The positions and the complete engine settings.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("positions"), list):
+        raise ValueError("Request must be a JSON object with a 'positions' list")
+    positions = data["positions"]
+    if len(positions) > MAX_POSITIONS:
+        raise ValueError(f"At most {MAX_POSITIONS} positions can be analysed at once")
+    return positions, search.normalise_settings(data)
+
+def prepare(index, position, settings):
+    """
+    Reads one position and looks it up in the AI cache.
+
+    Parameters:
+        index (int): Where the position is in the batch.
+        position (dict): The "board" and the "player" to move.
+        settings (dict): Complete engine settings.
+
+    Returns:
+        tuple(dict, tuple|None): The result so far, and the work still needed (the
+            symmetry, cache key, player and opponent masks) or None if the result is finished.
+    """
+    try:
+        if not isinstance(position, dict):
+            raise ValueError("Each position must be a JSON object")
+        if "board" not in position:
+            raise ValueError("Each position needs a 'board'")
+        board = encoding.decode(position["board"])
+        savefile.check_board(board)
+        if settings["engine"] == "greedy" and len(board) != 8:
+            raise ValueError("The greedy engine only supports 8x8 boards")
+        colour = parse_colour(position.get("player"))
+        size = len(board)
+        dark, light = bitboard.from_board(board)
+    except (ValueError, TypeError) as e:
+        return {"index": index, "status": "fail", "message": str(e)}, None
+
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    moves = bitboard.legal_moves(player, opponent, bitboard.geometry(size))
+    result = {
+        "index": index,
+        "status": "success",
+        "legal_moves": [[square % size + 1, square // size + 1] for square in range(size * size) if moves >> square & 1],
+        "size": size,
+    }
+    symmetry, key, canonical_player, canonical_opponent, entry = ai_cache.canonical_lookup(dark, light, colour, size, settings)
+    if entry is not None:
+        return finish(result, entry, symmetry), None
+    return result, (symmetry, key, canonical_player, canonical_opponent)
+
+def finish(result, entry, symmetry):
+    """
+    Adds the best move and score from a cache entry to a result.
+    """
+    size = result.pop("size")
+    square, score = ai_cache.real_move(entry, symmetry, size)
+    result["best_move"] = None if square is None else [square % size + 1, square // size + 1]
+    result["score"] = score
+    return result
+
+def complete(result, found, symmetry, key, settings):
+    """
+    Stores a finished search in the AI cache and adds its move to the result.
+
+    Parameters:
+        result (dict): The result from prepare.
+        found (dict): The result of search.best_move on the canonical position.
+        symmetry (int): The symmetry from the canonical position back to the real board.
+        key (tuple): The AI cache key of the position.
+        settings (dict): Complete engine settings.
+
+    Returns:
+        dict: The finished result.
+    """
+    ai_cache.record_search(found, settings)
+    entry = (found["square"], found["score"])
+    ai_cache.remember(key, entry, settings)
+    return finish(result, entry, symmetry)
+
+def analyse(positions, settings, pool=None):
+    """
+    Analyses a batch of positions, handing back each result as soon as it is ready.
+
+    Parameters:
+        positions (list[dict]): The positions from parse_batch.
+        settings (dict): Complete engine settings.
+        pool (concurrent.futures.Executor | None): Where searches run. The shared worker
+            pool is used if None. Greedy searches always run straight away.
+
+    Yields:
+        dict: The result of each position, in the order they finish.
+    """
+    pending = {}
+    try:
+        for index, position in enumerate(positions):
+            result, work = prepare(index, position, settings)
+            if work is None:
+                yield result
+                continue
+            symmetry, key, player, opponent = work
+            if settings["engine"] == "greedy":
+                yield complete(result, search.best_move(player, opponent, result["size"], settings), symmetry, key, settings)
+                continue
+            future = (pool or get_pool()).submit(search.best_move, player, opponent, result["size"], settings)
+            pending[future] = (result, symmetry, key)
+
+        for future in concurrent.futures.as_completed(pending):
+            result, symmetry, key = pending[future]
+            yield complete(result, future.result(), symmetry, key, settings)
+    finally:
+        # Stop searches nobody will read if the client went away
+        for future in pending:
+            future.cancel()
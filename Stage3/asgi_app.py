@@ -0,0 +1,511 @@
+"""
+Asyncio (ASGI) deployment of the Reversi web app.
+
+Serves the same routes as 'flask_game_engine' on an event loop, so thousands of
+idle keep-alive connections only cost a coroutine each instead of a worker
+thread. The routes that are called on every turn ('/move' and '/ai_move'), the
+spectator view ('/position') and the streaming batch analysis ('/analyse') are
+handled here directly. The rest ('/', '/save', '/load', '/reset', '/store/...')
+are passed on to the Flask app itself so they behave exactly the same.
+
+With a session backend enabled (see 'session_store') each browser gets its own
+game through the same session cookie as the Flask app.
+
+Every change to the game state runs on one state thread, so requests never
+race each other and the event loop never waits for a lock. AI searches deeper
+than the greedy engine run in a pool of worker processes so they use every CPU
+core and do not hold up other requests.
+
+Usage:
+    uvicorn asgi_app:app
+    python asgi_app.py [port]        (uses the built-in 'asgi_server' if uvicorn is not installed)
+"""
+
+import asyncio
+import concurrent.futures
+import http.cookies
+import io
+import json
+import math
+import sys
+import urllib.parse
+import uuid
+import admission
+import ai_cache
+import analysis
+import difficulty
+import encoding
+import ponder
+import search
+import session_store
+import flask_game_engine as engine
+
+# The single thread every change to the game state runs on
+state_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="reversi-state")
+
+async def run_on_state_thread(function, *args):
+    """
+    Runs a function that reads or changes the game state on the state thread.
+
+    Returns:
+        The result of the function.
+    """
+    return await asyncio.get_running_loop().run_in_executor(state_executor, function, *args)
+
+def query_args(scope):
+    """
+    Reads the query parameters of a request, keeping the first value of each.
+
+    Returns:
+        dict: The parameters by name.
+    """
+    query = urllib.parse.parse_qs(scope["query_string"].decode("latin-1"), keep_blank_values=True)
+    return {name: values[0] for name, values in query.items()}
+
+def header(scope, name):
+    """
+    Gets a request header by its lower case name, or None if it was not sent.
+    """
+    name = name.encode("latin-1")
+    for key, value in scope["headers"]:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+def int_arg(args, name):
+    """
+    Reads a whole number query parameter, giving None if it is missing or not numeric like Flask's 'type=int'.
+    """
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return None
+
+def session_id(scope):
+    """
+    Gets the session id from the request's session cookie, making a new one if
+    sessions are enabled and the browser does not have one yet.
+
+    Returns:
+        tuple(str|None, list[tuple(bytes,bytes)]): The session id (None when sessions
+            are disabled) and the headers to send a new session cookie.
+    """
+    if engine.session_backend is None:
+        return None, []
+    cookies = http.cookies.SimpleCookie()
+    try:
+        cookies.load(header(scope, "cookie") or "")
+    except http.cookies.CookieError:
+        pass
+    morsel = cookies.get(engine.SESSION_COOKIE)
+    if morsel is not None and engine.GAME_ID_PATTERN.fullmatch(morsel.value):
+        return morsel.value, []
+    new_id = uuid.uuid4().hex
+    cookie = f"{engine.SESSION_COOKIE}={new_id}; HttpOnly; Path=/; SameSite=Lax"
+    return new_id, [(b"set-cookie", cookie.encode("latin-1"))]
+
+async def send_response(send, status, body, content_type="application/json", headers=()):
+    """
+    Sends a complete response.
+
+    Parameters:
+        send (callable): The ASGI send function.
+        status (int): The HTTP status code.
+        body (bytes): The body of the response.
+        content_type (str): The Content-Type header.
+        headers (list[tuple(bytes,bytes)]): Any other headers.
+    """
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode("latin-1")),
+                    (b"content-length", str(len(body)).encode("latin-1")), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+async def send_json(send, payload, status=200, headers=()):
+    """
+    Sends a JSON response in the same layout as flask.jsonify.
+    """
+    await send_response(send, status, json.dumps(payload).encode() + b"\n", headers=headers)
+
+async def run_game_action(send, session, function, *args):
+    """
+    Runs a function on the state thread with the session's game as the current game.
+
+    Parameters:
+        send (callable): The ASGI send function, used to answer if the game keeps changing underneath.
+        session (tuple): The session id and cookie headers from session_id.
+        function (callable): The function to run.
+        *args: Passed on to the function.
+
+    Returns:
+        The result of the function, or None if a conflict response was sent.
+    """
+    try:
+        return await run_on_state_thread(engine.run_in_session, session[0], function, *args)
+    except session_store.VersionConflict:
+        await send_json(send, {"status": "fail", "message": "The game was changed by another request, please try again"},
+                        409, session[1])
+        return None
+
+async def move(scope, receive, send):
+    """
+    Handles the '/move' route with the shared flask_game_engine.play_move logic.
+    """
+    args = query_args(scope)
+    try:
+        board_format = encoding.choose_format(args.get("board_format"), header(scope, "accept"))
+    except ValueError as e:
+        await send_json(send, {"status": "fail", "message": str(e)})
+        return
+    session = session_id(scope)
+    payload = await run_game_action(send, session, engine.play_move, int_arg(args, "x"), int_arg(args, "y"), board_format)
+    if payload is not None:
+        await send_json(send, payload, headers=session[1])
+
+async def session_index(session):
+    """
+    Gets the published position index of a session's game. Without sessions the
+    index is read straight from the event loop: it is replaced rather than changed
+    when a move is played, so it never needs the state thread.
+
+    Returns:
+        dict: The position index, including its immutable "position".
+    """
+    if engine.session_backend is None:
+        return engine.current_index()
+    return await run_on_state_thread(engine.run_in_session, session[0], engine.current_index)
+
+async def spectate(scope, receive, send):
+    """
+    Handles the '/position' route for spectators from the published snapshot of the game.
+    """
+    try:
+        board_format = encoding.choose_format(query_args(scope).get("board_format"), header(scope, "accept"))
+    except ValueError as e:
+        await send_json(send, {"status": "fail", "message": str(e)})
+        return
+    session = session_id(scope)
+    if engine.session_backend is None:
+        payload = engine.spectate(board_format)
+    else:
+        payload = await run_on_state_thread(engine.run_in_session, session[0], engine.spectate, board_format)
+    await send_json(send, payload, headers=session[1])
+
+async def rank_moves(dark, light, colour, size, settings, count):
+    """
+    Ranks the best moves like ai_cache.ranked_moves, searching in the AI worker
+    processes unless the greedy engine is used.
+
+    Returns:
+        list[dict]: Up to 'count' moves, best first, with squares on the real board.
+    """
+    symmetry, key, player, opponent = ai_cache.canonical_position(dark, light, colour, size, settings)
+    with ai_cache.SEARCH_TIME.time():
+        if settings["engine"] == "greedy":
+            result = search.ranked_moves(player, opponent, size, settings, count)
+        else:
+            result = await asyncio.get_running_loop().run_in_executor(
+                analysis.get_pool(), search.ranked_moves, player, opponent, size, settings, count)
+    return ai_cache.store_ranking(result, symmetry, key, settings, size)
+
+async def ranked_ai_move(send, session, dark, light, colour, size, settings, count, extra):
+    """
+    Answers an '/ai_move' request with a 'multipv' count, ranking the best moves
+    in the AI worker processes unless the greedy engine is used, and starts pondering
+    from the best move like a normal request.
+    """
+    ranking = await rank_moves(dark, light, colour, size, settings, count)
+    ponder.start(session[0], dark, light, size, settings, ranking[0]["square"] if ranking else None, colour)
+    moves = engine.format_ranking(ranking, size)
+    best_move = (moves[0]["x"], moves[0]["y"]) if moves else (-1, -1)
+    await send_json(send, {"status": "success", "x": best_move[0], "y": best_move[1], "moves": moves, **extra},
+                    headers=session[1])
+
+async def ai_move(scope, receive, send):
+    """
+    Handles the '/ai_move' route. Cached moves and the greedy engine are answered
+    straight away and deeper searches run in the AI worker processes, as do the
+    rankings the random moves of the easier difficulty tiers are chosen from.
+    """
+    args = query_args(scope)
+    try:
+        settings, tier = difficulty.parse_request(args)
+        colour = analysis.parse_colour(args.get("player", "Light"))
+        count = args.get("multipv")
+        if count is not None:
+            count = search.parse_multi_pv(count)
+    except ValueError as e:
+        await send_json(send, {"status": "fail", "message": str(e)})
+        return
+
+    session = session_id(scope)
+    # Clients are told apart by their session, or by their address without sessions
+    client = session[0] or (scope.get("client") or ("",))[0]
+    try:
+        settings, tier, downgraded = admission.admit(client, settings, tier, count or 1)
+    except admission.Overloaded as e:
+        retry = (b"retry-after", str(math.ceil(e.retry_after)).encode("latin-1"))
+        await send_json(send, {"status": "fail", "message": str(e)}, 429, session[1] + [retry])
+        return
+    extra = {"difficulty": tier["name"]} if downgraded else {}
+    if tier is not None:
+        difficulty.meter(tier, count or 1)
+
+    snapshot = (await session_index(session))["position"]
+    dark, light, size = snapshot.dark, snapshot.light, snapshot.size
+    if count is not None:
+        await ranked_ai_move(send, session, dark, light, colour, size, settings, count, extra)
+        return
+    square = None
+    if difficulty.randomises(tier):
+        ranking = None
+        if tier["randomise"]["top"] is not None:
+            ranking = await rank_moves(dark, light, colour, size, tier["settings"], tier["randomise"]["top"])
+        square = difficulty.random_choice(tier, dark, light, colour, size, ranking)
+    if square is None:
+        square = await best_ai_move(session, dark, light, colour, size, settings)
+    ponder.start(session[0], dark, light, size, settings, square, colour)
+
+    # No legal moves gives the same out of range move as the Flask route
+    best_move = (-1, -1)
+    if square is not None:
+        best_move = (square % size + 1, square // size + 1)
+    await send_json(send, {"status": "success", "x": best_move[0], "y": best_move[1], **extra}, headers=session[1])
+
+async def best_ai_move(session, dark, light, colour, size, settings):
+    """
+    Chooses the engine's best move from the AI cache, the session's ponder or a new search.
+
+    Returns:
+        int | None: The square (y * size + x) of the move, or None if there are no legal moves.
+    """
+    with ai_cache.LOOKUP_TIME.time():
+        symmetry, key, player, opponent, entry = ai_cache.canonical_lookup(dark, light, colour, size, settings)
+
+    # Use the search done on the player's time if they played the predicted move and the
+    # answer is not in the AI cache already (ponder.start then throws the ponder away)
+    pondered = ponder.claim(session[0], key) if entry is None and ponder.ENABLED else None
+    if pondered is not None:
+        try:
+            entry = ponder.store(key, await asyncio.wrap_future(pondered), settings)
+        except ponder.FAILURES:
+            pass
+    if entry is None:
+        with ai_cache.SEARCH_TIME.time():
+            if settings["engine"] == "greedy":
+                result = search.best_move(player, opponent, size, settings)
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    analysis.get_pool(), search.best_move, player, opponent, size, settings)
+        ai_cache.record_search(result, settings)
+        entry = (result["square"], result["score"])
+        ai_cache.remember(key, entry, settings)
+    return ai_cache.real_move(entry, symmetry, size)[0]
+
+def wsgi_environ(scope, body):
+    """
+    Builds the WSGI environment for passing an ASGI request on to the Flask app.
+
+    Parameters:
+        scope (dict): The ASGI connection scope.
+        body (bytes): The whole request body.
+
+    Returns:
+        dict: The WSGI environment.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": "HTTP/" + scope.get("http_version", "1.1"),
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for key, value in scope["headers"]:
+        name = key.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        environ[name] = environ[name] + "," + value if name in environ else value
+    return environ
+
+def call_wsgi(environ):
+    """
+    Runs the Flask app for one request.
+
+    Returns:
+        tuple(int, list[tuple(bytes,bytes)], bytes): The status code, headers and body.
+    """
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    chunks = engine.app(environ, start_response)
+    try:
+        body = b"".join(chunks)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+    return response["status"], response["headers"], body
+
+async def read_body(receive):
+    """
+    Reads the whole request body, giving up on uploads too large for any route.
+
+    Returns:
+        bytes | None: The body, or None if it was too large or the client went away.
+    """
+    limit = engine.app.config["MAX_CONTENT_LENGTH"]
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if limit is not None and len(body) > limit:
+            return None
+    return body
+
+async def analyse(scope, receive, send):
+    """
+    Handles the '/analyse' route, streaming one line of JSON per position as
+    soon as its analysis is finished (see 'analysis'). The whole batch goes through
+    admission control before anything is searched, like the Flask route.
+    """
+    body = await read_body(receive)
+    if body is None:
+        await send_response(send, 413, b"Request too large", "text/plain")
+        return
+    try:
+        positions, settings = analysis.parse_batch(json.loads(body))
+    except ValueError as e:
+        await send_json(send, {"status": "fail", "message": str(e)}, 400)
+        return
+
+    session = session_id(scope)
+    client = session[0] or (scope.get("client") or ("",))[0]
+    try:
+        settings, tier, downgraded = admission.admit(client, settings, positions=len(positions))
+    except admission.Overloaded as e:
+        retry = (b"retry-after", str(math.ceil(e.retry_after)).encode("latin-1"))
+        await send_json(send, {"status": "fail", "message": str(e)}, 429, session[1] + [retry])
+        return
+    extra = {"difficulty": tier["name"]} if downgraded else {}
+
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")] + session[1]})
+
+    async def send_line(result):
+        await send({"type": "http.response.body", "body": json.dumps({**result, **extra}).encode() + b"\n",
+                    "more_body": True})
+
+    loop = asyncio.get_running_loop()
+    pending = {}
+    try:
+        for index, position in enumerate(positions):
+            result, work = analysis.prepare(index, position, settings)
+            if work is None:
+                await send_line(result)
+                continue
+            symmetry, key, player, opponent = work
+            if settings["engine"] == "greedy":
+                found = search.best_move(player, opponent, result["size"], settings)
+                await send_line(analysis.complete(result, found, symmetry, key, settings))
+                continue
+            future = loop.run_in_executor(analysis.get_pool(), search.best_move, player, opponent, result["size"], settings)
+            pending[future] = (result, symmetry, key)
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                result, symmetry, key = pending.pop(future)
+                await send_line(analysis.complete(result, future.result(), symmetry, key, settings))
+    finally:
+        # Stop searches nobody will read if the client went away
+        for future in pending:
+            future.cancel()
+    await send({"type": "http.response.body", "body": b""})
+
+async def flask_fallback(scope, receive, send):
+    """
+    Passes a request on to the Flask app on the state thread.
+    """
+    body = await read_body(receive)
+    if body is None:
+        await send_response(send, 413, b"Request too large", "text/plain")
+        return
+
+    status, headers, body = await run_on_state_thread(call_wsgi, wsgi_environ(scope, body))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+async def lifespan(receive, send):
+    """
+    Handles the ASGI lifespan messages, stopping the executors when the server shuts down.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            ponder.clear()
+            analysis.shutdown_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+# Routes handled on the event loop, by method and path
+ROUTES = {
+    ("GET", "/move"): move,
+    ("GET", "/ai_move"): ai_move,
+    ("GET", "/position"): spectate,
+    ("POST", "/analyse"): analyse,
+}
+
+async def app(scope, receive, send):
+    """
+    The ASGI application.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    if handler is None:
+        # The Flask app times the routes it answers itself
+        await flask_fallback(scope, receive, send)
+        return
+    with engine.REQUEST_SECONDS.labels(scope["path"]).time():
+        await handler(scope, receive, send)
+
+def main():
+    """
+    Runs the app with uvicorn if it is installed, otherwise with the built-in server.
+    """
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8000
+    try:
+        import uvicorn
+    except ImportError:
+        import asgi_server
+        asyncio.run(asgi_server.serve(app, "127.0.0.1", port))
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=port)
+
+if __name__ == "__main__":
+    main()
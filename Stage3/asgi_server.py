@@ -0,0 +1,214 @@
+"""
+Minimal HTTP/1.1 server for running an ASGI app with nothing but asyncio.
+
+Used by 'asgi_app' when uvicorn is not installed and by the tests. It supports
+keep-alive connections, request bodies with a Content-Length and streamed
+(chunked) responses, which is everything the Reversi web page and the load
+test need. Chunked uploads, HTTP/2 and websockets are not supported.
+"""
+
+import asyncio
+import http
+
+# Largest request line and header block accepted
+MAX_HEADER_BYTES = 16 * 1024
+
+# Seconds an idle keep-alive connection is kept open
+KEEP_ALIVE_TIMEOUT = 75
+
+async def read_request(reader):
+    """
+    Reads the request line and headers of the next request on a connection.
+
+    Parameters:
+        reader (asyncio.StreamReader): The connection.
+
+    Returns:
+        tuple(str, str, str, list[tuple(bytes,bytes)]) | None: The method, target,
+            HTTP version and headers, or None if the connection was closed.
+    """
+    try:
+        block = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise ValueError("Request headers are too large") from None
+
+    lines = block.decode("latin-1").split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ValueError("Invalid request line")
+    method, target, version = parts
+
+    headers = []
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers.append((name.strip().lower().encode("latin-1"), value.strip().encode("latin-1")))
+    return method, target, version[5:], headers
+
+def keep_alive(version, headers):
+    """
+    Works out if the connection should stay open after this request.
+    """
+    connection = b""
+    for name, value in headers:
+        if name == b"connection":
+            connection = value.lower()
+    if version == "1.0":
+        return connection == b"keep-alive"
+    return connection != b"close"
+
+async def handle_request(app, reader, writer, request, server, client):
+    """
+    Runs the app for one request and writes its response.
+
+    Returns:
+        bool: True if the connection can be used for another request.
+    """
+    method, target, version, headers = request
+    path, _, query = target.partition("?")
+
+    length = 0
+    for name, value in headers:
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"transfer-encoding":
+            raise ValueError("Chunked requests are not supported")
+    body = await reader.readexactly(length) if length else b""
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": version,
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("latin-1"),
+        "query_string": query.encode("latin-1"),
+        "root_path": "",
+        "headers": headers,
+        "server": server,
+        "client": client,
+    }
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            # Nothing more will arrive for this request
+            await asyncio.Future()
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    open_after = keep_alive(version, headers)
+    response = {"status": 500, "headers": [], "body": [], "chunked": False}
+
+    def head(extra):
+        """
+        Writes the status line and headers with the framing header given in 'extra'.
+        """
+        status = response["status"]
+        lines = [f"HTTP/1.1 {status} {http.HTTPStatus(status).phrase}"]
+        for name, value in response["headers"]:
+            if name.lower() not in (b"content-length", b"transfer-encoding", b"connection"):
+                lines.append(f"{name.decode('latin-1')}: {value.decode('latin-1')}")
+        lines.append(extra)
+        lines.append("connection: keep-alive" if open_after else "connection: close")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = list(message.get("headers", []))
+            return
+        if message["type"] != "http.response.body":
+            return
+        chunk = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        # Streamed responses are sent in chunks as they are made (HTTP/1.1 clients only),
+        # anything else is collected and sent with a Content-Length
+        if more_body and not response["chunked"] and version != "1.0":
+            response["chunked"] = True
+            writer.write(head("transfer-encoding: chunked") + b"".join(
+                b"%x\r\n%s\r\n" % (len(part), part) for part in response["body"] if part))
+            response["body"] = []
+        if response["chunked"]:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            if not more_body:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        else:
+            response["body"].append(chunk)
+
+    await app(scope, receive, send)
+
+    if not response["chunked"]:
+        content = b"".join(response["body"])
+        writer.write(head(f"content-length: {len(content)}") + content)
+        await writer.drain()
+    return open_after
+
+async def serve_connection(app, reader, writer):
+    """
+    Serves requests on one connection until the client closes it or it is idle for too long.
+    """
+    server = writer.get_extra_info("sockname")[:2]
+    client = writer.get_extra_info("peername")[:2]
+    try:
+        while True:
+            try:
+                request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+            except asyncio.TimeoutError:
+                break
+            if request is None:
+                break
+            if not await handle_request(app, reader, writer, request, server, client):
+                break
+    except (ValueError, asyncio.IncompleteReadError):
+        writer.write(b"HTTP/1.1 400 Bad Request\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+async def start(app, host="127.0.0.1", port=8000):
+    """
+    Starts serving an ASGI app.
+
+    Parameters:
+        app (callable): The ASGI app.
+        host (str): The address to listen on.
+        port (int): The port to listen on, 0 picks a free port.
+
+    Returns:
+        asyncio.Server: The running server.
+    """
+    return await asyncio.start_server(
+        lambda reader, writer: serve_connection(app, reader, writer),
+        host, port, limit=MAX_HEADER_BYTES, backlog=4096)
+
+async def serve(app, host="127.0.0.1", port=8000):
+    """
+    Serves an ASGI app until the process is stopped, running its lifespan startup and shutdown.
+    """
+    queue = asyncio.Queue()
+    sent = asyncio.Queue()
+
+    async def send(message):
+        await sent.put(message)
+
+    lifespan = asyncio.create_task(app({"type": "lifespan", "asgi": {"version": "3.0"}}, queue.get, send))
+    await queue.put({"type": "lifespan.startup"})
+    await sent.get()
+
+    server = await start(app, host, port)
+    print(f"Serving on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await queue.put({"type": "lifespan.shutdown"})
+        await lifespan
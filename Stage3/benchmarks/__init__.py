@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks and load tests for the Reversi engine.
+
+Run them from the Stage3 folder as modules, for example:
+    python -m benchmarks.bench_evaluation
+"""
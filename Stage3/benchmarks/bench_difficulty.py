@@ -0,0 +1,53 @@
+"""
+Measures the CPU cost per move of each difficulty tier, for the "cost" values in 'difficulty'.
+
+Every tier searches the same positions from all phases of the game without
+the AI cache, so the numbers are what a move costs when it is not cached.
+Besides the best move, the ranking of the "top" moves used by a randomise
+rule and a ranking of every move ('multipv=32') are measured too, to check the
+tier's budget also holds when moves are ranked. The expected cost of a move
+mixes the best move and the randomise ranking by the rule's chance.
+
+Usage:
+    python -m benchmarks.bench_difficulty
+"""
+
+import time
+import difficulty
+import search
+from benchmarks.common import random_positions
+
+def mean_milliseconds(positions, function):
+    """
+    Gets the average and worst CPU milliseconds of calling function(player, opponent) on every position.
+    """
+    times = []
+    for player, opponent in positions:
+        start = time.process_time()
+        function(player, opponent)
+        times.append((time.process_time() - start) * 1000)
+    return sum(times) / len(times), max(times)
+
+def main():
+    """
+    Prints the average and worst CPU milliseconds per move of every tier.
+    """
+    positions = random_positions(60)[::6]
+    print(f"{'tier':<10} {'stated':>8} {'mean ms':>9} {'max ms':>9} {'top ms':>9} {'expected':>9} {'rank 32':>9}")
+    for name, tier in difficulty.TIERS.items():
+        settings = tier["settings"]
+        mean, worst = mean_milliseconds(positions, lambda player, opponent: search.best_move(player, opponent, 8, settings))
+        expected = mean
+        top = "-"
+        rule = tier["randomise"]
+        if rule is not None and rule["top"] is not None:
+            top_mean, _ = mean_milliseconds(
+                positions, lambda player, opponent: search.ranked_moves(player, opponent, 8, settings, rule["top"]))
+            expected = (1 - rule["chance"]) * mean + rule["chance"] * top_mean
+            top = f"{top_mean:.2f}"
+        ranked, _ = mean_milliseconds(
+            positions, lambda player, opponent: search.ranked_moves(player, opponent, 8, settings, search.MAX_MULTI_PV))
+        print(f"{name:<10} {tier['cost']:>8} {mean:9.2f} {worst:9.2f} {top:>9} {expected:9.2f} {ranked:9.2f}")
+
+if __name__ == "__main__":
+    main()
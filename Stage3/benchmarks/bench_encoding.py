@@ -0,0 +1,50 @@
+"""
+Benchmarks for the board encodings used in API payloads and save files.
+
+Each format is timed end to end as it is used by the server: encoding the
+board and writing it with json.dumps, then reading it with json.loads and
+decoding it back into a list of lists. The payload size is printed too.
+
+Usage:
+    python -m benchmarks.bench_encoding
+"""
+
+import json
+import timeit
+import bitboard
+import encoding
+from benchmarks.common import random_positions
+
+def bench(name, function, values, repeat=5):
+    """
+    Times a function over every value and prints the calls per second of the best run.
+
+    Parameters:
+        name (str): The name printed next to the result.
+        function (callable): Takes one value.
+        values (list): The values to call the function on.
+        repeat (int): How many times the whole list is timed.
+    """
+    def run():
+        for value in values:
+            function(value)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    per_call = best / len(values)
+    print(f"{name:<20} {per_call * 1e6:8.2f} us/call {1 / per_call:12,.0f} calls/s")
+
+def main():
+    """
+    Runs the encode and decode benchmarks for every board format.
+    """
+    boards = [bitboard.to_board(player, opponent, 8) for player, opponent in random_positions(2000)]
+    print(f"{len(boards)} boards")
+
+    for board_format in encoding.FORMATS:
+        payloads = [json.dumps(encoding.encode(board, board_format)) for board in boards]
+        size = sum(len(payload) for payload in payloads) / len(payloads)
+        print(f"{board_format}: {size:.0f} bytes per board")
+        bench(f"encode:{board_format}", lambda board, board_format=board_format: json.dumps(encoding.encode(board, board_format)), boards)
+        bench(f"decode:{board_format}", lambda payload: encoding.decode(json.loads(payload)), payloads)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Micro-benchmarks for each evaluation term and for the full evaluators.
+
+Usage:
+    python -m benchmarks.bench_evaluation [size]
+"""
+
+import sys
+import timeit
+import bitboard
+import evaluation
+import patterns
+from benchmarks.common import random_positions
+
+def bench(name, function, positions, repeat=5):
+    """
+    Times a function over every position and prints the calls per second of the best run.
+
+    Parameters:
+        name (str): The name printed next to the result.
+        function (callable): Takes the player mask and the opponent mask.
+        positions (list[tuple(int,int)]): The positions to call the function on.
+        repeat (int): How many times the whole set of positions is timed.
+    """
+    def run():
+        for player, opponent in positions:
+            function(player, opponent)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    per_call = best / len(positions)
+    print(f"{name:<20} {per_call * 1e6:8.2f} us/call {1 / per_call:12,.0f} calls/s")
+
+def main():
+    """
+    Runs the benchmarks for every term, the move generator and the evaluators.
+    """
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    geo = bitboard.geometry(size)
+    positions = random_positions(2000, size)
+    print(f"{len(positions)} positions on a {size}x{size} board")
+
+    bench("legal_moves", lambda p, o: bitboard.legal_moves(p, o, geo), positions)
+    for name, term in evaluation.TERMS.items():
+        bench(name, lambda p, o, term=term: term(p, o, geo), positions)
+    bench("pattern_codes", patterns.pattern_codes, positions)
+    for name, evaluator in evaluation.EVALUATORS.items():
+        bench(f"evaluator:{name}", lambda p, o, evaluator=evaluator: evaluator(p, o, size), positions)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark of the compiled core against the pure Python reference on an 8x8 board.
+
+Usage:
+    python build_fastcore.py build_ext --inplace
+    python -m benchmarks.bench_fastcore
+"""
+
+import time
+import timeit
+import bitboard
+import evaluation
+import search
+from benchmarks.common import random_positions
+
+def report(name, seconds, number):
+    """
+    Prints the time per call of a benchmark.
+    """
+    print(f"{name:<28} {seconds / number * 1e6:8.2f} us/call")
+
+def bench(name, function, positions):
+    """
+    Times a function over every position, keeping the best of 5 runs.
+    """
+    def run():
+        for player, opponent in positions:
+            function(player, opponent)
+    report(name, min(timeit.repeat(run, number=1, repeat=5)), len(positions))
+
+def main():
+    """
+    Runs each hot function with the compiled and then with the Python geometry.
+    """
+    if bitboard.load_native() is None:
+        print("The compiled core is not built, run: python build_fastcore.py build_ext --inplace")
+        return
+    positions = random_positions(2000)
+    geo = bitboard.geometry(8)
+    # The lowest legal move of each position that has one, for timing play()
+    moves = [(p, o, bitboard.legal_moves(p, o, geo) & -bitboard.legal_moves(p, o, geo)) for p, o in positions]
+    moves = [move for move in moves if move[2]]
+    settings = search.normalise_settings({"engine": "alphabeta", "evaluator": "heuristic", "depth": 5})
+
+    for label, geo in (("native", geo), ("python", bitboard.Geometry(8, native_core=False))):
+        # Everything that looks up the 8x8 geometry, such as evaluate and the search, uses this one
+        bitboard._geometries[8] = geo
+        bench(f"legal_moves ({label})", lambda p, o: bitboard.legal_moves(p, o, geo), positions)
+        report(f"play ({label})", min(timeit.repeat(
+            lambda: [bitboard.play(p, o, move, geo) for p, o, move in moves], number=1, repeat=5)), len(moves))
+        bench(f"stable ({label})", lambda p, o: bitboard.stable(p, o, geo), positions)
+        bench(f"evaluate ({label})", lambda p, o: evaluation.evaluate(p, o, 8), positions)
+        start = time.perf_counter()
+        search.best_move(*positions[100], 8, settings)
+        print(f"{'depth 5 search (' + label + ')':<28} {(time.perf_counter() - start) * 1e3:8.2f} ms")
+    del bitboard._geometries[8]
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmarks for the cost of the metrics so they can stay switched on.
+
+Times recording one value, timing an empty block, and playing the first move
+of a game through flask_game_engine.play_move, which records four phase timings.
+
+Usage:
+    python -m benchmarks.bench_metrics
+"""
+
+import timeit
+import components
+import metrics
+import flask_game_engine as engine
+
+def report(name, seconds, number):
+    """
+    Prints the time per call of a benchmark.
+    """
+    print(f"{name:<24} {seconds / number * 1e9:10.0f} ns/call")
+
+def main():
+    """
+    Runs the metrics benchmarks.
+    """
+    histogram = metrics.Histogram("bench_seconds", "Benchmark histogram", registry=None)
+    child = histogram.labels()
+    counter = metrics.Counter("bench_total", "Benchmark counter", registry=None).labels()
+    number = 200000
+
+    report("counter.inc", min(timeit.repeat(counter.inc, number=number, repeat=5)), number)
+    report("histogram.observe", min(timeit.repeat(lambda: child.observe(0.001), number=number, repeat=5)), number)
+
+    def timed_block():
+        with child.time():
+            pass
+    report("timer (empty block)", min(timeit.repeat(timed_block, number=number, repeat=5)), number)
+
+    def first_move():
+        engine.game_state["board"] = components.initialise_board(8)
+        engine.game_state["current_player"] = "Dark "
+        engine.game_state["game_won"] = False
+        engine.play_move(4, 6)
+    number = 5000
+    report("play_move (first move)", min(timeit.repeat(first_move, number=number, repeat=5)), number)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Benchmark of ranking the best moves in one multi-PV search against searching
+every move separately with a full window and sorting the scores.
+
+Both give the same top moves and scores; the multi-PV search should visit
+fewer positions because moves that cannot make the ranking are cut off. The
+cost of choosing only the best move with Search.root is shown for comparison.
+
+Usage:
+    python -m benchmarks.bench_multipv [depth] [count]
+"""
+
+import sys
+import time
+import bitboard
+import evaluation
+import search
+from benchmarks.common import random_positions
+
+def separate_searches(player, opponent, depth, engine):
+    """
+    Scores every legal move with its own full window search.
+    """
+    scores = []
+    for move in engine.ordered_moves(bitboard.legal_moves(player, opponent, engine.geo)):
+        new_player, new_opponent = bitboard.play(player, opponent, move, engine.geo)
+        scores.append(-engine.negamax(new_opponent, new_player, depth - 1, -float("inf"), float("inf")))
+    return sorted(scores, reverse=True)
+
+def main():
+    """
+    Runs both ways of ranking moves over the same positions and prints their cost.
+    """
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    positions = random_positions(60)[::4]
+    evaluator = evaluation.get_evaluator("heuristic", 8)
+
+    for name in ("best move", "separate", "multi-pv"):
+        engine = search.Search(8, evaluator)
+        start = time.perf_counter()
+        for player, opponent in positions:
+            if name == "best move":
+                engine.root(player, opponent, depth)
+            elif name == "separate":
+                separate_searches(player, opponent, depth, engine)
+            else:
+                engine.ranked_root(player, opponent, depth, count)
+        seconds = time.perf_counter() - start
+        print(f"{name:<10} depth {depth} top {count}: {engine.nodes:>10} nodes {seconds * 1000 / len(positions):8.1f} ms/position")
+
+if __name__ == "__main__":
+    main()
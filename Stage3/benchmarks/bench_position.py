@@ -0,0 +1,35 @@
+"""
+Benchmark of trying a move on an immutable Position against copying the
+list of lists board and applying flask_game_engine.execute_move to the copy.
+
+Usage:
+    python -m benchmarks.bench_position
+"""
+
+import copy
+import timeit
+import components
+import flask_game_engine as engine
+from position import Position
+
+def report(name, seconds, number):
+    """
+    Prints the time per call of a benchmark.
+    """
+    print(f"{name:<28} {seconds / number * 1e6:8.2f} us/call")
+
+def main():
+    """
+    Runs the position benchmarks.
+    """
+    board = components.initialise_board(8)
+    start = Position.start()
+    number = 20000
+    report("deepcopy + execute_move", min(timeit.repeat(
+        lambda: engine.execute_move("Dark ", (4, 6), copy.deepcopy(board)), number=number, repeat=5)), number)
+    report("Position.play", min(timeit.repeat(lambda: start.play(4, 6), number=number, repeat=5)), number)
+    report("Position.from_board", min(timeit.repeat(lambda: Position.from_board(board), number=number, repeat=5)), number)
+    report("Position.to_board", min(timeit.repeat(start.to_board, number=number, repeat=5)), number)
+
+if __name__ == "__main__":
+    main()
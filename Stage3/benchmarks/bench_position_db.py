@@ -0,0 +1,52 @@
+"""
+Benchmark of building the position database from self-play games and of its
+lookups, which should each take well under a millisecond.
+
+Usage:
+    python -m benchmarks.bench_position_db [games]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import timeit
+import records
+import train_patterns
+from position_db import PositionDatabase
+
+def report(name, seconds, number):
+    """
+    Prints the time per call of a benchmark.
+    """
+    print(f"{name:<28} {seconds / number * 1e6:8.2f} us/call")
+
+def main():
+    """
+    Builds a database in a temporary folder and times the lookups.
+    """
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = random.Random(0)
+    games = [(f"self-play:{number}", records.format_moves(train_patterns.self_play_game(rng, 0.3)))
+             for number in range(count)]
+    with tempfile.TemporaryDirectory() as folder:
+        database = PositionDatabase(os.path.join(folder, "positions.sqlite"))
+        start = time.perf_counter()
+        database.add_games(games)
+        print(f"built from {count} games in {time.perf_counter() - start:.2f} s")
+
+        # An opening position reached by many games and a later one reached by a few
+        opening = records.replay(records.parse_moves("d6 c4"))[-1]
+        later = records.replay(records.parse_moves(games[0][1])[:12])[-1]
+        number = 5000
+        for name, position in (("opening", opening), ("move 12", later)):
+            report(f"lookup {name}", min(timeit.repeat(lambda: database.lookup(*position), number=number, repeat=5)), number)
+            report(f"games_reaching {name}", min(timeit.repeat(
+                lambda: database.games_reaching(*position, limit=10), number=number, repeat=5)), number)
+        report("corners a1=dark", min(timeit.repeat(
+            lambda: database.corners({"a1": "dark"}), number=number, repeat=5)), number)
+        database.close()
+
+if __name__ == "__main__":
+    main()
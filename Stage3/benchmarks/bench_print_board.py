@@ -0,0 +1,89 @@
+"""
+Benchmark of printing the board after every move of a 16x16 game: the original
+print call per cell, one buffered write per board, and the ANSI diff mode.
+
+Output goes to a line buffered null device, like a terminal, so every line
+written by the original version is one write system call.
+
+Usage:
+    python -m benchmarks.bench_print_board [size]
+"""
+
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import components
+from position import Position
+
+def print_per_cell(board):
+    """
+    The original print_board, with one print call for every label and cell.
+    """
+    size = len(board)
+    print(end="   ")
+    for i in range(size):
+        print(i + 1, end="     " if i + 1 < 10 else "    ")
+    print()
+    for i, row in enumerate(board):
+        print(i + 1, end="  " if i + 1 < 10 else " ")
+        for cell in row:
+            print(cell, end=" ")
+        print()
+
+def random_game(size, seed=0):
+    """
+    Plays random legal moves until the game is over.
+
+    Returns:
+        list[list[list[str]]]: The board after every move.
+    """
+    rng = random.Random(seed)
+    position = Position.start(size)
+    boards = [position.to_board()]
+    while not position.game_over():
+        moves = position.legal_moves()
+        if not moves:
+            position = position.passed()
+            continue
+        square = rng.choice([square for square in range(size * size) if moves >> square & 1])
+        position = position.play(square % size + 1, square // size + 1)
+        boards.append(position.to_board())
+    return boards
+
+def main():
+    """
+    Times printing every board of one game with each renderer and counts the characters written.
+    """
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    boards = random_game(size)
+    with open(os.devnull, "w", buffering=1) as terminal:
+        printer = components.BoardPrinter(diff=True, file=terminal)
+        runs = {
+            "print per cell": lambda board: print_per_cell(board),
+            "print_board": lambda board: components.print_board(board),
+            "BoardPrinter diff": printer.board,
+        }
+        print(f"{len(boards)} boards of {size}x{size}")
+        for name, function in runs.items():
+            printer.reset()
+            with contextlib.redirect_stdout(terminal):
+                start = time.perf_counter()
+                for board in boards:
+                    function(board)
+                seconds = time.perf_counter() - start
+            # The same again into memory to count what a terminal would have to draw
+            printer.reset()
+            written = io.StringIO()
+            printer.file = written
+            with contextlib.redirect_stdout(written):
+                for board in boards:
+                    function(board)
+            printer.file = terminal
+            print(f"{name:<20} {seconds / len(boards) * 1e6:9.1f} us/board "
+                  f"{len(written.getvalue()) / len(boards):8.0f} characters/board")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark of the selective search switches: how deep iterative deepening gets
+in a fixed time with plain alpha-beta, with each of principal variation
+search, aspiration windows and ProbCut on its own, and with all of them.
+
+Every setting searches the same standard set of positions with the same time
+budget per move. The average depth of the deepest finished search shows which
+techniques buy depth, and the share of moves that match plain alpha-beta at
+the depth the plain search reached shows how much ProbCut's pruning changes
+the play (PVS and aspiration windows give the same scores as plain alpha-beta).
+
+Usage:
+    python -m benchmarks.bench_selective [milliseconds] [evaluator]
+"""
+
+import sys
+import time
+import evaluation
+import search
+from benchmarks.common import random_positions
+
+CONFIGURATIONS = {
+    "plain": {},
+    "pvs": {"pvs": True},
+    "aspiration": {"aspiration": True},
+    "probcut": {"probcut": True},
+    "all": {"pvs": True, "aspiration": True, "probcut": True},
+}
+
+def main():
+    """
+    Searches the positions with every configuration and prints the depth each one reached.
+    """
+    milliseconds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    evaluator = sys.argv[2] if len(sys.argv) > 2 else "heuristic"
+    positions = random_positions(60)[::3]
+    function = evaluation.get_evaluator(evaluator, 8)
+
+    plain = None
+    for name, switches in CONFIGURATIONS.items():
+        settings = search.normalise_settings({"engine": "alphabeta", "evaluator": evaluator,
+                                              "depth": search.MAX_DEPTH, **switches})
+        options = search.selective_options(settings, 8)
+        results = []
+        nodes = 0
+        for player, opponent in positions:
+            engine = search.BudgetedSearch(8, function, deadline=time.perf_counter() + milliseconds / 1000, **options)
+            results.append(engine.deepen(player, opponent, search.MAX_DEPTH))
+            nodes += engine.nodes
+        if plain is None:
+            plain = results
+
+        # Moves are compared with a plain search to the same depth, so deeper searches are not counted as different
+        same = 0
+        for (player, opponent), (move, _, depth), (plain_move, _, plain_depth) in zip(positions, results, plain):
+            if depth != plain_depth:
+                plain_move, _ = search.Search(8, function).root(player, opponent, depth)
+            same += move == plain_move
+        depth = sum(result[2] for result in results) / len(results)
+        print(f"{name:<11} {milliseconds} ms/move: depth {depth:4.2f}  {nodes // len(positions):>8} nodes/move  "
+              f"same move as plain search {same / len(positions):.0%}")
+
+if __name__ == "__main__":
+    main()
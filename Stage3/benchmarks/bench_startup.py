@@ -0,0 +1,62 @@
+"""
+Cold start benchmark: the time from starting a new Python process to the web
+app's first '/' response, which is what a newly started (autoscaled) worker
+costs before it can serve a player.
+
+Usage:
+    python -m benchmarks.bench_startup [runs]
+
+Exits with status 1 if even the fastest run is over BUDGET_SECONDS.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+# Most seconds a cold start may take, checked by the tests as well
+BUDGET_SECONDS = 1.5
+
+# Run in the new process: import the app and render the main page
+_SCRIPT = """
+import time
+start = time.perf_counter()
+import flask_game_engine
+imported = time.perf_counter()
+response = flask_game_engine.app.test_client().get("/")
+assert response.status_code == 200, response.status_code
+print(imported - start, time.perf_counter() - imported)
+"""
+
+def measure():
+    """
+    Starts a new Python process that imports the web app and requests '/'.
+
+    Returns:
+        tuple(float,float,float): Seconds for the whole run (including starting the
+            interpreter), for importing the app and for the first response.
+    """
+    folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", _SCRIPT], cwd=folder, check=True,
+                            capture_output=True, text=True).stdout
+    total = time.perf_counter() - start
+    imported, responded = (float(value) for value in output.split())
+    return total, imported, responded
+
+def main():
+    """
+    Prints the time of each run and checks the fastest one against the budget.
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = [measure() for _ in range(runs)]
+    print(f"{'run':<5} {'total ms':>9} {'import ms':>10} {'first / ms':>11}")
+    for number, (total, imported, responded) in enumerate(results, 1):
+        print(f"{number:<5} {total * 1000:9.1f} {imported * 1000:10.1f} {responded * 1000:11.1f}")
+    best = min(total for total, _, _ in results)
+    print(f"fastest {best * 1000:.1f} ms, budget {BUDGET_SECONDS * 1000:.0f} ms")
+    if best > BUDGET_SECONDS:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
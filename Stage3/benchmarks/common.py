@@ -0,0 +1,42 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+
+import random
+import bitboard
+
+def random_positions(count, size=8, seed=0):
+    """
+    Plays random legal moves from the starting position to collect a set of positions
+    from every phase of the game.
+
+    Parameters:
+        count (int): How many positions to collect.
+        size (int): How many squares wide and tall the board is.
+        seed (int): Seed for the random moves so every run uses the same positions.
+
+    Returns:
+        list[tuple(int,int)]: The masks of the player to move and of the opponent for each position.
+    """
+    rng = random.Random(seed)
+    geo = bitboard.geometry(size)
+    positions = []
+    while len(positions) < count:
+        # Start a new game from the 4 middle counters
+        mid = size // 2
+        player = bitboard.bit(mid, mid - 1, size) | bitboard.bit(mid - 1, mid, size)
+        opponent = bitboard.bit(mid - 1, mid - 1, size) | bitboard.bit(mid, mid, size)
+        player, opponent = opponent, player
+        while len(positions) < count:
+            moves = bitboard.legal_moves(player, opponent, geo)
+            if not moves:
+                # Pass, or stop if neither player can move
+                if not bitboard.legal_moves(opponent, player, geo):
+                    break
+                player, opponent = opponent, player
+                continue
+            positions.append((player, opponent))
+            squares = [i for i in range(geo.cells) if moves >> i & 1]
+            player, opponent = bitboard.play(player, opponent, 1 << rng.choice(squares), geo)
+            player, opponent = opponent, player
+    return positions
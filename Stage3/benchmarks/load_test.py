@@ -0,0 +1,174 @@
+"""
+HTTP load test for the Reversi web app.
+
+Opens many connections at once and sends requests over them as fast as the
+server answers, then prints the requests per second and the latency
+percentiles. Connections are kept alive when the server allows it and opened
+again when it does not, as a browser would.
+
+Usage:
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --path /ai_move
+    python -m benchmarks.load_test --compare
+        (starts the Flask app and the ASGI app itself and tests both the same way)
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.parse
+
+async def open_connection(host, port):
+    """
+    Opens a connection to the server, retrying for a short while so a server that is starting up can be used.
+    """
+    for _ in range(100):
+        try:
+            return await asyncio.open_connection(host, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+    return await asyncio.open_connection(host, port)
+
+async def request(reader, writer, host, path):
+    """
+    Sends one GET request and reads the whole response.
+
+    Returns:
+        tuple(int, bool): The status code and True if the server closes the connection.
+    """
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+    length = None
+    close = status_line.startswith(b"HTTP/1.0")
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection":
+            close = value.strip().lower() == "close"
+
+    # Without a length the body runs until the server closes the connection
+    if length is None:
+        await reader.read()
+        close = True
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+async def client(host, port, path, deadline, latencies, counters):
+    """
+    Sends requests one after another on one connection until the deadline.
+    """
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await open_connection(host, port)
+            status, close = await request(reader, writer, host, path)
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            counters["errors"] += 1
+            close = True
+        else:
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                counters["errors"] += 1
+        if close and writer is not None:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+async def run_load(url, path, connections, duration):
+    """
+    Runs the load test against one server.
+
+    Returns:
+        dict: The requests per second, errors and the 50th, 90th and 99th percentile latency in milliseconds.
+    """
+    parsed = urllib.parse.urlsplit(url)
+    deadline = time.perf_counter() + duration
+    latencies = []
+    counters = {"errors": 0}
+    start = time.perf_counter()
+    await asyncio.gather(*(client(parsed.hostname, parsed.port or 80, path, deadline, latencies, counters)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+
+    def percentile(fraction):
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "errors": counters["errors"],
+        "p50": percentile(0.50),
+        "p90": percentile(0.90),
+        "p99": percentile(0.99),
+    }
+
+def print_result(name, result):
+    """
+    Prints one line of load test results.
+    """
+    print(f"{name:<8} {result['requests']:8d} requests {result['rps']:10,.0f} req/s "
+          f"p50 {result['p50']:7.2f} ms  p90 {result['p90']:7.2f} ms  p99 {result['p99']:7.2f} ms  "
+          f"errors {result['errors']}")
+
+# Commands that start each server on a port, run from the Stage3 directory
+SERVERS = {
+    "flask": "import flask_game_engine; flask_game_engine.app.run(port={port}, threaded=True)",
+    "asgi": "import sys; sys.argv[1:] = ['{port}']; import asgi_app; asgi_app.main()",
+}
+
+def compare(path, connections, duration, port=8765):
+    """
+    Starts the Flask app and the ASGI app one after another and runs the same load test on each.
+    """
+    stage3 = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for offset, (name, command) in enumerate(SERVERS.items()):
+        server = subprocess.Popen([sys.executable, "-c", command.format(port=port + offset)], cwd=stage3,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            # One request first so the server has started before timing
+            asyncio.run(run_load(f"http://127.0.0.1:{port + offset}", path, 1, 0.1))
+            print_result(name, asyncio.run(run_load(f"http://127.0.0.1:{port + offset}", path, connections, duration)))
+        finally:
+            server.terminate()
+            server.wait()
+
+def main():
+    """
+    Reads the command line options and runs the load test.
+    """
+    parser = argparse.ArgumentParser(description="Load test the Reversi web app")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="server to test")
+    parser.add_argument("--path", default="/ai_move", help="path and query string to request")
+    parser.add_argument("--connections", type=int, default=200, help="number of connections open at once")
+    parser.add_argument("--duration", type=float, default=10, help="seconds to run for")
+    parser.add_argument("--compare", action="store_true", help="start and test both the Flask and ASGI apps")
+    args = parser.parse_args()
+
+    print(f"{args.connections} connections for {args.duration:g}s requesting {args.path}")
+    if args.compare:
+        compare(args.path, args.connections, args.duration)
+    else:
+        print_result("server", asyncio.run(run_load(args.url, args.path, args.connections, args.duration)))
+
+if __name__ == "__main__":
+    main()
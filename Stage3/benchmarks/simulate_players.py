@@ -0,0 +1,293 @@
+"""
+Load generator that plays whole games like real players.
+
+Each simulated player starts a game with '/reset', thinks for a while and then
+plays a random legal move as Dark with '/move', and asks '/ai_move' for Light's
+reply and plays it. The player starts again when the game is over. Think times
+are random with a fixed mean, and every player has its own seed, so two runs
+with the same options make the same kind of load. This makes it possible to
+compare changes to the engine or the server, which a single repeated request
+(see 'load_test') cannot do.
+
+Each player has its own session, so the server needs sessions enabled
+(REVERSI_SESSION_BACKEND). Against the Flask app in this process an in-memory
+session backend is used if none is set.
+
+Usage:
+    python -m benchmarks.simulate_players --players 50 --duration 30
+        (plays against the Flask app in this process with the Flask test client)
+    python -m benchmarks.simulate_players --url http://127.0.0.1:8000 --players 200 --think 2
+    python -m benchmarks.simulate_players --ai "difficulty=hard"
+    python -m benchmarks.simulate_players --games 100 --think 0
+        (stops once 100 games are finished instead of after a fixed time)
+
+Prints the games and moves played, the requests per second, and the requests,
+error rate and p50/p90/p99 latency of each route.
+"""
+
+import argparse
+import http.client
+import http.cookies
+import json
+import random
+import threading
+import time
+import urllib.parse
+import bitboard
+
+class FlaskClient:
+    """
+    Sends requests to the Flask app in this process, keeping the session cookie like a browser.
+    """
+
+    def __init__(self):
+        # Imported here so testing a server over HTTP does not load the app
+        import flask_game_engine
+        self.client = flask_game_engine.app.test_client()
+
+    def request(self, method, path, query=None):
+        """
+        Sends one request.
+
+        Returns:
+            tuple(int, dict|None): The status code and the JSON body (None if it is not JSON).
+        """
+        response = self.client.open(path, method=method, query_string=query)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """
+    Sends requests to a server over one kept-alive HTTP connection, keeping the session cookie.
+    """
+
+    def __init__(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        self.connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=60)
+        self.cookies = http.cookies.SimpleCookie()
+
+    def request(self, method, path, query=None):
+        """
+        Sends one request.
+
+        Returns:
+            tuple(int, dict|None): The status code and the JSON body (None if it is not JSON).
+        """
+        if query:
+            path += "?" + urllib.parse.urlencode(query)
+        headers = {"Cookie": "; ".join(f"{name}={morsel.value}" for name, morsel in self.cookies.items())}
+        try:
+            self.connection.request(method, path, headers=headers)
+            response = self.connection.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            # Opened again on the next request
+            self.connection.close()
+            raise
+        for value in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(value)
+        try:
+            return response.status, json.loads(body)
+        except ValueError:
+            return response.status, None
+
+
+class Stats:
+    """
+    The latencies and errors of every route, shared by all the players.
+
+    Attributes:
+        target (int | None): The number of finished games to stop at, or None to play until the deadline.
+    """
+
+    def __init__(self, target=None):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.games = 0
+        self.moves = 0
+        self.target = target
+
+    def done(self, deadline):
+        """
+        Checks if the players should stop: the deadline has passed or enough games are finished.
+
+        Parameters:
+            deadline (float | None): The time.perf_counter() to stop at, or None for no time limit.
+        """
+        if deadline is not None and time.perf_counter() >= deadline:
+            return True
+        return self.target is not None and self.games >= self.target
+
+    def call(self, client, method, path, query=None):
+        """
+        Sends a request and records how long it took and whether it failed.
+
+        Returns:
+            dict | None: The JSON body, or None if the request failed.
+        """
+        start = time.perf_counter()
+        try:
+            status, data = client.request(method, path, query)
+        except (OSError, http.client.HTTPException):
+            status, data = None, None
+        seconds = time.perf_counter() - start
+        # A redirect is the normal answer to '/reset'
+        failed = status is None or status >= 400 or (data is not None and data.get("status") == "fail")
+        with self.lock:
+            self.latencies.setdefault(path, []).append(seconds)
+            self.errors[path] = self.errors.get(path, 0) + failed
+        return None if failed else data
+
+
+def random_legal_move(board, colour, rng):
+    """
+    Chooses a random legal move on a list of lists board.
+
+    Returns:
+        tuple(int,int) | None: The x and y of the move, None if there are no legal moves.
+    """
+    size = len(board)
+    dark, light = bitboard.from_board(board)
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    moves = bitboard.legal_moves(player, opponent, bitboard.geometry(size))
+    squares = [square for square in range(size * size) if moves >> square & 1]
+    if not squares:
+        return None
+    square = rng.choice(squares)
+    return (square % size + 1, square // size + 1)
+
+def play(client, stats, rng, deadline, think, ai_query):
+    """
+    Plays games as Dark against the AI until the deadline.
+
+    Parameters:
+        client (FlaskClient | HttpClient): The player's connection.
+        stats (Stats): Where the requests are recorded.
+        rng (random.Random): The player's source of random numbers.
+        deadline (float | None): The time.perf_counter() to stop at, or None to stop after stats.target games.
+        think (float): The mean seconds the player thinks before each move.
+        ai_query (dict): The query parameters of '/ai_move' requests.
+    """
+    while not stats.done(deadline):
+        stats.call(client, "POST", "/reset")
+        data = stats.call(client, "GET", "/position")
+        while data is not None and not stats.done(deadline):
+            if data["player"] == "Dark ":
+                if think:
+                    pause = rng.expovariate(1 / think)
+                    if deadline is not None:
+                        pause = min(pause, max(0.0, deadline - time.perf_counter()))
+                    time.sleep(pause)
+                move = random_legal_move(data["board"], "Dark ", rng)
+            else:
+                reply = stats.call(client, "GET", "/ai_move", dict(ai_query, player="Light"))
+                move = None if reply is None else (reply["x"], reply["y"])
+            if move is None:
+                break
+            data = stats.call(client, "GET", "/move", {"x": move[0], "y": move[1]})
+            if data is None:
+                break
+            with stats.lock:
+                stats.moves += 1
+                if "finished" in data:
+                    stats.games += 1
+            if "finished" in data:
+                break
+
+def percentile(latencies, fraction):
+    """
+    Gets a percentile of sorted latencies in milliseconds.
+    """
+    if not latencies:
+        return 0.0
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+def simulate(make_client, players, duration=None, think=1.0, ai_query=None, seed=0, games=None):
+    """
+    Runs the simulated players at the same time, one thread each, until the duration
+    is over or the number of games are finished.
+
+    Parameters:
+        make_client (callable): Makes the connection of a new player.
+        players (int): How many players play at once.
+        duration (float | None): Seconds to play for, or None for no time limit.
+        think (float): The mean seconds each player thinks before a move.
+        ai_query (dict | None): The query parameters of '/ai_move' requests, the server's default AI if None.
+        seed (int): Seed for the players' random numbers.
+        games (int | None): Stop once this many games are finished (games being played
+            by the other players at that point are left unfinished), or None for no limit.
+
+    Returns:
+        dict: The "games" finished, "moves" played, total "requests" and "errors", the
+            requests per second ("rps"), the "error_rate" and for each route of "routes"
+            its "requests", "errors", "error_rate" and "p50", "p90" and "p99" latency in milliseconds.
+    """
+    if duration is None and games is None:
+        raise ValueError("Either a duration or a number of games is needed")
+    stats = Stats(games)
+    start = time.perf_counter()
+    deadline = None if duration is None else start + duration
+    threads = [threading.Thread(target=play, args=(make_client(), stats, random.Random(seed + number),
+                                                   deadline, think, ai_query or {}))
+               for number in range(players)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    routes = {}
+    for path, latencies in sorted(stats.latencies.items()):
+        latencies.sort()
+        routes[path] = {"requests": len(latencies), "errors": stats.errors[path],
+                        "error_rate": stats.errors[path] / len(latencies),
+                        "p50": percentile(latencies, 0.50), "p90": percentile(latencies, 0.90),
+                        "p99": percentile(latencies, 0.99)}
+    requests = sum(route["requests"] for route in routes.values())
+    errors = sum(route["errors"] for route in routes.values())
+    return {"games": stats.games, "moves": stats.moves, "requests": requests, "errors": errors,
+            "rps": requests / elapsed, "error_rate": errors / requests if requests else 0.0, "routes": routes}
+
+def print_report(result):
+    """
+    Prints the results of a simulation.
+    """
+    print(f"{result['games']} games, {result['moves']} moves, {result['requests']} requests "
+          f"({result['rps']:,.0f} req/s), error rate {result['error_rate']:.2%}")
+    for path, route in result["routes"].items():
+        print(f"{path:<10} {route['requests']:8d} requests  p50 {route['p50']:7.2f} ms  p90 {route['p90']:7.2f} ms  "
+              f"p99 {route['p99']:7.2f} ms  errors {route['error_rate']:.2%}")
+
+def main():
+    """
+    Reads the command line options and runs the simulation.
+    """
+    parser = argparse.ArgumentParser(description="Simulate players playing whole games against the Reversi web app")
+    parser.add_argument("--url", help="server to test, the Flask app in this process if not given")
+    parser.add_argument("--players", type=int, default=20, help="number of players playing at once")
+    parser.add_argument("--duration", type=float, help="seconds to play for (10 unless --games is given)")
+    parser.add_argument("--games", type=int, help="stop once this many games are finished")
+    parser.add_argument("--think", type=float, default=1.0, help="mean seconds a player thinks before a move")
+    parser.add_argument("--ai", default="", help="query parameters for '/ai_move', such as 'difficulty=hard'")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        import flask_game_engine
+        import session_store
+        if flask_game_engine.session_backend is None:
+            flask_game_engine.session_backend = session_store.open_backend("memory")
+        make_client = FlaskClient
+
+    if args.duration is None and args.games is None:
+        args.duration = 10
+    limit = f"{args.duration:g}s" if args.games is None else f"{args.games} games"
+    print(f"{args.players} players for {limit}, thinking {args.think:g}s per move on average")
+    ai_query = dict(urllib.parse.parse_qsl(args.ai))
+    print_report(simulate(make_client, args.players, args.duration, args.think, ai_query, args.seed, args.games))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+"""
+Bitboard representation of a Reversi board.
+
+Each colour is stored as a single integer where bit (y * size + x) is set if
+that colour has a counter at column x and row y (both zero-based). Move
+generation, flipping and the evaluation terms work on these integers with
+shifts and masks instead of scanning the list of lists cell by cell, which
+makes them cheap enough to be called many times inside a search.
+
+For 8x8 boards the hot functions use the compiled '_fastcore' module when it
+has been built (see build_fastcore.py) and REVERSI_PURE_PYTHON is not set to 1.
+The Python code below stays the reference: it is used for every other board
+size and whenever the compiled module is missing, and gives the same results.
+"""
+
+import os
+
+# The compiled 8x8 core, or None to use the pure Python functions everywhere.
+# It is imported by load_native when the first 8x8 Geometry is made
+native = None
+_native_checked = False
+
+# Direction vectors in the same order as the ones used in 'components'
+DIRECTIONS = [(-1,-1),(0,-1),(1,-1),(-1,0),(1,0),(-1,1),(0,1),(1,1)]
+
+# Geometry objects are built once per board size and reused
+_geometries = {}
+
+
+class Geometry:
+    """
+    Precomputed masks for one board size.
+
+    Attributes:
+        size (int): How many squares wide and tall the board is.
+        cells (int): Total number of squares on the board.
+        full (int): Mask with every square of the board set.
+        shifts (list[tuple(int,int)]): For each direction, the bit shift amount and the mask
+            that removes counters that wrapped around the side of the board.
+        border (int): Mask of the squares on the outside edge of the board.
+        corners (int): Mask of the 4 corner squares.
+        x_squares (list[tuple(int,int)]): Each corner with the square diagonally next to it.
+        c_squares (list[tuple(int,int)]): Each corner with the two edge squares next to it.
+        x_mask (int): Mask of every X-square.
+        c_mask (int): Mask of every C-square.
+        axis_lines (list[list[int]]): For each of the 4 axes (horizontal, vertical and the
+            two diagonals), the masks of every line along that axis.
+        axis_edges (list[int]): For each axis, the squares that touch the outside of
+            the board along that axis.
+        native (bool): Whether the compiled core is used for this board size.
+    """
+
+    __slots__ = ("size", "cells", "full", "shifts", "border", "corners",
+                 "x_squares", "c_squares", "x_mask", "c_mask", "axis_lines", "axis_edges", "native")
+
+    def __init__(self, size, native_core=True):
+        # Passing native_core=False makes a Geometry that always uses the Python
+        # functions, which is how the tests compare the two
+        self.native = native_core and size == 8 and load_native() is not None
+        self.size = size
+        self.cells = size * size
+        self.full = (1 << self.cells) - 1
+
+        # Masks of the first and last columns so counters shifted off one side of
+        # the board do not reappear on the other side of the next row
+        first_column = 0
+        last_column = 0
+        for y in range(size):
+            first_column |= 1 << (y * size)
+            last_column |= 1 << (y * size + size - 1)
+
+        self.shifts = []
+        for dx, dy in DIRECTIONS:
+            mask = self.full
+            if dx == 1:
+                mask &= ~first_column
+            elif dx == -1:
+                mask &= ~last_column
+            self.shifts.append((dy * size + dx, mask))
+
+        first_row = (1 << size) - 1
+        last_row = first_row << (size * (size - 1))
+        self.border = first_column | last_column | first_row | last_row
+
+        last = size - 1
+        corner_cells = [(0, 0), (last, 0), (0, last), (last, last)]
+        self.corners = 0
+        self.x_squares = []
+        self.c_squares = []
+        self.x_mask = 0
+        self.c_mask = 0
+        for cx, cy in corner_cells:
+            # Step one square towards the middle of the board from the corner
+            sx = 1 if cx == 0 else -1
+            sy = 1 if cy == 0 else -1
+            corner = bit(cx, cy, size)
+            self.corners |= corner
+            self.x_squares.append((corner, bit(cx + sx, cy + sy, size)))
+            self.c_squares.append((corner, bit(cx + sx, cy, size) | bit(cx, cy + sy, size)))
+            self.x_mask |= self.x_squares[-1][1]
+            self.c_mask |= self.c_squares[-1][1]
+
+        # Every line on the board grouped by axis so full lines can be found quickly
+        rows = []
+        columns = []
+        for i in range(size):
+            rows.append(first_row << (i * size))
+            columns.append(first_column << i)
+        diagonals = []
+        anti_diagonals = []
+        for total in range(2 * size - 1):
+            diagonal = 0
+            anti_diagonal = 0
+            for x in range(size):
+                y = total - x
+                if 0 <= y < size:
+                    anti_diagonal |= bit(x, y, size)
+                y = x - total + size - 1
+                if 0 <= y < size:
+                    diagonal |= bit(x, y, size)
+            diagonals.append(diagonal)
+            anti_diagonals.append(anti_diagonal)
+        self.axis_lines = [rows, columns, diagonals, anti_diagonals]
+        self.axis_edges = [first_column | last_column, first_row | last_row, self.border, self.border]
+
+
+def load_native():
+    """
+    Imports the compiled core the first time it is asked for.
+
+    Returns:
+        module | None: The '_fastcore' module, or None if it has not been built or
+            REVERSI_PURE_PYTHON is set to 1.
+    """
+    global native, _native_checked
+    if not _native_checked:
+        if os.environ.get("REVERSI_PURE_PYTHON") != "1":
+            try:
+                import _fastcore
+                native = _fastcore
+            except ImportError:
+                pass
+        _native_checked = True
+    return native
+
+def geometry(size):
+    """
+    Gets the precomputed masks for a board size, building them the first time they are needed.
+
+    Parameters:
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        Geometry: The masks for that board size.
+    """
+    geo = _geometries.get(size)
+    if geo is None:
+        geo = Geometry(size)
+        _geometries[size] = geo
+    return geo
+
+def bit(x, y, size):
+    """
+    Gets the mask with only the bit for one square set.
+
+    Parameters:
+        x (int): Zero-based column number.
+        y (int): Zero-based row number.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        int: The mask of the square.
+    """
+    return 1 << (y * size + x)
+
+def shift(bits, amount, mask):
+    """
+    Moves every set bit one square in a direction.
+
+    Parameters:
+        bits (int): The squares being moved.
+        amount (int): The bit shift amount of the direction from Geometry.shifts.
+        mask (int): The wrap around mask of the direction from Geometry.shifts.
+
+    Returns:
+        int: The squares one step along the direction from the original squares.
+    """
+    if amount > 0:
+        return (bits << amount) & mask
+    return (bits >> -amount) & mask
+
+def neighbours(bits, geo):
+    """
+    Gets every square next to at least one of the given squares in any direction.
+
+    Parameters:
+        bits (int): The squares to find the neighbours of.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        int: The mask of the neighbouring squares.
+    """
+    result = 0
+    for amount, mask in geo.shifts:
+        if amount > 0:
+            result |= (bits << amount) & mask
+        else:
+            result |= (bits >> -amount) & mask
+    return result
+
+def from_board(board):
+    """
+    Converts a list of lists board into one mask per colour.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+
+    Returns:
+        tuple(int,int): The masks of the dark counters and of the light counters.
+    """
+    dark = 0
+    light = 0
+    index = 0
+    for row in board:
+        for cell in row:
+            if cell == "Dark ":
+                dark |= 1 << index
+            elif cell == "Light":
+                light |= 1 << index
+            index += 1
+    return dark, light
+
+def to_board(dark, light, size):
+    """
+    Converts the masks of each colour back into a list of lists board.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        list[list[str]]: 2D list of cells where each cell is "None ", "Dark " or "Light".
+    """
+    board = []
+    index = 0
+    for _ in range(size):
+        row = []
+        for _ in range(size):
+            if dark >> index & 1:
+                row.append("Dark ")
+            elif light >> index & 1:
+                row.append("Light")
+            else:
+                row.append("None ")
+            index += 1
+        board.append(row)
+    return board
+
+def split_colours(dark, light, colour):
+    """
+    Orders the two masks so the player making the move comes first.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour of the player making the move.
+
+    Returns:
+        tuple(int,int): The masks of the player's counters and of the opponent's counters.
+    """
+    if colour == "Dark ":
+        return dark, light
+    return light, dark
+
+def legal_moves(player, opponent, geo):
+    """
+    Gets every square the player can legally place a counter on.
+
+    Parameters:
+        player (int): Mask of the counters of the player making the move.
+        opponent (int): Mask of the counters of the other player.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        int: Mask of the legal moves.
+    """
+    if geo.native:
+        return native.legal_moves(player, opponent)
+    empty = geo.full & ~(player | opponent)
+    moves = 0
+    for amount, mask in geo.shifts:
+        # Walk outwards from every player counter at once. 'run' holds the opponent
+        # counters that are the end of an unbroken line of opponent counters
+        if amount > 0:
+            run = (player << amount) & mask & opponent
+            while run:
+                run = (run << amount) & mask
+                moves |= run & empty
+                run &= opponent
+        else:
+            amount = -amount
+            run = (player >> amount) & mask & opponent
+            while run:
+                run = (run >> amount) & mask
+                moves |= run & empty
+                run &= opponent
+    return moves
+
+def flips(player, opponent, move, geo):
+    """
+    Gets the opponent counters that would be outflanked by placing a counter.
+
+    Parameters:
+        player (int): Mask of the counters of the player making the move.
+        opponent (int): Mask of the counters of the other player.
+        move (int): Mask with only the square of the new counter set.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        int: Mask of the counters that change colour. 0 if the move is not legal.
+    """
+    if geo.native:
+        return native.flips(player, opponent, move)
+    flipped = 0
+    for amount, mask in geo.shifts:
+        line = 0
+        check = shift(move, amount, mask) & opponent
+        while check:
+            line |= check
+            check = shift(check, amount, mask)
+            # The line of opponent counters is closed off by one of the player's counters
+            if check & player:
+                flipped |= line
+                break
+            check &= opponent
+    return flipped
+
+def play(player, opponent, move, geo):
+    """
+    Places a counter and flips the outflanked counters.
+
+    Parameters:
+        player (int): Mask of the counters of the player making the move.
+        opponent (int): Mask of the counters of the other player.
+        move (int): Mask with only the square of the new counter set.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        tuple(int,int): The new masks of the player's counters and of the opponent's counters.
+    """
+    if geo.native:
+        return native.play(player, opponent, move)
+    flipped = flips(player, opponent, move, geo)
+    return player | move | flipped, opponent & ~flipped
+
+def stable(player, opponent, geo):
+    """
+    Gets the player's counters that can never be flipped again.
+
+    A counter is treated as stable when, along each of the 4 axes, the line through it
+    is full, it touches the edge of the board, or it is next to another stable counter
+    of the same colour. This misses some stable counters but never marks an unstable one.
+
+    Parameters:
+        player (int): Mask of the player's counters.
+        opponent (int): Mask of the other player's counters.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        int: Mask of the stable counters.
+    """
+    if geo.native:
+        return native.stable(player, opponent)
+    filled = player | opponent
+
+    # Squares on lines with no empty squares left cannot be flipped along that axis
+    axis_safe = []
+    for lines, edges in zip(geo.axis_lines, geo.axis_edges):
+        safe = edges
+        for line in lines:
+            if filled & line == line:
+                safe |= line
+        axis_safe.append(safe)
+
+    # The shifts come in opposite pairs so each axis uses two of them
+    axis_shifts = (
+        (geo.shifts[3], geo.shifts[4]),
+        (geo.shifts[1], geo.shifts[6]),
+        (geo.shifts[0], geo.shifts[7]),
+        (geo.shifts[2], geo.shifts[5]),
+    )
+
+    # Keep adding counters until no more can be proven stable
+    result = 0
+    while True:
+        grown = player
+        for safe, (first, second) in zip(axis_safe, axis_shifts):
+            grown &= safe | shift(result, *first) | shift(result, *second)
+        if grown == result:
+            return result
+        result = grown
+
+# Square permutations and lookup tables for the 8 rotations and reflections, built once per size
+_symmetries = {}
+
+def _symmetry_tables(size):
+    """
+    Builds the tables used to rotate and reflect masks of one board size.
+
+    Each of the 8 symmetries maps square (x, y) to a new square. The tables hold,
+    for every byte of a mask and every value that byte can have, the transformed
+    squares, so a whole mask is transformed with one lookup per byte.
+    """
+    last = size - 1
+    mappings = [
+        lambda x, y: (x, y),
+        lambda x, y: (last - x, y),
+        lambda x, y: (x, last - y),
+        lambda x, y: (last - x, last - y),
+        lambda x, y: (y, x),
+        lambda x, y: (last - y, x),
+        lambda x, y: (y, last - x),
+        lambda x, y: (last - y, last - x),
+    ]
+    cells = size * size
+    permutations = []
+    byte_tables = []
+    for mapping in mappings:
+        permutation = []
+        for index in range(cells):
+            x, y = mapping(index % size, index // size)
+            permutation.append(y * size + x)
+        permutations.append(permutation)
+
+        tables = []
+        for start in range(0, cells, 8):
+            table = []
+            for value in range(256):
+                transformed = 0
+                for offset in range(8):
+                    if value >> offset & 1 and start + offset < cells:
+                        transformed |= 1 << permutation[start + offset]
+                table.append(transformed)
+            tables.append(table)
+        byte_tables.append(tables)
+
+    # The inverse of each permutation maps squares back to the original board
+    inverses = []
+    for permutation in permutations:
+        inverse = [0] * cells
+        for index, target in enumerate(permutation):
+            inverse[target] = index
+        inverses.append(inverse)
+    return permutations, inverses, byte_tables
+
+def transform(bits, symmetry, size):
+    """
+    Rotates or reflects a mask.
+
+    Parameters:
+        bits (int): The mask to transform.
+        symmetry (int): Which of the 8 symmetries to apply (0 leaves the mask unchanged).
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        int: The transformed mask.
+    """
+    tables = _symmetries.get(size)
+    if tables is None:
+        tables = _symmetries[size] = _symmetry_tables(size)
+    result = 0
+    for table, value in zip(tables[2][symmetry], bits.to_bytes((size * size + 7) // 8, "little")):
+        result |= table[value]
+    return result
+
+def canonical(dark, light, size):
+    """
+    Finds the rotation or reflection of a position with the smallest masks, so
+    positions that are the same apart from symmetry share one canonical form.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        tuple(int,int,int): The symmetry used, and the transformed dark and light masks.
+    """
+    best = (0, dark, light)
+    for symmetry in range(1, 8):
+        transformed = (transform(dark, symmetry, size), transform(light, symmetry, size))
+        if transformed < best[1:]:
+            best = (symmetry, *transformed)
+    return best
+
+def untransform_square(index, symmetry, size):
+    """
+    Maps a square of a transformed board back to the original board.
+
+    Parameters:
+        index (int): The square (y * size + x) on the transformed board.
+        symmetry (int): The symmetry that was applied to the original board.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        int: The square on the original board.
+    """
+    tables = _symmetries.get(size)
+    if tables is None:
+        tables = _symmetries[size] = _symmetry_tables(size)
+    return tables[1][symmetry][index]
@@ -0,0 +1,16 @@
+"""
+Builds the optional compiled core ('_fastcore.pyx') next to the other modules.
+
+Usage (from the Stage3 folder, needs Cython and a C compiler):
+    python build_fastcore.py build_ext --inplace
+
+The game works the same without it, only slower, so a failed build is never fatal.
+"""
+
+from setuptools import Extension, setup
+from Cython.Build import cythonize
+
+setup(
+    name="reversi-fastcore",
+    ext_modules=cythonize([Extension("_fastcore", ["_fastcore.pyx"], extra_compile_args=["-O3"])]),
+)
@@ -3,6 +3,8 @@ Utility functions for the game Reversi. Includes board initialisation,
 legal move checking, and board representation printing.
 """
 
+import sys
+
 def initialise_board(size=8):
     """
     Creates a square Reversi board as a list of lists and returns it.
@@ -130,41 +132,113 @@ def legal_move(colour,coord,board):
 
 
 
-def print_board(board):
+# Column header line and row labels for each board size, made the first time a
+# board of that size is printed
+_board_labels = {}
+
+def _labels(size):
+    """
+    Gets the column header line and the row labels for a board size.
+
+    Returns:
+        tuple(str, list[str]): The header line and the label at the start of each row.
+    """
+    labels = _board_labels.get(size)
+    if labels is None:
+        # Each column is 6 characters wide and each row label 3, with less
+        # padding after numbers with 2 digits so the columns line up
+        header = "   " + "".join(f"{i:<6}" for i in range(1, size + 1)) + "\n"
+        labels = _board_labels[size] = (header, [f"{i:<3}" for i in range(1, size + 1)])
+    return labels
+
+def render_board(board):
+    """
+    Makes the text printed by print_board for a board.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+
+    Returns:
+        str: The whole grid with row and column numbers, ending with a new line.
+    """
+    header, row_labels = _labels(len(board))
+    lines = [header]
+    for label, row in zip(row_labels, board):
+        lines.append(label + " ".join(row) + " \n")
+    return "".join(lines)
+
+def print_board(board, file=None):
     """
     Prints the status of each cell on the board as empty, light or dark
     in a grid with row and column numbers.
 
+    The whole grid is built first and written at once instead of one print per cell.
+
     Parameters:
         board (list[list[str]]): The board containing the current status of each cell in the game.
+        file (file | None): Where the board is written, stdout if None.
     """
-    size = len(board)
+    (file or sys.stdout).write(render_board(board))
 
-    # Padding for the top left corner of the representation
-    print(end="   ")
 
-    # Print the column numbers so that they are
-    # directly above the column they are associated with
-    for i in range(size):
-        # Numbers with 2 digits need less padding
-        if i+1 < 10:
-            print(i+1, end="     ")
-        else:
-            print(i+1, end="    ")
+class BoardPrinter:
+    """
+    Prints a board after every move, optionally redrawing only the cells that changed.
 
-    # Start the printing of rows on a new line
-    print()
+    In diff mode the first board is printed in full and later boards move the
+    cursor of an ANSI terminal back over the grid to rewrite just the changed
+    cells, so a long replay writes a few bytes per move instead of the whole
+    grid. Anything else printed in between must go through write so the next
+    board is printed in full below it.
 
-    # Print the row number along with the status of each cell in the row
-    for i, row in enumerate(board):
-        # Numbers with 2 digits need less padding
-        if i+1 < 10:
-            print(i+1, end="  ")
-        else:
-            print(i+1, end=" ")
+    Attributes:
+        diff (bool): Whether only changed cells are redrawn.
+        file (file | None): Where the boards are written, stdout if None.
+    """
+
+    __slots__ = ("diff", "file", "_previous")
 
-        for cell in row:
-            print(cell, end=" ")
+    def __init__(self, diff=False, file=None):
+        self.diff = diff
+        self.file = file
+        self._previous = None
 
-        # Print a new line so rows are not all printed on the same line
-        print()
+    def board(self, board):
+        """
+        Prints a board, or only its changes from the last board when in diff mode.
+
+        Parameters:
+            board (list[list[str]]): The board containing the current status of each cell in the game.
+        """
+        file = self.file or sys.stdout
+        previous = self._previous
+        if not self.diff or previous is None or len(previous) != len(board):
+            file.write(render_board(board))
+        else:
+            size = len(board)
+            parts = []
+            for y, (row, old_row) in enumerate(zip(board, previous)):
+                if row == old_row:
+                    continue
+                for x, cell in enumerate(row):
+                    if cell != old_row[x]:
+                        # The cursor waits on the line below the grid: go up to the row,
+                        # across to the cell's column, write it and come back down
+                        parts.append(f"\x1b[{size - y}A\x1b[{4 + 6 * x}G{cell}\x1b[{size - y}B\r")
+            file.write("".join(parts))
+        file.flush()
+        if self.diff:
+            self._previous = [list(row) for row in board]
+
+    def write(self, text):
+        """
+        Prints other text, after which the next board is printed in full.
+        """
+        (self.file or sys.stdout).write(text)
+        self._previous = None
+
+    def reset(self):
+        """
+        Makes the next board be printed in full.
+        """
+        self._previous = None
@@ -0,0 +1,182 @@
+"""
+Named difficulty levels for the AI.
+
+Each tier sets the engine settings (see 'search', including an optional
+"nodes" or "time" budget), an optional rule for playing a weaker move on
+purpose, and its CPU cost. '/ai_move?difficulty=<name>' plays with a tier
+instead of the individual 'engine', 'evaluator' and 'depth' parameters.
+
+Costs are the CPU time a tier is expected to use per move in milliseconds,
+measured with 'python -m benchmarks.bench_difficulty'. Every move played with a
+tier adds its cost to 'reversi_ai_tier_cost_milliseconds_total' on '/metrics'
+so expensive tiers can be metered separately, and REVERSI_DIFFICULTIES can
+limit a server to a list of (cheap) tiers.
+"""
+
+import os
+import random
+import ai_cache
+import bitboard
+import metrics
+import search
+
+# The tiers from easiest to hardest. "randomise" is None or a rule: with
+# probability "chance" a random move is played instead of the best one, chosen
+# from the engine's "top" moves (or from every legal move if "top" is None)
+TIERS = {
+    "beginner": {
+        "settings": {"engine": "greedy"},
+        "randomise": {"chance": 0.5, "top": None},
+        "cost": 0.05,
+    },
+    "easy": {
+        "settings": {"engine": "greedy"},
+        "randomise": {"chance": 0.25, "top": 3},
+        "cost": 0.05,
+    },
+    "medium": {
+        "settings": {"engine": "alphabeta", "evaluator": "heuristic", "depth": 2},
+        "randomise": {"chance": 0.1, "top": 2},
+        "cost": 2,
+    },
+    "hard": {
+        "settings": {"engine": "alphabeta", "evaluator": "heuristic", "depth": 4},
+        "randomise": None,
+        "cost": 50,
+    },
+    "expert": {
+        "settings": {"engine": "alphabeta", "evaluator": "heuristic", "depth": 8, "nodes": 10000},
+        "randomise": None,
+        "cost": 400,
+    },
+    "master": {
+        "settings": {"engine": "alphabeta", "evaluator": "heuristic", "depth": 8, "time": 1500},
+        "randomise": None,
+        "cost": 1500,
+    },
+}
+
+# Tiers costing at least this many milliseconds per move are marked as metered
+METERED_COST = 10
+
+# Tiers this server offers (all of them unless REVERSI_DIFFICULTIES lists some)
+AVAILABLE = [name for name in os.environ.get("REVERSI_DIFFICULTIES", "").split(",") if name] or list(TIERS)
+
+TIER_MOVES = metrics.Counter("reversi_ai_tier_moves_total", "AI moves played with each difficulty tier", ["tier"])
+TIER_COST = metrics.Counter("reversi_ai_tier_cost_milliseconds_total", "Expected CPU cost of the AI moves of each difficulty tier", ["tier"])
+
+# Random numbers for the randomise rules
+rng = random.Random()
+
+# Check the tiers once so a mistake shows up at startup instead of on a request
+for _name, _tier in TIERS.items():
+    _tier["name"] = _name
+    _tier["settings"] = search.normalise_settings(_tier["settings"])
+
+def get_tier(name):
+    """
+    Gets a difficulty tier by name.
+
+    Parameters:
+        name (str): The name of the tier, such as "medium".
+
+    Returns:
+        dict: The tier's "name", complete engine "settings", "randomise" rule and "cost".
+    """
+    if name not in TIERS or name not in AVAILABLE:
+        raise ValueError(f"Unknown difficulty: {name}")
+    return TIERS[name]
+
+def describe():
+    """
+    Lists the tiers offered by this server for the '/difficulty' route.
+
+    Returns:
+        list[dict]: The name, settings, randomise rule, cost and whether each tier is metered.
+    """
+    return [{"name": name, "settings": TIERS[name]["settings"], "randomise": TIERS[name]["randomise"],
+             "cost": TIERS[name]["cost"], "metered": TIERS[name]["cost"] >= METERED_COST}
+            for name in AVAILABLE]
+
+def parse_request(args):
+    """
+    Reads the engine settings of an '/ai_move' request: a 'difficulty' tier, or
+    otherwise the individual engine settings.
+
+    Parameters:
+        args (dict): The query parameters.
+
+    Returns:
+        tuple(dict, dict|None): The complete engine settings and the tier, or None without one.
+    """
+    name = args.get("difficulty")
+    if name:
+        tier = get_tier(name)
+        return tier["settings"], tier
+    return search.normalise_settings(args), None
+
+def meter(tier, count=1):
+    """
+    Counts one AI move played with a tier and its cost. Ranking the best 'count'
+    moves ('multipv') costs more than one move (see search.ranking_factor).
+    """
+    TIER_MOVES.labels(tier["name"]).inc()
+    TIER_COST.labels(tier["name"]).inc(tier["cost"] * search.ranking_factor(tier["settings"], count))
+
+def randomises(tier):
+    """
+    Decides if a tier plays a random move this time instead of the engine's best one.
+
+    Parameters:
+        tier (dict | None): The tier, or None if the request did not use one.
+
+    Returns:
+        bool: True if a random move should be played (see random_choice).
+    """
+    return tier is not None and tier["randomise"] is not None and rng.random() < tier["randomise"]["chance"]
+
+def random_choice(tier, dark, light, colour, size, ranking=None):
+    """
+    Picks a tier's random move from every legal move, or from the engine's "top" moves.
+
+    Parameters:
+        tier (dict): The tier, which must have a randomise rule.
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour the AI is playing.
+        size (int): How many squares wide and tall the board is.
+        ranking (list[dict] | None): The tier's "top" best moves from ai_cache.ranked_moves,
+            which are ranked here if they are needed and not given.
+
+    Returns:
+        int | None: The square (y * size + x) of the random move, or None if there are no legal moves.
+    """
+    top = tier["randomise"]["top"]
+    if top is None:
+        player, opponent = bitboard.split_colours(dark, light, colour)
+        moves = bitboard.legal_moves(player, opponent, bitboard.geometry(size))
+        squares = [square for square in range(size * size) if moves >> square & 1]
+    else:
+        if ranking is None:
+            ranking = ai_cache.ranked_moves(dark, light, colour, size, tier["settings"], top)
+        squares = [move["square"] for move in ranking]
+    return rng.choice(squares) if squares else None
+
+def random_move(tier, dark, light, colour, size):
+    """
+    Applies a tier's randomise rule.
+
+    Parameters:
+        tier (dict | None): The tier, or None if the request did not use one.
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour the AI is playing.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        int | None: The square (y * size + x) of the random move, or None if the
+            engine's best move should be played.
+    """
+    if not randomises(tier):
+        return None
+    return random_choice(tier, dark, light, colour, size)
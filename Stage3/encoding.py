@@ -0,0 +1,152 @@
+"""
+Compact board encodings for saves, storage and API payloads.
+
+Boards can be sent in three formats:
+- "list": the list of lists of "None ", "Dark " and "Light" (the default).
+- "compact": one character per cell, row by row from the top left: "." for an
+  empty cell, "D" for a dark counter and "L" for a light counter. An 8x8 board
+  becomes a 64 character string.
+- "hex": for 8x8 boards only, the masks of the dark and light counters as two
+  16 digit hexadecimal numbers, {"dark": "...", "light": "..."}. Bit
+  (y * 8 + x) is set when that colour has a counter at zero-based column x and row y.
+
+Clients choose the format with the 'board_format' query parameter or by
+asking for one of the MEDIA_TYPES in the Accept header.
+"""
+
+import math
+import bitboard
+
+CELL_TO_CHARACTER = {"None ": ".", "Dark ": "D", "Light": "L"}
+CHARACTER_TO_CELL = {character: cell for cell, character in CELL_TO_CHARACTER.items()}
+
+def encode_board(board):
+    """
+    Writes a board in the compact encoding.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+
+    Returns:
+        str: One character per cell.
+    """
+    return "".join(CELL_TO_CHARACTER[cell] for row in board for cell in row)
+
+def decode_board(text):
+    """
+    Reads a board written in the compact encoding.
+
+    Parameters:
+        text (str): One character per cell. The length must be the square of an
+            even board size between 4 and 16.
+
+    Returns:
+        list[list[str]]: 2D list of cells where each cell is "None ", "Dark " or "Light".
+    """
+    size = math.isqrt(len(text))
+    if size * size != len(text) or size % 2 != 0 or size < 4 or size > 16:
+        raise ValueError("Compact board must have a square number of cells for a board size from 4 to 16")
+    try:
+        cells = [CHARACTER_TO_CELL[character] for character in text]
+    except KeyError as e:
+        raise ValueError(f"Invalid cell in compact board: {e.args[0]!r}") from None
+    return [cells[y * size:(y + 1) * size] for y in range(size)]
+
+FORMATS = ("list", "compact", "hex")
+
+# Media types a client can put in the Accept header to choose a format
+MEDIA_TYPES = {
+    "application/vnd.reversi.compact+json": "compact",
+    "application/vnd.reversi.hex+json": "hex",
+}
+
+def encode_board_hex(board):
+    """
+    Writes an 8x8 board as the hexadecimal masks of each colour.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+
+    Returns:
+        dict: The "dark" and "light" masks as 16 digit hexadecimal strings.
+    """
+    if len(board) != 8:
+        raise ValueError("The hex board format is only available for 8x8 boards")
+    dark, light = bitboard.from_board(board)
+    return {"dark": f"{dark:016x}", "light": f"{light:016x}"}
+
+def decode_board_hex(masks):
+    """
+    Reads an 8x8 board written as the hexadecimal masks of each colour.
+
+    Parameters:
+        masks (dict): The "dark" and "light" masks as hexadecimal strings.
+
+    Returns:
+        list[list[str]]: 2D list of cells where each cell is "None ", "Dark " or "Light".
+    """
+    try:
+        dark = int(masks["dark"], 16)
+        light = int(masks["light"], 16)
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Hex board must have 'dark' and 'light' hexadecimal masks") from None
+    if dark < 0 or light < 0 or dark.bit_length() > 64 or light.bit_length() > 64:
+        raise ValueError("Hex board masks must be 64 bit numbers")
+    if dark & light:
+        raise ValueError("Hex board has squares with both colours")
+    return bitboard.to_board(dark, light, 8)
+
+def encode(board, board_format):
+    """
+    Writes a board in any of the FORMATS.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+        board_format (str): "list", "compact" or "hex".
+
+    Returns:
+        list | str | dict: The encoded board.
+    """
+    if board_format == "compact":
+        return encode_board(board)
+    if board_format == "hex":
+        return encode_board_hex(board)
+    return board
+
+def decode(value):
+    """
+    Reads a board in any of the FORMATS, working out the format from the type of the value.
+
+    Parameters:
+        value (list | str | dict): The encoded board.
+
+    Returns:
+        list[list[str]]: The board. Lists are returned unchanged and should be checked by the caller.
+    """
+    if isinstance(value, str):
+        return decode_board(value)
+    if isinstance(value, dict):
+        return decode_board_hex(value)
+    return value
+
+def choose_format(board_format=None, accept=None):
+    """
+    Works out which board format a client asked for.
+
+    Parameters:
+        board_format (str | None): The 'board_format' query parameter, which takes priority.
+        accept (str | None): The Accept header of the request.
+
+    Returns:
+        str: One of the FORMATS. "list" if the client did not ask for one.
+    """
+    if board_format:
+        if board_format not in FORMATS:
+            raise ValueError(f"board_format must be one of: {', '.join(FORMATS)}")
+        return board_format
+    if accept:
+        for media_type in accept.split(","):
+            media_type = media_type.split(";")[0].strip().lower()
+            if media_type in MEDIA_TYPES:
+                return MEDIA_TYPES[media_type]
+    return "list"
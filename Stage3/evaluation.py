@@ -0,0 +1,309 @@
+"""
+Position evaluation for the Reversi AI.
+
+Scores a position from the point of view of one player using a set of
+pluggable terms (mobility, potential mobility, frontier counters, stable
+counters, corners, edge patterns, parity and counter difference). The terms
+are combined with weights that depend on the phase of the game. Everything
+works on the bitboards from the 'bitboard' module so a search can call the
+evaluation for every position it visits.
+"""
+
+import copy
+import bitboard
+
+def _ratio(mine, theirs):
+    """
+    Compares two counts as a score between -100 and 100.
+
+    Parameters:
+        mine (int): The count for the player being evaluated.
+        theirs (int): The count for the other player.
+
+    Returns:
+        float: 100 if only the player has any, -100 if only the opponent does, 0 if equal.
+    """
+    total = mine + theirs
+    if total == 0:
+        return 0
+    return 100 * (mine - theirs) / total
+
+def mobility(player, opponent, geo):
+    """
+    Scores how many more legal moves the player has than the opponent.
+    """
+    mine = bitboard.legal_moves(player, opponent, geo).bit_count()
+    theirs = bitboard.legal_moves(opponent, player, geo).bit_count()
+    return _ratio(mine, theirs)
+
+def potential_mobility(player, opponent, geo):
+    """
+    Scores the empty squares next to the opponent's counters (moves the player may get later)
+    against the empty squares next to the player's counters.
+    """
+    empty = geo.full & ~(player | opponent)
+    mine = (bitboard.neighbours(opponent, geo) & empty).bit_count()
+    theirs = (bitboard.neighbours(player, geo) & empty).bit_count()
+    return _ratio(mine, theirs)
+
+def frontier(player, opponent, geo):
+    """
+    Scores the counters next to an empty square. Having fewer of these is better
+    because they give the opponent moves.
+    """
+    empty = geo.full & ~(player | opponent)
+    next_to_empty = bitboard.neighbours(empty, geo)
+    mine = (player & next_to_empty).bit_count()
+    theirs = (opponent & next_to_empty).bit_count()
+    return -_ratio(mine, theirs)
+
+def stability(player, opponent, geo):
+    """
+    Scores the counters that can never be flipped again.
+    """
+    mine = bitboard.stable(player, opponent, geo).bit_count()
+    theirs = bitboard.stable(opponent, player, geo).bit_count()
+    return _ratio(mine, theirs)
+
+def corners(player, opponent, geo):
+    """
+    Scores the corners owned by each player. Each corner is worth 25.
+    """
+    return 25 * ((player & geo.corners).bit_count() - (opponent & geo.corners).bit_count())
+
+def edges(player, opponent, geo):
+    """
+    Scores the squares next to empty corners. Counters there usually give the corner
+    away, so X-squares (diagonal to the corner) cost 2 and C-squares (along the edge) cost 1.
+    """
+    filled = player | opponent
+    risky_x = 0
+    risky_c = 0
+    for corner, square in geo.x_squares:
+        if not filled & corner:
+            risky_x |= square
+    for corner, squares in geo.c_squares:
+        if not filled & corner:
+            risky_c |= squares
+    mine = 2 * (player & risky_x).bit_count() + (player & risky_c).bit_count()
+    theirs = 2 * (opponent & risky_x).bit_count() + (opponent & risky_c).bit_count()
+    return -_ratio(mine, theirs)
+
+def parity(player, opponent, geo):
+    """
+    Scores who is expected to make the last move. With an odd number of empty squares
+    left the player about to move will normally also play the final move.
+    """
+    empties = geo.cells - (player | opponent).bit_count()
+    return 100 if empties % 2 == 1 else -100
+
+def discs(player, opponent, geo):
+    """
+    Scores the counters owned by each player, which decides the game at the end.
+    """
+    return _ratio(player.bit_count(), opponent.bit_count())
+
+# Every term that can be used in the weight tables. Terms take the masks of
+# the player being evaluated, the opponent and the Geometry for the board size
+TERMS = {
+    "mobility": mobility,
+    "potential_mobility": potential_mobility,
+    "frontier": frontier,
+    "stability": stability,
+    "corners": corners,
+    "edges": edges,
+    "parity": parity,
+    "discs": discs,
+}
+
+# Weight of each term in each phase of the game. Mobility and keeping a small
+# frontier matter most early on, stability and the final counter count matter
+# most near the end
+PHASE_WEIGHTS = {
+    "opening": {"mobility": 5, "potential_mobility": 3, "frontier": 3, "corners": 30, "edges": 8},
+    "midgame": {"mobility": 4, "potential_mobility": 2, "frontier": 2, "stability": 4,
+                "corners": 30, "edges": 6, "parity": 1},
+    "endgame": {"mobility": 2, "stability": 6, "corners": 20, "edges": 2, "parity": 4, "discs": 6},
+}
+
+# The terms the compiled core has, and the last PHASE_WEIGHTS it was given with
+# the tables made from them. The compiled evaluation is only used while neither
+# has been changed or wrapped (for example by 'profiling')
+_NATIVE_TERMS = dict(TERMS)
+_native = (None, None)
+
+def _compile_weights(weights):
+    """
+    Converts weight tables into the form taken by the compiled evaluation.
+
+    Parameters:
+        weights (dict): Weight tables in the same form as PHASE_WEIGHTS.
+
+    Returns:
+        tuple | None: For each phase, the (term number, weight) pairs in the order they
+            are added up, or None if a table uses a term the compiled core does not have.
+    """
+    names = list(_NATIVE_TERMS)
+    tables = []
+    for phase in ("opening", "midgame", "endgame"):
+        if any(name not in _NATIVE_TERMS for name in weights[phase]):
+            return None
+        tables.append(tuple((names.index(name), weight) for name, weight in weights[phase].items()))
+    return tuple(tables)
+
+def _native_tables():
+    """
+    Gets the tables of PHASE_WEIGHTS for the compiled evaluation, making them again
+    if PHASE_WEIGHTS has been changed.
+
+    Returns:
+        tuple | None: The tables from _compile_weights, or None if the compiled evaluation
+            cannot be used because TERMS has been changed or wrapped.
+    """
+    global _native
+    if TERMS != _NATIVE_TERMS:
+        return None
+    if PHASE_WEIGHTS != _native[0]:
+        _native = (copy.deepcopy(PHASE_WEIGHTS), _compile_weights(PHASE_WEIGHTS))
+    return _native[1]
+
+def register_term(name, function):
+    """
+    Adds a new term that can be used in the weight tables.
+
+    Parameters:
+        name (str): The name used for the term in the weight tables.
+        function (callable): Takes the player mask, the opponent mask and the Geometry
+            and returns the score of the term for the player.
+    """
+    TERMS[name] = function
+
+def game_phase(player, opponent, geo):
+    """
+    Works out the phase of the game from how full the board is.
+
+    Parameters:
+        player (int): Mask of the player's counters.
+        opponent (int): Mask of the other player's counters.
+        geo (Geometry): The masks for the board size.
+
+    Returns:
+        str: "opening", "midgame" or "endgame".
+    """
+    filled = (player | opponent).bit_count()
+
+    # On an 8x8 board the opening is the first 20 counters and the
+    # endgame is the last 20 empty squares
+    if filled * 16 < geo.cells * 5:
+        return "opening"
+    if (geo.cells - filled) * 16 <= geo.cells * 5:
+        return "endgame"
+    return "midgame"
+
+def evaluate(player, opponent, size, weights=None):
+    """
+    Scores a position for a player using the phase weighted terms.
+
+    Parameters:
+        player (int): Mask of the counters of the player the score is for.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is.
+        weights (dict | None): Weight tables to use in place of PHASE_WEIGHTS.
+
+    Returns:
+        float: The score of the position. Higher is better for the player.
+    """
+    geo = bitboard.geometry(size)
+    if weights is None:
+        weights = PHASE_WEIGHTS
+        if geo.native:
+            tables = _native_tables()
+            if tables is not None:
+                return bitboard.native.evaluate(player, opponent, tables)
+    score = 0
+    for name, weight in weights[game_phase(player, opponent, geo)].items():
+        score += weight * TERMS[name](player, opponent, geo)
+    return score
+
+def positional(player, opponent, size):
+    """
+    Scores a position by where the counters are, in the same spirit as the AI score map.
+    Corners are worth the most and the squares next to them are worth the least.
+
+    Parameters:
+        player (int): Mask of the counters of the player the score is for.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        float: The score of the position. Higher is better for the player.
+    """
+    geo = bitboard.geometry(size)
+    x_squares = geo.x_mask
+    c_squares = geo.c_mask
+    edge = geo.border & ~geo.corners & ~c_squares
+    score = 3 * ((player & geo.corners).bit_count() - (opponent & geo.corners).bit_count())
+    score -= 4 * ((player & x_squares).bit_count() - (opponent & x_squares).bit_count())
+    score -= 3 * ((player & c_squares).bit_count() - (opponent & c_squares).bit_count())
+    score += (player & edge).bit_count() - (opponent & edge).bit_count()
+    return score
+
+# Every evaluator the AI can use. Evaluators take the player mask, the opponent
+# mask and the board size and return a score for the player
+EVALUATORS = {
+    "heuristic": evaluate,
+    "positional": positional,
+}
+
+def register_evaluator(name, function):
+    """
+    Adds a new evaluator that can be chosen by name.
+
+    Parameters:
+        name (str): The name used to choose the evaluator.
+        function (callable): Takes the player mask, the opponent mask and the board size
+            and returns a score for the player.
+    """
+    EVALUATORS[name] = function
+
+def get_evaluator(name, size=None):
+    """
+    Gets an evaluator by name.
+
+    Given the board size, the heuristic evaluator is resolved to the compiled evaluation
+    there and then when it can be used, so a search does not check PHASE_WEIGHTS and
+    TERMS again for every position it scores. Changes made after that are only picked
+    up by the next call.
+
+    Parameters:
+        name (str): The name of the evaluator.
+        size (int | None): How many squares wide and tall the board is, if known.
+
+    Returns:
+        callable: The evaluator function.
+    """
+    if name not in EVALUATORS:
+        raise ValueError(f"Unknown evaluator: {name}")
+    function = EVALUATORS[name]
+    if function is evaluate and size is not None and bitboard.geometry(size).native:
+        tables = _native_tables()
+        if tables is not None:
+            native_evaluate = bitboard.native.evaluate
+            return lambda player, opponent, size: native_evaluate(player, opponent, tables)
+    return function
+
+def evaluate_board(board, colour, evaluator="heuristic"):
+    """
+    Scores a list of lists board for a player.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+        colour (str): The colour of the player the score is for.
+        evaluator (str): The name of the evaluator to use.
+
+    Returns:
+        float: The score of the position. Higher is better for the player.
+    """
+    dark, light = bitboard.from_board(board)
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    return get_evaluator(evaluator)(player, opponent, len(board))
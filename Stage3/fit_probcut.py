@@ -0,0 +1,166 @@
+"""
+Offline fitter for the selective search parameters.
+
+Collects positions from self-play games (or game records), scores each one
+with full window searches of every depth from 1 to the deepest fitted depth,
+and fits for each evaluator:
+- the ProbCut fits of each game stage: for every pair of a deep and a shallow
+  depth in PAIRS, the line deep score = slope * shallow score + intercept by
+  least squares and the standard deviation of the errors of that line.
+- the aspiration window: the standard deviation of the change in score from
+  one depth to the next.
+
+Positions where a search reaches the end of the game are left out, as their
+scores are counter differences times search.WIN_SCALE and would swamp the fit.
+
+Usage:
+    python fit_probcut.py --games 60 --positions 300
+    python fit_probcut.py --records games.txt --evaluator heuristic --output probcut.json
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+import bitboard
+import evaluation
+import patterns
+import records
+import search
+import train_patterns
+
+# The shallow depths fitted for each deep depth, shallowest first. Deep depths
+# with two shallow depths get two cut checks (Multi-ProbCut). Searches of up to
+# search.MAX_DEPTH call negamax with at most MAX_DEPTH - 1 moves to look ahead
+PAIRS = {
+    3: (1,),
+    4: (2,),
+    5: (1, 3),
+    6: (2, 4),
+    7: (3, 5),
+}
+
+def collect_positions(games, count, rng):
+    """
+    Picks positions with legal moves from the games at random.
+
+    Parameters:
+        games (list[list[tuple(int,int)]]): The moves of each game.
+        count (int): How many positions to pick.
+        rng (random.Random): Source of random numbers.
+
+    Returns:
+        list[tuple(int,int)]: The masks of the player to move and of the opponent for each position.
+    """
+    geo = bitboard.geometry(8)
+    positions = []
+    for moves in games:
+        for dark, light, colour in records.replay(moves):
+            player, opponent = bitboard.split_colours(dark, light, colour)
+            if bitboard.legal_moves(player, opponent, geo):
+                positions.append((player, opponent))
+    return rng.sample(positions, min(count, len(positions)))
+
+def search_scores(positions, evaluator, depth):
+    """
+    Scores positions with full window searches of every depth up to 'depth'.
+
+    Returns:
+        list[list[float]]: For each position its scores at depths 1 to 'depth' (index 0 is depth 1).
+    """
+    engine = search.Search(8, evaluation.get_evaluator(evaluator, 8))
+    return [[engine.negamax(player, opponent, d, -float("inf"), float("inf")) for d in range(1, depth + 1)]
+            for player, opponent in positions]
+
+def fit_line(xs, ys):
+    """
+    Fits y = slope * x + intercept by least squares.
+
+    Returns:
+        tuple(float, float, float): The slope, the intercept and the standard deviation of the errors.
+    """
+    count = len(xs)
+    mean_x = sum(xs) / count
+    mean_y = sum(ys) / count
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread if spread else 1.0
+    intercept = mean_y - slope * mean_x
+    deviation = math.sqrt(sum((y - slope * x - intercept) ** 2 for x, y in zip(xs, ys)) / count)
+    return slope, intercept, deviation
+
+def fit(positions, scores, minimum=20):
+    """
+    Fits the ProbCut lines of every stage and the aspiration window of one evaluator.
+
+    Parameters:
+        positions (list[tuple(int,int)]): The positions that were searched.
+        scores (list[list[float]]): Their scores from search_scores.
+        minimum (int): The fewest positions a line is fitted from. Pairs with fewer are left out.
+
+    Returns:
+        dict: The "window" and the "cuts" of each stage, as written to the parameters file.
+    """
+    exact = [(position, row) for position, row in zip(positions, scores)
+             if all(abs(score) < search.WIN_SCALE for score in row)]
+    cuts = [{} for _ in range(search.PROBCUT_STAGES)]
+    for stage, stage_cuts in enumerate(cuts):
+        rows = [row for (player, opponent), row in exact if search.probcut_stage(player, opponent, 8) == stage]
+        if len(rows) < minimum:
+            continue
+        for deep, shallows in PAIRS.items():
+            if deep > len(rows[0]):
+                continue
+            fits = []
+            for shallow in shallows:
+                slope, intercept, deviation = fit_line([row[shallow - 1] for row in rows], [row[deep - 1] for row in rows])
+                # A line that does not rise would turn the cut tests upside down
+                if slope > 0:
+                    fits.append([shallow, round(slope, 4), round(intercept, 4), round(deviation, 4)])
+            if fits:
+                stage_cuts[str(deep)] = fits
+
+    changes = [row[depth] - row[depth - 1] for _, row in exact for depth in range(1, len(row))]
+    window = math.sqrt(sum(change ** 2 for change in changes) / len(changes)) if changes else search.ASPIRATION_WINDOW
+    return {"window": round(window, 4), "cuts": cuts}
+
+def main():
+    """
+    Reads the command line options, searches the positions and writes the parameters file.
+    """
+    parser = argparse.ArgumentParser(description="Fit the aspiration windows and ProbCut parameters of the search")
+    parser.add_argument("--records", help="game record file to take positions from")
+    parser.add_argument("--games", type=int, default=60, help="number of self-play games to generate without --records")
+    parser.add_argument("--positions", type=int, default=300, help="number of positions to search")
+    parser.add_argument("--evaluator", action="append", help="evaluator to fit (can be repeated), all of them if not given")
+    parser.add_argument("--output", default=search.DEFAULT_PROBCUT_PATH, help="parameters file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.records:
+        games = records.read_records(args.records)
+    else:
+        games = [train_patterns.self_play_game(rng) for _ in range(args.games)]
+    positions = collect_positions(games, args.positions, rng)
+    depth = max(PAIRS)
+
+    fitted = {}
+    for name in args.evaluator or sorted(evaluation.EVALUATORS):
+        # Without weights the pattern evaluator is the heuristic one, whose fits would be wrong once weights are trained
+        if name == "pattern" and not patterns.weights_loaded():
+            print("Skipping pattern: no pattern weights are loaded")
+            continue
+        start = time.perf_counter()
+        scores = search_scores(positions, name, depth)
+        fitted[name] = fit(positions, scores)
+        print(f"Fitted {name} on {len(positions)} positions in {time.perf_counter() - start:.0f} s, "
+              f"aspiration window {fitted[name]['window']:g}")
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump({"evaluators": fitted}, file, indent=1)
+        file.write("\n")
+    print(f"Parameters written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -7,13 +7,45 @@ JSON files. Game logic and board management are handled via helper
 functions and the 'components' module.
 """
 
+import atexit
+import contextlib
+import contextvars
 import json
+import math
+import os
 import io
+import re
+import time
+import uuid
 import flask
+import admission
+import ai_cache
+import analysis
+import bitboard
 import components
+import difficulty
+import encoding
+import game_store
+import metrics
+import ponder
+import position
+import profiling
+import savefile
+import search
+import session_store
 
 app = flask.Flask(__name__)
 
+# Reject whole requests that are far larger than any save file before reading them
+app.config["MAX_CONTENT_LENGTH"] = 2 * savefile.MAX_SAVE_BYTES
+
+# Profiling (see 'profiling'): REVERSI_PROFILE=process records the whole process,
+# served on '/profile', and REVERSI_PROFILE_REQUESTS=1 lets a request ask for its
+# own profile with '?profile=1' (or '?profile=cprofile' to also write a pstats
+# file to REVERSI_PROFILE_DIR)
+app.config["PROFILE_REQUESTS"] = os.environ.get("REVERSI_PROFILE_REQUESTS") == "1"
+app.config["PROFILE_DIR"] = os.environ.get("REVERSI_PROFILE_DIR", ".")
+
 # Initialise the board,keep track of whos turn it is,
 # and store if the game is won values in a dictionary
 # so the values can be changed during the move() function
@@ -25,18 +57,217 @@ game_state = {
 
 # Score map used by the AI player to rate the available moves it has
 # higher score = the move is probably better
-# This map favours the corners highly as corners are useful and are unable
-# to be flipped after being claimed
-ai_score_map = [
-    [3,  -3,  2,  1,  1,  2, -3,  3],
-    [-3, -4, -1, -1, -1, -1, -4, -3],
-    [2,  -1,  0,  0,  0,  0, -1,  2],
-    [1,  -1,  0,  0,  0,  0, -1,  1],
-    [1,  -1,  0,  0,  0,  0, -1,  1],
-    [2,  -1,  0,  0,  0,  0, -1,  2],
-    [-3, -4, -1, -1, -1, -1, -4, -3],
-    [3,  -3,  2,  1,  1,  2, -3,  3],
-]
+# The map now lives with the greedy engine in the 'search' module
+ai_score_map = search.SCORE_MAP
+
+# Timing histograms and counters served on '/metrics'
+REQUEST_SECONDS = metrics.Histogram("reversi_request_seconds", "Time taken to answer each route", ["route"])
+MOVE_PHASE_SECONDS = metrics.Histogram("reversi_move_phase_seconds", "Time spent in each phase of playing a move", ["phase"])
+LEGAL_MOVE_TIME = MOVE_PHASE_SECONDS.labels("legal_move")
+EXECUTE_MOVE_TIME = MOVE_PHASE_SECONDS.labels("execute_move")
+STATUS_TIME = MOVE_PHASE_SECONDS.labels("status")
+MOVES = metrics.Counter("reversi_moves_total", "Moves played")
+PASSES = metrics.Counter("reversi_passes_total", "Turns passed because the player had no legal move")
+GAMES_OVER = metrics.Counter("reversi_games_over_total", "Games finished", ["result"])
+
+# Id the game being played is kept under in the game store
+ACTIVE_GAME_ID = "active"
+
+# Game ids chosen by players may only use letters, digits, '-' and '_'
+GAME_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Optional server-side game store, enabled by setting the REVERSI_GAME_STORE
+# environment variable to the path of a database file
+store = None
+if game_store.DEFAULT_PATH:
+    store = game_store.GameStore(game_store.DEFAULT_PATH)
+    atexit.register(store.close)
+    metrics.Gauge("reversi_game_store_writes_total", "Game saves written to the game store", lambda: store.writes, "counter")
+    metrics.Gauge("reversi_game_store_commits_total", "Batches committed to the game store", lambda: store.commits, "counter")
+
+    # Carry on with the game that was being played before the server restarted
+    saved_game = store.load(ACTIVE_GAME_ID)
+    if saved_game is not None:
+        game_state.update(saved_game)
+
+# Snapshot of the game being played: the immutable "position" (see 'position'),
+# "game_won", and values worked out from the board ("dark" and "light" masks, the
+# "hash" of the position, the counter "counts" and the "frontier" of counters next
+# to empty squares). A new index replaces the old one whenever the server changes
+# the game and is never changed afterwards, so readers on other threads can use
+# it without a lock
+position_index = {}
+
+# Optional shared backend holding one game per browser session, enabled by setting
+# the REVERSI_SESSION_BACKEND environment variable (see 'session_store'). Without it
+# every visitor plays the one game in game_state
+session_backend = session_store.open_backend(session_store.DEFAULT_URL) if session_store.DEFAULT_URL else None
+
+# Name of the cookie holding the session id
+SESSION_COOKIE = "reversi_session"
+
+# How many times a change is tried again when another process saved the same game first
+CONFLICT_RETRIES = 3
+
+# The session used by the current request: its "id", the stored "version", the
+# "game" state and its position "index". None when sessions are disabled
+_session = contextvars.ContextVar("session", default=None)
+
+def current_game():
+    """
+    Gets the game state the current request is playing.
+
+    Returns:
+        dict: The session's game when sessions are enabled, otherwise game_state.
+    """
+    session = _session.get()
+    return game_state if session is None else session["game"]
+
+def current_index():
+    """
+    Gets the position index of the game the current request is playing.
+
+    Returns:
+        dict: The session's position index when sessions are enabled, otherwise position_index.
+    """
+    session = _session.get()
+    return position_index if session is None else session["index"]
+
+def index_position(game, snapshot=None):
+    """
+    Works out the position index of a game.
+
+    Parameters:
+        game (dict): The game state.
+        snapshot (Position | None): The game's position if it has already been made, so the
+            legal moves it has worked out are published with it.
+
+    Returns:
+        dict: The new position index.
+    """
+    if snapshot is None:
+        snapshot = position.Position.from_game(game)
+    return {
+        "position": snapshot,
+        "game_won": game["game_won"],
+        "dark": snapshot.dark,
+        "light": snapshot.light,
+        "hash": hash(snapshot),
+        "counts": snapshot.counts(),
+        "frontier": snapshot.frontier(),
+    }
+
+def current_position():
+    """
+    Gets the position of the current game. The published one is reused while it still
+    matches the board, so legal moves it has already worked out are not scanned again.
+
+    Returns:
+        Position: The current game's position.
+    """
+    game = current_game()
+    dark, light = bitboard.from_board(game["board"])
+    snapshot = current_index().get("position")
+    if snapshot is not None and (snapshot.dark, snapshot.light, snapshot.player) == (dark, light, game["current_player"]):
+        return snapshot
+    return position.Position(dark, light, game["current_player"], len(game["board"]))
+
+def rebuild_position_index(snapshot=None):
+    """
+    Publishes a new position index for the current game state. The old index is
+    replaced in one step so readers see either the old game or the new one, never a mix.
+
+    Parameters:
+        snapshot (Position | None): The current game's position if it has already been made.
+    """
+    global position_index
+    index = index_position(current_game(), snapshot)
+    session = _session.get()
+    if session is None:
+        position_index = index
+    else:
+        session["index"] = index
+
+def load_session(session_id):
+    """
+    Loads a session's game from the session backend, starting a new game if it has none.
+
+    Parameters:
+        session_id (str): The id of the session.
+
+    Returns:
+        dict: The session's "id", "version", "game" and "index".
+    """
+    version, game = session_backend.get(session_id)
+    if game is None:
+        game = {"board": components.initialise_board(8), "current_player": "Dark ", "game_won": False}
+    return {"id": session_id, "version": version, "game": game, "index": index_position(game)}
+
+def save_session():
+    """
+    Saves the current session's game, raising session_store.VersionConflict if
+    another request saved it after it was loaded.
+    """
+    session = _session.get()
+    session["version"] = session_backend.put(session["id"], session["game"], session["version"])
+
+def retry_on_conflict(function, *args):
+    """
+    Runs a function that changes the game, loading the game again and retrying
+    when another process saved it first.
+
+    Returns:
+        The result of the function.
+    """
+    session = _session.get()
+    for attempt in range(CONFLICT_RETRIES):
+        try:
+            return function(*args)
+        except session_store.VersionConflict:
+            if session is None or attempt == CONFLICT_RETRIES - 1:
+                raise
+            session.update(load_session(session["id"]))
+
+def run_in_session(session_id, function, *args):
+    """
+    Runs a function with a session's game as the current game, for servers that
+    do not go through the Flask request hooks (see 'asgi_app').
+
+    Parameters:
+        session_id (str | None): The id of the session, ignored when sessions are disabled.
+        function (callable): The function to run.
+        *args: Passed on to the function.
+
+    Returns:
+        The result of the function.
+    """
+    if session_backend is None:
+        return function(*args)
+    token = _session.set(load_session(session_id))
+    try:
+        return retry_on_conflict(function, *args)
+    finally:
+        _session.reset(token)
+
+rebuild_position_index()
+
+if os.environ.get("REVERSI_PROFILE") == "process":
+    profiling.enable_process_profile()
+
+# Reuse AI moves worked out before the last restart and keep them for the next one.
+# The file is read on another thread so the first requests are not held up by it
+ai_cache.load_cache_in_background()
+atexit.register(ai_cache.save_cache)
+
+def requested_board_format():
+    """
+    Works out which board encoding the client asked for with the 'board_format'
+    query parameter or the Accept header. The list of lists is the default.
+
+    Returns:
+        str: One of encoding.FORMATS.
+    """
+    return encoding.choose_format(flask.request.args.get("board_format"), flask.request.headers.get("Accept"))
 
 def execute_move(colour,coord,board):
     """
@@ -114,12 +345,34 @@ def execute_move(colour,coord,board):
 
     return board
 
+def store_active_game():
+    """
+    Buffers the current game in the game store (if enabled) so it survives a restart.
+    """
+    if store is not None:
+        store.save(ACTIVE_GAME_ID, game_state)
+
+def game_changed(snapshot=None):
+    """
+    Rebuilds the position index and stores the game after the server changes the game state.
+    With sessions enabled the session's game is saved to the session backend instead.
+
+    Parameters:
+        snapshot (Position | None): The new position of the game if it has already been made.
+    """
+    rebuild_position_index(snapshot)
+    if _session.get() is not None:
+        save_session()
+    else:
+        store_active_game()
+
 def pass_turn():
     """
     Changes the current player's turn to the other colour.
     """
     # Toggles player
-    game_state["current_player"] = "Dark " if game_state["current_player"] == "Light" else "Light"
+    game = current_game()
+    game["current_player"] = "Dark " if game["current_player"] == "Light" else "Light"
 
 def calculate_winner():
     """
@@ -132,7 +385,7 @@ def calculate_winner():
     light_total = 0
 
     # Add total number of each player's counters in each row
-    for row in game_state["board"]:
+    for row in current_game()["board"]:
         dark_total += row.count("Dark ")
         light_total += row.count("Light")
 
@@ -166,6 +419,107 @@ def legal_move_available(colour, board):
                 return True
     return False
 
+@app.before_request
+def start_request_timer():
+    """
+    Notes when the request started so its time can be recorded in the metrics
+    """
+    flask.g.request_start = time.perf_counter()
+
+@app.teardown_request
+def record_request_time(exception):
+    """
+    Records how long the request took in the route's histogram
+    """
+    start = flask.g.pop("request_start", None)
+    if start is not None:
+        rule = flask.request.url_rule
+        REQUEST_SECONDS.labels(rule.rule if rule is not None else "unmatched").observe(time.perf_counter() - start)
+
+@app.before_request
+def start_request_profile():
+    """
+    Profiles the request if it asked for it and per-request profiling is allowed
+    """
+    mode = flask.request.args.get("profile")
+    if not app.config["PROFILE_REQUESTS"] or mode not in ("1", "cprofile"):
+        return
+    stack = contextlib.ExitStack()
+    flask.g.profile = stack.enter_context(profiling.profiled(cprofile=mode == "cprofile"))
+    flask.g.profile_stack = stack
+
+@app.after_request
+def add_request_profile(response):
+    """
+    Adds the request's profile to the response as a Server-Timing header, writing the pstats file if one was asked for
+    """
+    profile = flask.g.get("profile")
+    if profile is not None:
+        stack = flask.g.pop("profile_stack")
+        stack.close()
+        response.headers["Server-Timing"] = profile.server_timing()
+        if profile.cprofile is not None:
+            path = os.path.join(app.config["PROFILE_DIR"], f"profile-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.pstats")
+            profile.dump(path)
+            response.headers["X-Profile-Dump"] = path
+    return response
+
+@app.teardown_request
+def stop_request_profile(exception):
+    """
+    Stops profiling if the request failed before its response was made
+    """
+    stack = flask.g.pop("profile_stack", None)
+    if stack is not None:
+        stack.close()
+
+@app.before_request
+def open_session():
+    """
+    Loads the game of the browser's session when sessions are enabled, starting a new session if needed
+    """
+    if session_backend is None:
+        return
+    session_id = flask.request.cookies.get(SESSION_COOKIE, "")
+    if not GAME_ID_PATTERN.fullmatch(session_id):
+        session_id = uuid.uuid4().hex
+        flask.g.new_session_id = session_id
+    flask.g.session_token = _session.set(load_session(session_id))
+
+@app.after_request
+def set_session_cookie(response):
+    """
+    Sends the session id to the browser when a new session was started
+    """
+    if "new_session_id" in flask.g:
+        response.set_cookie(SESSION_COOKIE, flask.g.new_session_id, httponly=True, samesite="Lax")
+    return response
+
+@app.teardown_request
+def close_session(exception):
+    """
+    Stops using the session's game once the request is finished
+    """
+    token = flask.g.pop("session_token", None)
+    if token is not None:
+        _session.reset(token)
+
+@app.errorhandler(session_store.VersionConflict)
+def version_conflict(error):
+    """
+    Tells the client to try again when another request kept changing the same game
+    """
+    return flask.jsonify(status="fail", message="The game was changed by another request, please try again"), 409
+
+@app.errorhandler(admission.Overloaded)
+def overloaded(error):
+    """
+    Tells the client when to try again when the AI is too busy for even the cheapest tier
+    """
+    response = flask.jsonify(status="fail", message=str(error))
+    response.headers["Retry-After"] = str(math.ceil(error.retry_after))
+    return response, 429
+
 @app.route("/")
 def index():
     """
@@ -174,16 +528,29 @@ def index():
 
     # Sends the state of the board and the current player
     # so they can be used when loading the webpage
-    return flask.render_template("index.html", game_board=game_state["board"], turn=game_state["current_player"].strip())
+    game = current_game()
+    return flask.render_template("index.html", game_board=game["board"], turn=game["current_player"].strip(), store_enabled=store is not None)
 
 @app.route('/save', methods=['GET'])
 def save_game():
     """
     Downloads the state of the current game as a json file to the user's device
+
+    The board is written in the format chosen with 'board_format' (see requested_board_format)
     """
 
-    # Game_state is a dictionary so it can be easily converted to json
-    json_str = json.dumps(game_state, indent=4)
+    try:
+        board_format = requested_board_format()
+    except ValueError as e:
+        return str(e), 400
+
+    # The published snapshot is saved so a move being played at the same time cannot
+    # be half written. The counter counts are included so the board can be checked when it is loaded
+    index = current_index()
+    snapshot = index["position"]
+    saved = {"board": encoding.encode(snapshot.to_board(), board_format), "current_player": snapshot.player,
+             "game_won": index["game_won"], "counts": index["counts"]}
+    json_str = json.dumps(saved, indent=4)
     buffer = io.BytesIO()
     buffer.write(json_str.encode())
     buffer.seek(0)
@@ -206,104 +573,334 @@ def load_game():
     if file.filename == '':
         return "No selected file", 400
     try:
-        # Load values from the file json to game_state
-        loaded_game_state = json.load(file)
-        game_state["board"] = loaded_game_state["board"]
-        game_state["game_won"] = loaded_game_state["game_won"]
-        game_state["current_player"] = loaded_game_state["current_player"]
-        return flask.redirect(flask.url_for('index'))
+        # Read and check the whole file before changing game_state so a bad
+        # file cannot leave the game half loaded
+        loaded_game_state = savefile.load_game_state(file.stream, board_size=8)
     
-    # Return an error with error information if the loading of values to game_state fails
-    except Exception as e:
+    # Return an error with error information if the file is not a valid save
+    except ValueError as e:
         return f"Error loading file: {e}", 400
 
+    current_game().update(loaded_game_state)
+    game_changed()
+    return flask.redirect(flask.url_for('index'))
+
 @app.route('/reset', methods=['POST'])
 def reset_game():
     """
     Reset the current game so players can start a new game
     """
     
-    # Set values in game_state to their initial values and reload the page
-    game_state["board"] = components.initialise_board(8)
-    game_state["game_won"] = False
-    game_state["current_player"] = "Dark "
+    # Set values in the game state to their initial values and reload the page
+    game = current_game()
+    game["board"] = components.initialise_board(8)
+    game["game_won"] = False
+    game["current_player"] = "Dark "
+    game_changed()
     return flask.redirect(flask.url_for('index'))
 
+@app.route('/store/save', methods=['POST'])
+def store_save_game():
+    """
+    Saves the current game in the server-side game store under a game id.
+    A new game id is made if none is given.
+    """
+
+    if store is None:
+        return flask.jsonify(status="fail", message="The game store is not enabled")
+
+    game_id = flask.request.values.get("game_id") or uuid.uuid4().hex
+    if not GAME_ID_PATTERN.fullmatch(game_id):
+        return flask.jsonify(status="fail", message="Game id may only use letters, digits, '-' and '_'")
+
+    store.save(game_id, current_game())
+    return flask.jsonify(status="success", game_id=game_id)
+
+@app.route('/store/load', methods=['POST'])
+def store_load_game():
+    """
+    Loads a game from the server-side game store by its game id
+    """
+
+    if store is None:
+        return "The game store is not enabled", 404
+
+    game_id = flask.request.values.get("game_id", "")
+    if not GAME_ID_PATTERN.fullmatch(game_id):
+        return "Invalid game id", 400
+
+    saved = store.load(game_id)
+    if saved is None:
+        return "No saved game with that id", 404
+
+    current_game().update(saved)
+    game_changed()
+    return flask.redirect(flask.url_for('index'))
+
+def spectate(board_format="list"):
+    """
+    Describes the current game from its published snapshot without touching the game state.
+
+    Parameters:
+        board_format (str): The encoding of the board, one of encoding.FORMATS.
+
+    Returns:
+        dict: The JSON response with the "board", the "player" to move, the "counts" and "game_won".
+    """
+    index = current_index()
+    snapshot = index["position"]
+    return {"status": "success", "board": encoding.encode(snapshot.to_board(), board_format),
+            "player": snapshot.player, "counts": index["counts"], "game_won": index["game_won"]}
+
+@app.route("/position")
+def position_page():
+    """
+    Serves the current game for spectators and other read-only clients
+
+    The board is written in the format chosen with 'board_format' (see requested_board_format)
+    """
+
+    try:
+        board_format = requested_board_format()
+    except ValueError as e:
+        return flask.jsonify(status="fail", message=str(e))
+    return flask.jsonify(**spectate(board_format))
+
+@app.route("/metrics")
+def metrics_page():
+    """
+    Serves the timing histograms and counters in the Prometheus text format
+    """
+    return flask.Response(metrics.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
+@app.route("/profile")
+def profile_page():
+    """
+    Serves the call counts and cumulative times of the process profile as JSON.
+    '?reset=1' starts the counts again
+    """
+    profile = profiling.process_profile
+    if profile is None:
+        return "Process profiling is not enabled", 404
+    report = profile.report()
+    if flask.request.args.get("reset") == "1":
+        profiling.disable_process_profile()
+        profiling.enable_process_profile()
+    return flask.jsonify(status="success", functions=report)
+
+@app.route("/analyse", methods=["POST"])
+def analyse_positions():
+    """
+    Analyses a batch of positions sent as JSON and streams one line of JSON per
+    position as soon as it is finished (see 'analysis'). The game being played is not changed
+
+    With admission control enabled (see 'admission') the whole batch is charged before
+    anything is searched, and a batch that would use more than its share of the AI is
+    analysed with a cheaper tier, named in 'difficulty' in every line
+    """
+
+    try:
+        positions, settings = analysis.parse_batch(flask.request.get_json(silent=True))
+    except ValueError as e:
+        return flask.jsonify(status="fail", message=str(e)), 400
+
+    session = _session.get()
+    client = flask.request.remote_addr if session is None else session["id"]
+    settings, tier, downgraded = admission.admit(client, settings, positions=len(positions))
+    extra = {"difficulty": tier["name"]} if downgraded else {}
 
+    def lines():
+        for result in analysis.analyse(positions, settings):
+            yield json.dumps({**result, **extra}) + "\n"
+
+    return flask.Response(lines(), mimetype="application/x-ndjson")
+
+def format_ranking(moves, size):
+    """
+    Turns ranked moves from a multi-PV search into JSON friendly coordinates.
+
+    Parameters:
+        moves (list[dict]): Moves from ai_cache.ranked_moves.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        list[dict]: The "x", "y" and "score" of each move, best first, and its principal
+            variation "pv" as a list of [x, y] moves with null for a pass.
+    """
+    return [{"x": move["square"] % size + 1, "y": move["square"] // size + 1, "score": move["score"],
+             "pv": [None if square is None else [square % size + 1, square // size + 1] for square in move["pv"]]}
+            for move in moves]
 
 @app.route("/ai_move")
 def ai_move():
     """
     Calculates a next move using an artificial intelligence algorithm and
     calls the general 'move' function
-    """
 
-    # Get all the legal moves available and store their coords in a list
-    legal_moves = []
-    for x in range(1, 9):
-        for y in range(1, 9):
-            if components.legal_move("Light",(x, y),game_state["board"]):
-                legal_moves.append((x, y))
+    The engine can be chosen with the optional 'engine', 'evaluator' and 'depth'
+    query parameters (and a 'nodes' or 'time' budget), or with a named 'difficulty'
+    tier (see 'difficulty'). By default the greedy score map engine is used. Moves are
+    looked up in the server-wide AI cache before searching. The AI plays Light
+    unless the 'player' query parameter is 'Dark'.
 
-    # Check which move from the list has the highest score (predicted as best move)
-    highest_move_score = -10
-    best_move = (-1,-1)
-    for move in legal_moves:
-        score = ai_score_map[move[1]-1][move[0]-1]
-        if score > highest_move_score:
-            highest_move_score = score
-            best_move = move
+    With pondering enabled (see 'ponder') the AI starts working out its next move
+    in the background while the player thinks about theirs.
 
-    # Return the response to simulate the Light player clicking that specific best move
-    return flask.jsonify(status="success", x=best_move[0], y=best_move[1])
+    With the optional 'multipv' query parameter the best 'multipv' moves are also
+    returned in 'moves' with their scores and principal variations (see 'format_ranking')
 
-@app.route("/move")
-def move():
+    With admission control enabled (see 'admission') a request that would use more than
+    its share of the AI is played with a cheaper tier, named in 'difficulty' in the response
     """
-    Handles turn passing, updating the board and game log when the player attempts to make a move
+
+    try:
+        settings, tier = difficulty.parse_request(flask.request.args)
+        colour = analysis.parse_colour(flask.request.args.get("player", "Light"))
+        count = flask.request.args.get("multipv")
+        if count is not None:
+            count = search.parse_multi_pv(count)
+    except ValueError as e:
+        return flask.jsonify(status="fail", message=str(e))
+
+    # Clients are told apart by their session, or by their address without sessions
+    session = _session.get()
+    session_id = None if session is None else session["id"]
+    settings, tier, downgraded = admission.admit(session_id or flask.request.remote_addr, settings, tier, count or 1)
+    extra = {"difficulty": tier["name"]} if downgraded else {}
+    if tier is not None:
+        difficulty.meter(tier, count or 1)
+
+    snapshot = current_position()
+    size, dark, light = snapshot.size, snapshot.dark, snapshot.light
+    if count is not None:
+        ranking = ai_cache.ranked_moves(dark, light, colour, size, settings, count)
+        ponder.start(session_id, dark, light, size, settings, ranking[0]["square"] if ranking else None, colour)
+        moves = format_ranking(ranking, size)
+        best_move = (moves[0]["x"], moves[0]["y"]) if moves else (-1, -1)
+        return flask.jsonify(status="success", x=best_move[0], y=best_move[1], moves=moves, **extra)
+
+    # The legal moves worked out by /move for the published position tell if there is anything to search
+    square = None
+    if snapshot.mobility()[0 if colour == snapshot.player else 1]:
+        # Easier tiers sometimes play a random move instead of the best one
+        square = difficulty.random_move(tier, dark, light, colour, size)
+        if square is None:
+            # Use the search done on the player's time if they played the predicted move
+            # and the answer is not in the AI cache already
+            square, _ = ai_cache.cached_best_move(dark, light, colour, size, settings,
+                                                  lambda key: ponder.collect(session_id, key, settings))
+    ponder.start(session_id, dark, light, size, settings, square, colour)
+
+    # No legal moves gives the same out of range move as before
+    best_move = (-1, -1)
+    if square is not None:
+        best_move = (square % size + 1, square // size + 1)
+
+    # Return the response to simulate the AI player clicking that specific best move
+    return flask.jsonify(status="success", x=best_move[0], y=best_move[1], **extra)
+
+@app.route("/difficulty")
+def difficulty_levels():
+    """
+    Lists the difficulty tiers offered by the server with their engine settings and CPU cost
     """
 
-    # Check if the game is still playable
-    if game_state["game_won"]:
-        return flask.jsonify(status="fail", message="The game is over")
+    return flask.jsonify(status="success", tiers=difficulty.describe())
 
-    # Get x and y from the GET request
-    # If a coordinate is not numeric, it is set to None
-    x = flask.request.args.get("x", type=int)
-    y = flask.request.args.get("y", type=int)
+def play_move(x, y, board_format="list"):
+    """
+    Plays a move for the current player, passing the turn and ending the game when needed.
+    This holds the logic of the '/move' route without depending on Flask so other
+    servers (see 'asgi_app') can share it.
+
+    Parameters:
+        x (int | None): The column of the move, starting from 1.
+        y (int | None): The row of the move, starting from 1.
+        board_format (str): The encoding of the board in the response, one of encoding.FORMATS.
+
+    Returns:
+        dict: The JSON response with a "status" of "success" or "fail".
+    """
+
+    game = current_game()
+
+    # Check if the game is still playable
+    if game["game_won"]:
+        return {"status": "fail", "message": "The game is over"}
 
     # Check coordinates are not None and that they are on the board
     if x is None or y is None or x < 1 or y < 1 or x > 8 or y > 8:
-        return flask.jsonify(status="fail", message=f"Coordinates must be whole number between 1 and {8}")
+        return {"status": "fail", "message": f"Coordinates must be whole number between 1 and {8}"}
+
+    # An invalid move returns a fail
+    with LEGAL_MOVE_TIME.time():
+        legal = components.legal_move(game["current_player"], (x, y), game["board"])
+    if not legal:
+        return {"status": "fail", "message": "Move is not legal"}
+
+    # Place new counter and flip outflanked counters
+    with EXECUTE_MOVE_TIME.time():
+        game["board"] = execute_move(game["current_player"], (x, y), game["board"])
 
-    # Check if move is legal for the current player
-    if components.legal_move(game_state["current_player"], (x, y), game_state["board"]):
-        # Place new counter and flip outflanked counters
-        game_state["board"] = execute_move(game_state["current_player"], (x, y), game_state["board"])
+    pass_turn()
 
+    # One call finds the legal moves of both players, so passing and the end of the game
+    # (with the final counts) are known without scanning the board again for each
+    with STATUS_TIME.time():
+        snapshot = position.Position.from_game(game)
+        status = snapshot.status()
+
+    # Skip the players turn if they have no available legal moves
+    if status["pass"] or status["game_over"]:
         pass_turn()
+        snapshot = snapshot.passed()
+        # If the next player also cant make a move then the game is over
+        if status["game_over"]:
+            winner = status["winner"]
+            game["game_won"] = True
+            game_changed(snapshot)
+
+            # Counted once the game is saved so a retried move is only counted once
+            MOVES.inc()
+            GAMES_OVER.labels(winner).inc()
+
+            # Return a response indicating the game ended with a message of who won
+            if winner == "draw":
+                finished = "Neither player can make a legal move! The game is over. The game ended in a draw"
+            else:
+                finished = f"Neither player can make a legal move! The game is over. The player with {winner} counters won!"
+            return {"status": "success", "finished": finished, "player": game["current_player"], "board": encoding.encode(game["board"], board_format)}
+        game_changed(snapshot)
+        MOVES.inc()
+        PASSES.inc()
+        return {"status": "success", "player": game["current_player"], "board": encoding.encode(game["board"], board_format), "message": f"No legal moves available for {'Light' if game['current_player'] == 'Dark ' else 'Dark '}. Turn was passed"}
+
+    game_changed(snapshot)
+    MOVES.inc()
+
+    # A valid completed move returns a success with the updated board to be displayed
+    return {"status": "success", "player": game["current_player"], "board": encoding.encode(game["board"], board_format)}
+
+@app.route("/move")
+def move():
+    """
+    Handles turn passing, updating the board and game log when the player attempts to make a move
 
-        # Skip the players turn if they have no available legal moves
-        if not legal_move_available(game_state["current_player"], game_state["board"]):
-            pass_turn()
-            # If the next player also cant make a move then the game is over
-            if not legal_move_available(game_state["current_player"], game_state["board"]):
-                winner = calculate_winner()
-                game_state["game_won"] = True
+    The board in the response is written in the format chosen with 'board_format'
+    (see requested_board_format)
+    """
 
-                # Return a response indicating the game ended with a message of who won
-                if winner == "draw":
-                    return flask.jsonify(status="success", finished="Neither player can make a legal move! The game is over. The game ended in a draw", player=game_state["current_player"], board=game_state["board"])
-                else:
-                    return flask.jsonify(status="success", finished=f"Neither player can make a legal move! The game is over. The player with {winner} counters won!", player=game_state["current_player"], board=game_state["board"])
-            return flask.jsonify(status="success", player=game_state["current_player"], board=game_state["board"], message=f"No legal moves available for {"Light" if game_state["current_player"] == "Dark " else "Dark "}. Turn was passed")
+    try:
+        board_format = requested_board_format()
+    except ValueError as e:
+        return flask.jsonify(status="fail", message=str(e))
 
-        # A valid completed move returns a success with the updated board to be displayed
-        return flask.jsonify(status="success", player=game_state["current_player"], board=game_state["board"])
+    # Get x and y from the GET request
+    # If a coordinate is not numeric, it is set to None
+    x = flask.request.args.get("x", type=int)
+    y = flask.request.args.get("y", type=int)
 
-    else:
-        # An invalid move returns a fail
-        return flask.jsonify(status="fail", message="Move is not legal")
+    return flask.jsonify(**retry_on_conflict(play_move, x, y, board_format))
 
 if __name__ == "__main__":
     app.run()
@@ -0,0 +1,233 @@
+"""
+CLI version of Reversi
+
+Plays the game in the terminal on the same core as the web app. The board is
+an immutable 'position.Position', so checking and playing moves is done by
+'bitboard' (and the compiled core when it has been built) rather than by a
+copy of the flipping code.
+
+There are two ways to play:
+- Interactive (the default): each player types the x and y of their move.
+- Scripted (--replay FILE, or --replay - for stdin): every line of the file is
+  one game in record notation (see 'records', for example "d3 c5 f6"). The
+  games are played at full speed and checked as they go, which makes it
+  possible to validate or benchmark large batches of games from the shell.
+  --print-board prints the board after every move as in interactive play,
+  and --diff redraws only the cells that changed (on an ANSI terminal).
+"""
+
+import argparse
+import sys
+import time
+import components
+import records
+from position import Position
+
+BOARD_SIZE = 8
+
+def cli_input_coords(size=BOARD_SIZE):
+    """
+    Requests column and row number of the cell the player wants to place a counter on until
+    valid numbers are inputted.
+
+    Parameters:
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        tuple(int,int): The x and y position of the players desired move.
+    """
+
+    # Keep asking the player for a move position until a valid move is given
+    while True:
+        x = input("Enter x coordinate of move: ")
+        y = input("Enter y coordinate of move: ")
+
+        # Checks inputted coordinates are whole positive numbers
+        if not x.isdecimal() or not y.isdecimal():
+            print("Coordinates must both be whole numbers. Try again")
+            continue
+
+        # Disallow numbers longer than necessary to avoid extremely long digit numbers
+        # that cause str to int conversion to error (>4300 digit numbers)
+        if len(x) > 2 or len(y) > 2:
+            print("Inputted numbers are too long. Try again")
+            continue
+
+        # They are safe to convert into integers now
+        x = int(x)
+        y = int(y)
+
+        # Check the coordinates are on the board
+        if x < 1 or y < 1 or x > size or y > size:
+            print(f"Coordinates must be whole numbers within 1 and {size}")
+            continue
+
+        return (x, y)
+
+def play_game(choose_move, printer=None, size=BOARD_SIZE):
+    """
+    Plays one game from the starting position, passing the turn whenever a player has no legal move.
+
+    Parameters:
+        choose_move (callable): Takes the Position and returns the (x, y) of the move to
+            play, or None to stop before the game is over.
+        printer (components.BoardPrinter | None): Prints the board after every move and
+            the passes, nothing is printed if None.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        tuple(Position, bool): The last position and whether the game is over.
+    """
+    position = Position.start(size)
+    if printer:
+        printer.reset()
+        printer.board(position.to_board())
+
+    while True:
+        if not position.legal_moves():
+            passed = position.passed()
+
+            # Neither player can make a legal move so the game is over
+            if not passed.legal_moves():
+                if printer:
+                    printer.write("No more legal moves can be made by either player. Game over!\n")
+                return position, True
+            if printer:
+                printer.write(f"{position.player.strip()} has no legal moves! Passing turn\n")
+            position = passed
+            continue
+
+        move = choose_move(position)
+        if move is None:
+            return position, False
+        position = position.play(*move)
+        if printer:
+            printer.board(position.to_board())
+
+def winner_message(position):
+    """
+    Describes the result of a finished game.
+
+    Returns:
+        str: Who won and by how many counters, or that the game was a draw.
+    """
+    counts = position.counts()
+    if counts["dark"] > counts["light"]:
+        return f"Dark wins the game with {counts['dark']} total counters! (Light had {counts['light']} counters)"
+    if counts["light"] > counts["dark"]:
+        return f"Light wins the game with {counts['light']} total counters! (Dark had {counts['dark']} counters)"
+    return "The game ended in a draw!"
+
+def simple_game_loop():
+    """
+    Initialises the game, processes the players' moves and ends the game.
+    """
+
+    print("Welcome to CLI Reversi! :)")
+
+    def ask(position):
+        # The player has to enter a legal move for the turn to progress
+        empty = BOARD_SIZE * BOARD_SIZE - sum(position.counts().values())
+        print(f"{empty} max moves left")
+        print(f"Its {position.player.strip()}'s turn")
+        while True:
+            move = cli_input_coords()
+            if position.is_legal(*move):
+                return move
+            print("Move is invalid. Try again")
+
+    position, _ = play_game(ask, components.BoardPrinter())
+    print(winner_message(position))
+
+def replay_game(moves, printer=None, size=BOARD_SIZE):
+    """
+    Plays through one game record and checks every move.
+
+    Parameters:
+        moves (list[tuple(int,int)]): The x and y position of every move.
+        printer (components.BoardPrinter | None): Prints the board after every move.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        tuple(Position, bool): The last position and whether the game is over.
+    """
+    played = 0
+
+    def next_move(position):
+        nonlocal played
+        if played == len(moves):
+            return None
+        move = moves[played]
+        played += 1
+        if not position.is_legal(*move):
+            raise ValueError(f"Move {played} ({records.format_move(move)}) is not legal")
+        return move
+
+    position, over = play_game(next_move, printer, size)
+    if played < len(moves):
+        raise ValueError(f"The game is over after {played} moves but the record has {len(moves)}")
+    return position, over
+
+def replay(lines, printer=None, output=None):
+    """
+    Replays every game in a record file and writes one result line per game.
+
+    Parameters:
+        lines (iterable[str]): The lines of the file. Blank lines and lines starting with '#' are skipped.
+        printer (components.BoardPrinter | None): Prints the board after every move.
+        output (file | None): Where the results are written, stdout if None.
+
+    Returns:
+        dict: The number of "games", "invalid" games and "moves" played, and the "seconds" taken.
+    """
+    output = output or sys.stdout
+    summary = {"games": 0, "invalid": 0, "moves": 0, "seconds": 0.0}
+    start = time.perf_counter()
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        summary["games"] += 1
+        try:
+            moves = records.parse_moves(line)
+            position, over = replay_game(moves, printer)
+        except ValueError as e:
+            summary["invalid"] += 1
+            output.write(f"line {line_number}: invalid: {e}\n")
+            continue
+        summary["moves"] += len(moves)
+        counts = position.counts()
+        result = winner_message(position) if over else f"unfinished, {position.player.strip()} to move"
+        output.write(f"line {line_number}: {len(moves)} moves, dark {counts['dark']} light {counts['light']}, {result}\n")
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def main():
+    """
+    Reads the command line options and plays interactively or replays a record file.
+    """
+    parser = argparse.ArgumentParser(description="Play Reversi in the terminal")
+    parser.add_argument("--replay", metavar="FILE", help="game record file to replay, '-' to read from stdin")
+    parser.add_argument("--print-board", action="store_true", help="print the board after every replayed move")
+    parser.add_argument("--diff", action="store_true",
+                        help="with --print-board, only redraw the cells that changed (ANSI terminals)")
+    args = parser.parse_args()
+
+    if args.replay is None:
+        simple_game_loop()
+        return
+
+    printer = components.BoardPrinter(args.diff) if args.print_board else None
+    if args.replay == "-":
+        summary = replay(sys.stdin, printer)
+    else:
+        with open(args.replay, encoding="utf-8") as file:
+            summary = replay(file, printer)
+    rate = summary["moves"] / summary["seconds"] if summary["seconds"] else 0
+    print(f"{summary['games']} games, {summary['invalid']} invalid, {summary['moves']} moves "
+          f"in {summary['seconds']:.3f} s ({rate:,.0f} moves/s)")
+    if summary["invalid"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Post-game analysis of finished games.
+
+Every game in a record file (see 'records') is replayed through the engine
+and each position is searched. For every move the report gives the engine's
+best move, how much the played move lost against it (in the engine's score,
+from the point of view of the player who moved) and the number of counters of
+each colour after the move, which is the disc curve of the game.
+
+Usage:
+    python game_report.py games.txt --output report.jsonl --engine alphabeta --depth 4
+
+Each game is written as one compact JSON line, for example
+{"source":"games.txt:3","moves":"d6 c4 c3","players":"DLD","best":["d6","e6","c3"],
+ "score":[5,0,3],"loss":[0,2,0],"discs":[[4,1],[3,3],[5,2]],"result":{...}}
+so an archive of games gives a report that can be read one game at a time.
+
+Games are analysed in a pool of worker processes and each one is written as
+soon as it is finished. The report doubles as the checkpoint: running the same
+command again skips every game already in it and only analyses the rest, so a
+long batch job that is stopped or crashes loses at most the games that were
+being searched.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+import bitboard
+import records
+import search
+
+# Most games waiting in the pool for each worker, so huge archives are not all queued at once
+QUEUED_PER_WORKER = 4
+
+def analyse_game(moves, settings, size=8):
+    """
+    Replays a game and scores every move with the engine.
+
+    Parameters:
+        moves (list[tuple(int,int)]): The x and y position of every move.
+        settings (dict): Complete engine settings from search.normalise_settings.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        dict: The "moves" in record notation, the colour that played each move in
+            "players" ("D" or "L"), the engine's "best" move and its "score" before each
+            move, the score "loss" of the move played, the dark and light counts in
+            "discs" after each move and the final "result" (see final_result).
+    """
+    positions = records.replay(moves, size)
+    geo = bitboard.geometry(size)
+    report = {"moves": records.format_moves(moves), "players": "", "best": [], "score": [], "loss": [], "discs": []}
+    for (dark, light, colour), move, (after_dark, after_light, _) in zip(positions, moves, positions[1:]):
+        player, opponent = bitboard.split_colours(dark, light, colour)
+        legal = bitboard.legal_moves(player, opponent, geo)
+
+        # Every legal move gets an exact score so the loss of the played one is known
+        ranked = search.ranked_moves(player, opponent, size, settings, legal.bit_count())["moves"]
+        played = (move[1] - 1) * size + move[0] - 1
+        played_score = next(entry["score"] for entry in ranked if entry["square"] == played)
+        best = ranked[0]
+
+        report["players"] += colour[0]
+        report["best"].append(records.format_move((best["square"] % size + 1, best["square"] // size + 1)))
+        # Two decimal places are plenty for comparing moves and keep the report small
+        report["score"].append(round(best["score"], 2))
+        report["loss"].append(round(best["score"] - played_score, 2))
+        report["discs"].append([after_dark.bit_count(), after_light.bit_count()])
+    report["result"] = final_result(*positions[-1], geo)
+    return report
+
+def final_result(dark, light, colour, geo):
+    """
+    Describes the end of a game record.
+
+    Returns:
+        dict: The "dark" and "light" counts, whether the game is "finished" and, if it
+            is, the "winner" ("dark", "light" or "draw").
+    """
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    result = {"dark": dark.bit_count(), "light": light.bit_count(),
+              "finished": not bitboard.legal_moves(player, opponent, geo) and not bitboard.legal_moves(opponent, player, geo)}
+    if result["finished"]:
+        if result["dark"] == result["light"]:
+            result["winner"] = "draw"
+        else:
+            result["winner"] = "dark" if result["dark"] > result["light"] else "light"
+    return result
+
+def report_game(source, text, settings):
+    """
+    Analyses one line of a record file. Runs in the worker processes.
+
+    Parameters:
+        source (str): Where the game came from, the file name and line number.
+        text (str): The game in record notation.
+        settings (dict): Complete engine settings.
+
+    Returns:
+        dict: The "source" and the report from analyse_game, or a "status" of "fail"
+            with a "message" if the record is not a valid game.
+    """
+    try:
+        report = analyse_game(records.parse_moves(text), settings)
+    except ValueError as e:
+        return {"source": source, "moves": text, "status": "fail", "message": str(e)}
+    return {"source": source, **report}
+
+def normalise_record(text):
+    """
+    Writes a game record the way reports store it, so the same game written with
+    commas, capitals or no spaces is recognised as already analysed.
+
+    Returns:
+        str: The moves in record notation, or the text unchanged if it is not a valid record.
+    """
+    try:
+        return records.format_moves(records.parse_moves(text))
+    except ValueError:
+        # Invalid games are reported with the text as it was read
+        return text
+
+def read_archive(paths):
+    """
+    Reads the games of one or more record files. Blank lines and lines starting with '#' are skipped.
+
+    Parameters:
+        paths (list[str]): The paths of the record files.
+
+    Yields:
+        tuple(str,str): The source ("file:line") and the moves of each game.
+    """
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for number, line in enumerate(file, start=1):
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    yield f"{path}:{number}", line
+
+def read_checkpoint(path, settings):
+    """
+    Reads the games already written to a report so they can be skipped. A line left half
+    written by a crash is removed from the end of the file.
+
+    Parameters:
+        path (str): The path of the report.
+        settings (dict): The engine settings of this run.
+
+    Returns:
+        dict: The moves of every finished game, by source.
+    """
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as file:
+        data = file.read()
+        # Everything after the last newline was being written when the job stopped
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            file.truncate(complete)
+    lines = data[:complete].decode("utf-8").splitlines()
+    if lines and json.loads(lines[0]).get("settings") != settings:
+        raise ValueError(f"{path} was written with different engine settings")
+    for line in lines[1:]:
+        report = json.loads(line)
+        done[report["source"]] = report["moves"]
+    return done
+
+def export(games, path, settings, pool=None, workers=None):
+    """
+    Analyses a batch of games and appends each report to a file as it is finished,
+    skipping the games already in the file.
+
+    Parameters:
+        games (iterable[tuple(str,str)]): The source and moves of every game, as from read_archive.
+        path (str): The report file, which is made if it does not exist.
+        settings (dict): Complete engine settings.
+        pool (concurrent.futures.Executor | None): Where games are analysed. A pool of
+            'workers' processes is made (and stopped afterwards) if None.
+        workers (int | None): The number of worker processes, the number of CPU cores if None.
+
+    Returns:
+        dict: The number of "games" analysed, "skipped" because they were already in the
+            report and "invalid", and the "seconds" taken.
+    """
+    start = time.perf_counter()
+    done = read_checkpoint(path, settings)
+    summary = {"games": 0, "skipped": 0, "invalid": 0, "seconds": 0.0}
+    own_pool = pool is None
+    if own_pool:
+        workers = workers or os.cpu_count() or 1
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    limit = QUEUED_PER_WORKER * (workers or os.cpu_count() or 1)
+
+    with open(path, "a", encoding="utf-8") as output:
+        if output.tell() == 0:
+            output.write(json.dumps({"settings": settings}) + "\n")
+
+        def write(future):
+            report = future.result()
+            output.write(json.dumps(report, separators=(",", ":")) + "\n")
+            # Flushed line by line so the report is a checkpoint of the finished games
+            output.flush()
+            summary["games"] += 1
+            if report.get("status") == "fail":
+                summary["invalid"] += 1
+
+        pending = set()
+        try:
+            for source, text in games:
+                if done.get(source) == normalise_record(text):
+                    summary["skipped"] += 1
+                    continue
+                pending.add(pool.submit(report_game, source, text, settings))
+                if len(pending) >= limit:
+                    finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in finished:
+                        write(future)
+            for future in concurrent.futures.as_completed(pending):
+                write(future)
+        finally:
+            for future in pending:
+                future.cancel()
+            if own_pool:
+                pool.shutdown(cancel_futures=True)
+    summary["seconds"] = time.perf_counter() - start
+    return summary
+
+def main():
+    """
+    Reads the command line options and writes the report of every game in the archive.
+    """
+    parser = argparse.ArgumentParser(description="Analyse finished games with the engine")
+    parser.add_argument("archive", nargs="+", help="game record files, one game per line")
+    parser.add_argument("--output", required=True, help="report file, also used to resume a stopped job")
+    parser.add_argument("--engine", default="alphabeta", choices=search.ENGINES)
+    parser.add_argument("--evaluator")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to the number of CPU cores)")
+    args = parser.parse_args()
+
+    try:
+        settings = search.normalise_settings(vars(args))
+        summary = export(read_archive(args.archive), args.output, settings, workers=args.workers)
+    except (OSError, ValueError) as e:
+        sys.exit(f"error: {e}")
+    print(f"{summary['games']} games analysed ({summary['invalid']} invalid), "
+          f"{summary['skipped']} already in {args.output}, in {summary['seconds']:.1f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Server-side game store backed by an embedded SQLite database.
+
+Games are saved under a game id. Saves are kept in memory and written to the
+database in batches, either when enough games have changed or after a short
+interval, so a busy server does not wait for the disk after every move. The
+database uses write-ahead logging with normal synchronisation, which keeps
+every committed batch safe across a restart of the server while avoiding a
+disk flush per transaction.
+
+Boards are stored in the compact encoding from the 'encoding' module.
+"""
+
+import os
+import threading
+import time
+import encoding
+
+# Path of the database used by the web app (the store is disabled if not set)
+DEFAULT_PATH = os.environ.get("REVERSI_GAME_STORE")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id TEXT PRIMARY KEY,
+    board TEXT NOT NULL,
+    current_player TEXT NOT NULL,
+    game_won INTEGER NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+
+class GameStore:
+    """
+    Stores game states in SQLite with batched writes.
+
+    Attributes:
+        path (str): The path of the database file.
+        batch_size (int): How many changed games are buffered before they are written.
+        flush_interval (float): The longest time in seconds a save waits before it is written.
+        writes (int): How many game saves have been written to the database.
+        commits (int): How many batches have been committed.
+    """
+
+    def __init__(self, path, batch_size=64, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.writes = 0
+        self.commits = 0
+
+        # Latest unsaved state of each game, later saves replace earlier ones
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Imported here so servers without a game store never load sqlite3
+        import sqlite3
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+
+        # Background thread that writes buffered saves once the interval has passed
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def save(self, game_id, game_state):
+        """
+        Buffers a game state to be written in the next batch.
+
+        Parameters:
+            game_id (str): The id the game is stored under.
+            game_state (dict): The game's "board", "current_player" and "game_won".
+        """
+        row = (game_id, encoding.encode_board(game_state["board"]), game_state["current_player"],
+               int(game_state["game_won"]), time.time())
+        with self._lock:
+            self._pending[game_id] = row
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def load(self, game_id):
+        """
+        Gets a stored game, including saves that have not been written yet.
+
+        Parameters:
+            game_id (str): The id the game is stored under.
+
+        Returns:
+            dict | None: The game's "board", "current_player" and "game_won", or None if there is no such game.
+        """
+        with self._lock:
+            row = self._pending.get(game_id)
+            if row is None:
+                row = self._connection.execute(
+                    "SELECT game_id, board, current_player, game_won, updated FROM games WHERE game_id = ?",
+                    (game_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "board": encoding.decode_board(row[1]),
+            "current_player": row[2],
+            "game_won": bool(row[3]),
+        }
+
+    def delete(self, game_id):
+        """
+        Removes a stored game.
+
+        Parameters:
+            game_id (str): The id the game is stored under.
+        """
+        with self._lock:
+            self._pending.pop(game_id, None)
+            self._connection.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+            self._connection.commit()
+
+    def flush(self):
+        """
+        Writes every buffered save to the database in one transaction.
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            rows = list(self._pending.values())
+            self._pending.clear()
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO games (game_id, board, current_player, game_won, updated) "
+                    "VALUES (?, ?, ?, ?, ?)", rows)
+            self.writes += len(rows)
+            self.commits += 1
+
+    def close(self):
+        """
+        Writes any buffered saves and closes the database.
+        """
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def _flush_loop(self):
+        """
+        Writes buffered saves every flush_interval seconds until the store is closed.
+        """
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,272 @@
+"""
+Counters and timing histograms exposed in the Prometheus text format.
+
+Metrics are made once at import time by the modules that use them and
+registered in REGISTRY. A metric with labels hands out one child per set of
+label values; children are meant to be looked up once and kept in a module
+variable so recording a value is a lock and an addition:
+
+    MOVE_PHASE_SECONDS = metrics.Histogram("reversi_move_phase_seconds", "...", ["phase"])
+    LEGAL_MOVE_TIME = MOVE_PHASE_SECONDS.labels("legal_move")
+
+    with LEGAL_MOVE_TIME.time():
+        ...
+
+Values are kept per process. When the app runs as several processes each one
+serves its own '/metrics' and Prometheus adds them up.
+"""
+
+import bisect
+import threading
+import time
+
+# Upper bounds in seconds of the default histogram buckets, from 50 microseconds to 10 seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Every registered metric, in the order they are written out
+REGISTRY = []
+
+def format_labels(names, values, extra=""):
+    """
+    Writes label names and values in the Prometheus format, e.g. '{phase="search"}'.
+
+    Parameters:
+        names (tuple[str]): The label names.
+        values (tuple[str]): The label values in the same order.
+        extra (str): Another label already written out, such as 'le="0.5"'.
+
+    Returns:
+        str: The labels in braces, or "" if there are none.
+    """
+    parts = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def format_value(value):
+    """
+    Writes a number the way Prometheus expects, using "+Inf" for infinity.
+    """
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Shared parts of counters and histograms: the name, help text and children per label values.
+    """
+
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.append(self)
+
+    def labels(self, *values):
+        """
+        Gets the child that records values for one set of label values, making it if needed.
+
+        Parameters:
+            *values (str): One value for each label name, in order.
+
+        Returns:
+            The child, with the same recording methods as the metric.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} needs {len(self.labelnames)} label values")
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        """
+        Writes the metric in the Prometheus text format.
+
+        Returns:
+            list[str]: The lines of the metric.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _CounterChild:
+    """
+    The value of a counter for one set of label values.
+    """
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        Adds to the counter.
+        """
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """
+    A total that only goes up, such as the number of moves played.
+    """
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """
+        Adds to a counter without labels.
+        """
+        self.labels().inc(amount)
+
+    def _render_child(self, values, child):
+        return [f"{self.name}{format_labels(self.labelnames, values)} {format_value(child.value)}"]
+
+
+class _Timer:
+    """
+    Context manager that records how long its block took in a histogram.
+    """
+
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    """
+    The bucket counts, sum and count of a histogram for one set of label values.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count", "_lock")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One count per bucket (not cumulative) plus one for values above the last bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        Records one value.
+        """
+        bucket = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        """
+        Gets a context manager that records how long its block takes in seconds.
+        """
+        return _Timer(self)
+
+
+class Histogram(_Metric):
+    """
+    Counts values (usually durations in seconds) in buckets so percentiles can be worked out.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        """
+        Records one value in a histogram without labels.
+        """
+        self.labels().observe(value)
+
+    def time(self):
+        """
+        Times a block in a histogram without labels.
+        """
+        return self.labels().time()
+
+    def _render_child(self, values, child):
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+            count = child.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+            cumulative += bucket_count
+            le = 'le="' + format_value(bound) + '"'
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, values, le)} {cumulative}")
+        labels = format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    A value read from a function whenever the metrics are written out, such as
+    the number of entries in a cache. Totals that are already counted somewhere
+    else (like the cache hits) can be written out as counters with kind="counter".
+    """
+
+    def __init__(self, name, documentation, function, kind="gauge", registry=REGISTRY):
+        super().__init__(name, documentation, (), registry)
+        self.function = function
+        self.kind = kind
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {format_value(self.function())}"]
+
+
+def render(registry=REGISTRY):
+    """
+    Writes every metric in the Prometheus text format.
+
+    Parameters:
+        registry (list): The metrics to write.
+
+    Returns:
+        str: The text served on '/metrics'.
+    """
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Content type of the Prometheus text format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
@@ -0,0 +1,396 @@
+"""
+Pattern table evaluation for the Reversi AI (8x8 boards only).
+
+In the style of Logistello, the board is split into overlapping patterns:
+edges with both X-squares, the 3x3 square in each corner, the 2nd, 3rd and
+4th rows and columns, and every diagonal of length 4 to 8. Each pattern is
+read as a base-3 code (0 = empty, 1 = player to move, 2 = opponent) and
+looked up in a table of weights, one table per pattern family and game stage.
+The score of a position is the sum of the weights of every pattern, which
+approximates the final counter difference for the player to move.
+
+Weights are fitted offline by 'train_patterns' and stored in a binary file.
+The file is memory-mapped the first time the pattern evaluator is used, so
+importing this module stays cheap and processes serving the same file share
+one copy of the tables through the operating system's page cache.
+"""
+
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+import bitboard
+import evaluation
+
+# Number of squares in each pattern family, in the order the tables are stored
+FAMILIES = [
+    ("edge_2x", 10),
+    ("corner_3x3", 9),
+    ("row_2", 8),
+    ("row_3", 8),
+    ("row_4", 8),
+    ("diagonal_8", 8),
+    ("diagonal_7", 7),
+    ("diagonal_6", 6),
+    ("diagonal_5", 5),
+    ("diagonal_4", 4),
+]
+
+# Squares swapped by the reflection each family is symmetric under. Lines read the
+# same backwards, edges also swap their two X-squares and the corner squares are
+# symmetric along the diagonal through the corner. Trained tables give the same
+# weight to both readings so the evaluation does not depend on the direction
+# each instance happens to be read in
+SYMMETRIES = [
+    [7, 6, 5, 4, 3, 2, 1, 0, 9, 8],
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],
+    [7, 6, 5, 4, 3, 2, 1, 0],
+    [7, 6, 5, 4, 3, 2, 1, 0],
+    [7, 6, 5, 4, 3, 2, 1, 0],
+    [7, 6, 5, 4, 3, 2, 1, 0],
+    [6, 5, 4, 3, 2, 1, 0],
+    [5, 4, 3, 2, 1, 0],
+    [4, 3, 2, 1, 0],
+    [3, 2, 1, 0],
+]
+
+# Games are split into stages by the number of counters on the board
+# and each stage has its own set of tables
+STAGES = 4
+
+# Header of the weights file: magic bytes, format version, stages, families
+_HEADER = struct.Struct("<4sHHH")
+_MAGIC = b"RVPW"
+_VERSION = 1
+
+DEFAULT_WEIGHTS_PATH = os.environ.get(
+    "REVERSI_PATTERN_WEIGHTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pattern_weights.bin"))
+
+# Converts a binary number to the base-3 number with the same digits,
+# so a pattern code is BINARY_TO_TERNARY[player bits] + 2 * BINARY_TO_TERNARY[opponent bits]
+# Each extra digit doubles the table: the numbers without it, then the same
+# numbers plus 3 to the power of the digit
+BINARY_TO_TERNARY = [0]
+for _digit in range(10):
+    BINARY_TO_TERNARY += [_ternary + 3 ** _digit for _ternary in BINARY_TO_TERNARY]
+
+# Reverses the bits of a byte, which mirrors one row of the board left to right
+_REVERSE_BYTE = bytes(int(f"{value:08b}"[::-1], 2) for value in range(256))
+
+# Gathers the counters of one diagonal into the top byte when multiplied
+_GATHER = 0x0101010101010101
+_MASK_64 = (1 << 64) - 1
+
+def _diagonal_masks(length):
+    """
+    Gets the masks of the two diagonals of a length that run from the top-left
+    towards the bottom-right, one starting on the top edge and one on the left edge.
+    """
+    start = 8 - length
+    upper = 0
+    lower = 0
+    for i in range(length):
+        upper |= bitboard.bit(start + i, i, 8)
+        lower |= bitboard.bit(i, start + i, 8)
+    return start, upper, lower
+
+_DIAGONALS = [_diagonal_masks(length) for length in (7, 6, 5, 4)]
+_MAIN_DIAGONAL = 0x8040201008040201
+
+# Weight tables: _tables[stage][family] is an array (or a memory-mapped view) of
+# floats indexed by pattern code
+_tables = None
+_bias = None
+
+# Weights file still to be loaded the first time the tables are needed
+_pending_path = DEFAULT_WEIGHTS_PATH if os.path.exists(DEFAULT_WEIGHTS_PATH) else None
+_load_lock = threading.Lock()
+
+def empty_tables():
+    """
+    Creates a set of weight tables with every weight set to 0.
+
+    Returns:
+        tuple(list[list[array]], array): The tables for each stage and family, and the bias of each stage.
+    """
+    tables = []
+    for _ in range(STAGES):
+        tables.append([array("f", bytes(4 * 3 ** squares)) for _, squares in FAMILIES])
+    return tables, array("f", bytes(4 * STAGES))
+
+def save_weights(path, tables, bias):
+    """
+    Writes weight tables to a binary file.
+
+    Parameters:
+        path (str): The path of the file to write.
+        tables (list[list[array]]): The tables for each stage and family.
+        bias (array): The bias of each stage.
+    """
+    with open(path, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, _VERSION, STAGES, len(FAMILIES)))
+        file.write(struct.pack(f"<{len(FAMILIES)}H", *[squares for _, squares in FAMILIES]))
+        file.write(bias.tobytes())
+        for stage_tables in tables:
+            for table in stage_tables:
+                file.write(table.tobytes())
+
+def read_weights(path):
+    """
+    Reads weight tables from a binary file written by save_weights.
+
+    Parameters:
+        path (str): The path of the file to read.
+
+    Returns:
+        tuple(list[list[array]], array): The tables for each stage and family, and the bias of each stage.
+    """
+    with open(path, "rb") as file:
+        magic, version, stages, families = _HEADER.unpack(file.read(_HEADER.size))
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("Not a pattern weights file")
+        sizes = list(struct.unpack(f"<{families}H", file.read(2 * families)))
+        if stages != STAGES or sizes != [squares for _, squares in FAMILIES]:
+            raise ValueError("Pattern weights file does not match the pattern layout")
+
+        bias = array("f")
+        bias.frombytes(file.read(4 * STAGES))
+        tables = []
+        for _ in range(STAGES):
+            stage_tables = []
+            for _, squares in FAMILIES:
+                table = array("f")
+                table.frombytes(file.read(4 * 3 ** squares))
+                if len(table) != 3 ** squares:
+                    raise ValueError("Pattern weights file is truncated")
+                stage_tables.append(table)
+            tables.append(stage_tables)
+    return tables, bias
+
+def map_weights(path):
+    """
+    Memory-maps weight tables from a binary file written by save_weights instead of
+    copying them into memory. Pages of the file are only read when they are used.
+
+    Parameters:
+        path (str): The path of the file to map.
+
+    Returns:
+        tuple(list[list[memoryview]], memoryview): The tables for each stage and family,
+            and the bias of each stage, as read-only views of floats.
+    """
+    # The views use the machine's own float layout, which only matches the file on little-endian machines
+    if sys.byteorder != "little":
+        return read_weights(path)
+    with open(path, "rb") as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapping)
+    magic, version, stages, families = _HEADER.unpack_from(view)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError("Not a pattern weights file")
+    offset = _HEADER.size
+    sizes = list(struct.unpack_from(f"<{families}H", view, offset))
+    if stages != STAGES or sizes != [squares for _, squares in FAMILIES]:
+        raise ValueError("Pattern weights file does not match the pattern layout")
+    offset += 2 * families
+    if len(view) != offset + 4 * STAGES * (1 + sum(3 ** squares for squares in sizes)):
+        raise ValueError("Pattern weights file is the wrong length")
+
+    bias = view[offset:offset + 4 * STAGES].cast("f")
+    offset += 4 * STAGES
+    tables = []
+    for _ in range(STAGES):
+        stage_tables = []
+        for squares in sizes:
+            stage_tables.append(view[offset:offset + 4 * 3 ** squares].cast("f"))
+            offset += 4 * 3 ** squares
+        tables.append(stage_tables)
+    return tables, bias
+
+def load_weights(path=DEFAULT_WEIGHTS_PATH):
+    """
+    Loads weight tables from a binary file so they are used by evaluate.
+
+    Parameters:
+        path (str): The path of the file to map.
+    """
+    global _pending_path
+    with _load_lock:
+        _pending_path = None
+        _install(*map_weights(path))
+
+def _install(tables, bias):
+    """
+    Puts loaded tables in use. The bias is set first because evaluate only checks _tables.
+    """
+    global _tables, _bias
+    _bias = bias
+    _tables = tables
+
+def _load_pending():
+    """
+    Loads the default weights file the first time the tables are needed.
+    """
+    global _pending_path
+    with _load_lock:
+        path, _pending_path = _pending_path, None
+        if path is not None:
+            _install(*map_weights(path))
+
+def weights_loaded():
+    """
+    Checks if weight tables have been loaded, loading the default file if it has not been used yet.
+
+    Returns:
+        bool: True if evaluate is using pattern tables.
+    """
+    if _pending_path is not None:
+        _load_pending()
+    return _tables is not None
+
+def reflect_code(family, code):
+    """
+    Gets the code of a pattern instance read in the reflected order.
+
+    Parameters:
+        family (int): The index of the pattern family in FAMILIES.
+        code (int): The base-3 code of the instance.
+
+    Returns:
+        int: The base-3 code with the squares swapped by SYMMETRIES.
+    """
+    reflected = 0
+    for square, target in enumerate(SYMMETRIES[family]):
+        reflected += (code // 3 ** square % 3) * 3 ** target
+    return reflected
+
+def stage_of(player, opponent):
+    """
+    Gets the stage of the game used to choose the weight tables.
+
+    Parameters:
+        player (int): Mask of the player's counters.
+        opponent (int): Mask of the other player's counters.
+
+    Returns:
+        int: The stage from 0 to STAGES - 1.
+    """
+    return min(STAGES - 1, ((player | opponent).bit_count() - 4) * STAGES // 60)
+
+def _transpose(bits):
+    """
+    Swaps the rows and columns of an 8x8 mask.
+    """
+    t = 0x0F0F0F0F00000000 & (bits ^ (bits << 28))
+    bits ^= t ^ (t >> 28)
+    t = 0x3333000033330000 & (bits ^ (bits << 14))
+    bits ^= t ^ (t >> 14)
+    t = 0x5500550055005500 & (bits ^ (bits << 7))
+    bits ^= t ^ (t >> 7)
+    return bits
+
+def _row_views(bits):
+    """
+    Gets the rows of a mask as bytes, the rows mirrored left to right, the columns
+    and the columns mirrored, so every symmetric copy of a pattern can be read the same way.
+    """
+    rows = bits.to_bytes(8, "little")
+    columns = _transpose(bits).to_bytes(8, "little")
+    return rows, rows.translate(_REVERSE_BYTE), columns, columns.translate(_REVERSE_BYTE)
+
+def pattern_bits(bits):
+    """
+    Reads every pattern instance out of one mask.
+
+    Parameters:
+        bits (int): Mask of one player's counters on an 8x8 board.
+
+    Returns:
+        list[list[int]]: For each family, the binary number of every instance
+            (bit i set if the player owns square i of that instance).
+    """
+    rows, mirrored, columns, mirrored_columns = _row_views(bits)
+    mirrored_bits = int.from_bytes(mirrored, "little")
+
+    # Each edge with the two X-squares next to it
+    edges = [
+        rows[0] | (rows[1] >> 1 & 1) << 8 | (rows[1] >> 6 & 1) << 9,
+        rows[7] | (rows[6] >> 1 & 1) << 8 | (rows[6] >> 6 & 1) << 9,
+        columns[0] | (columns[1] >> 1 & 1) << 8 | (columns[1] >> 6 & 1) << 9,
+        columns[7] | (columns[6] >> 1 & 1) << 8 | (columns[6] >> 6 & 1) << 9,
+    ]
+
+    # The 3x3 square in each corner, the mirrored rows put the right hand corners in bits 0 to 2
+    corners = [
+        (rows[0] & 7) | (rows[1] & 7) << 3 | (rows[2] & 7) << 6,
+        (mirrored[0] & 7) | (mirrored[1] & 7) << 3 | (mirrored[2] & 7) << 6,
+        (rows[7] & 7) | (rows[6] & 7) << 3 | (rows[5] & 7) << 6,
+        (mirrored[7] & 7) | (mirrored[6] & 7) << 3 | (mirrored[5] & 7) << 6,
+    ]
+
+    result = [
+        edges,
+        corners,
+        [rows[1], rows[6], columns[1], columns[6]],
+        [rows[2], rows[5], columns[2], columns[5]],
+        [rows[3], rows[4], columns[3], columns[4]],
+        [((bits & _MAIN_DIAGONAL) * _GATHER & _MASK_64) >> 56,
+         ((mirrored_bits & _MAIN_DIAGONAL) * _GATHER & _MASK_64) >> 56],
+    ]
+
+    # Diagonals running down-right on the board and on the mirrored board
+    # (which are the diagonals running down-left on the real board)
+    for start, upper, lower in _DIAGONALS:
+        result.append([
+            ((bits & upper) * _GATHER & _MASK_64) >> (56 + start),
+            ((bits & lower) * _GATHER & _MASK_64) >> 56,
+            ((mirrored_bits & upper) * _GATHER & _MASK_64) >> (56 + start),
+            ((mirrored_bits & lower) * _GATHER & _MASK_64) >> 56,
+        ])
+    return result
+
+def pattern_codes(player, opponent):
+    """
+    Gets the base-3 code of every pattern instance.
+
+    Parameters:
+        player (int): Mask of the counters of the player to move on an 8x8 board.
+        opponent (int): Mask of the other player's counters.
+
+    Returns:
+        list[list[int]]: For each family, the code of every instance.
+    """
+    codes = []
+    for mine, theirs in zip(pattern_bits(player), pattern_bits(opponent)):
+        codes.append([BINARY_TO_TERNARY[a] + 2 * BINARY_TO_TERNARY[b] for a, b in zip(mine, theirs)])
+    return codes
+
+def evaluate(player, opponent, size):
+    """
+    Scores a position for the player to move with the pattern tables. Falls back to
+    the heuristic evaluation when no weights are loaded or the board is not 8x8.
+
+    Parameters:
+        player (int): Mask of the counters of the player the score is for.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        float: The predicted final counter difference for the player.
+    """
+    if _pending_path is not None:
+        _load_pending()
+    if _tables is None or size != 8:
+        return evaluation.evaluate(player, opponent, size)
+    stage = stage_of(player, opponent)
+    tables = _tables[stage]
+    score = _bias[stage]
+    for table, mine, theirs in zip(tables, pattern_bits(player), pattern_bits(opponent)):
+        for a, b in zip(mine, theirs):
+            score += table[BINARY_TO_TERNARY[a] + 2 * BINARY_TO_TERNARY[b]]
+    return score
+
+evaluation.register_evaluator("pattern", evaluate)
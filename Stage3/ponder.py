@@ -0,0 +1,240 @@
+"""
+Pondering: searching on the human player's time.
+
+After the AI chooses its move the server would sit idle until the human
+replies. With pondering on (REVERSI_PONDER=1) the AI's reply is worked out in
+the background instead, in two steps run in the AI worker processes:
+1. Predict the human's reply by searching their position with the same engine.
+2. Search the AI's answer to the predicted position.
+
+When the next '/ai_move' request is for the predicted position the finished
+(or still running) search is used instead of starting again. Any other
+position discards it. Each session has at most one ponder at a time and the
+whole server runs at most MAX_PONDERS at once, so pondering never takes more
+than its share of a busy machine.
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+import ai_cache
+import analysis
+import bitboard
+import metrics
+import search
+
+# Whether the AI ponders at all
+ENABLED = os.environ.get("REVERSI_PONDER") == "1"
+
+# Most ponders running at once across every session (defaults to half the AI workers)
+MAX_PONDERS = int(os.environ.get("REVERSI_PONDER_LIMIT", "0")) or max(1, analysis.AI_WORKERS // 2)
+
+# Ways a claimed ponder can fail to finish, in which case the move is searched as normal
+FAILURES = (concurrent.futures.CancelledError, concurrent.futures.BrokenExecutor)
+
+# Most finished ponders kept waiting for their session's next '/ai_move'
+MAX_KEPT = 1000
+
+PONDERS = metrics.Counter("reversi_ponders_total", "Background searches on the human player's time", ["result"])
+STARTED = PONDERS.labels("started")
+SKIPPED = PONDERS.labels("skipped")
+HITS = PONDERS.labels("hit")
+MISSES = PONDERS.labels("miss")
+
+
+class Ponder:
+    """
+    One session's background search.
+
+    Attributes:
+        settings (dict): The engine settings of the AI move it follows.
+        colour (str): The colour the AI is playing.
+        size (int): How many squares wide and tall the board is.
+        reply (int | None): The square of the predicted reply, once it is known.
+        key (tuple | None): The AI cache key of the predicted position, once it is known.
+        future (concurrent.futures.Future): The step that is running, then the finished search.
+        discarded (bool): Whether the ponder was thrown away.
+    """
+
+    __slots__ = ("settings", "colour", "size", "reply", "key", "future", "discarded")
+
+    def __init__(self, settings, colour, size):
+        self.settings = settings
+        self.colour = colour
+        self.size = size
+        self.reply = None
+        self.key = None
+        self.future = None
+        self.discarded = False
+
+    def running(self):
+        """
+        Whether the ponder is still using a worker.
+        """
+        return not self.discarded and self.future is not None and not self.future.done()
+
+
+# The ponder of each session (None when sessions are disabled), oldest first
+_ponders = collections.OrderedDict()
+_lock = threading.Lock()
+
+def _discard(ponder):
+    """
+    Throws a ponder away, stopping it if it has not started running yet.
+    """
+    ponder.discarded = True
+    if ponder.future is not None:
+        ponder.future.cancel()
+
+def discard(session):
+    """
+    Throws away the session's ponder, if it has one.
+    """
+    with _lock:
+        ponder = _ponders.pop(session, None)
+        if ponder is not None:
+            _discard(ponder)
+
+def start(session, dark, light, size, settings, square, colour="Light", pool=None):
+    """
+    Starts pondering after the AI chose a move, replacing the session's last ponder.
+
+    Parameters:
+        session (str | None): The session id, None when sessions are disabled.
+        dark (int): Mask of the dark counters before the AI's move.
+        light (int): Mask of the light counters before the AI's move.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings of the AI move.
+        square (int | None): The square of the AI's move, None if it had no legal move.
+        colour (str): The colour the AI is playing.
+        pool (concurrent.futures.Executor | None): Where the searches run, the shared
+            AI worker pool if None.
+
+    Returns:
+        bool: True if a ponder was started.
+    """
+    if not ENABLED:
+        return False
+    # The last ponder is out of date even when no new one is started
+    discard(session)
+    # The greedy engine answers straight away so there is nothing to gain
+    if settings["engine"] == "greedy" or square is None:
+        return False
+
+    geo = bitboard.geometry(size)
+    ai, human = bitboard.split_colours(dark, light, colour)
+    ai, human = bitboard.play(ai, human, 1 << square, geo)
+    if not bitboard.legal_moves(human, ai, geo):
+        return False
+
+    ponder = Ponder(settings, colour, size)
+    with _lock:
+        old = _ponders.pop(session, None)
+        if old is not None:
+            _discard(old)
+        if sum(1 for other in _ponders.values() if other.running()) >= MAX_PONDERS:
+            SKIPPED.inc()
+            return False
+        _ponders[session] = ponder
+        while len(_ponders) > MAX_KEPT:
+            _discard(_ponders.popitem(last=False)[1])
+        pool = pool or analysis.get_pool()
+        ponder.future = pool.submit(search.best_move, human, ai, size, settings)
+    STARTED.inc()
+    ponder.future.add_done_callback(lambda future: _predicted(ponder, future, ai, human, pool))
+    return True
+
+def _predicted(ponder, future, ai, human, pool):
+    """
+    Starts searching the predicted position once the human's reply has been predicted.
+    """
+    if ponder.discarded or future.cancelled() or future.exception() is not None:
+        return
+    reply = future.result()["square"]
+    geo = bitboard.geometry(ponder.size)
+    human, ai = bitboard.play(human, ai, 1 << reply, geo)
+    # The AI has to pass after the predicted reply so it has nothing to search
+    if not bitboard.legal_moves(ai, human, geo):
+        return
+    dark, light = (ai, human) if ponder.colour == "Dark " else (human, ai)
+    _, key, player, opponent = ai_cache.canonical_position(dark, light, ponder.colour, ponder.size, ponder.settings)
+    with _lock:
+        if ponder.discarded:
+            return
+        ponder.reply = reply
+        ponder.key = key
+        try:
+            ponder.future = pool.submit(search.best_move, player, opponent, ponder.size, ponder.settings)
+        except RuntimeError:
+            # The pool was shut down while the prediction was running
+            ponder.discarded = True
+
+def claim(session, key):
+    """
+    Takes the session's ponder if it searched the position the AI now has to move in.
+    A ponder for any other position is discarded.
+
+    Parameters:
+        session (str | None): The session id.
+        key (tuple): The AI cache key of the position (see ai_cache.canonical_lookup).
+
+    Returns:
+        concurrent.futures.Future | None: The search of the position, which may still
+            be running, or None if there is nothing to reuse.
+    """
+    with _lock:
+        ponder = _ponders.pop(session, None)
+        if ponder is None:
+            return None
+        if ponder.discarded or ponder.key is None or ponder.key != key:
+            _discard(ponder)
+            MISSES.inc()
+            return None
+    HITS.inc()
+    return ponder.future
+
+def store(key, result, settings):
+    """
+    Puts the result of a claimed ponder in the AI cache.
+
+    Returns:
+        tuple(int|None, float|None): The cache entry for the position.
+    """
+    ai_cache.record_search(result, settings)
+    entry = (result["square"], result["score"])
+    ai_cache.remember(key, entry, settings)
+    return entry
+
+def collect(session, key, settings):
+    """
+    Waits for the session's ponder if it searched this position and puts its move in
+    the AI cache. Only called when the position is not in the AI cache already.
+
+    Parameters:
+        session (str | None): The session id.
+        key (tuple): The AI cache key of the position (see ai_cache.canonical_lookup).
+        settings (dict): Complete engine settings.
+
+    Returns:
+        tuple(int|None, float|None) | None: The cache entry for the position, or None
+            if the AI has to search the position itself.
+    """
+    if not ENABLED:
+        return None
+    future = claim(session, key)
+    if future is None:
+        return None
+    try:
+        return store(key, future.result(), settings)
+    except FAILURES:
+        return None
+
+def clear():
+    """
+    Discards every ponder.
+    """
+    with _lock:
+        for ponder in _ponders.values():
+            _discard(ponder)
+        _ponders.clear()
@@ -0,0 +1,263 @@
+"""
+Immutable Reversi positions.
+
+A Position holds the board as two integer masks (see 'bitboard') and the
+colour to move. It can never be changed: playing a move makes a new Position,
+which only costs a few integer operations instead of copying a list of lists.
+Because a Position cannot change under a reader, the web app publishes one
+for the current game after every move and anything that only reads the game
+(saving, spectators, the AI) can use it without locks or copies while the
+next move is being applied.
+
+Coordinates are the same 1-based x and y used by the rest of the game.
+"""
+
+import bitboard
+
+
+class Position:
+    """
+    A board and the colour to move that cannot be changed once made.
+
+    Attributes:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        player (str): The colour to move, "Dark " or "Light".
+        geo (Geometry): The masks for the board size.
+    """
+
+    __slots__ = ("dark", "light", "player", "geo", "_hash", "_mobility")
+
+    def __init__(self, dark, light, player="Dark ", size=8):
+        if player not in ("Dark ", "Light"):
+            raise ValueError("Player must be 'Dark ' or 'Light'")
+        geo = bitboard.geometry(size)
+        if dark & light or (dark | light) & ~geo.full:
+            raise ValueError("Masks overlap or do not fit on the board")
+        _set(self, dark, light, player, geo)
+
+    @classmethod
+    def _make(cls, dark, light, player, geo):
+        """
+        Makes a position from values that are already known to be valid, skipping the checks.
+        """
+        position = object.__new__(cls)
+        _set(position, dark, light, player, geo)
+        return position
+
+    @classmethod
+    def from_board(cls, board, player="Dark "):
+        """
+        Makes a position from a list of lists board.
+
+        Parameters:
+            board (list[list[str]]): The board containing the current status of each cell in the game.
+            player (str): The colour to move.
+
+        Returns:
+            Position: The position.
+        """
+        dark, light = bitboard.from_board(board)
+        return cls(dark, light, player, len(board))
+
+    @classmethod
+    def from_game(cls, game):
+        """
+        Makes a position from a game state dictionary with a "board" and "current_player".
+        """
+        return cls.from_board(game["board"], game["current_player"])
+
+    @classmethod
+    def start(cls, size=8):
+        """
+        Makes the starting position with the 4 middle counters and Dark to move.
+        """
+        mid = size // 2
+        dark = bitboard.bit(mid - 1, mid - 1, size) | bitboard.bit(mid, mid, size)
+        light = bitboard.bit(mid, mid - 1, size) | bitboard.bit(mid - 1, mid, size)
+        return cls(dark, light, "Dark ", size)
+
+    @property
+    def size(self):
+        """
+        How many squares wide and tall the board is.
+        """
+        return self.geo.size
+
+    @property
+    def opponent(self):
+        """
+        The colour that is not to move.
+        """
+        return "Light" if self.player == "Dark " else "Dark "
+
+    def masks(self):
+        """
+        Gets the masks of the player to move and of the opponent.
+
+        Returns:
+            tuple(int,int): The player's and the opponent's counters.
+        """
+        if self.player == "Dark ":
+            return self.dark, self.light
+        return self.light, self.dark
+
+    def legal_moves(self):
+        """
+        Gets the mask of the squares the player to move can play.
+        """
+        if self._mobility is not None:
+            return self._mobility[0]
+        player, opponent = self.masks()
+        return bitboard.legal_moves(player, opponent, self.geo)
+
+    def mobility(self):
+        """
+        Gets the legal moves of both colours. They are worked out the first time this is
+        called and kept on the position, so anything else that reads the same position
+        (the next move, the AI or a pass check) does not scan the board again.
+
+        Returns:
+            tuple(int,int): The masks of the squares the player to move and the opponent can play.
+        """
+        if self._mobility is None:
+            player, opponent = self.masks()
+            # Not a change a reader could see, so it goes around __setattr__
+            object.__setattr__(self, "_mobility", (bitboard.legal_moves(player, opponent, self.geo),
+                                                   bitboard.legal_moves(opponent, player, self.geo)))
+        return self._mobility
+
+    def status(self):
+        """
+        Works out what happens next from the legal moves of both colours in one call:
+        whether the player to move has to pass, or whether the game is over and the final result.
+
+        Returns:
+            dict: "mobility" with the number of legal moves of "dark" and "light", "pass" (True if
+                the player to move has no legal move but the opponent has) and "game_over". When
+                the game is over the final "counts" and the "winner" ("dark", "light" or "draw")
+                are included too.
+        """
+        player_moves, opponent_moves = self.mobility()
+        if self.player == "Dark ":
+            dark_moves, light_moves = player_moves, opponent_moves
+        else:
+            dark_moves, light_moves = opponent_moves, player_moves
+        status = {"mobility": {"dark": dark_moves.bit_count(), "light": light_moves.bit_count()},
+                  "pass": not player_moves and bool(opponent_moves),
+                  "game_over": not player_moves and not opponent_moves}
+        if status["game_over"]:
+            counts = self.counts()
+            status["counts"] = counts
+            if counts["dark"] == counts["light"]:
+                status["winner"] = "draw"
+            else:
+                status["winner"] = "dark" if counts["dark"] > counts["light"] else "light"
+        return status
+
+    def is_legal(self, x, y):
+        """
+        Checks if the player to move can play at a square.
+
+        Parameters:
+            x (int): The column, starting from 1.
+            y (int): The row, starting from 1.
+
+        Returns:
+            bool: True if the move is legal.
+        """
+        size = self.geo.size
+        if not (1 <= x <= size and 1 <= y <= size):
+            return False
+        return bool(self.legal_moves() >> ((y - 1) * size + x - 1) & 1)
+
+    def play(self, x, y):
+        """
+        Plays a move for the player to move.
+
+        Parameters:
+            x (int): The column, starting from 1.
+            y (int): The row, starting from 1.
+
+        Returns:
+            Position: The new position, with the other colour to move. This position is unchanged.
+        """
+        if not self.is_legal(x, y):
+            raise ValueError(f"Move ({x}, {y}) is not legal")
+        player, opponent = self.masks()
+        player, opponent = bitboard.play(player, opponent, bitboard.bit(x - 1, y - 1, self.geo.size), self.geo)
+        if self.player == "Dark ":
+            return Position._make(player, opponent, "Light", self.geo)
+        return Position._make(opponent, player, "Dark ", self.geo)
+
+    def passed(self):
+        """
+        Gets the same board with the other colour to move.
+        """
+        passed = Position._make(self.dark, self.light, self.opponent, self.geo)
+        # The same moves are legal with the colours swapped
+        if self._mobility is not None:
+            object.__setattr__(passed, "_mobility", self._mobility[::-1])
+        return passed
+
+    def game_over(self):
+        """
+        Checks if neither colour can move.
+        """
+        return self.mobility() == (0, 0)
+
+    def counts(self):
+        """
+        Counts the counters of each colour.
+
+        Returns:
+            dict: The number of "dark" and "light" counters.
+        """
+        return {"dark": self.dark.bit_count(), "light": self.light.bit_count()}
+
+    def frontier(self):
+        """
+        Gets the mask of counters next to at least one empty square.
+        """
+        occupied = self.dark | self.light
+        return occupied & bitboard.neighbours(self.geo.full & ~occupied, self.geo)
+
+    def to_board(self):
+        """
+        Writes the position as a new list of lists board.
+        """
+        return bitboard.to_board(self.dark, self.light, self.geo.size)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Position cannot be changed, play a move to make a new one")
+
+    def __delattr__(self, name):
+        raise AttributeError("Position cannot be changed")
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return (self.dark == other.dark and self.light == other.light and self.player == other.player
+                and self.geo.size == other.geo.size)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"Position(dark={self.dark:#x}, light={self.light:#x}, player={self.player!r}, size={self.geo.size})"
+
+    def __reduce__(self):
+        # Pickled by value so positions can be sent to worker processes
+        return (Position, (self.dark, self.light, self.player, self.geo.size))
+
+
+def _set(position, dark, light, player, geo):
+    """
+    Fills in the slots of a new position, going around the __setattr__ that stops changes.
+    """
+    object.__setattr__(position, "dark", dark)
+    object.__setattr__(position, "light", light)
+    object.__setattr__(position, "player", player)
+    object.__setattr__(position, "geo", geo)
+    object.__setattr__(position, "_hash", hash((dark, light, player)))
+    object.__setattr__(position, "_mobility", None)
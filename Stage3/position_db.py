@@ -0,0 +1,332 @@
+"""
+Position database built from game records.
+
+Every position reached in the games of one or more record files (see
+'records') is stored in an SQLite database under the hash of its canonical
+form (see bitboard.canonical), so positions that are the same apart from a
+rotation or reflection are found together. Each position row holds how many
+games reached it and how those games ended, which makes a lookup one read of
+the primary key. The games that reached a position can be listed, and positions
+can also be queried by who owns the four corners.
+
+Usage:
+    python position_db.py build games.txt --db positions.sqlite
+    python position_db.py lookup "d6 c4" --db positions.sqlite
+    python position_db.py corners a1=dark h8=empty --db positions.sqlite
+
+Games are stored under their source (the record file and line), so an archive
+can be added again after new games are appended to it without counting its
+old games twice. Identical games from different lines are separate games.
+"""
+
+import argparse
+import hashlib
+import sys
+import bitboard
+import game_report
+import records
+from position import Position
+
+# The corners in the order used by corner codes
+CORNERS = ("a1", "h1", "a8", "h8")
+
+# Owner of a corner in a corner pattern and its digit in the corner code
+OWNERS = {"empty": 0, "dark": 1, "light": 2}
+
+# Results of a game, and the statistics kept for each position and corner code
+RESULTS = ("dark", "light", "draw", "unfinished")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    game_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    moves TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    hash INTEGER PRIMARY KEY,
+    dark INTEGER NOT NULL,
+    light INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    dark_wins INTEGER NOT NULL,
+    light_wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    unfinished INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS occurrences (
+    hash INTEGER NOT NULL,
+    game_id INTEGER NOT NULL,
+    ply INTEGER NOT NULL,
+    PRIMARY KEY (hash, game_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS corners (
+    code INTEGER PRIMARY KEY,
+    positions INTEGER NOT NULL,
+    games INTEGER NOT NULL,
+    dark_wins INTEGER NOT NULL,
+    light_wins INTEGER NOT NULL,
+    draws INTEGER NOT NULL,
+    unfinished INTEGER NOT NULL
+);
+"""
+
+# Squares of the corners on an 8x8 board
+_CORNER_SQUARES = tuple((y - 1) * 8 + x - 1 for x, y in map(records.parse_move, CORNERS))
+
+def to_signed(value):
+    """
+    Stores a 64 bit mask in a signed SQLite integer.
+    """
+    return value - (1 << 64) if value >> 63 else value
+
+def position_key(dark, light, colour):
+    """
+    Works out the key of a position, shared by all of its rotations and reflections.
+
+    Parameters:
+        dark (int): Mask of the dark counters.
+        light (int): Mask of the light counters.
+        colour (str): The colour to move.
+
+    Returns:
+        tuple(int,int,int): The signed 64 bit hash and the canonical dark and light masks (signed too).
+    """
+    _, dark, light = bitboard.canonical(dark, light, 8)
+    digest = hashlib.blake2b(dark.to_bytes(8, "little") + light.to_bytes(8, "little") + colour[0].encode(),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True), to_signed(dark), to_signed(light)
+
+def corner_code(dark, light):
+    """
+    Works out the corner code of a position, a base 3 number with one digit per corner
+    in CORNERS (0 if the corner is empty, 1 if it is dark and 2 if it is light).
+    """
+    code = 0
+    for square in reversed(_CORNER_SQUARES):
+        code = code * 3 + (1 if dark >> square & 1 else 2 if light >> square & 1 else 0)
+    return code
+
+def corner_codes(pattern):
+    """
+    Lists every corner code that matches a corner pattern.
+
+    Parameters:
+        pattern (dict): The owner ("dark", "light" or "empty") of some of the corners
+            in CORNERS, for example {"a1": "dark"}. Corners that are left out can have any owner.
+
+    Returns:
+        list[int]: The matching corner codes.
+    """
+    for corner, owner in pattern.items():
+        if corner not in CORNERS:
+            raise ValueError(f"Unknown corner: {corner!r}, must be one of {', '.join(CORNERS)}")
+        if owner not in OWNERS:
+            raise ValueError(f"Unknown owner: {owner!r}, must be one of {', '.join(OWNERS)}")
+    codes = [0]
+    for place, corner in enumerate(CORNERS):
+        digits = [OWNERS[pattern[corner]]] if corner in pattern else list(OWNERS.values())
+        codes = [code + digit * 3 ** place for code in codes for digit in digits]
+    return codes
+
+def game_positions(moves):
+    """
+    Replays a game and gets every position reached in it and how it ended.
+
+    Parameters:
+        moves (list[tuple(int,int)]): The x and y position of every move.
+
+    Returns:
+        tuple(list, str): The dark mask, light mask and colour to move of every position
+            from the start to the end, and the result, one of RESULTS.
+    """
+    positions = records.replay(moves)
+    status = Position(*positions[-1]).status()
+    return positions, status["winner"] if status["game_over"] else "unfinished"
+
+
+class PositionDatabase:
+    """
+    Stores every position of a game archive in SQLite, keyed by canonical hash.
+
+    Attributes:
+        path (str): The path of the database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # Imported here so the game never loads sqlite3 unless the database is used
+        import sqlite3
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript(_SCHEMA)
+
+    def add_games(self, games):
+        """
+        Adds games to the database in one transaction. Games from a source already in it are skipped.
+
+        Parameters:
+            games (iterable[tuple(str,str)]): The source (such as "file:line"), which tells
+                games apart, and the moves in record notation of every game.
+
+        Returns:
+            dict: The number of games "added", "skipped" because their source was already
+                stored and "invalid" because the record could not be replayed.
+        """
+        summary = {"added": 0, "skipped": 0, "invalid": 0}
+        # Statistics are added up in memory and written once per position and corner code
+        positions = {}
+        corners = {}
+        occurrences = []
+        with self._connection:
+            for source, text in games:
+                try:
+                    moves = records.parse_moves(text)
+                    replayed, result = game_positions(moves)
+                except ValueError:
+                    summary["invalid"] += 1
+                    continue
+                cursor = self._connection.execute(
+                    "INSERT OR IGNORE INTO games (source, moves, result) VALUES (?, ?, ?)",
+                    (source, records.format_moves(moves), result))
+                if not cursor.rowcount:
+                    summary["skipped"] += 1
+                    continue
+                summary["added"] += 1
+                column = RESULTS.index(result)
+
+                reached = set()
+                for ply, (dark, light, colour) in enumerate(replayed):
+                    key, canonical_dark, canonical_light = position_key(dark, light, colour)
+                    stats = positions.setdefault(key, [canonical_dark, canonical_light, 0, 0, 0, 0, 0])
+                    stats[2] += 1
+                    stats[3 + column] += 1
+                    occurrences.append((key, cursor.lastrowid, ply))
+
+                    code = corner_code(dark, light)
+                    stats = corners.setdefault(code, [0, 0, 0, 0, 0, 0])
+                    stats[0] += 1
+                    if code not in reached:
+                        # A game only counts once for each corner code it reached
+                        reached.add(code)
+                        stats[1] += 1
+                        stats[2 + column] += 1
+
+            self._connection.executemany(
+                "INSERT INTO positions VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (hash) DO UPDATE SET "
+                "games = games + excluded.games, dark_wins = dark_wins + excluded.dark_wins, "
+                "light_wins = light_wins + excluded.light_wins, draws = draws + excluded.draws, "
+                "unfinished = unfinished + excluded.unfinished",
+                [(key, *stats) for key, stats in positions.items()])
+            self._connection.executemany("INSERT OR IGNORE INTO occurrences VALUES (?, ?, ?)", occurrences)
+            self._connection.executemany(
+                "INSERT INTO corners VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (code) DO UPDATE SET "
+                "positions = positions + excluded.positions, games = games + excluded.games, "
+                "dark_wins = dark_wins + excluded.dark_wins, light_wins = light_wins + excluded.light_wins, "
+                "draws = draws + excluded.draws, unfinished = unfinished + excluded.unfinished",
+                [(code, *stats) for code, stats in corners.items()])
+        return summary
+
+    def lookup(self, dark, light, colour):
+        """
+        Gets how many games reached a position (or a rotation or reflection of it) and how they ended.
+
+        Parameters:
+            dark (int): Mask of the dark counters.
+            light (int): Mask of the light counters.
+            colour (str): The colour to move.
+
+        Returns:
+            dict: The number of "games" and of games won by "dark", won by "light",
+                drawn ("draw") and "unfinished".
+        """
+        key, canonical_dark, canonical_light = position_key(dark, light, colour)
+        row = self._connection.execute(
+            "SELECT dark, light, games, dark_wins, light_wins, draws, unfinished FROM positions WHERE hash = ?",
+            (key,)).fetchone()
+        # A different position with the same hash counts as not found
+        if row is None or row[:2] != (canonical_dark, canonical_light):
+            row = (0,) * 7
+        return {"games": row[2], **dict(zip(RESULTS, row[3:]))}
+
+    def games_reaching(self, dark, light, colour, limit=100):
+        """
+        Lists the games that reached a position (or a rotation or reflection of it).
+
+        Parameters:
+            dark (int): Mask of the dark counters.
+            light (int): Mask of the light counters.
+            colour (str): The colour to move.
+            limit (int): The most games to list.
+
+        Returns:
+            list[dict]: The "source", "moves" and "result" of each game and the "ply"
+                (number of moves played) when it reached the position, in the order they were added.
+        """
+        key, _, _ = position_key(dark, light, colour)
+        rows = self._connection.execute(
+            "SELECT games.source, games.moves, games.result, occurrences.ply FROM occurrences "
+            "JOIN games USING (game_id) WHERE occurrences.hash = ? ORDER BY game_id LIMIT ?",
+            (key, limit)).fetchall()
+        return [{"source": source, "moves": moves, "result": result, "ply": ply} for source, moves, result, ply in rows]
+
+    def corners(self, pattern):
+        """
+        Gets how many positions had a corner pattern, how many games reached it and how they ended.
+
+        Parameters:
+            pattern (dict): The owner of some of the corners (see corner_codes).
+
+        Returns:
+            dict: The number of "positions" and "games", and of those games won by
+                "dark", won by "light", drawn ("draw") and "unfinished". A game that reached
+                several positions matching the pattern counts once for each of their corner codes.
+        """
+        codes = corner_codes(pattern)
+        totals = self._connection.execute(
+            "SELECT TOTAL(positions), TOTAL(games), TOTAL(dark_wins), TOTAL(light_wins), TOTAL(draws), "
+            f"TOTAL(unfinished) FROM corners WHERE code IN ({', '.join('?' * len(codes))})", codes).fetchone()
+        totals = [int(value) for value in totals]
+        return {"positions": totals[0], "games": totals[1], **dict(zip(RESULTS, totals[2:]))}
+
+    def close(self):
+        """
+        Closes the database.
+        """
+        self._connection.close()
+
+
+def main():
+    """
+    Reads the command line options and builds or queries the database.
+    """
+    parser = argparse.ArgumentParser(description="Build and query a database of the positions in game records")
+    parser.add_argument("--db", required=True, help="the SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="add the games of record files")
+    build.add_argument("archive", nargs="+", help="game record files, one game per line")
+    lookup = commands.add_parser("lookup", help="statistics and games of the position after some moves")
+    lookup.add_argument("moves", help="the moves from the start in record notation")
+    lookup.add_argument("--limit", type=int, default=10, help="most games to list")
+    corners = commands.add_parser("corners", help="statistics of the positions with a corner pattern")
+    corners.add_argument("pattern", nargs="*", help="corner=owner pairs such as a1=dark h8=empty")
+    args = parser.parse_args()
+
+    database = PositionDatabase(args.db)
+    try:
+        if args.command == "build":
+            summary = database.add_games(game_report.read_archive(args.archive))
+            print(f"{summary['added']} games added, {summary['skipped']} already stored, {summary['invalid']} invalid")
+        elif args.command == "lookup":
+            dark, light, colour = records.replay(records.parse_moves(args.moves))[-1]
+            print(database.lookup(dark, light, colour))
+            for game in database.games_reaching(dark, light, colour, args.limit):
+                print(f"{game['source']} (after {game['ply']} moves, {game['result']}): {game['moves']}")
+        else:
+            print(database.corners(dict(pair.split("=", 1) for pair in args.pattern)))
+    except (OSError, ValueError) as e:
+        sys.exit(f"error: {e}")
+    finally:
+        database.close()
+
+if __name__ == "__main__":
+    main()
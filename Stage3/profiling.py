@@ -0,0 +1,243 @@
+"""
+Opt-in profiling of the move and AI pipeline.
+
+While profiling is on, the hot functions listed in TARGETS are replaced by
+wrappers that count their calls and add up the time spent inside them. When
+it is off the original functions are put back, so normal requests run the
+exact same code as without this module.
+
+Profiling can be switched on in two ways:
+- For one block of code (such as one request) with 'profiled()'. Only calls
+  made in that thread or task are recorded, so other requests running at the
+  same time do not show up. A cProfile/pstats dump can be made as well.
+- For the whole process with 'enable_process_profile()', which records every
+  call that is not part of a per-request profile.
+"""
+
+import contextlib
+import contextvars
+import sys
+import threading
+import time
+
+# Functions wrapped while profiling is on, as (module name, attribute). The
+# attribute may name a method ("Search.negamax") or a dictionary of functions
+# ("TERMS"), in which case every function in the dictionary is wrapped. Modules
+# that have not been imported are skipped.
+TARGETS = [
+    ("components", "legal_move"),
+    ("flask_game_engine", "execute_move"),
+    ("flask_game_engine", "legal_move_available"),
+    ("flask_game_engine", "calculate_winner"),
+    ("position", "Position.status"),
+    ("bitboard", "legal_moves"),
+    ("bitboard", "flips"),
+    ("bitboard", "play"),
+    ("evaluation", "TERMS"),
+    ("evaluation", "EVALUATORS"),
+    ("patterns", "pattern_codes"),
+    ("search", "Search.negamax"),
+    ("search", "Search.root"),
+    ("search", "greedy_move"),
+    ("search", "best_move"),
+]
+
+
+class Profile:
+    """
+    Call counts and cumulative time of each wrapped function.
+
+    Attributes:
+        calls (dict): Number of calls of each function by name.
+        cumulative (dict): Seconds spent inside each function by name, including the
+            functions it calls. Recursive calls are only timed once, at the outermost call.
+        cprofile (cProfile.Profile | None): Full profile of the block if it was asked for.
+    """
+
+    __slots__ = ("calls", "cumulative", "active", "cprofile", "lock")
+
+    def __init__(self, cprofile=False):
+        self.calls = {}
+        self.cumulative = {}
+        # How many calls of each function are in progress in each thread, for recursive functions
+        self.active = {}
+        self.cprofile = None
+        if cprofile:
+            # Only loaded when a full profile is asked for
+            import cProfile
+            self.cprofile = cProfile.Profile()
+        self.lock = threading.Lock()
+
+    def record(self, name, outermost, seconds):
+        """
+        Records one finished call of a function.
+        """
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if outermost:
+                self.cumulative[name] = self.cumulative.get(name, 0.0) + seconds
+
+    def report(self):
+        """
+        Gets the results with the most expensive functions first.
+
+        Returns:
+            list[dict]: The "function", its "calls" and its "cumulative" seconds.
+        """
+        with self.lock:
+            rows = [{"function": name, "calls": calls, "cumulative": self.cumulative.get(name, 0.0)}
+                    for name, calls in self.calls.items()]
+        rows.sort(key=lambda row: row["cumulative"], reverse=True)
+        return rows
+
+    def server_timing(self):
+        """
+        Writes the results as a Server-Timing header, shown by browser developer tools.
+
+        Returns:
+            str: One entry per function with its time in milliseconds and its call count.
+        """
+        return ", ".join(f'{row["function"].replace(".", "_")};dur={row["cumulative"] * 1000:.3f};desc="{row["calls"]} calls"'
+                         for row in self.report())
+
+    def dump(self, path):
+        """
+        Writes the cProfile results to a file that can be read with pstats.
+        """
+        if self.cprofile is None:
+            raise ValueError("This profile was made without cProfile")
+        self.cprofile.dump_stats(path)
+
+
+# The per-request profile of the running thread or task
+_current = contextvars.ContextVar("profile", default=None)
+
+# Profile of the whole process, or None if it is not enabled
+process_profile = None
+
+# The original functions while the wrappers are in place, and how many users need them
+_originals = []
+_users = 0
+_install_lock = threading.Lock()
+
+def _wrap(function, name):
+    """
+    Makes the wrapper that records calls of one function.
+    """
+    def wrapper(*args, **kwargs):
+        profile = _current.get() or process_profile
+        if profile is None:
+            return function(*args, **kwargs)
+        active = profile.active
+        key = (threading.get_ident(), name)
+        depth = active.get(key, 0)
+        active[key] = depth + 1
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            active[key] = depth
+            profile.record(name, depth == 0, seconds)
+    wrapper.__wrapped__ = function
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    return wrapper
+
+def _install():
+    """
+    Replaces every target with its wrapper.
+    """
+    for module_name, attribute in TARGETS:
+        module = sys.modules.get(module_name)
+        if module is None:
+            continue
+        owner = module
+        *parents, name = attribute.split(".")
+        for parent in parents:
+            owner = getattr(owner, parent)
+        value = getattr(owner, name)
+        if isinstance(value, dict):
+            for key, function in list(value.items()):
+                _originals.append((value, key, function, True))
+                value[key] = _wrap(function, f"{module_name}.{name}[{key}]")
+        else:
+            _originals.append((owner, name, value, False))
+            setattr(owner, name, _wrap(value, f"{module_name}.{attribute}"))
+
+def _uninstall():
+    """
+    Puts every original function back.
+    """
+    while _originals:
+        owner, name, function, is_dict = _originals.pop()
+        if is_dict:
+            owner[name] = function
+        else:
+            setattr(owner, name, function)
+
+def _acquire():
+    """
+    Puts the wrappers in place if this is the first user.
+    """
+    global _users
+    with _install_lock:
+        if _users == 0:
+            _install()
+        _users += 1
+
+def _release():
+    """
+    Removes the wrappers once the last user is finished.
+    """
+    global _users
+    with _install_lock:
+        _users -= 1
+        if _users == 0:
+            _uninstall()
+
+@contextlib.contextmanager
+def profiled(cprofile=False):
+    """
+    Profiles the calls made inside a with block in this thread or task.
+
+    Parameters:
+        cprofile (bool): Also run cProfile over the block for a full pstats dump.
+
+    Returns:
+        Profile: The results, filled in once the block is finished.
+    """
+    profile = Profile(cprofile)
+    _acquire()
+    token = _current.set(profile)
+    if profile.cprofile is not None:
+        profile.cprofile.enable()
+    try:
+        yield profile
+    finally:
+        if profile.cprofile is not None:
+            profile.cprofile.disable()
+        _current.reset(token)
+        _release()
+
+def enable_process_profile():
+    """
+    Starts recording every call in the process that is not part of a per-request profile.
+
+    Returns:
+        Profile: The process profile.
+    """
+    global process_profile
+    if process_profile is None:
+        process_profile = Profile()
+        _acquire()
+    return process_profile
+
+def disable_process_profile():
+    """
+    Stops recording the whole process.
+    """
+    global process_profile
+    if process_profile is not None:
+        process_profile = None
+        _release()
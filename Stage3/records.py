@@ -0,0 +1,149 @@
+"""
+Game records for Reversi.
+
+A game record is a list of moves written as a column letter followed by a
+row number, for example "e3 f4 c5". Columns start at "a" on the left and
+rows start at 1 at the top, matching the x and y coordinates used by the
+rest of the game. Passes are not written down because they can be worked
+out from the position. A record file holds one game per line.
+"""
+
+import bitboard
+
+COLUMN_LETTERS = "abcdefghijklmnop"
+
+def format_move(coord):
+    """
+    Writes a move in record notation.
+
+    Parameters:
+        coord (tuple(int,int)): The x and y position of the move, starting from 1.
+
+    Returns:
+        str: The move such as "e3".
+    """
+    return f"{COLUMN_LETTERS[coord[0] - 1]}{coord[1]}"
+
+def parse_move(text):
+    """
+    Reads a move written in record notation.
+
+    Parameters:
+        text (str): The move such as "e3". Upper case letters are accepted.
+
+    Returns:
+        tuple(int,int): The x and y position of the move, starting from 1.
+    """
+    text = text.strip().lower()
+    if len(text) < 2 or text[0] not in COLUMN_LETTERS or not text[1:].isdecimal():
+        raise ValueError(f"Invalid move: {text!r}")
+    return (COLUMN_LETTERS.index(text[0]) + 1, int(text[1:]))
+
+def parse_moves(text):
+    """
+    Reads a whole game written in record notation. Moves may be separated by spaces
+    or commas or written with no separator at all ("e3f4c5").
+
+    Parameters:
+        text (str): The moves of the game.
+
+    Returns:
+        list[tuple(int,int)]: The x and y position of every move.
+    """
+    moves = []
+    current = ""
+    for character in text.replace(",", " ").lower():
+        # A space or a letter starts a new move so anything collected so far is complete
+        if character.isspace() or character.isalpha():
+            if current:
+                moves.append(parse_move(current))
+                current = ""
+            if character.isspace():
+                continue
+        current += character
+    if current:
+        moves.append(parse_move(current))
+    return moves
+
+def format_moves(moves):
+    """
+    Writes a whole game in record notation.
+
+    Parameters:
+        moves (list[tuple(int,int)]): The x and y position of every move.
+
+    Returns:
+        str: The moves separated by spaces.
+    """
+    return " ".join(format_move(move) for move in moves)
+
+def read_records(path):
+    """
+    Reads every game from a record file. Blank lines and lines starting with '#' are skipped.
+
+    Parameters:
+        path (str): The path of the record file.
+
+    Returns:
+        list[list[tuple(int,int)]]: The moves of each game.
+    """
+    games = []
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                games.append(parse_moves(line))
+    return games
+
+def start_position(size=8):
+    """
+    Gets the masks of the starting position with the same layout as components.initialise_board.
+
+    Parameters:
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        tuple(int,int): The masks of the dark counters and of the light counters.
+    """
+    mid = size // 2
+    dark = bitboard.bit(mid, mid, size) | bitboard.bit(mid - 1, mid - 1, size)
+    light = bitboard.bit(mid, mid - 1, size) | bitboard.bit(mid - 1, mid, size)
+    return dark, light
+
+def replay(moves, size=8):
+    """
+    Plays through a game record, passing automatically when a player has no legal moves.
+
+    Parameters:
+        moves (list[tuple(int,int)]): The x and y position of every move.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        list[tuple(int,int,str)]: The dark mask, the light mask and the colour to move
+            before every move, followed by the final position (with the colour that
+            would have moved next).
+    """
+    geo = bitboard.geometry(size)
+    dark, light = start_position(size)
+    colour = "Dark "
+    positions = []
+    for number, (x, y) in enumerate(moves, start=1):
+        player, opponent = bitboard.split_colours(dark, light, colour)
+        legal = bitboard.legal_moves(player, opponent, geo)
+
+        # The player has to pass so the other player makes this move
+        if not legal:
+            colour = "Dark " if colour == "Light" else "Light"
+            player, opponent = opponent, player
+            legal = bitboard.legal_moves(player, opponent, geo)
+
+        move = bitboard.bit(x - 1, y - 1, size) if 1 <= x <= size and 1 <= y <= size else 0
+        if not move & legal:
+            raise ValueError(f"Move {number} at ({x}, {y}) is not legal")
+
+        positions.append((dark, light, colour))
+        player, opponent = bitboard.play(player, opponent, move, geo)
+        dark, light = (player, opponent) if colour == "Dark " else (opponent, player)
+        colour = "Dark " if colour == "Light" else "Light"
+    positions.append((dark, light, colour))
+    return positions
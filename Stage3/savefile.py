@@ -0,0 +1,130 @@
+"""
+Reading and checking uploaded save files.
+
+Save files are read in chunks up to a size limit before anything is parsed,
+so an oversized upload is rejected without reading all of it. The parsed game
+state is checked completely (board shape, cell values, counter counts, whose
+turn it is) before it is used, so a bad file can never leave the game half
+loaded. Boards may be a list of lists or use the compact or hex encodings.
+"""
+
+import json
+import encoding
+
+# Largest save file accepted. A 16x16 board as a list of lists is about 5 KB
+MAX_SAVE_BYTES = 64 * 1024
+
+# Size of each piece read from the uploaded file
+CHUNK_SIZE = 8 * 1024
+
+PLAYERS = ("Dark ", "Light")
+
+def read_capped(stream, max_bytes=MAX_SAVE_BYTES):
+    """
+    Reads a stream in chunks, stopping as soon as it is longer than the limit.
+
+    Parameters:
+        stream (file-like): The stream to read bytes from.
+        max_bytes (int): The most bytes allowed.
+
+    Returns:
+        bytes: Everything in the stream.
+    """
+    chunks = []
+    total = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            return b"".join(chunks)
+        total += len(chunk)
+        if total > max_bytes:
+            raise ValueError(f"Save file is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+
+def check_board(board, board_size=None):
+    """
+    Checks a list of lists board in a single pass over the cells.
+
+    Parameters:
+        board (list[list[str]]): The board to check.
+        board_size (int | None): The board size required, or None to allow any valid size.
+
+    Returns:
+        tuple(int,int): The number of dark and light counters on the board.
+    """
+    if not isinstance(board, list):
+        raise ValueError("Board must be a list of rows")
+    size = len(board)
+    if size % 2 != 0 or size < 4 or size > 16:
+        raise ValueError("Board size must be an even number between 4 and 16")
+    if board_size is not None and size != board_size:
+        raise ValueError(f"Board must be {board_size}x{board_size}")
+
+    dark_total = 0
+    light_total = 0
+    for row in board:
+        if not isinstance(row, list) or len(row) != size:
+            raise ValueError("Every row of the board must have one cell per column")
+        for cell in row:
+            if cell == "Dark ":
+                dark_total += 1
+            elif cell == "Light":
+                light_total += 1
+            elif cell != "None ":
+                raise ValueError(f"Invalid cell value: {cell!r}")
+
+    # Counters are never removed so there are always at least the 4 starting counters
+    if dark_total + light_total < 4:
+        raise ValueError("Board has fewer counters than the starting position")
+    return dark_total, light_total
+
+def parse_game_state(data, board_size=None):
+    """
+    Checks a parsed save file and turns it into a game state.
+
+    Parameters:
+        data (dict): The parsed JSON of the save file.
+        board_size (int | None): The board size required, or None to allow any valid size.
+
+    Returns:
+        dict: The "board" (list of lists), "current_player" and "game_won" of the game.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Save file must contain a JSON object")
+    for key in ("board", "current_player", "game_won"):
+        if key not in data:
+            raise ValueError(f"Save file is missing '{key}'")
+
+    board = encoding.decode(data["board"])
+    dark_total, light_total = check_board(board, board_size)
+
+    # Saves include the counter counts, which must agree with the board
+    counts = data.get("counts")
+    if counts is not None and counts != {"dark": dark_total, "light": light_total}:
+        raise ValueError("Counter counts in the save file do not match the board")
+
+    if data["current_player"] not in PLAYERS:
+        raise ValueError("current_player must be 'Dark ' or 'Light'")
+    if not isinstance(data["game_won"], bool):
+        raise ValueError("game_won must be true or false")
+
+    return {"board": board, "current_player": data["current_player"], "game_won": data["game_won"]}
+
+def load_game_state(stream, max_bytes=MAX_SAVE_BYTES, board_size=None):
+    """
+    Reads, parses and checks a save file.
+
+    Parameters:
+        stream (file-like): The uploaded save file.
+        max_bytes (int): The largest file accepted.
+        board_size (int | None): The board size required, or None to allow any valid size.
+
+    Returns:
+        dict: The "board", "current_player" and "game_won" of the game.
+    """
+    data = read_capped(stream, max_bytes)
+    try:
+        parsed = json.loads(data)
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Save file is not valid JSON: {e}") from None
+    return parse_game_state(parsed, board_size)
@@ -0,0 +1,870 @@
+"""
+Move search for the Reversi AI.
+
+Engines choose a move for the player to move. The 'greedy' engine is the
+original AI that picks the legal move with the highest value in the score
+map. The 'alphabeta' engine looks several moves ahead with a negamax
+alpha-beta search and scores the positions it reaches with one of the
+evaluators from the 'evaluation' module.
+
+Engine settings are a dictionary such as
+{"engine": "alphabeta", "evaluator": "heuristic", "depth": 4}. The alpha-beta
+engine can also be given a budget of "nodes" (positions visited) or "time"
+(milliseconds), in which case it searches one move deeper at a time up to
+"depth" and plays the move from the deepest search that finished in budget.
+
+Three selective search techniques can be switched on one at a time to search
+deeper in the same time, each with its own setting:
+- "pvs": principal variation search. Moves after the first are searched with a
+  null window that only proves they are no better, and are searched again with
+  the full window when that fails. Gives the same scores as plain alpha-beta.
+- "aspiration": each search of iterative deepening starts with a narrow window
+  around the score of the search before, widened when the score falls outside it.
+  Gives the same scores as plain alpha-beta.
+- "probcut": Multi-ProbCut forward pruning. Before searching a position deeply,
+  one or more shallow searches predict the deep score with a linear fit, and
+  the position is cut off when the prediction is very likely outside the window.
+  Can change the move played.
+The aspiration windows and the ProbCut fits are made offline by 'fit_probcut'
+from shallow and deep searches of self-play positions and are read from
+'probcut.json'.
+
+Ranked moves (multi-PV) are searched with the same budgets and switches, apart
+from aspiration windows, which only apply to a single best move.
+"""
+
+import json
+import os
+import threading
+import time
+import bitboard
+import evaluation
+# Registers the 'pattern' evaluator
+import patterns
+
+# Score map used by the greedy engine to rate the available moves
+# higher score = the move is probably better
+# This map favours the corners highly as corners are useful and are unable
+# to be flipped after being claimed
+SCORE_MAP = [
+    [3,  -3,  2,  1,  1,  2, -3,  3],
+    [-3, -4, -1, -1, -1, -1, -4, -3],
+    [2,  -1,  0,  0,  0,  0, -1,  2],
+    [1,  -1,  0,  0,  0,  0, -1,  1],
+    [1,  -1,  0,  0,  0,  0, -1,  1],
+    [2,  -1,  0,  0,  0,  0, -1,  2],
+    [-3, -4, -1, -1, -1, -1, -4, -3],
+    [3,  -3,  2,  1,  1,  2, -3,  3],
+]
+
+ENGINES = ("greedy", "alphabeta")
+
+DEFAULT_SETTINGS = {"engine": "greedy", "evaluator": "heuristic", "depth": 1}
+
+# Deepest search allowed through the web app so one request cannot run for minutes
+MAX_DEPTH = 8
+
+# Largest node and time (milliseconds) budgets allowed through the web app
+MAX_NODES = 10000000
+MAX_TIME = 10000
+
+# Most moves that can be ranked in one multi-PV search
+MAX_MULTI_PV = 32
+
+# Finished games are scored by counter difference times this, so any win is
+# worth more than the best evaluation of an unfinished game
+WIN_SCALE = 100000
+
+# Settings that switch on a selective search technique, off unless given
+SWITCHES = ("pvs", "aspiration", "probcut")
+
+# Width of the null windows of principal variation search and ProbCut. Scores
+# are floats, so this only has to be smaller than any real difference in score
+NULL_WINDOW = 1e-6
+
+# Half width of an aspiration window when the evaluator has no fitted one, and
+# how much wider the window gets each time the score falls outside it
+ASPIRATION_WINDOW = 50.0
+ASPIRATION_GROWTH = 4
+
+# A position is cut off when the shallow search predicts the deep score is this
+# many standard deviations of the fit outside the window. Lower cuts more and
+# reaches deeper but changes more moves (see benchmarks/bench_selective)
+PROBCUT_THRESHOLD = 1.0
+
+# Games are split into stages by the number of counters on the board and each
+# stage has its own ProbCut fits, as scores change more later in the game
+PROBCUT_STAGES = 3
+
+DEFAULT_PROBCUT_PATH = os.environ.get(
+    "REVERSI_PROBCUT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "probcut.json"))
+
+# Fitted parameters of each evaluator, loaded the first time they are needed
+_selective = None
+_selective_lock = threading.Lock()
+
+def normalise_settings(settings):
+    """
+    Fills in missing engine settings with the defaults and checks they are valid.
+
+    Parameters:
+        settings (dict): Engine settings, for example the query parameters of a request.
+            Unknown keys are ignored.
+
+    Returns:
+        dict: The complete engine settings.
+    """
+    engine = settings.get("engine") or DEFAULT_SETTINGS["engine"]
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}")
+
+    evaluator = settings.get("evaluator") or DEFAULT_SETTINGS["evaluator"]
+    evaluation.get_evaluator(evaluator)
+
+    depth = settings.get("depth") or DEFAULT_SETTINGS["depth"]
+    if isinstance(depth, str):
+        if not depth.isdecimal():
+            raise ValueError("Depth must be a whole number")
+        depth = int(depth)
+    if not isinstance(depth, int) or depth < 1 or depth > MAX_DEPTH:
+        raise ValueError(f"Depth must be a whole number between 1 and {MAX_DEPTH}")
+
+    # The greedy engine only looks at the squares so the other settings do not change its move
+    if engine == "greedy":
+        return {"engine": engine, "evaluator": DEFAULT_SETTINGS["evaluator"], "depth": 1}
+    result = {"engine": engine, "evaluator": evaluator, "depth": depth}
+
+    # Budgets are only added when given so settings without them stay the same
+    for name, largest in (("nodes", MAX_NODES), ("time", MAX_TIME)):
+        value = settings.get(name)
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            if not value.isdecimal():
+                raise ValueError(f"The {name} budget must be a whole number")
+            value = int(value)
+        if not isinstance(value, int) or value < 1 or value > largest:
+            raise ValueError(f"The {name} budget must be a whole number between 1 and {largest}")
+        result[name] = value
+
+    # Switches are also only added when on, so settings without them stay the same
+    for name in SWITCHES:
+        value = settings.get(name)
+        if value in (None, "", False, 0, "0", "false"):
+            continue
+        if value not in (True, 1, "1", "true"):
+            raise ValueError(f"{name} must be 1 (on) or 0 (off)")
+        result[name] = True
+    return result
+
+def parse_multi_pv(value):
+    """
+    Reads how many moves a multi-PV search should rank.
+
+    Parameters:
+        value (str | int): The number of moves, for example the 'multipv' query parameter.
+
+    Returns:
+        int: The number of moves, between 1 and MAX_MULTI_PV.
+    """
+    if isinstance(value, str):
+        if not value.isdecimal():
+            raise ValueError("multipv must be a whole number")
+        value = int(value)
+    if not isinstance(value, int) or value < 1 or value > MAX_MULTI_PV:
+        raise ValueError(f"multipv must be a whole number between 1 and {MAX_MULTI_PV}")
+    return value
+
+def deterministic(settings):
+    """
+    Checks if a search with these settings always chooses the same move for the
+    same position. Searches with a time budget depend on how busy the machine is.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+
+    Returns:
+        bool: True if the move can be cached.
+    """
+    return "time" not in settings
+
+def symmetric(settings):
+    """
+    Checks if the engine chooses the same move (turned or reflected with the board)
+    for every symmetry of a position. The greedy engine breaks ties between squares
+    with the same value in the order it scans the board, so it does not.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+
+    Returns:
+        bool: True if the move can be searched and cached on the canonical position.
+    """
+    return settings["engine"] != "greedy"
+
+def ranking_agrees(settings):
+    """
+    Checks if the best move of ranked_moves is always the move best_move chooses with
+    the same settings, so it can be cached as the engine's move. Budgets stop the
+    two searches at different depths and ProbCut prunes differently when ranking.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+
+    Returns:
+        bool: True if the ranking's best move can stand in for best_move.
+    """
+    return not any(name in settings for name in ("nodes", "time", "probcut"))
+
+def ranking_factor(settings, count):
+    """
+    Estimates how many times the work of best_move ranking the best 'count' moves
+    takes. Every ranked move needs an exact score, so a search can cost up to 'count'
+    times as much, unless the engine is greedy or a budget stops it.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+        count (int): How many moves are ranked.
+
+    Returns:
+        int: The factor to multiply the cost of one move by.
+    """
+    if settings["engine"] == "greedy" or "nodes" in settings or "time" in settings:
+        return 1
+    return count
+
+def settings_key(settings):
+    """
+    Turns complete engine settings into a value that can be used as a dictionary key.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+
+    Returns:
+        tuple: The settings in a fixed order.
+    """
+    return tuple(sorted(settings.items()))
+
+def probcut_stage(player, opponent, size):
+    """
+    Gets the game stage a position's ProbCut fits belong to, from 0 to PROBCUT_STAGES - 1.
+    """
+    return ((player | opponent).bit_count() - 4) * PROBCUT_STAGES // (size * size - 3)
+
+def load_selective(path=DEFAULT_PROBCUT_PATH):
+    """
+    Reads the fitted aspiration windows and ProbCut fits written by 'fit_probcut'.
+
+    Parameters:
+        path (str): The path of the parameters file.
+
+    Returns:
+        dict: For each evaluator, its "window" and its ProbCut "cuts": a dictionary for each
+            stage from the depth of a search to a tuple of (shallow depth, slope, intercept,
+            standard deviation) fits, shallowest first.
+    """
+    with open(path, encoding="utf-8") as file:
+        data = json.load(file)
+    parameters = {}
+    for name, fitted in data["evaluators"].items():
+        cuts = [{int(depth): tuple(sorted(tuple(fit) for fit in fits)) for depth, fits in stage.items()}
+                for stage in fitted["cuts"]]
+        if len(cuts) != PROBCUT_STAGES:
+            raise ValueError(f"{path} has {len(cuts)} stages instead of {PROBCUT_STAGES}")
+        parameters[name] = {"window": fitted["window"], "cuts": cuts}
+    return parameters
+
+def selective_parameters(evaluator):
+    """
+    Gets the fitted parameters of an evaluator, loading the parameters file the first time.
+
+    Returns:
+        dict | None: The "window" and "cuts" of the evaluator (see load_selective), or
+            None if there is no parameters file or it has nothing for the evaluator.
+    """
+    global _selective
+    if _selective is None:
+        with _selective_lock:
+            if _selective is None:
+                _selective = load_selective() if os.path.exists(DEFAULT_PROBCUT_PATH) else {}
+    return _selective.get(evaluator)
+
+def selective_options(settings, size):
+    """
+    Turns the switches in engine settings into the options of a Search.
+
+    Parameters:
+        settings (dict): Complete engine settings from normalise_settings.
+        size (int): How many squares wide and tall the board is.
+
+    Returns:
+        dict: The "pvs", "window" and "cuts" arguments of Search.
+    """
+    fitted = selective_parameters(settings["evaluator"])
+    options = {"pvs": settings.get("pvs", False), "window": None, "cuts": None}
+    if settings.get("aspiration"):
+        options["window"] = fitted["window"] if fitted else ASPIRATION_WINDOW
+    # The fits are made on 8x8 boards and do not carry over to other sizes
+    if settings.get("probcut") and fitted and size == 8:
+        options["cuts"] = fitted["cuts"]
+    return options
+
+
+class Search:
+    """
+    Negamax alpha-beta search from the point of view of the player to move.
+
+    Attributes:
+        size (int): How many squares wide and tall the board is.
+        geo (Geometry): The masks for the board size.
+        evaluate (callable): The evaluator used at the end of the search.
+        nodes (int): How many positions have been visited.
+        pvs (bool): Whether moves after the first are searched with a null window first.
+        window (float | None): Half width of the aspiration windows of deepen, or None for full windows.
+        cuts (list[dict] | None): The ProbCut fits of each stage (see load_selective), or None for no pruning.
+    """
+
+    __slots__ = ("size", "geo", "evaluate", "nodes", "order", "pvs", "window", "cuts")
+
+    def __init__(self, size, evaluator, pvs=False, window=None, cuts=None):
+        self.size = size
+        self.geo = bitboard.geometry(size)
+        self.evaluate = evaluator
+        self.nodes = 0
+        self.pvs = pvs
+        self.window = window
+        self.cuts = cuts
+
+        # Moves are tried corners first and squares next to corners last,
+        # which lets alpha-beta cut off more of the tree
+        risky = self.geo.x_mask | self.geo.c_mask
+        self.order = (self.geo.corners, self.geo.full & ~self.geo.corners & ~risky, risky)
+
+    def ordered_moves(self, moves):
+        """
+        Splits a mask of moves into single square masks, best looking squares first.
+
+        Parameters:
+            moves (int): Mask of the legal moves.
+
+        Returns:
+            list[int]: One mask per move.
+        """
+        result = []
+        for group in self.order:
+            group &= moves
+            while group:
+                move = group & -group
+                result.append(move)
+                group ^= move
+        return result
+
+    def final_score(self, player, opponent):
+        """
+        Scores a finished game for the player.
+        """
+        return WIN_SCALE * (player.bit_count() - opponent.bit_count())
+
+    def negamax(self, player, opponent, depth, alpha, beta):
+        """
+        Scores a position by searching the moves below it.
+
+        Parameters:
+            player (int): Mask of the counters of the player to move.
+            opponent (int): Mask of the other player's counters.
+            depth (int): How many more moves to look ahead.
+            alpha (float): The score the player is already guaranteed elsewhere.
+            beta (float): The score the opponent is already guaranteed elsewhere.
+
+        Returns:
+            float: The score of the position for the player to move.
+        """
+        self.nodes += 1
+        if depth == 0:
+            return self.evaluate(player, opponent, self.size)
+
+        moves = bitboard.legal_moves(player, opponent, self.geo)
+        if not moves:
+            # Pass if the opponent can move, otherwise the game is over
+            if not bitboard.legal_moves(opponent, player, self.geo):
+                return self.final_score(player, opponent)
+            return -self.negamax(opponent, player, depth, -beta, -alpha)
+
+        if self.cuts is not None:
+            fits = self.cuts[probcut_stage(player, opponent, self.size)].get(depth)
+            if fits:
+                cut = self.probcut(player, opponent, fits, alpha, beta)
+                if cut is not None:
+                    return cut
+
+        best = None
+        for move in self.ordered_moves(moves):
+            new_player, new_opponent = bitboard.play(player, opponent, move, self.geo)
+            score = self.search_move(new_player, new_opponent, depth - 1, alpha, beta, best is None)
+            if best is None or score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best
+
+    def search_move(self, player, opponent, depth, alpha, beta, first):
+        """
+        Scores a move for the player who made it. With principal variation search, a
+        move that is not the first is searched with a null window that only proves it is
+        no better than alpha, and searched again with the full window if it is better.
+
+        Parameters:
+            player (int): Mask of the counters of the player who made the move, after it.
+            opponent (int): Mask of the other player's counters after the move.
+            depth (int): How many more moves to look ahead.
+            alpha (float): The score the player is already guaranteed elsewhere.
+            beta (float): The score the opponent is already guaranteed elsewhere.
+            first (bool): Whether this is the first move searched in the position.
+
+        Returns:
+            float: The score of the move for the player who made it.
+        """
+        if not self.pvs or first:
+            return -self.negamax(opponent, player, depth, -beta, -alpha)
+        score = -self.negamax(opponent, player, depth, -alpha - NULL_WINDOW, -alpha)
+        if alpha < score < beta:
+            score = -self.negamax(opponent, player, depth, -beta, -alpha)
+        return score
+
+    def probcut(self, player, opponent, fits, alpha, beta):
+        """
+        Tries to cut off a position with shallow searches (Multi-ProbCut). Each fit
+        predicts the deep score as slope * shallow score + intercept, and the position is
+        cut off when a null window search proves the prediction is more than
+        PROBCUT_THRESHOLD standard deviations above beta or below alpha.
+
+        Parameters:
+            player (int): Mask of the counters of the player to move.
+            opponent (int): Mask of the other player's counters.
+            fits (tuple): The (shallow depth, slope, intercept, standard deviation) fits of the depth.
+            alpha (float): The score the player is already guaranteed elsewhere.
+            beta (float): The score the opponent is already guaranteed elsewhere.
+
+        Returns:
+            float | None: beta or alpha if the position is cut off, otherwise None.
+        """
+        for shallow, slope, intercept, deviation in fits:
+            margin = PROBCUT_THRESHOLD * deviation
+            if beta < WIN_SCALE:
+                bound = (beta + margin - intercept) / slope
+                if self.negamax(player, opponent, shallow, bound - NULL_WINDOW, bound) >= bound:
+                    return beta
+            if alpha > -WIN_SCALE:
+                bound = (alpha - margin - intercept) / slope
+                if self.negamax(player, opponent, shallow, bound, bound + NULL_WINDOW) <= bound:
+                    return alpha
+        return None
+
+    def root(self, player, opponent, depth, alpha=-float("inf"), beta=float("inf")):
+        """
+        Searches every legal move of the player to move and returns the best one.
+
+        Parameters:
+            player (int): Mask of the counters of the player to move.
+            opponent (int): Mask of the other player's counters.
+            depth (int): How many moves to look ahead, including the move being chosen.
+            alpha (float): The lower end of the window. The score is only an upper bound if it is not above it.
+            beta (float): The upper end of the window. The score is only a lower bound if it is not below it.
+
+        Returns:
+            tuple(int|None, float|None): The mask of the best move and its score,
+                or None and None if there are no legal moves.
+        """
+        self.nodes += 1
+        moves = bitboard.legal_moves(player, opponent, self.geo)
+        best_move = None
+        best_score = None
+        for move in self.ordered_moves(moves):
+            new_player, new_opponent = bitboard.play(player, opponent, move, self.geo)
+            score = self.search_move(new_player, new_opponent, depth - 1, alpha, beta, best_score is None)
+            if best_score is None or score > best_score:
+                best_move = move
+                best_score = score
+                alpha = max(alpha, score)
+                if alpha >= beta:
+                    break
+        return best_move, best_score
+
+    def aspiration_root(self, player, opponent, depth, guess):
+        """
+        Searches like root, in a window around a guess of the score when 'window' is set.
+        The window is widened and the search repeated until the score is inside it.
+
+        Parameters:
+            player (int): Mask of the counters of the player to move.
+            opponent (int): Mask of the other player's counters.
+            depth (int): How many moves to look ahead, including the move being chosen.
+            guess (float | None): The expected score, such as the score of a shallower search.
+
+        Returns:
+            tuple(int|None, float|None): The mask of the best move and its score,
+                or None and None if there are no legal moves.
+        """
+        if self.window is None or guess is None:
+            return self.root(player, opponent, depth)
+        window = self.window
+        alpha, beta = guess - window, guess + window
+        while True:
+            move, score = self.root(player, opponent, depth, alpha, beta)
+            window *= ASPIRATION_GROWTH
+            # A window wider than a win is no narrower than a full window
+            if score <= alpha:
+                alpha = score - window if window < WIN_SCALE else -float("inf")
+            elif score >= beta:
+                beta = score + window if window < WIN_SCALE else float("inf")
+            else:
+                return move, score
+
+    def deepen(self, player, opponent, depth):
+        """
+        Searches one move deeper at a time until 'depth', starting each search after
+        the first in an aspiration window around the score of the one before.
+
+        Returns:
+            tuple(int|None, float|None, int): The mask and score of the best move from the
+                deepest search, and the depth of that search.
+        """
+        move, score = self.root(player, opponent, 1)
+        for next_depth in range(2, depth + 1):
+            move, score = self.aspiration_root(player, opponent, next_depth, score)
+        return move, score, depth
+
+    def negamax_pv(self, player, opponent, depth, alpha, beta):
+        """
+        Scores a position like negamax and also keeps the line of best play found.
+        The line is only meaningful when the score is between alpha and beta.
+
+        Returns:
+            tuple(float, list[int]): The score for the player to move and the masks of the
+                moves in the line, with 0 for a pass.
+        """
+        self.nodes += 1
+        if depth == 0:
+            return self.evaluate(player, opponent, self.size), []
+
+        moves = bitboard.legal_moves(player, opponent, self.geo)
+        if not moves:
+            if not bitboard.legal_moves(opponent, player, self.geo):
+                return self.final_score(player, opponent), []
+            score, line = self.negamax_pv(opponent, player, depth, -beta, -alpha)
+            return -score, [0] + line
+
+        if self.cuts is not None:
+            fits = self.cuts[probcut_stage(player, opponent, self.size)].get(depth)
+            if fits:
+                cut = self.probcut(player, opponent, fits, alpha, beta)
+                if cut is not None:
+                    return cut, []
+
+        best = None
+        best_line = []
+        for move in self.ordered_moves(moves):
+            new_player, new_opponent = bitboard.play(player, opponent, move, self.geo)
+            score, line = self.search_move_pv(new_player, new_opponent, depth - 1, alpha, beta, best is None)
+            if best is None or score > best:
+                best = score
+                best_line = [move] + line
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best, best_line
+
+    def search_move_pv(self, player, opponent, depth, alpha, beta, first):
+        """
+        Scores a move like search_move and also keeps the line of best play after it.
+        The null window search of principal variation search does not need a line, so
+        only the full window search keeps one.
+
+        Returns:
+            tuple(float, list[int]): The score of the move for the player who made it and
+                the masks of the moves in the line after it.
+        """
+        if self.pvs and not first:
+            score = -self.negamax(opponent, player, depth, -alpha - NULL_WINDOW, -alpha)
+            if not alpha < score < beta:
+                return score, []
+        score, line = self.negamax_pv(opponent, player, depth, -beta, -alpha)
+        return -score, line
+
+    def ranked_root(self, player, opponent, depth, count):
+        """
+        Searches every legal move of the player to move and ranks the best ones (multi-PV).
+
+        All the moves are ranked in one search. Each move only has to beat the
+        worst of the best 'count' moves found so far, so moves that cannot make the
+        list are cut off early and only the moves that do make it get exact scores.
+        With a count of 1 this chooses the same move as root.
+
+        Parameters:
+            player (int): Mask of the counters of the player to move.
+            opponent (int): Mask of the other player's counters.
+            depth (int): How many moves to look ahead, including the move being chosen.
+            count (int): How many moves to rank.
+
+        Returns:
+            list[tuple(int, float, list[int])]: The mask, score and principal variation
+                (starting with the move, 0 for a pass) of up to 'count' moves, best first.
+        """
+        self.nodes += 1
+        moves = bitboard.legal_moves(player, opponent, self.geo)
+        ranked = []
+        for move in self.ordered_moves(moves):
+            alpha = ranked[-1][1] if len(ranked) == count else -float("inf")
+            new_player, new_opponent = bitboard.play(player, opponent, move, self.geo)
+            # Until the list is full every move is a first move that needs an exact score
+            score, line = self.search_move_pv(new_player, new_opponent, depth - 1, alpha, float("inf"), len(ranked) < count)
+            if score > alpha:
+                # The sort is stable so moves searched first stay ahead on equal scores
+                ranked.append((move, score, [move] + line))
+                ranked.sort(key=lambda entry: -entry[1])
+                del ranked[count:]
+        return ranked
+
+
+class BudgetExceeded(Exception):
+    """
+    Raised inside a budgeted search when its node or time budget runs out.
+    """
+
+
+class BudgetedSearch(Search):
+    """
+    Search that stops once it has visited 'max_nodes' positions or it is past its 'deadline'.
+
+    Attributes:
+        max_nodes (int | None): The node budget, or None for no limit.
+        deadline (float | None): The time.perf_counter() value to stop at, or None for no limit.
+    """
+
+    __slots__ = ("max_nodes", "deadline")
+
+    def __init__(self, size, evaluator, max_nodes=None, deadline=None, **options):
+        super().__init__(size, evaluator, **options)
+        self.max_nodes = max_nodes
+        self.deadline = deadline
+
+    def check_budget(self):
+        """
+        Raises BudgetExceeded if the node or time budget has run out.
+        """
+        # The clock is only read every 256 positions as it costs about as much as a position
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise BudgetExceeded
+        if self.deadline is not None and not self.nodes & 255 and time.perf_counter() > self.deadline:
+            raise BudgetExceeded
+
+    def negamax(self, player, opponent, depth, alpha, beta):
+        self.check_budget()
+        return Search.negamax(self, player, opponent, depth, alpha, beta)
+
+    def negamax_pv(self, player, opponent, depth, alpha, beta):
+        self.check_budget()
+        return Search.negamax_pv(self, player, opponent, depth, alpha, beta)
+
+    def deepen(self, player, opponent, depth):
+        """
+        Searches one move deeper at a time until 'depth' or until the budget runs out.
+        The one move search is always finished so there is a move whenever one is legal.
+
+        Returns:
+            tuple(int|None, float|None, int): The mask and score of the best move from the
+                deepest finished search, and the depth of that search.
+        """
+        max_nodes, deadline = self.max_nodes, self.deadline
+        self.max_nodes = self.deadline = None
+        move, score = self.root(player, opponent, 1)
+        self.max_nodes, self.deadline = max_nodes, deadline
+
+        finished = 1
+        for next_depth in range(2, depth + 1):
+            try:
+                move, score = self.aspiration_root(player, opponent, next_depth, score)
+            except BudgetExceeded:
+                break
+            finished = next_depth
+        return move, score, finished
+
+    def deepen_ranked(self, player, opponent, depth, count):
+        """
+        Ranks the best moves one move deeper at a time until 'depth' or until the budget
+        runs out, like deepen. The one move ranking is always finished.
+
+        Returns:
+            tuple(list, int): The ranking from the deepest finished search (see ranked_root)
+                and the depth of that search.
+        """
+        max_nodes, deadline = self.max_nodes, self.deadline
+        self.max_nodes = self.deadline = None
+        ranked = self.ranked_root(player, opponent, 1, count)
+        self.max_nodes, self.deadline = max_nodes, deadline
+
+        finished = 1
+        for next_depth in range(2, depth + 1):
+            try:
+                ranked = self.ranked_root(player, opponent, next_depth, count)
+            except BudgetExceeded:
+                break
+            finished = next_depth
+        return ranked, finished
+
+
+def greedy_move(player, opponent, size):
+    """
+    Picks the legal move with the highest value in the score map. When several
+    moves share the highest value the first one found column by column is used.
+
+    Parameters:
+        player (int): Mask of the counters of the player to move.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is. Must be 8.
+
+    Returns:
+        tuple(int|None, int|None): The mask of the best move and its score map value,
+            or None and None if there are no legal moves.
+    """
+    if size != 8:
+        raise ValueError("The greedy engine only supports 8x8 boards")
+    moves = bitboard.legal_moves(player, opponent, bitboard.geometry(size))
+    best_move = None
+    best_score = None
+    for x in range(size):
+        for y in range(size):
+            move = bitboard.bit(x, y, size)
+            if moves & move and (best_score is None or SCORE_MAP[y][x] > best_score):
+                best_move = move
+                best_score = SCORE_MAP[y][x]
+    return best_move, best_score
+
+def greedy_ranking(player, opponent, size):
+    """
+    Ranks every legal move by its value in the score map, with moves of the same
+    value in the order greedy_move finds them.
+
+    Returns:
+        list[tuple(int, int)]: The mask and score map value of each move, best first.
+    """
+    if size != 8:
+        raise ValueError("The greedy engine only supports 8x8 boards")
+    moves = bitboard.legal_moves(player, opponent, bitboard.geometry(size))
+    ranking = []
+    for x in range(size):
+        for y in range(size):
+            move = bitboard.bit(x, y, size)
+            if moves & move:
+                ranking.append((move, SCORE_MAP[y][x]))
+    ranking.sort(key=lambda entry: -entry[1])
+    return ranking
+
+def budgeted_search(size, settings):
+    """
+    Makes the search for settings with a node or time budget, starting the clock of a time budget.
+
+    Returns:
+        BudgetedSearch: The search, with the settings' evaluator, budget and switches.
+    """
+    deadline = None
+    if "time" in settings:
+        deadline = time.perf_counter() + settings["time"] / 1000
+    return BudgetedSearch(size, evaluation.get_evaluator(settings["evaluator"], size), settings.get("nodes"), deadline,
+                          **selective_options(settings, size))
+
+def best_move(player, opponent, size, settings):
+    """
+    Chooses a move for the player to move with the engine in the settings.
+
+    Parameters:
+        player (int): Mask of the counters of the player to move.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from normalise_settings.
+
+    Returns:
+        dict: "square" is the index (y * size + x) of the chosen move or None if there
+            are no legal moves, "score" is the engine's score for it and "nodes" is
+            the number of positions visited.
+    """
+    if settings["engine"] == "greedy":
+        move, score = greedy_move(player, opponent, size)
+        nodes = 1
+    elif "nodes" in settings or "time" in settings:
+        search = budgeted_search(size, settings)
+        move, score, _ = search.deepen(player, opponent, settings["depth"])
+        nodes = search.nodes
+    else:
+        search = Search(size, evaluation.get_evaluator(settings["evaluator"], size), **selective_options(settings, size))
+        if search.window is None:
+            move, score = search.root(player, opponent, settings["depth"])
+        else:
+            # Aspiration windows need the score of a shallower search
+            move, score, _ = search.deepen(player, opponent, settings["depth"])
+        nodes = search.nodes
+    square = move.bit_length() - 1 if move else None
+    return {"square": square, "score": score, "nodes": nodes}
+
+def ranked_moves(player, opponent, size, settings, count):
+    """
+    Ranks the best moves for the player to move with the engine in the settings.
+    A node or time budget is kept to by ranking one move deeper at a time, and the
+    ranking of the deepest search finished in budget is returned.
+
+    Parameters:
+        player (int): Mask of the counters of the player to move.
+        opponent (int): Mask of the other player's counters.
+        size (int): How many squares wide and tall the board is.
+        settings (dict): Complete engine settings from normalise_settings.
+        count (int): How many moves to rank.
+
+    Returns:
+        dict: "moves" is a list of up to 'count' moves, best first, each with the
+            "square" (y * size + x), the engine's "score" and the principal variation
+            "pv" as a list of squares starting with the move (None for a pass).
+            "nodes" is the number of positions visited.
+    """
+    if settings["engine"] == "greedy":
+        ranked = [(move, score, [move]) for move, score in greedy_ranking(player, opponent, size)[:count]]
+        nodes = 1
+    elif "nodes" in settings or "time" in settings:
+        search = budgeted_search(size, settings)
+        ranked, _ = search.deepen_ranked(player, opponent, settings["depth"], count)
+        nodes = search.nodes
+    else:
+        options = selective_options(settings, size)
+        # Aspiration windows only help find a single best move
+        options["window"] = None
+        search = Search(size, evaluation.get_evaluator(settings["evaluator"], size), **options)
+        ranked = search.ranked_root(player, opponent, settings["depth"], count)
+        nodes = search.nodes
+    moves = [{"square": move.bit_length() - 1, "score": score,
+              "pv": [step.bit_length() - 1 if step else None for step in line]}
+             for move, score, line in ranked]
+    return {"moves": moves, "nodes": nodes}
+
+def best_move_for_board(board, colour, settings=None):
+    """
+    Chooses a move on a list of lists board.
+
+    Parameters:
+        board (list[list[str]]): The board containing the current status of each cell in the game.
+        colour (str): The colour of the player to move.
+        settings (dict | None): Engine settings, the defaults are used if None.
+
+    Returns:
+        tuple(int,int) | None: The x and y position of the chosen move, starting from 1,
+            or None if there are no legal moves.
+    """
+    size = len(board)
+    dark, light = bitboard.from_board(board)
+    player, opponent = bitboard.split_colours(dark, light, colour)
+    result = best_move(player, opponent, size, normalise_settings(settings or {}))
+    if result["square"] is None:
+        return None
+    return (result["square"] % size + 1, result["square"] // size + 1)
@@ -0,0 +1,343 @@
+"""
+Shared game-state backends for running the web app as several processes or nodes.
+
+Each browser session has its own game, kept in a backend that every server
+process can reach, so any process can serve any game. Three backends are
+available and all have the same methods:
+- MemoryBackend: a dictionary inside one process (for a single process and for tests).
+- SQLiteBackend: a SQLite database file shared by the processes on one machine.
+- RedisBackend: any server that speaks the Redis protocol, shared by every node.
+
+Games are stored as one short string: the colour to move ("D" or "L"), whether
+the game is won ("0" or "1") and the board in the compact encoding.
+
+Every stored game has a version number that goes up by one on each save. A save
+names the version it read and fails with VersionConflict if another process has
+saved in between, so two workers can never overwrite each other's moves and no
+lock is held across processes. The caller loads the game again and retries.
+
+The web app chooses a backend with the REVERSI_SESSION_BACKEND environment
+variable: "memory", "sqlite:<path>" or "redis://<host>:<port>/<db>".
+"""
+
+import os
+import socket
+import threading
+import urllib.parse
+import encoding
+
+# Backend used by the web app (sessions are disabled if not set)
+DEFAULT_URL = os.environ.get("REVERSI_SESSION_BACKEND")
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a game was saved by someone else after it was loaded.
+    """
+
+
+def encode_state(game_state):
+    """
+    Writes a game state as one short string.
+
+    Parameters:
+        game_state (dict): The game's "board", "current_player" and "game_won".
+
+    Returns:
+        str: The colour to move, whether the game is won and the compact board.
+    """
+    player = "D" if game_state["current_player"] == "Dark " else "L"
+    return player + ("1" if game_state["game_won"] else "0") + encoding.encode_board(game_state["board"])
+
+def decode_state(text):
+    """
+    Reads a game state written by encode_state.
+
+    Returns:
+        dict: The game's "board", "current_player" and "game_won".
+    """
+    if len(text) < 2 or text[0] not in "DL" or text[1] not in "01":
+        raise ValueError("Invalid stored game state")
+    return {
+        "board": encoding.decode_board(text[2:]),
+        "current_player": "Dark " if text[0] == "D" else "Light",
+        "game_won": text[1] == "1",
+    }
+
+
+class MemoryBackend:
+    """
+    Keeps games in a dictionary in this process.
+    """
+
+    def __init__(self):
+        self._games = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        """
+        Loads the game of a session.
+
+        Parameters:
+            session_id (str): The id of the session.
+
+        Returns:
+            tuple(int, dict|None): The version of the stored game and the game state,
+                or 0 and None if the session has no game yet.
+        """
+        version, text = self._games.get(session_id, (0, None))
+        return version, decode_state(text) if text is not None else None
+
+    def put(self, session_id, game_state, version):
+        """
+        Saves the game of a session if it has not changed since it was loaded.
+
+        Parameters:
+            session_id (str): The id of the session.
+            game_state (dict): The game's "board", "current_player" and "game_won".
+            version (int): The version the game was loaded at, 0 for a new game.
+
+        Returns:
+            int: The new version of the game.
+        """
+        text = encode_state(game_state)
+        with self._lock:
+            if self._games.get(session_id, (0, None))[0] != version:
+                raise VersionConflict(session_id)
+            self._games[session_id] = (version + 1, text)
+        return version + 1
+
+    def delete(self, session_id):
+        """
+        Removes the game of a session if there is one.
+        """
+        with self._lock:
+            self._games.pop(session_id, None)
+
+
+class SQLiteBackend:
+    """
+    Keeps games in a SQLite database that several processes can share.
+
+    Attributes:
+        path (str): The path of the database file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # SQLite connections cannot be shared between threads so each thread opens its own
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, version INTEGER NOT NULL, state TEXT NOT NULL)")
+        connection.commit()
+
+    def _connection(self):
+        """
+        Gets this thread's connection to the database, opening it if needed.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Imported here so servers without a SQLite session store never load sqlite3
+            import sqlite3
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, session_id):
+        """
+        Loads the game of a session. See MemoryBackend.get.
+        """
+        row = self._connection().execute(
+            "SELECT version, state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return 0, None
+        return row[0], decode_state(row[1])
+
+    def put(self, session_id, game_state, version):
+        """
+        Saves the game of a session if it has not changed since it was loaded. See MemoryBackend.put.
+        """
+        connection = self._connection()
+        text = encode_state(game_state)
+        with connection:
+            # The version check and the write are one statement so no other process can get in between
+            if version == 0:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, version, state) VALUES (?, 1, ?)",
+                    (session_id, text))
+            else:
+                cursor = connection.execute(
+                    "UPDATE sessions SET version = version + 1, state = ? WHERE session_id = ? AND version = ?",
+                    (text, session_id, version))
+        if cursor.rowcount != 1:
+            raise VersionConflict(session_id)
+        return version + 1
+
+    def delete(self, session_id):
+        """
+        Removes the game of a session if there is one.
+        """
+        with self._connection() as connection:
+            connection.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+
+class RedisError(Exception):
+    """
+    Raised when the Redis server replies with an error.
+    """
+
+
+class RedisBackend:
+    """
+    Keeps games in a Redis server (or anything that speaks the Redis protocol)
+    so every node can reach them. Each game is one key holding "<version>:<state>",
+    and saves use WATCH/MULTI/EXEC so a save fails if the key changed after it was read.
+
+    Attributes:
+        host (str): The address of the server.
+        port (int): The port of the server.
+        db (int): The database number.
+        prefix (str): Added to the front of every session id to make its key.
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, prefix="reversi:session:"):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.prefix = prefix
+        # WATCH applies to a whole connection so each thread has its own
+        self._local = threading.local()
+
+    def _connection(self):
+        """
+        Gets this thread's connection to the server, opening it if needed.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            sock = socket.create_connection((self.host, self.port))
+            connection = (sock, sock.makefile("rb"))
+            self._local.connection = connection
+            if self.db:
+                self.command("SELECT", self.db)
+        return connection
+
+    def close(self):
+        """
+        Closes this thread's connection to the server.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+            self._local.connection = None
+
+    def command(self, *args):
+        """
+        Sends one command and reads the reply.
+
+        Parameters:
+            *args (str | int | bytes): The command and its arguments.
+
+        Returns:
+            The reply: bytes, int, a list or None.
+        """
+        sock, reader = self._connection()
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        try:
+            sock.sendall(b"".join(parts))
+            return self._read_reply(reader)
+        except OSError:
+            # Open a new connection next time instead of reusing a broken one
+            self.close()
+            raise
+
+    def _read_reply(self, reader):
+        """
+        Reads one reply in the Redis protocol.
+        """
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RedisError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(rest)
+            if length < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(length)]
+        raise RedisError(f"Unknown reply type {kind!r}")
+
+    def get(self, session_id):
+        """
+        Loads the game of a session. See MemoryBackend.get.
+        """
+        value = self.command("GET", self.prefix + session_id)
+        if value is None:
+            return 0, None
+        version, _, text = value.decode().partition(":")
+        return int(version), decode_state(text)
+
+    def put(self, session_id, game_state, version):
+        """
+        Saves the game of a session if it has not changed since it was loaded. See MemoryBackend.put.
+        """
+        key = self.prefix + session_id
+        self.command("WATCH", key)
+        current = self.command("GET", key)
+        current_version = int(current.split(b":", 1)[0]) if current is not None else 0
+        if current_version != version:
+            self.command("UNWATCH")
+            raise VersionConflict(session_id)
+
+        # EXEC gives no reply if the key was changed after WATCH
+        self.command("MULTI")
+        self.command("SET", key, f"{version + 1}:{encode_state(game_state)}")
+        if self.command("EXEC") is None:
+            raise VersionConflict(session_id)
+        return version + 1
+
+    def delete(self, session_id):
+        """
+        Removes the game of a session if there is one.
+        """
+        self.command("DEL", self.prefix + session_id)
+
+
+def open_backend(url):
+    """
+    Makes the backend described by a backend url.
+
+    Parameters:
+        url (str): "memory", "sqlite:<path>" or "redis://<host>:<port>/<db>".
+
+    Returns:
+        MemoryBackend | SQLiteBackend | RedisBackend: The backend.
+    """
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith("sqlite:"):
+        return SQLiteBackend(url[len("sqlite:"):])
+    if url.startswith("redis://"):
+        parsed = urllib.parse.urlsplit(url)
+        db = int(parsed.path.strip("/") or 0)
+        return RedisBackend(parsed.hostname or "127.0.0.1", parsed.port or 6379, db)
+    raise ValueError(f"Unknown session backend: {url}")
@@ -0,0 +1,192 @@
+"""
+Tests for admission.py and admission control of the '/ai_move' and '/analyse' routes
+"""
+
+import json
+import unittest
+import admission
+import difficulty
+import encoding
+import search
+import flask_game_engine as fge
+
+class FakeClock:
+    """
+    A clock that only moves when a test moves it.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def counts():
+    """
+    Gets the admitted, downgraded and shed counters.
+    """
+    return [child.value for child in (admission.ADMITTED, admission.DOWNGRADED, admission.SHED)]
+
+class TestAdmissionControl(unittest.TestCase):
+    """
+    Contains tests for the token buckets and downgrading
+    """
+
+    def setUp(self):
+        """
+        Make admission control with a fake clock: 120 ms of work per second per client,
+        300 ms per second for the server and buckets holding 1 second of work
+        """
+        self.clock = FakeClock()
+        self.control = admission.AdmissionControl(120, 300, 1, max_clients=3, clock=self.clock)
+        self.hard = difficulty.get_tier("hard")
+        self.medium = difficulty.get_tier("medium")
+
+    def test_estimate_cost(self):
+        """
+        Test the cost of engine settings matches the measured cost of the tier with the same settings
+        """
+        for name in ("easy", "medium", "hard", "expert", "master"):
+            tier = difficulty.get_tier(name)
+            self.assertEqual(admission.estimate_cost(tier["settings"]), tier["cost"])
+            self.assertEqual(admission.estimate_cost(search.normalise_settings({}), tier), tier["cost"])
+
+    def test_ranking_cost(self):
+        """
+        Test ranking several moves costs a search per move, unless a budget or the greedy engine keeps it to one
+        """
+        self.assertEqual(admission.estimate_cost(self.hard["settings"], self.hard, 3), 3 * self.hard["cost"])
+        self.assertEqual(admission.estimate_cost(self.hard["settings"], None, 3), 3 * self.hard["cost"])
+        for name in ("easy", "expert", "master"):
+            tier = difficulty.get_tier(name)
+            self.assertEqual(admission.estimate_cost(tier["settings"], tier, search.MAX_MULTI_PV), tier["cost"])
+
+        # Three hard moves do not fit in 120 ms, so the ranking is downgraded to the medium tier
+        settings, tier, downgraded = self.control.admit("a", self.hard["settings"], self.hard, 3)
+        self.assertEqual((tier, downgraded), (self.medium, True))
+        self.assertAlmostEqual(self.control._clients["a"].tokens, 120 - 3 * self.medium["cost"])
+
+    def test_batch_cost(self):
+        """
+        Test a batch is charged the cost of every position, and its cheaper tiers are costed for the whole batch too
+        """
+        self.assertEqual(admission.estimate_cost(self.hard["settings"], self.hard, positions=4), 4 * self.hard["cost"])
+        self.assertEqual(admission.estimate_cost(self.hard["settings"], positions=4), 4 * self.hard["cost"])
+        easy = difficulty.get_tier("easy")
+        self.assertEqual(admission.estimate_cost(easy["settings"], positions=10), 10 * easy["cost"])
+
+        # One hard move fits in 120 ms but three of them do not, so the batch is downgraded
+        settings, tier, downgraded = self.control.admit("a", self.hard["settings"], positions=3)
+        self.assertEqual((tier, downgraded), (self.medium, True))
+        self.assertAlmostEqual(self.control._clients["a"].tokens, 120 - 3 * self.medium["cost"])
+
+    def test_downgrade_then_shed(self):
+        """
+        Test requests are admitted while they fit, then downgraded to cheaper tiers, then shed
+        """
+        before = counts()
+        # Two hard moves use 100 of the client's 120 ms
+        for _ in range(2):
+            self.assertEqual(self.control.admit("a", self.hard["settings"], self.hard), (self.hard["settings"], self.hard, False))
+        settings, tier, downgraded = self.control.admit("a", self.hard["settings"], self.hard)
+        self.assertTrue(downgraded)
+        self.assertEqual((settings, tier), (self.medium["settings"], self.medium))
+
+        # Emptying the bucket down to nothing leaves no tier that fits
+        self.control._clients["a"].tokens = 0
+        with self.assertRaises(admission.Overloaded) as raised:
+            self.control.admit("a", self.hard["settings"], self.hard)
+        self.assertAlmostEqual(raised.exception.retry_after, difficulty.get_tier("easy")["cost"] / 120)
+        self.assertEqual([after - start for start, after in zip(before, counts())], [2, 1, 1])
+
+        # A tenth of a second later the bucket holds 12 ms, enough for the medium tier again
+        self.clock.now = 0.1
+        self.assertEqual(self.control.admit("a", self.hard["settings"], self.hard)[1], self.medium)
+
+    def test_clients_and_server_share(self):
+        """
+        Test one client using up its share leaves the others alone until the server's share is used
+        """
+        # Moves at depth 3 cost 10 ms, so a and b use up their 120 ms
+        deep = search.normalise_settings({"engine": "alphabeta", "depth": 3})
+        for client in ("a", "b"):
+            for _ in range(12):
+                self.assertFalse(self.control.admit(client, deep, None)[2])
+        with self.assertRaises(admission.Overloaded):
+            self.control.admit("a", deep, None)
+        self.assertFalse(self.control.admit("c", self.hard["settings"], self.hard)[2])
+
+        # The server has 10 ms left, so a new client with a full bucket is downgraded too
+        self.assertEqual(self.control.admit("d", self.hard["settings"], self.hard)[1], self.medium)
+        # Only the 3 most recently seen clients are kept
+        self.assertEqual(list(self.control._clients), ["a", "c", "d"])
+
+    def test_disabled(self):
+        """
+        Test requests are admitted unchanged when admission control is off
+        """
+        self.assertFalse(admission.ENABLED)
+        self.assertEqual(admission.admit("a", self.hard["settings"], self.hard), (self.hard["settings"], self.hard, False))
+
+class TestAiMoveAdmission(unittest.TestCase):
+    """
+    Contains tests for admission control of the '/ai_move' and '/analyse' routes
+    """
+
+    def setUp(self):
+        """
+        Reset the game and turn on admission control with a small budget
+        """
+        fge.game_state['board'] = fge.components.initialise_board()
+        fge.game_state['current_player'] = 'Dark '
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        self.client = fge.app.test_client()
+        previous = (admission.ENABLED, admission.control)
+        admission.ENABLED = True
+        admission.control = admission.AdmissionControl(60, 1000, 1, clock=FakeClock())
+        self.addCleanup(setattr, admission, "control", previous[1])
+        self.addCleanup(setattr, admission, "ENABLED", previous[0])
+
+    def test_downgraded_and_shed(self):
+        """
+        Test a request over the client's budget is played with a cheaper tier and named in
+        the response, and one that does not fit at all gets a 429 with Retry-After
+        """
+        query = {'difficulty': 'hard', 'player': 'Dark'}
+        data = self.client.get('/ai_move', query_string=query).get_json()
+        self.assertEqual(data['status'], 'success')
+        self.assertNotIn('difficulty', data)
+        data = self.client.get('/ai_move', query_string=query).get_json()
+        self.assertEqual(data['difficulty'], 'medium')
+        self.assertTrue(fge.components.legal_move('Dark ', (data['x'], data['y']), fge.game_state['board']))
+
+        admission.control._clients["127.0.0.1"].tokens = 0
+        response = self.client.get('/ai_move', query_string=query)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual(response.get_json()['status'], 'fail')
+
+    def test_analyse_charged_for_the_batch(self):
+        """
+        Test a batch is downgraded as a whole, and one too large for even the cheapest
+        tier gets a 429 with Retry-After although each of its positions alone would fit
+        """
+        board = encoding.encode_board(fge.components.initialise_board())
+        batch = {"positions": [{"board": board, "player": "Dark"}] * 2, "engine": "alphabeta", "depth": 4}
+        response = self.client.post('/analyse', json=batch)
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        self.assertEqual([line['difficulty'] for line in lines], ['medium', 'medium'])
+        self.assertEqual(len(lines[0]['best_move']), 2)
+
+        admission.control._clients["127.0.0.1"].tokens = 10
+        before = counts()
+        batch["positions"] = batch["positions"] * 128
+        response = self.client.post('/analyse', json=batch)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.headers['Retry-After'], '1')
+        self.assertEqual([after - start for start, after in zip(before, counts())], [0, 0, 1])
+        self.assertEqual(admission.control._clients["127.0.0.1"].tokens, 10)
+
+if __name__ == "__main__":
+    unittest.main()
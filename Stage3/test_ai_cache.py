@@ -0,0 +1,138 @@
+"""
+Tests for ai_cache.py
+"""
+
+import os
+import tempfile
+import unittest
+import ai_cache
+import bitboard
+import components
+import search
+from benchmarks.common import random_positions
+
+class TestLRUCache(unittest.TestCase):
+    """
+    Contains tests for the LRUCache class
+    """
+
+    def test_hits_and_misses(self):
+        """
+        Test lookups are counted as hits or misses
+        """
+
+        cache = ai_cache.LRUCache(10)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_least_recently_used_is_evicted(self):
+        """
+        Test the entry used longest ago is removed first when the cache is full
+        """
+
+        cache = ai_cache.LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        # Using "a" makes "b" the least recently used entry
+        cache.get("a")
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_save_and_load(self):
+        """
+        Test entries with tuple keys survive being saved and loaded
+        """
+
+        cache = ai_cache.LRUCache(10)
+        cache.put((8, 1, 2, "Dark ", (("depth", 1),)), (5, 1.5))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "cache.json")
+            cache.save(path)
+            loaded = ai_cache.LRUCache(10)
+            loaded.load(path)
+        self.assertEqual(loaded.get((8, 1, 2, "Dark ", (("depth", 1),))), (5, 1.5))
+
+
+class TestCachedBestMove(unittest.TestCase):
+    """
+    Contains tests for looking up AI moves through the cache
+    """
+
+    def setUp(self):
+        """
+        Start each test with an empty cache
+        """
+
+        ai_cache.cache.clear()
+
+    def test_symmetric_positions_share_an_entry(self):
+        """
+        Test a position and its mirror image use one cache entry and both get a legal move
+        """
+
+        settings = search.normalise_settings({"engine": "alphabeta", "depth": 2})
+        board = components.initialise_board(8)
+        board[2][3] = "Dark "
+        board[3][3] = "Dark "
+        dark, light = bitboard.from_board(board)
+
+        for symmetry in (0, 1, 4):
+            mirrored_dark = bitboard.transform(dark, symmetry, 8)
+            mirrored_light = bitboard.transform(light, symmetry, 8)
+            square, _ = ai_cache.cached_best_move(mirrored_dark, mirrored_light, "Light", 8, settings)
+            mirrored_board = bitboard.to_board(mirrored_dark, mirrored_light, 8)
+            self.assertTrue(components.legal_move("Light", (square % 8 + 1, square // 8 + 1), mirrored_board))
+
+        self.assertEqual(ai_cache.cache.stats()["misses"], 1)
+        self.assertEqual(ai_cache.cache.stats()["hits"], 2)
+
+    def test_greedy_engine_uses_the_real_board(self):
+        """
+        Test the greedy engine chooses the same move with the cache as without it,
+        including between squares with the same score map value
+        """
+
+        settings = search.normalise_settings({})
+        for player, opponent in random_positions(200):
+            dark, light = opponent, player
+            expected = search.best_move(player, opponent, 8, settings)["square"]
+            self.assertEqual(ai_cache.cached_best_move(dark, light, "Light", 8, settings)[0], expected)
+            # Twice so the second answer comes from the cache
+            self.assertEqual(ai_cache.cached_best_move(dark, light, "Light", 8, settings)[0], expected)
+
+    def test_ranking_cached_only_when_it_agrees(self):
+        """
+        Test the best move of a ranking is cached as the engine's move only when
+        best_move would choose the same move with the same settings
+        """
+
+        dark, light = bitboard.from_board(components.initialise_board(8))
+        plain = search.normalise_settings({"engine": "alphabeta", "depth": 3})
+        ranking = ai_cache.ranked_moves(dark, light, "Dark ", 8, plain, 2)
+        self.assertEqual(len(ai_cache.cache), 1)
+        self.assertEqual(ai_cache.cached_best_move(dark, light, "Dark ", 8, plain)[0], ranking[0]["square"])
+
+        ai_cache.cache.clear()
+        for extra in ({"nodes": 50}, {"probcut": 1}):
+            ai_cache.ranked_moves(dark, light, "Dark ", 8, search.normalise_settings(dict(plain, **extra)), 2)
+        self.assertEqual(len(ai_cache.cache), 0)
+
+    def test_settings_are_part_of_the_key(self):
+        """
+        Test different engine settings do not share cache entries
+        """
+
+        dark, light = bitboard.from_board(components.initialise_board(8))
+        for depth in (1, 2):
+            settings = search.normalise_settings({"engine": "alphabeta", "depth": depth})
+            ai_cache.cached_best_move(dark, light, "Dark ", 8, settings)
+        self.assertEqual(ai_cache.cache.stats()["misses"], 2)
+
+if __name__ == "__main__":
+    unittest.main()
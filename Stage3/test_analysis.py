@@ -0,0 +1,107 @@
+"""
+Tests for analysis.py and the '/analyse' route
+"""
+
+import concurrent.futures
+import json
+import unittest
+import ai_cache
+import analysis
+import components
+import encoding
+import records
+import search
+import flask_game_engine as fge
+
+def position_after(moves, player):
+    """
+    Gets a batch position for the board after some moves from the start.
+    """
+    dark, light, _ = records.replay(records.parse_moves(moves))[-1]
+    return {"board": encoding.encode_board(fge.bitboard.to_board(dark, light, 8)), "player": player}
+
+class TestAnalysis(unittest.TestCase):
+    """
+    Contains tests for analysing batches of positions
+    """
+
+    def setUp(self):
+        """
+        Empty the AI cache and make a thread pool for the searches
+        """
+        ai_cache.cache.clear()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+        self.positions = [position_after("", "Dark"), position_after("d6", "Light"),
+                          position_after("d6 c4", "Dark"), position_after("d6 c4 b3", "light")]
+        self.settings = search.normalise_settings({"engine": "alphabeta", "depth": 3})
+
+    def test_results_match_single_searches(self):
+        """
+        Test every position gets the same move as searching it on its own, and its legal moves
+        """
+        results = list(analysis.analyse(self.positions, self.settings, self.pool))
+        self.assertEqual(sorted(result["index"] for result in results), [0, 1, 2, 3])
+        for result in results:
+            position = self.positions[result["index"]]
+            board = encoding.decode_board(position["board"])
+            colour = analysis.parse_colour(position["player"])
+            with self.subTest(index=result["index"]):
+                self.assertEqual(result["status"], "success")
+                self.assertEqual(tuple(result["best_move"]), search.best_move_for_board(board, colour, self.settings))
+                self.assertIn(result["best_move"], result["legal_moves"])
+                for x, y in result["legal_moves"]:
+                    self.assertTrue(components.legal_move(colour, (x, y), board))
+
+    def test_cached_positions_skip_the_pool(self):
+        """
+        Test a second batch of the same positions is answered from the AI cache
+        """
+        first = sorted(analysis.analyse(self.positions, self.settings, self.pool), key=lambda result: result["index"])
+        self.pool.shutdown()
+        second = list(analysis.analyse(self.positions, self.settings, self.pool))
+        self.assertEqual(second, first)
+
+    def test_invalid_positions(self):
+        """
+        Test bad positions get a fail result without stopping the rest of the batch
+        """
+        positions = [{"board": "...", "player": "Dark"}, {"player": "Dark"}, "e6",
+                     {"board": self.positions[0]["board"], "player": "Blue"}, self.positions[0]]
+        results = list(analysis.analyse(positions, search.normalise_settings({}), self.pool))
+        self.assertEqual([result["status"] for result in results], ["fail"] * 4 + ["success"])
+
+    def test_invalid_batches(self):
+        """
+        Test batches of the wrong shape, too many positions or bad settings raise a ValueError
+        """
+        for data in (None, {"positions": "e6"}, {"positions": [{}] * (analysis.MAX_POSITIONS + 1)},
+                     {"positions": [], "engine": "magic"}):
+            with self.subTest(data=str(data)[:40]):
+                with self.assertRaises(ValueError):
+                    analysis.parse_batch(data)
+
+class TestAnalyseRoute(unittest.TestCase):
+    """
+    Contains tests for the '/analyse' route of the Flask app
+    """
+
+    def test_streams_ndjson(self):
+        """
+        Test the route streams one JSON line per position and leaves the game alone
+        """
+        board = [row[:] for row in fge.game_state["board"]]
+        client = fge.app.test_client()
+        positions = [position_after("", "Dark"), position_after("d6", "Light")]
+        response = client.post('/analyse', json={"positions": positions})
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(sorted(line["index"] for line in lines), [0, 1])
+        self.assertTrue(all(line["status"] == "success" for line in lines))
+        self.assertEqual(fge.game_state["board"], board)
+
+        response = client.post('/analyse', json={"moves": []})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,328 @@
+"""
+Tests for asgi_app.py and asgi_server.py
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import time
+import unittest
+import admission
+import ai_cache
+import analysis
+import asgi_app
+import asgi_server
+import bitboard
+import difficulty
+import encoding
+import ponder
+import search
+import flask_game_engine as fge
+
+async def request(method, path, query=b"", headers=(), body=b""):
+    """
+    Sends one request straight to the ASGI app on the running event loop.
+
+    Returns:
+        tuple(int, dict, bytes): The status code, headers and body of the response.
+    """
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "path": path,
+        "query_string": query, "headers": list(headers), "server": ("testserver", 80),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi_app.app(scope, receive, send)
+    headers = {name.decode(): value.decode() for name, value in sent[0]["headers"]}
+    return sent[0]["status"], headers, b"".join(message.get("body", b"") for message in sent[1:])
+
+def call(method, path, query=b"", headers=(), body=b""):
+    """
+    Sends one request straight to the ASGI app (see request).
+    """
+    return asyncio.run(request(method, path, query, headers, body))
+
+class TestAsgiApp(unittest.TestCase):
+    """
+    Contains tests for the routes of the ASGI app
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Stop the AI worker processes if a test started them
+        """
+        analysis.shutdown_pool()
+
+    def setUp(self):
+        """
+        Reset the game and the AI cache for each test
+        """
+        fge.game_state['board'] = fge.components.initialise_board()
+        fge.game_state['current_player'] = 'Dark '
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        ai_cache.cache.clear()
+
+    def test_move_matches_flask(self):
+        """
+        Test a move gives the same response as the Flask route
+        """
+        status, headers, body = call("GET", "/move", b"x=4&y=6")
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-type"], "application/json")
+        data = json.loads(body)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['player'], 'Light')
+        self.assertEqual(data['board'], fge.game_state['board'])
+
+        data = json.loads(call("GET", "/move", b"x=4&y=4")[2])
+        self.assertEqual(data['message'], 'Move is not legal')
+        data = json.loads(call("GET", "/move", b"x=a&y=4")[2])
+        self.assertEqual(data['status'], 'fail')
+
+    def test_move_board_format(self):
+        """
+        Test the Accept header chooses the board format
+        """
+        body = call("GET", "/move", b"x=4&y=6", [(b"accept", b"application/vnd.reversi.compact+json")])[2]
+        self.assertEqual(len(json.loads(body)['board']), 64)
+
+    def test_position(self):
+        """
+        Test spectators are served the snapshot of the game straight from the event loop
+        """
+        call("GET", "/move", b"x=4&y=6")
+        data = json.loads(call("GET", "/position")[2])
+        self.assertEqual(data['player'], 'Light')
+        self.assertEqual(data['board'], fge.game_state['board'])
+
+    def test_ai_move(self):
+        """
+        Test the greedy and alpha-beta engines both give a legal move for Light
+        """
+        call("GET", "/move", b"x=4&y=6")
+        for query in (b"", b"engine=alphabeta&depth=3"):
+            with self.subTest(query=query):
+                data = json.loads(call("GET", "/ai_move", query)[2])
+                self.assertEqual(data['status'], 'success')
+                self.assertTrue(fge.components.legal_move("Light", (data['x'], data['y']), fge.game_state['board']))
+
+        data = json.loads(call("GET", "/ai_move", b"engine=magic")[2])
+        self.assertEqual(data['status'], 'fail')
+
+    def test_ai_move_multipv(self):
+        """
+        Test a ranking from the worker processes matches the Flask route
+        """
+        call("GET", "/move", b"x=4&y=6")
+        query = b"engine=alphabeta&depth=3&multipv=3"
+        data = json.loads(call("GET", "/ai_move", query)[2])
+        self.assertEqual(len(data['moves']), 3)
+        expected = json.loads(fge.app.test_client().get('/ai_move?' + query.decode()).data)
+        self.assertEqual(data, expected)
+
+        # A tier's ranking is metered by its cost and keeps to the tier's node budget
+        cost = fge.difficulty.TIER_COST.labels('expert').value
+        nodes = ai_cache.AI_NODES.labels('alphabeta').value
+        data = json.loads(call("GET", "/ai_move", b"difficulty=expert&multipv=32")[2])
+        self.assertEqual(len(data['moves']), 3)
+        self.assertEqual(fge.difficulty.TIER_COST.labels('expert').value, cost + fge.difficulty.get_tier('expert')['cost'])
+        budget = fge.difficulty.get_tier('expert')['settings']['nodes']
+        self.assertLessEqual(ai_cache.AI_NODES.labels('alphabeta').value - nodes, budget + len(data['moves']) + 1)
+
+    def test_random_move_off_the_event_loop(self):
+        """
+        Test the ranking a tier's random move is chosen from is searched off the event loop,
+        so a spectator is answered while it runs
+        """
+        call("GET", "/move", b"x=4&y=6")
+        # A thread pool shares the slowed down search, which would hold up the event loop if it ran there
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        ranked_moves = search.ranked_moves
+
+        def slow_ranked_moves(*args):
+            time.sleep(0.5)
+            return ranked_moves(*args)
+
+        medium = difficulty.TIERS["medium"]
+        self.addCleanup(setattr, analysis, "get_pool", analysis.get_pool)
+        self.addCleanup(setattr, search, "ranked_moves", ranked_moves)
+        self.addCleanup(medium.__setitem__, "randomise", medium["randomise"])
+        analysis.get_pool = lambda: pool
+        search.ranked_moves = slow_ranked_moves
+        medium["randomise"] = {"chance": 1.0, "top": 2}
+
+        async def together():
+            move = asyncio.create_task(request("GET", "/ai_move", b"difficulty=medium"))
+            await asyncio.sleep(0.1)
+            position = await request("GET", "/position")
+            self.assertFalse(move.done())
+            return position, await move
+
+        position, move = asyncio.run(together())
+        self.assertEqual(json.loads(position[2])['player'], 'Light')
+        data = json.loads(move[2])
+        self.assertTrue(fge.components.legal_move("Light", (data['x'], data['y']), fge.game_state['board']))
+
+    def test_cached_move_leaves_ponder(self):
+        """
+        Test a move answered from the AI cache does not claim the session's ponder, and the
+        ponder is cancelled rather than left running when the next one starts
+        """
+        self.addCleanup(setattr, ponder, "ENABLED", ponder.ENABLED)
+        self.addCleanup(ponder.clear)
+        ponder.ENABLED = True
+        call("GET", "/move", b"x=4&y=6")
+        settings = search.normalise_settings({"engine": "alphabeta", "depth": 2})
+        dark, light = bitboard.from_board(fge.game_state['board'])
+        square, _ = ai_cache.cached_best_move(dark, light, "Light", 8, settings)
+
+        current = ponder.Ponder(settings, "Light", 8)
+        current.key = ai_cache.canonical_position(dark, light, "Light", 8, settings)[1]
+        current.future = concurrent.futures.Future()
+        ponder._ponders[None] = current
+
+        hits = ponder.HITS.value
+        data = json.loads(call("GET", "/ai_move", b"engine=alphabeta&depth=2")[2])
+        self.assertEqual((data['x'], data['y']), (square % 8 + 1, square // 8 + 1))
+        self.assertEqual(ponder.HITS.value, hits)
+        self.assertTrue(current.future.cancelled())
+
+    def test_ai_move_admission(self):
+        """
+        Test an AI request over its budget is downgraded and one that does not fit at all is shed
+        """
+        previous = (admission.ENABLED, admission.control)
+        admission.ENABLED = True
+        # The clock never moves so the buckets are not refilled during the test
+        admission.control = admission.AdmissionControl(60, 1000, 1, clock=lambda: 0.0)
+        self.addCleanup(setattr, admission, "control", previous[1])
+        self.addCleanup(setattr, admission, "ENABLED", previous[0])
+
+        call("GET", "/move", b"x=4&y=6")
+        self.assertNotIn('difficulty', json.loads(call("GET", "/ai_move", b"difficulty=hard")[2]))
+        self.assertEqual(json.loads(call("GET", "/ai_move", b"difficulty=hard")[2])['difficulty'], 'medium')
+        admission.control._clients[""].tokens = 0
+        status, headers, _ = call("GET", "/ai_move", b"difficulty=hard")
+        self.assertEqual(status, 429)
+        self.assertIn('retry-after', headers)
+
+    def test_analyse(self):
+        """
+        Test a batch is analysed in the worker processes and streamed back line by line
+        """
+        board = encoding.encode_board(fge.components.initialise_board())
+        body = json.dumps({"positions": [{"board": board, "player": "Dark"}, {"board": board, "player": "Light"}],
+                           "engine": "alphabeta", "depth": 2}).encode()
+        status, headers, body = call("POST", "/analyse", body=body)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["content-type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual(sorted(line["index"] for line in lines), [0, 1])
+        self.assertEqual(len(lines[0]["legal_moves"]), 4)
+
+        self.assertEqual(call("POST", "/analyse", body=b"not json")[0], 400)
+
+    def test_analyse_admission(self):
+        """
+        Test a batch is charged as a whole, and shed with a retry-after header when even the cheapest tier does not fit
+        """
+        previous = (admission.ENABLED, admission.control)
+        admission.ENABLED = True
+        admission.control = admission.AdmissionControl(60, 1000, 1, clock=lambda: 0.0)
+        self.addCleanup(setattr, admission, "control", previous[1])
+        self.addCleanup(setattr, admission, "ENABLED", previous[0])
+
+        board = encoding.encode_board(fge.components.initialise_board())
+        batch = {"positions": [{"board": board, "player": "Dark"}] * 2, "engine": "alphabeta", "depth": 4}
+        status, _, body = call("POST", "/analyse", body=json.dumps(batch).encode())
+        self.assertEqual(status, 200)
+        self.assertEqual([json.loads(line)["difficulty"] for line in body.decode().splitlines()], ["medium", "medium"])
+
+        admission.control._clients[""].tokens = 10
+        batch["positions"] = batch["positions"] * 128
+        status, headers, _ = call("POST", "/analyse", body=json.dumps(batch).encode())
+        self.assertEqual(status, 429)
+        self.assertEqual(headers["retry-after"], "1")
+
+    def test_flask_fallback(self):
+        """
+        Test routes not handled by the ASGI app are passed on to the Flask app
+        """
+        status, headers, body = call("GET", "/save")
+        self.assertEqual(status, 200)
+        self.assertIn("attachment", headers["content-disposition"])
+        self.assertEqual(json.loads(body)['current_player'], 'Dark ')
+
+        call("GET", "/move", b"x=4&y=6")
+        status, headers, _ = call("POST", "/reset")
+        self.assertEqual(status, 302)
+        self.assertEqual(fge.game_state['current_player'], 'Dark ')
+
+        self.assertEqual(call("GET", "/missing")[0], 404)
+
+class TestAsgiServer(unittest.TestCase):
+    """
+    Contains tests for the built-in HTTP server
+    """
+
+    def test_keep_alive(self):
+        """
+        Test several requests can be sent over one connection
+        """
+        async def run():
+            server = await asgi_server.start(asgi_app.app, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            responses = []
+            for _ in range(3):
+                writer.write(b"GET /move?x=0&y=0 HTTP/1.1\r\nHost: test\r\n\r\n")
+                headers = (await reader.readuntil(b"\r\n\r\n")).decode()
+                length = int(headers.lower().split("content-length: ")[1].split("\r\n")[0])
+                responses.append((headers, json.loads(await reader.readexactly(length))))
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return responses
+
+        for headers, data in asyncio.run(run()):
+            self.assertTrue(headers.startswith("HTTP/1.1 200 OK"))
+            self.assertIn("connection: keep-alive", headers)
+            self.assertEqual(data['status'], 'fail')
+
+    def test_streamed_response_is_chunked(self):
+        """
+        Test a response sent in several parts is written with chunked transfer encoding
+        """
+        async def streaming_app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            for part in (b"one\n", b"two\n"):
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def run():
+            server = await asgi_server.start(streaming_app, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET / HTTP/1.1\r\nHost: test\r\nConnection: close\r\n\r\n")
+            data = await reader.read()
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            return data
+
+        data = asyncio.run(run())
+        self.assertIn(b"transfer-encoding: chunked", data)
+        self.assertTrue(data.endswith(b"4\r\none\n\r\n4\r\ntwo\n\r\n0\r\n\r\n"))
+
+if __name__ == "__main__":
+    unittest.main()
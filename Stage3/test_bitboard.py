@@ -0,0 +1,138 @@
+"""
+Tests for bitboard.py
+"""
+
+import random
+import unittest
+import bitboard
+import components
+
+class TestConversion(unittest.TestCase):
+    """
+    Contains tests for converting between list boards and masks
+    """
+
+    def test_round_trip(self):
+        """
+        Test from_board and to_board give back the same board for every size
+        """
+
+        for size in (4, 8, 16):
+            with self.subTest(size=size):
+                board = components.initialise_board(size)
+                dark, light = bitboard.from_board(board)
+                self.assertEqual(bitboard.to_board(dark, light, size), board)
+
+    def test_starting_counters(self):
+        """
+        Test the starting position has 2 counters of each colour in the right places
+        """
+
+        dark, light = bitboard.from_board(components.initialise_board(8))
+        self.assertEqual(dark, bitboard.bit(3, 3, 8) | bitboard.bit(4, 4, 8))
+        self.assertEqual(light, bitboard.bit(4, 3, 8) | bitboard.bit(3, 4, 8))
+
+
+class TestMoves(unittest.TestCase):
+    """
+    Contains tests for move generation and flipping
+    """
+
+    def test_legal_moves_match_components(self):
+        """
+        Test legal_moves finds exactly the moves components.legal_move accepts
+        throughout random games on different board sizes
+        """
+
+        rng = random.Random(0)
+        for size in (4, 8, 10):
+            geo = bitboard.geometry(size)
+            board = components.initialise_board(size)
+            dark, light = bitboard.from_board(board)
+            colour = "Dark "
+            for _ in range(size * size):
+                player, opponent = bitboard.split_colours(dark, light, colour)
+                moves = bitboard.legal_moves(player, opponent, geo)
+
+                # Compare against the slower list based check for every square
+                board = bitboard.to_board(dark, light, size)
+                for y in range(size):
+                    for x in range(size):
+                        expected = components.legal_move(colour, (x + 1, y + 1), board)
+                        self.assertEqual(bool(moves & bitboard.bit(x, y, size)), expected)
+
+                colour = "Dark " if colour == "Light" else "Light"
+                if not moves:
+                    continue
+                squares = [i for i in range(geo.cells) if moves >> i & 1]
+                player, opponent = bitboard.play(player, opponent, 1 << rng.choice(squares), geo)
+                dark, light = (player, opponent) if colour == "Light" else (opponent, player)
+
+    def test_flips_in_every_direction(self):
+        """
+        Test a move surrounded by lines of opponent counters flips all of them
+        """
+
+        geo = bitboard.geometry(8)
+
+        # Dark ring around the edge of a 5x5 area with light counters inside,
+        # Dark plays in the middle square
+        player = 0
+        opponent = 0
+        for dx, dy in bitboard.DIRECTIONS:
+            opponent |= bitboard.bit(3 + dx, 3 + dy, 8)
+            player |= bitboard.bit(3 + 2 * dx, 3 + 2 * dy, 8)
+        move = bitboard.bit(3, 3, 8)
+        self.assertEqual(bitboard.flips(player, opponent, move, geo), opponent)
+
+    def test_flips_do_not_wrap_around_rows(self):
+        """
+        Test a line that would continue off the right side of the board is not flipped
+        """
+
+        geo = bitboard.geometry(8)
+
+        # Light counter on the last column with a dark counter at the start of the next row
+        opponent = bitboard.bit(7, 2, 8)
+        player = bitboard.bit(0, 3, 8)
+        move = bitboard.bit(6, 2, 8)
+        self.assertEqual(bitboard.flips(player, opponent, move, geo), 0)
+
+
+class TestStable(unittest.TestCase):
+    """
+    Contains tests for the stable counter estimate
+    """
+
+    def test_corner_is_stable(self):
+        """
+        Test a counter in the corner is stable and a lone middle counter is not
+        """
+
+        geo = bitboard.geometry(8)
+        player = bitboard.bit(0, 0, 8) | bitboard.bit(4, 4, 8)
+        self.assertEqual(bitboard.stable(player, 0, geo), bitboard.bit(0, 0, 8))
+
+    def test_edge_line_from_corner_is_stable(self):
+        """
+        Test counters running along the top edge from an owned corner are stable
+        """
+
+        geo = bitboard.geometry(8)
+        player = 0
+        for x in range(4):
+            player |= bitboard.bit(x, 0, 8)
+        self.assertEqual(bitboard.stable(player, 0, geo), player)
+
+    def test_full_board_is_stable(self):
+        """
+        Test every counter is stable when the board is full
+        """
+
+        geo = bitboard.geometry(8)
+        player = geo.full & 0x5555555555555555
+        opponent = geo.full & ~player
+        self.assertEqual(bitboard.stable(player, opponent, geo), player)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -202,5 +202,78 @@ class TestPrintBoard(unittest.TestCase):
         self.assertIn("Light", output)
         self.assertIn("None", output)
 
+    def test_render_layout(self):
+        """
+        Test the columns stay 6 characters wide once the numbers have 2 digits
+        """
+
+        lines = components.render_board(components.initialise_board(16)).splitlines()
+        self.assertEqual(len(lines), 17)
+        self.assertTrue(lines[0].startswith("   1     2 "))
+        self.assertTrue(lines[0].endswith("9     10    11    12    13    14    15    16    "))
+        self.assertEqual(lines[8], "8  " + "None  " * 7 + "Dark  Light " + "None  " * 7)
+        self.assertTrue(lines[10].startswith("10 None "))
+
+    def test_diff_printer_redraws_changed_cells(self):
+        """
+        Test the diff printer only writes the cells that changed and that its
+        escape codes leave the terminal showing the new board
+        """
+
+        board = components.initialise_board(8)
+        output = io.StringIO()
+        printer = components.BoardPrinter(diff=True, file=output)
+        printer.board(board)
+        board[5][3] = "Dark "
+        board[4][3] = "Dark "
+        start = len(output.getvalue())
+        printer.board(board)
+        self.assertEqual(output.getvalue()[start:].count("Dark "), 2)
+        self.assertEqual(terminal_screen(output.getvalue()), components.render_board(board).splitlines())
+
+        # Other text moves the cursor so the next board is printed in full below it
+        printer.write("Light has no legal moves! Passing turn\n")
+        printer.board(board)
+        self.assertTrue(output.getvalue().endswith(components.render_board(board)))
+
+def terminal_screen(text):
+    """
+    Plays text with the cursor movement codes used by BoardPrinter onto a blank screen.
+
+    Returns:
+        list[str]: The lines on the screen.
+    """
+    screen = [[]]
+    row = column = 0
+    i = 0
+    while i < len(text):
+        if text[i] == "\x1b":
+            end = i + 2
+            while not text[end].isalpha():
+                end += 1
+            amount = int(text[i + 2:end])
+            if text[end] == "A":
+                row -= amount
+            elif text[end] == "B":
+                row += amount
+            else:
+                column = amount - 1
+            i = end + 1
+            continue
+        if text[i] == "\n":
+            row += 1
+            column = 0
+        elif text[i] == "\r":
+            column = 0
+        else:
+            while len(screen) <= row:
+                screen.append([])
+            line = screen[row]
+            line.extend(" " * (column + 1 - len(line)))
+            line[column] = text[i]
+            column += 1
+        i += 1
+    return ["".join(line) for line in screen if line]
+
 if __name__ == "__main__":
     unittest.main()
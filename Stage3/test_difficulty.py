@@ -0,0 +1,99 @@
+"""
+Tests for difficulty.py
+"""
+
+import random
+import unittest
+import ai_cache
+import bitboard
+import components
+import difficulty
+import search
+
+class TestDifficulty(unittest.TestCase):
+    """
+    Contains tests for the difficulty tiers
+    """
+
+    def setUp(self):
+        """
+        Use the starting position with Dark to move and fixed random numbers
+        """
+        self.dark, self.light = bitboard.from_board(components.initialise_board(8))
+        self.rng = difficulty.rng
+        difficulty.rng = random.Random(1)
+        self.addCleanup(setattr, difficulty, "rng", self.rng)
+        ai_cache.cache.clear()
+
+    def test_tiers(self):
+        """
+        Test every tier has complete settings, a cost, and is listed with whether it is metered
+        """
+        listed = {tier["name"]: tier for tier in difficulty.describe()}
+        self.assertEqual(list(listed), list(difficulty.TIERS))
+        for name, tier in difficulty.TIERS.items():
+            with self.subTest(tier=name):
+                self.assertEqual(search.normalise_settings(tier["settings"]), tier["settings"])
+                self.assertGreater(tier["cost"], 0)
+                self.assertEqual(listed[name]["metered"], tier["cost"] >= difficulty.METERED_COST)
+        costs = [tier["cost"] for tier in difficulty.TIERS.values()]
+        self.assertEqual(costs, sorted(costs))
+
+    def test_parse_request(self):
+        """
+        Test a difficulty replaces the engine settings and unknown tiers raise a ValueError
+        """
+        settings, tier = difficulty.parse_request({"difficulty": "hard", "engine": "greedy"})
+        self.assertEqual(tier["name"], "hard")
+        self.assertEqual(settings["engine"], "alphabeta")
+        self.assertEqual(difficulty.parse_request({"depth": "2", "engine": "alphabeta"}),
+                         (search.normalise_settings({"depth": 2, "engine": "alphabeta"}), None))
+        with self.assertRaises(ValueError):
+            difficulty.parse_request({"difficulty": "impossible"})
+
+    def test_random_moves(self):
+        """
+        Test the randomise rules pick legal moves from the right set, and only some of the time
+        """
+        moves = bitboard.legal_moves(self.dark, self.light, bitboard.geometry(8))
+        beginner = difficulty.get_tier("beginner")
+        picks = [difficulty.random_move(beginner, self.dark, self.light, "Dark ", 8) for _ in range(200)]
+        random_picks = [square for square in picks if square is not None]
+        self.assertTrue(50 < len(random_picks) < 150)
+        self.assertTrue(all(moves >> square & 1 for square in random_picks))
+
+        easy = dict(difficulty.get_tier("easy"), randomise={"chance": 1, "top": 2})
+        top = [move["square"] for move in ai_cache.ranked_moves(self.dark, self.light, "Dark ", 8, easy["settings"], 2)]
+        for _ in range(20):
+            self.assertIn(difficulty.random_move(easy, self.dark, self.light, "Dark ", 8), top)
+        # A ranking searched somewhere else is used instead of ranking again
+        ranking = [{"square": top[1], "score": 0, "pv": [top[1]]}]
+        self.assertEqual(difficulty.random_choice(easy, self.dark, self.light, "Dark ", 8, ranking), top[1])
+
+        self.assertIsNone(difficulty.random_move(difficulty.get_tier("hard"), self.dark, self.light, "Dark ", 8))
+        self.assertIsNone(difficulty.random_move(None, self.dark, self.light, "Dark ", 8))
+
+    def test_random_moves_keep_to_budget(self):
+        """
+        Test a randomise rule ranking the top moves keeps to the tier's node budget
+        """
+        tier = dict(difficulty.get_tier("expert"), randomise={"chance": 1, "top": 3})
+        nodes = ai_cache.AI_NODES.labels("alphabeta").value
+        square = difficulty.random_move(tier, self.dark, self.light, "Dark ", 8)
+        self.assertTrue(bitboard.legal_moves(self.dark, self.light, bitboard.geometry(8)) >> square & 1)
+        # The one move ranking of the 4 legal moves is always finished
+        self.assertLessEqual(ai_cache.AI_NODES.labels("alphabeta").value - nodes, tier["settings"]["nodes"] + 5)
+        # A budgeted ranking may not match the tier's best move, so it is not cached
+        self.assertEqual(len(ai_cache.cache), 0)
+
+    def test_time_budget_not_cached(self):
+        """
+        Test moves from a time limited tier are not kept in the AI cache
+        """
+        settings = dict(difficulty.get_tier("master")["settings"], time=20)
+        square, _ = ai_cache.cached_best_move(self.dark, self.light, "Dark ", 8, settings)
+        self.assertIsNotNone(square)
+        self.assertEqual(len(ai_cache.cache), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for evaluation.py
+"""
+
+import unittest
+import bitboard
+import components
+import evaluation
+
+class TestTerms(unittest.TestCase):
+    """
+    Contains tests for the individual evaluation terms
+    """
+
+    def setUp(self):
+        """
+        Set up the starting position for Dark for each test
+        """
+
+        self.geo = bitboard.geometry(8)
+        dark, light = bitboard.from_board(components.initialise_board(8))
+        self.player = dark
+        self.opponent = light
+
+    def test_starting_position_is_balanced(self):
+        """
+        Test every term scores 0 in the symmetric starting position except parity
+        """
+
+        for name, term in evaluation.TERMS.items():
+            if name == "parity":
+                continue
+            with self.subTest(term=name):
+                self.assertEqual(term(self.player, self.opponent, self.geo), 0)
+
+    def test_terms_are_antisymmetric(self):
+        """
+        Test swapping the players negates every term except parity
+        """
+
+        player, opponent = bitboard.play(self.player, self.opponent, bitboard.bit(3, 2, 8), self.geo)
+        for name, term in evaluation.TERMS.items():
+            if name == "parity":
+                continue
+            with self.subTest(term=name):
+                self.assertAlmostEqual(term(player, opponent, self.geo), -term(opponent, player, self.geo))
+
+    def test_corner_is_good(self):
+        """
+        Test owning a corner raises the corners term and the full evaluation
+        """
+
+        with_corner = self.player | bitboard.bit(0, 0, 8)
+        self.assertGreater(evaluation.corners(with_corner, self.opponent, self.geo), 0)
+        self.assertGreater(evaluation.evaluate(with_corner, self.opponent, 8),
+                           evaluation.evaluate(self.player | bitboard.bit(2, 2, 8), self.opponent, 8))
+
+    def test_x_square_is_bad(self):
+        """
+        Test a counter on an X-square next to an empty corner lowers the edges term
+        """
+
+        with_x_square = self.player | bitboard.bit(1, 1, 8)
+        self.assertLess(evaluation.edges(with_x_square, self.opponent, self.geo), 0)
+
+    def test_game_phase(self):
+        """
+        Test the phase moves from opening to endgame as the board fills
+        """
+
+        self.assertEqual(evaluation.game_phase(self.player, self.opponent, self.geo), "opening")
+        half = self.geo.full & 0xFFFFFFFF
+        self.assertEqual(evaluation.game_phase(half, 0, self.geo), "midgame")
+        self.assertEqual(evaluation.game_phase(self.geo.full, 0, self.geo), "endgame")
+
+
+class TestEvaluators(unittest.TestCase):
+    """
+    Contains tests for choosing and registering evaluators
+    """
+
+    def test_evaluate_board(self):
+        """
+        Test evaluate_board scores a list board from both sides
+        """
+
+        board = components.initialise_board(8)
+        board[0][0] = "Dark "
+        self.assertGreater(evaluation.evaluate_board(board, "Dark "), 0)
+        self.assertLess(evaluation.evaluate_board(board, "Light", "positional"), 0)
+
+    def test_unknown_evaluator(self):
+        """
+        Test asking for an evaluator that does not exist raises a ValueError
+        """
+
+        with self.assertRaises(ValueError):
+            evaluation.get_evaluator("missing")
+
+    def test_register_term(self):
+        """
+        Test a registered term can be used in custom weight tables
+        """
+
+        evaluation.register_term("constant", lambda player, opponent, geo: 1)
+        try:
+            weights = {phase: {"constant": 7} for phase in ("opening", "midgame", "endgame")}
+            self.assertEqual(evaluation.evaluate(0, 0, 8, weights), 7)
+        finally:
+            del evaluation.TERMS["constant"]
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for _fastcore.pyx, the optional compiled core
+"""
+
+import unittest
+import bitboard
+import evaluation
+from benchmarks.common import random_positions
+
+@unittest.skipIf(bitboard.load_native() is None, "the compiled core has not been built")
+class TestNativeCore(unittest.TestCase):
+    """
+    Contains tests that the compiled core gives exactly the same results as the Python reference
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Collect positions from every phase of the game and a Geometry that always uses Python
+        """
+        cls.positions = random_positions(1500)
+        cls.native = bitboard.geometry(8)
+        cls.python = bitboard.Geometry(8, native_core=False)
+
+    def test_chosen_for_8x8_only(self):
+        """
+        Test the compiled core is only used for the board size it was written for
+        """
+        self.assertTrue(self.native.native)
+        self.assertFalse(self.python.native)
+        self.assertFalse(bitboard.geometry(6).native)
+
+    def test_moves_and_flips(self):
+        """
+        Test legal moves, flips and the position after every legal move match
+        """
+        for player, opponent in self.positions:
+            moves = bitboard.legal_moves(player, opponent, self.python)
+            self.assertEqual(bitboard.legal_moves(player, opponent, self.native), moves)
+            for square in range(64):
+                move = 1 << square
+                # Illegal squares must give no flips in both versions too
+                self.assertEqual(bitboard.flips(player, opponent, move, self.native),
+                                 bitboard.flips(player, opponent, move, self.python))
+                if moves & move:
+                    self.assertEqual(bitboard.play(player, opponent, move, self.native),
+                                     bitboard.play(player, opponent, move, self.python))
+
+    def test_stable(self):
+        """
+        Test the same counters are found to be stable
+        """
+        for player, opponent in self.positions:
+            self.assertEqual(bitboard.stable(player, opponent, self.native),
+                             bitboard.stable(player, opponent, self.python))
+
+    def test_evaluate(self):
+        """
+        Test the compiled evaluation gives the same score, to the last bit, as adding up the
+        Python terms with the Python geometry
+        """
+        for player, opponent in self.positions:
+            phase = evaluation.game_phase(player, opponent, self.python)
+            expected = 0
+            for name, weight in evaluation.PHASE_WEIGHTS[phase].items():
+                expected += weight * evaluation.TERMS[name](player, opponent, self.python)
+            self.assertEqual(evaluation.evaluate(player, opponent, 8), expected)
+
+    def test_changed_weights_are_picked_up(self):
+        """
+        Test changing PHASE_WEIGHTS or wrapping a term is picked up instead of using stale tables
+        """
+        player, opponent = self.positions[500]
+        before = evaluation.evaluate(player, opponent, 8)
+        original = dict(evaluation.PHASE_WEIGHTS)
+        try:
+            evaluation.PHASE_WEIGHTS = {phase: {"corners": 1} for phase in original}
+            self.assertEqual(evaluation.evaluate(player, opponent, 8),
+                             evaluation.corners(player, opponent, self.python))
+        finally:
+            evaluation.PHASE_WEIGHTS = original
+        self.assertEqual(evaluation.evaluate(player, opponent, 8), before)
+
+        calls = []
+        term = evaluation.TERMS["corners"]
+        evaluation.TERMS["corners"] = lambda *args: calls.append(args) or term(*args)
+        try:
+            self.assertEqual(evaluation.evaluate(player, opponent, 8), before)
+        finally:
+            evaluation.TERMS["corners"] = term
+        self.assertEqual(len(calls), 1)
+
+    def test_resolved_evaluator(self):
+        """
+        Test the heuristic evaluator resolved for an 8x8 search gives the same scores as
+        evaluate, and stays in Python while a term is wrapped or for other board sizes
+        """
+        resolved = evaluation.get_evaluator("heuristic", 8)
+        self.assertIsNot(resolved, evaluation.evaluate)
+        for player, opponent in self.positions[:200]:
+            self.assertEqual(resolved(player, opponent, 8), evaluation.evaluate(player, opponent, 8))
+        self.assertIs(evaluation.get_evaluator("heuristic", 6), evaluation.evaluate)
+        self.assertIs(evaluation.get_evaluator("heuristic"), evaluation.evaluate)
+
+        term = evaluation.TERMS["corners"]
+        evaluation.TERMS["corners"] = lambda *args: term(*args)
+        try:
+            self.assertIs(evaluation.get_evaluator("heuristic", 8), evaluation.evaluate)
+        finally:
+            evaluation.TERMS["corners"] = term
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,8 +4,14 @@ Tests for flask_game_engine.py
 
 import io
 import json
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
+import encoding
 import flask_game_engine as fge
+from benchmarks import bench_startup
 
 
 class TestGameFunctions(unittest.TestCase):
@@ -118,6 +124,7 @@ class FlaskGameEngineTests(unittest.TestCase):
         fge.game_state['board'] = fge.components.initialise_board()
         fge.game_state['current_player'] = 'Dark '
         fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
 
     def test_index_route(self):
         """
@@ -166,6 +173,72 @@ class FlaskGameEngineTests(unittest.TestCase):
         self.assertEqual(response.status_code, 302)
         self.assertEqual(fge.game_state['current_player'], 'Dark ')
 
+    def test_save_then_load_round_trip(self):
+        """
+        Test a file downloaded from /save can be loaded again with /load
+        """
+
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        saved = self.client.get('/save').data
+        self.client.post('/reset')
+
+        file_data = io.BytesIO(saved)
+        response = self.client.post('/load', data={'file': (file_data, 'reversi_save.json')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(fge.game_state['current_player'], 'Light')
+        self.assertEqual(fge.position_index['counts'], {'dark': 4, 'light': 1})
+
+    def test_save_then_load_hex_board(self):
+        """
+        Test a save file written with the hex board format can be loaded again
+        """
+
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        saved = self.client.get('/save', query_string={'board_format': 'hex'}).data
+        self.assertIsInstance(json.loads(saved)['board'], dict)
+        self.client.post('/reset')
+
+        response = self.client.post('/load', data={'file': (io.BytesIO(saved), 'reversi_save.json')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(fge.position_index['counts'], {'dark': 4, 'light': 1})
+
+    def test_load_compact_board(self):
+        """
+        Test a save file with the board in the compact encoding can be loaded
+        """
+
+        save_data = {
+            "board": encoding.encode_board(fge.components.initialise_board()),
+            "current_player": "Light",
+            "game_won": False
+        }
+        file_data = io.BytesIO(json.dumps(save_data).encode())
+        response = self.client.post('/load', data={'file': (file_data, 'reversi_save.json')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(fge.game_state['board'], fge.components.initialise_board())
+
+    def test_load_invalid_file_keeps_game(self):
+        """
+        Test loading a bad file returns an error and does not change the current game
+        """
+
+        bad_files = [
+            b"not json",
+            json.dumps({"board": [["None "] * 8] * 7, "current_player": "Light", "game_won": False}).encode(),
+            json.dumps({"board": fge.components.initialise_board(), "current_player": "Blue", "game_won": False}).encode(),
+            b" " * (fge.savefile.MAX_SAVE_BYTES + 1),
+        ]
+        for contents in bad_files:
+            with self.subTest(contents=contents[:20]):
+                response = self.client.post('/load', data={'file': (io.BytesIO(contents), 'reversi_save.json')},
+                                            content_type='multipart/form-data')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(fge.game_state['board'], fge.components.initialise_board())
+                self.assertEqual(fge.game_state['current_player'], 'Dark ')
+
     def test_reset_game_route(self):
         """
         Test resetting the game returns game_state to its original state
@@ -196,6 +269,78 @@ class FlaskGameEngineTests(unittest.TestCase):
         self.assertTrue(1 <= data['x'] <= 8)
         self.assertTrue(1 <= data['y'] <= 8)
 
+    def test_ai_move_route_with_engine(self):
+        """
+        Test the AI can use the alpha-beta engine and returns a legal move for Light
+        """
+
+        # Dark has moved so it is Light's turn
+        fge.game_state['board'] = fge.execute_move('Dark ', (4, 6), fge.game_state['board'])
+        response = self.client.get('/ai_move', query_string={'engine': 'alphabeta', 'depth': 2})
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'success')
+        self.assertTrue(fge.components.legal_move('Light', (data['x'], data['y']), fge.game_state['board']))
+
+    def test_ai_move_route_multipv(self):
+        """
+        Test the AI can rank several moves with their scores and principal variations
+        """
+
+        fge.game_state['board'] = fge.execute_move('Dark ', (4, 6), fge.game_state['board'])
+        response = self.client.get('/ai_move', query_string={'engine': 'alphabeta', 'depth': 3, 'multipv': 2})
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(len(data['moves']), 2)
+        self.assertEqual((data['x'], data['y']), (data['moves'][0]['x'], data['moves'][0]['y']))
+        self.assertGreaterEqual(data['moves'][0]['score'], data['moves'][1]['score'])
+        for ranked in data['moves']:
+            self.assertTrue(fge.components.legal_move('Light', (ranked['x'], ranked['y']), fge.game_state['board']))
+            self.assertEqual(ranked['pv'][0], [ranked['x'], ranked['y']])
+            self.assertEqual(len(ranked['pv']), 3)
+
+        # The best move is the one a normal request chooses
+        response = self.client.get('/ai_move', query_string={'engine': 'alphabeta', 'depth': 3})
+        data_single = json.loads(response.data)
+        self.assertEqual((data_single['x'], data_single['y']), (data['x'], data['y']))
+
+        response = self.client.get('/ai_move', query_string={'multipv': 'all'})
+        self.assertEqual(json.loads(response.data)['status'], 'fail')
+
+        # Rankings are metered by what they cost, a search for each ranked move
+        cost = fge.difficulty.TIER_COST.labels('hard').value
+        response = self.client.get('/ai_move', query_string={'difficulty': 'hard', 'multipv': 3})
+        self.assertEqual(len(json.loads(response.data)['moves']), 3)
+        self.assertEqual(fge.difficulty.TIER_COST.labels('hard').value, cost + 3 * fge.difficulty.get_tier('hard')['cost'])
+
+    def test_ai_move_route_difficulty(self):
+        """
+        Test the AI can play Dark at a difficulty tier, and each move is metered
+        """
+
+        tiers = json.loads(self.client.get('/difficulty').data)['tiers']
+        self.assertIn('hard', [tier['name'] for tier in tiers])
+
+        moves = fge.difficulty.TIER_MOVES.labels('hard').value
+        response = self.client.get('/ai_move', query_string={'difficulty': 'hard', 'player': 'Dark'})
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'success')
+        self.assertTrue(fge.components.legal_move('Dark ', (data['x'], data['y']), fge.game_state['board']))
+        self.assertEqual(fge.difficulty.TIER_MOVES.labels('hard').value, moves + 1)
+
+        for query in ({'difficulty': 'impossible'}, {'player': 'Blue'}):
+            with self.subTest(query=query):
+                response = self.client.get('/ai_move', query_string=query)
+                self.assertEqual(json.loads(response.data)['status'], 'fail')
+
+    def test_ai_move_route_invalid_engine(self):
+        """
+        Test asking for an engine that does not exist returns a fail status
+        """
+
+        response = self.client.get('/ai_move', query_string={'engine': 'magic'})
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'fail')
+
     def test_move_route_valid(self):
         """
         Test that making a legal move passes the turn
@@ -210,6 +355,23 @@ class FlaskGameEngineTests(unittest.TestCase):
         self.assertEqual(data['player'], 'Light')
         self.assertEqual(len(data['board']), 8)
 
+    def test_move_route_board_formats(self):
+        """
+        Test the board in a move response can be asked for in the compact and hex formats
+        """
+
+        response = self.client.get('/move', query_string={'x': 4, 'y': 6, 'board_format': 'compact'})
+        data = json.loads(response.data)
+        self.assertEqual(data['board'], encoding.encode_board(fge.game_state['board']))
+
+        response = self.client.get('/move', query_string={'x': 3, 'y': 4},
+                                   headers={'Accept': 'application/vnd.reversi.hex+json'})
+        data = json.loads(response.data)
+        self.assertEqual(encoding.decode_board_hex(data['board']), fge.game_state['board'])
+
+        response = self.client.get('/move', query_string={'x': 3, 'y': 3, 'board_format': 'binary'})
+        self.assertEqual(json.loads(response.data)['status'], 'fail')
+
     def test_move_route_invalid(self):
         """
         Test an invalid move returns a fail status and a message saying the move is not legal
@@ -221,6 +383,75 @@ class FlaskGameEngineTests(unittest.TestCase):
         self.assertEqual(data['status'], 'fail')
         self.assertIn('Move is not legal', data['message'])
 
+    def test_store_routes(self):
+        """
+        Test a game saved in the server-side store can be loaded again by its game id
+        """
+
+        with tempfile.TemporaryDirectory() as folder:
+            previous_store = fge.store
+            fge.store = fge.game_store.GameStore(os.path.join(folder, "games.db"))
+            try:
+                self.client.get('/move', query_string={'x': 4, 'y': 6})
+                data = json.loads(self.client.post('/store/save', data={'game_id': 'test-game'}).data)
+                self.assertEqual(data['game_id'], 'test-game')
+
+                # The moved game is also stored as the active game
+                self.assertEqual(fge.store.load(fge.ACTIVE_GAME_ID)['current_player'], 'Light')
+
+                self.client.post('/reset')
+                response = self.client.post('/store/load', data={'game_id': 'test-game'})
+                self.assertEqual(response.status_code, 302)
+                self.assertEqual(fge.game_state['current_player'], 'Light')
+
+                response = self.client.post('/store/load', data={'game_id': 'missing'})
+                self.assertEqual(response.status_code, 404)
+            finally:
+                fge.store.close()
+                fge.store = previous_store
+
+    def test_store_disabled(self):
+        """
+        Test the store routes fail when no game store is configured
+        """
+
+        previous_store = fge.store
+        fge.store = None
+        try:
+            data = json.loads(self.client.post('/store/save').data)
+            self.assertEqual(data['status'], 'fail')
+            self.assertEqual(self.client.post('/store/load', data={'game_id': 'x'}).status_code, 404)
+        finally:
+            fge.store = previous_store
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Contains the cold start time budget
+    """
+
+    def test_first_response_within_budget(self):
+        """
+        Test a new process can import the app and answer '/' within the startup budget
+        """
+
+        # The fastest of a few runs so one slow process start does not fail the test
+        best = min(bench_startup.measure()[0] for _ in range(3))
+        self.assertLess(best, bench_startup.BUDGET_SECONDS)
+
+    def test_heavy_modules_load_on_first_use(self):
+        """
+        Test importing the app does not load modules that are only needed by optional features
+        """
+
+        script = "import sys, flask_game_engine; print(' '.join(sorted(sys.modules)))"
+        folder = os.path.dirname(os.path.abspath(__file__))
+        env = {name: value for name, value in os.environ.items() if not name.startswith("REVERSI_")}
+        loaded = subprocess.run([sys.executable, "-c", script], cwd=folder, env=env, check=True,
+                                capture_output=True, text=True).stdout.split()
+        for module in ("sqlite3", "cProfile", "numpy"):
+            self.assertNotIn(module, loaded)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for game_engine.py
+"""
+
+import contextlib
+import io
+import random
+import unittest
+from unittest import mock
+import components
+import game_engine
+import records
+import train_patterns
+
+class TestReplay(unittest.TestCase):
+    """
+    Contains tests for replaying game records without a player
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Generate a few complete games to replay
+        """
+        rng = random.Random(0)
+        cls.games = [train_patterns.self_play_game(rng) for _ in range(5)]
+
+    def test_complete_games_match_records(self):
+        """
+        Test every game is played to the end with the same final position as records.replay
+        """
+        for moves in self.games:
+            position, over = game_engine.replay_game(moves)
+            self.assertTrue(over)
+            dark, light, _ = records.replay(moves)[-1]
+            self.assertEqual((position.dark, position.light), (dark, light))
+
+    def test_replay_reports_each_game(self):
+        """
+        Test a file of records gives one line per game, skips comments and counts invalid games
+        """
+        lines = ["# opening test"] + [records.format_moves(moves) for moves in self.games]
+        lines += ["d6 c4", "d6 d6", "d6 zz", records.format_moves(self.games[0]) + " a1"]
+        output = io.StringIO()
+        summary = game_engine.replay(lines, output=output)
+        results = output.getvalue().splitlines()
+
+        self.assertEqual(summary["games"], 9)
+        self.assertEqual(summary["invalid"], 3)
+        self.assertEqual(summary["moves"], sum(len(moves) for moves in self.games) + 2)
+        self.assertTrue(results[0].startswith("line 2: "))
+        self.assertIn("unfinished, Dark to move", results[5])
+        self.assertEqual(results[6], "line 8: invalid: Move 2 (d6) is not legal")
+        self.assertIn("invalid: Invalid move", results[7])
+        self.assertIn("invalid: The game is over", results[8])
+
+    def test_print_board(self):
+        """
+        Test the board is printed before the first move and after every move
+        """
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            game_engine.replay_game(records.parse_moves("d6 c4"), components.BoardPrinter())
+        # 2, then 4 and then 3 dark counters
+        self.assertEqual(output.getvalue().count("Dark"), 2 + 4 + 3)
+
+    def test_interactive_game(self):
+        """
+        Test the interactive loop asks again after an illegal move and announces the winner
+        """
+        moves = self.games[0]
+        answers = ["4", "4"] + [str(value) for move in moves for value in move]
+        output = io.StringIO()
+        with mock.patch("builtins.input", side_effect=answers), contextlib.redirect_stdout(output):
+            game_engine.simple_game_loop()
+        text = output.getvalue()
+        self.assertEqual(text.count("Move is invalid. Try again"), 1)
+        self.assertIn(game_engine.winner_message(game_engine.replay_game(moves)[0]), text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+"""
+Tests for game_report.py
+"""
+
+import concurrent.futures
+import json
+import os
+import random
+import tempfile
+import unittest
+import game_report
+import records
+import search
+import train_patterns
+
+class TestGameReport(unittest.TestCase):
+    """
+    Contains tests for analysing finished games and exporting the reports
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Generate a few complete games and the engine settings to analyse them with
+        """
+        rng = random.Random(2)
+        cls.games = [train_patterns.self_play_game(rng) for _ in range(4)]
+        cls.settings = search.normalise_settings({"engine": "alphabeta", "depth": 2})
+
+    def setUp(self):
+        """
+        Make a thread pool for the analysis and a folder for the report
+        """
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.path = os.path.join(folder.name, "report.jsonl")
+
+    def archive(self):
+        """
+        Gets the games as they would be read from a record file, with one invalid game.
+        """
+        games = [(f"games.txt:{number}", records.format_moves(moves)) for number, moves in enumerate(self.games, 1)]
+        return games + [("games.txt:9", "d6 d6")]
+
+    def read_report(self):
+        """
+        Reads the report file, leaving out the settings line.
+        """
+        with open(self.path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file][1:]
+
+    def test_analyse_game(self):
+        """
+        Test every move gets the engine's best move, a loss that is 0 exactly when the
+        best move was played and the counters after the move
+        """
+        moves = self.games[0]
+        report = game_report.analyse_game(moves, self.settings)
+        positions = records.replay(moves)
+        self.assertEqual(len(report["best"]), len(moves))
+        self.assertEqual(report["players"], "".join(colour[0] for _, _, colour in positions[:-1]))
+        for move, best, loss, discs, (dark, light, _) in zip(report["moves"].split(), report["best"],
+                                                                 report["loss"], report["discs"], positions[1:]):
+            self.assertGreaterEqual(loss, 0)
+            if move == best:
+                self.assertEqual(loss, 0)
+            self.assertEqual(discs, [dark.bit_count(), light.bit_count()])
+        self.assertTrue(report["result"]["finished"])
+        self.assertEqual(report["discs"][-1], [report["result"]["dark"], report["result"]["light"]])
+
+    def test_export_resumes_from_checkpoint(self):
+        """
+        Test a stopped export is finished by running it again, without analysing a game twice
+        and dropping the half written last line
+        """
+        games = self.archive()
+        summary = game_report.export(games[:2], self.path, self.settings, self.pool)
+        self.assertEqual((summary["games"], summary["skipped"]), (2, 0))
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write('{"source":"games.txt:3","mo')
+
+        summary = game_report.export(games, self.path, self.settings, self.pool)
+        self.assertEqual(summary, dict(summary, games=3, skipped=2, invalid=1))
+        reports = self.read_report()
+        self.assertEqual(sorted(report["source"] for report in reports), sorted(source for source, _ in games))
+        failed = [report for report in reports if report.get("status") == "fail"]
+        self.assertEqual([report["source"] for report in failed], ["games.txt:9"])
+
+    def test_resume_with_records_not_in_report_notation(self):
+        """
+        Test games written with commas, capitals or no spaces are skipped when running again
+        """
+        games = [("games.txt:1", records.format_moves(self.games[0]).upper().replace(" ", ",")),
+                 ("games.txt:2", records.format_moves(self.games[1]).replace(" ", "")),
+                 ("games.txt:3", "d6 d6")]
+        self.assertEqual(game_report.export(games, self.path, self.settings, self.pool)["games"], 3)
+        summary = game_report.export(games, self.path, self.settings, self.pool)
+        self.assertEqual((summary["games"], summary["skipped"]), (0, 3))
+        self.assertEqual(len(self.read_report()), 3)
+
+    def test_other_settings_rejected(self):
+        """
+        Test a report is not resumed with different engine settings
+        """
+        game_report.export(self.archive()[:1], self.path, self.settings, self.pool)
+        other = search.normalise_settings({"engine": "alphabeta", "depth": 3})
+        with self.assertRaises(ValueError):
+            game_report.export(self.archive(), self.path, other, self.pool)
+
+if __name__ == "__main__":
+    unittest.main()
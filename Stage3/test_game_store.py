@@ -0,0 +1,143 @@
+"""
+Tests for game_store.py and encoding.py
+"""
+
+import os
+import tempfile
+import unittest
+import components
+import encoding
+import game_store
+
+class TestEncoding(unittest.TestCase):
+    """
+    Contains tests for the compact board encoding
+    """
+
+    def test_round_trip(self):
+        """
+        Test a board is the same after being encoded and decoded
+        """
+
+        board = components.initialise_board(8)
+        text = encoding.encode_board(board)
+        self.assertEqual(len(text), 64)
+        self.assertEqual(text[27:29], "DL")
+        self.assertEqual(encoding.decode_board(text), board)
+
+    def test_invalid_boards(self):
+        """
+        Test boards of the wrong length or with unknown characters raise a ValueError
+        """
+
+        for text in ("." * 63, "." * 36 + "X" * 28, "." * 4):
+            with self.subTest(text=text):
+                with self.assertRaises(ValueError):
+                    encoding.decode_board(text)
+
+    def test_hex_round_trip(self):
+        """
+        Test an 8x8 board is the same after being written as hex masks and read back
+        """
+
+        board = components.initialise_board(8)
+        masks = encoding.encode_board_hex(board)
+        self.assertEqual(masks, {"dark": "0000001008000000", "light": "0000000810000000"})
+        self.assertEqual(encoding.decode_board_hex(masks), board)
+        self.assertEqual(encoding.decode(masks), board)
+        self.assertEqual(encoding.decode(encoding.encode(board, "compact")), board)
+
+    def test_invalid_hex_boards(self):
+        """
+        Test overlapping, oversized or missing masks raise a ValueError
+        """
+
+        for masks in ({"dark": "1", "light": "1"}, {"dark": "1" * 17, "light": "0"}, {"dark": "zz", "light": "0"}, {"dark": "0"}):
+            with self.subTest(masks=masks):
+                with self.assertRaises(ValueError):
+                    encoding.decode_board_hex(masks)
+        with self.assertRaises(ValueError):
+            encoding.encode_board_hex(components.initialise_board(6))
+
+    def test_choose_format(self):
+        """
+        Test the query parameter is used first, then the Accept header, then the list default
+        """
+
+        self.assertEqual(encoding.choose_format(), "list")
+        self.assertEqual(encoding.choose_format("hex", "application/vnd.reversi.compact+json"), "hex")
+        self.assertEqual(encoding.choose_format(None, "text/html, application/vnd.reversi.compact+json;q=0.9"), "compact")
+        self.assertEqual(encoding.choose_format(None, "application/json"), "list")
+        with self.assertRaises(ValueError):
+            encoding.choose_format("binary")
+
+
+class TestGameStore(unittest.TestCase):
+    """
+    Contains tests for the GameStore class
+    """
+
+    def setUp(self):
+        """
+        Create a store in a temporary folder for each test
+        """
+
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "games.db")
+        # A long interval so only the tests decide when batches are written
+        self.store = game_store.GameStore(self.path, batch_size=3, flush_interval=60)
+        self.game = {"board": components.initialise_board(8), "current_player": "Light", "game_won": False}
+
+    def tearDown(self):
+        """
+        Close the store and remove the temporary folder
+        """
+
+        self.store.close()
+        self.folder.cleanup()
+
+    def test_load_before_flush(self):
+        """
+        Test a buffered save can be loaded before it is written to the database
+        """
+
+        self.store.save("game1", self.game)
+        self.assertEqual(self.store.commits, 0)
+        self.assertEqual(self.store.load("game1"), self.game)
+
+    def test_batches_are_written_together(self):
+        """
+        Test saves are written in one commit once the batch is full, keeping only the latest save per game
+        """
+
+        self.store.save("game1", self.game)
+        self.store.save("game1", self.game)
+        self.store.save("game2", self.game)
+        self.assertEqual(self.store.commits, 0)
+        self.store.save("game3", self.game)
+        self.assertEqual(self.store.commits, 1)
+        self.assertEqual(self.store.writes, 3)
+
+    def test_games_survive_reopening(self):
+        """
+        Test games saved before the store is closed are there when it is opened again
+        """
+
+        self.store.save("game1", self.game)
+        self.store.close()
+        self.store = game_store.GameStore(self.path)
+        self.assertEqual(self.store.load("game1"), self.game)
+        self.assertIsNone(self.store.load("missing"))
+
+    def test_delete(self):
+        """
+        Test a deleted game can no longer be loaded
+        """
+
+        self.store.save("game1", self.game)
+        self.store.flush()
+        self.store.delete("game1")
+        self.assertIsNone(self.store.load("game1"))
+
+if __name__ == "__main__":
+    unittest.main()
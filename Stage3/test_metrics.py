@@ -0,0 +1,97 @@
+"""
+Tests for metrics.py and the '/metrics' route
+"""
+
+import unittest
+import metrics
+import flask_game_engine as fge
+
+class TestMetrics(unittest.TestCase):
+    """
+    Contains tests for the counters, histograms and the Prometheus text format
+    """
+
+    def test_counter(self):
+        """
+        Test counters add up per set of label values
+        """
+        registry = []
+        counter = metrics.Counter("test_total", "A test counter", ["kind"], registry=registry)
+        counter.labels("a").inc()
+        counter.labels("a").inc(2)
+        counter.labels("b").inc()
+        self.assertEqual(metrics.render(registry).splitlines(), [
+            "# HELP test_total A test counter",
+            "# TYPE test_total counter",
+            'test_total{kind="a"} 3',
+            'test_total{kind="b"} 1',
+        ])
+        with self.assertRaises(ValueError):
+            counter.labels()
+
+    def test_histogram(self):
+        """
+        Test histogram buckets are written out cumulatively with the sum and count
+        """
+        registry = []
+        histogram = metrics.Histogram("test_seconds", "A test histogram", buckets=(0.1, 1.0), registry=registry)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        lines = metrics.render(registry).splitlines()
+        self.assertEqual(lines[2:], [
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1.0"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            "test_seconds_sum 3.65",
+            "test_seconds_count 4",
+        ])
+
+    def test_timer_and_gauge(self):
+        """
+        Test the timer records one value and gauges read their function when written out
+        """
+        registry = []
+        histogram = metrics.Histogram("test_seconds", "A test histogram", registry=registry)
+        with histogram.time():
+            pass
+        self.assertEqual(histogram.labels().count, 1)
+
+        values = [5]
+        metrics.Gauge("test_size", "A test gauge", lambda: values[0], registry=registry)
+        values[0] = 7
+        self.assertIn("test_size 7", metrics.render(registry).splitlines())
+
+class TestMetricsRoute(unittest.TestCase):
+    """
+    Contains tests for the '/metrics' route of the web app
+    """
+
+    def setUp(self):
+        """
+        Start a new game for each test
+        """
+        fge.game_state['board'] = fge.components.initialise_board()
+        fge.game_state['current_player'] = 'Dark '
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        self.client = fge.app.test_client()
+
+    def test_move_is_counted(self):
+        """
+        Test a move shows up in the move counter, the phase timings and the route timings
+        """
+        moves = fge.MOVES.labels().value
+        phase_count = fge.LEGAL_MOVE_TIME.count
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith("text/plain; version=0.0.4"))
+        text = response.data.decode()
+        self.assertIn(f"reversi_moves_total {moves + 1}", text)
+        self.assertEqual(fge.LEGAL_MOVE_TIME.count, phase_count + 1)
+        self.assertIn('reversi_request_seconds_count{route="/move"}', text)
+        self.assertIn("reversi_ai_cache_hits_total", text)
+
+if __name__ == "__main__":
+    unittest.main()
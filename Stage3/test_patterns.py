@@ -0,0 +1,162 @@
+"""
+Tests for patterns.py and train_patterns.py
+"""
+
+import os
+import random
+import tempfile
+import unittest
+import bitboard
+import patterns
+import train_patterns
+from benchmarks.common import random_positions
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def transform(bits, mapping):
+    """
+    Moves every counter of an 8x8 mask to the square given by mapping(x, y).
+    """
+    result = 0
+    for square in range(64):
+        if bits >> square & 1:
+            x, y = mapping(square % 8, square // 8)
+            result |= bitboard.bit(x, y, 8)
+    return result
+
+# The 8 rotations and reflections of the board
+SYMMETRIES = [
+    lambda x, y: (x, y), lambda x, y: (7 - x, y), lambda x, y: (x, 7 - y), lambda x, y: (7 - x, 7 - y),
+    lambda x, y: (y, x), lambda x, y: (7 - y, x), lambda x, y: (y, 7 - x), lambda x, y: (7 - y, 7 - x),
+]
+
+class TestPatternCodes(unittest.TestCase):
+    """
+    Contains tests for reading pattern codes from a position
+    """
+
+    def test_instance_counts(self):
+        """
+        Test every family has the expected number of instances on the board
+        """
+
+        codes = patterns.pattern_codes(*random_positions(1)[0])
+        self.assertEqual([len(family) for family in codes], [4, 4, 4, 4, 4, 2, 4, 4, 4, 4])
+
+    def test_codes_within_tables(self):
+        """
+        Test every code is a valid index into its family's table
+        """
+
+        for player, opponent in random_positions(100):
+            for (_, squares), codes in zip(patterns.FAMILIES, patterns.pattern_codes(player, opponent)):
+                for code in codes:
+                    self.assertTrue(0 <= code < 3 ** squares)
+
+    def test_codes_are_symmetric(self):
+        """
+        Test rotating or reflecting the board gives the same codes once each
+        code is paired with its reflection
+        """
+
+        canonical = train_patterns.canonical_codes()
+        for player, opponent in random_positions(30):
+            expected = [sorted(canonical[family][code] for code in codes)
+                        for family, codes in enumerate(patterns.pattern_codes(player, opponent))]
+            for mapping in SYMMETRIES:
+                codes = patterns.pattern_codes(transform(player, mapping), transform(opponent, mapping))
+                actual = [sorted(canonical[family][code] for code in family_codes)
+                          for family, family_codes in enumerate(codes)]
+                self.assertEqual(actual, expected)
+
+
+class TestWeights(unittest.TestCase):
+    """
+    Contains tests for saving, loading and training weights
+    """
+
+    def test_save_and_read(self):
+        """
+        Test weights written to a file are read back unchanged
+        """
+
+        tables, bias = patterns.empty_tables()
+        tables[2][1][123] = 1.5
+        bias[3] = -2.0
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "weights.bin")
+            patterns.save_weights(path, tables, bias)
+            loaded_tables, loaded_bias = patterns.read_weights(path)
+        self.assertEqual(loaded_tables[2][1][123], 1.5)
+        self.assertEqual(list(loaded_bias), list(bias))
+
+    def test_map_matches_read(self):
+        """
+        Test memory-mapped weights hold the same values as weights read into memory,
+        and are only loaded once the pattern evaluator needs them
+        """
+
+        tables, bias = patterns.empty_tables()
+        tables[0][0][59048] = 3.25
+        bias[0] = 0.5
+        previous = (patterns._tables, patterns._bias, patterns._pending_path)
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "weights.bin")
+            patterns.save_weights(path, tables, bias)
+            mapped_tables, mapped_bias = patterns.map_weights(path)
+            read_tables, read_bias = patterns.read_weights(path)
+            for stage in range(patterns.STAGES):
+                for mapped, read in zip(mapped_tables[stage], read_tables[stage]):
+                    self.assertEqual(list(mapped), list(read))
+            self.assertEqual(list(mapped_bias), list(read_bias))
+
+            patterns._tables, patterns._pending_path = None, path
+            try:
+                self.assertIsNone(patterns._tables)
+                # Nothing but the bias is set for the counters of the starting position
+                self.assertEqual(patterns.evaluate(0x810000000, 0x1008000000, 8), 0.5)
+                self.assertTrue(patterns.weights_loaded())
+            finally:
+                patterns._tables, patterns._bias, patterns._pending_path = previous
+
+            with open(path, "ab") as file:
+                file.write(b"extra")
+            with self.assertRaises(ValueError):
+                patterns.map_weights(path)
+
+    def test_read_rejects_other_files(self):
+        """
+        Test reading a file that is not a weights file raises a ValueError
+        """
+
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "weights.bin")
+            with open(path, "wb") as file:
+                file.write(b"not a weights file")
+            with self.assertRaises(ValueError):
+                patterns.read_weights(path)
+
+    @unittest.skipIf(numpy is None, "NumPy is needed for training")
+    def test_trained_evaluation_is_symmetric(self):
+        """
+        Test weights trained from self-play games score every rotation of a position the same
+        """
+
+        rng = random.Random(0)
+        games = [train_patterns.self_play_game(rng) for _ in range(20)]
+        tables, bias = train_patterns.train(games, epochs=2)
+        previous = (patterns._tables, patterns._bias)
+        patterns._tables, patterns._bias = tables, bias
+        try:
+            for player, opponent in random_positions(10):
+                scores = {round(patterns.evaluate(transform(player, mapping), transform(opponent, mapping), 8), 3)
+                          for mapping in SYMMETRIES}
+                self.assertEqual(len(scores), 1)
+        finally:
+            patterns._tables, patterns._bias = previous
+
+if __name__ == "__main__":
+    unittest.main()
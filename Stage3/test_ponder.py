@@ -0,0 +1,196 @@
+"""
+Tests for ponder.py
+"""
+
+import concurrent.futures
+import json
+import time
+import unittest
+import ai_cache
+import analysis
+import bitboard
+import components
+import ponder
+import search
+import flask_game_engine as fge
+
+class PendingPool:
+    """
+    Executor whose work never starts, for filling up the ponder limit.
+    """
+
+    def submit(self, function, *args):
+        return concurrent.futures.Future()
+
+def wait_for_search(session=None):
+    """
+    Waits until a session's ponder is searching the predicted position and has finished.
+
+    Returns:
+        ponder.Ponder: The ponder.
+    """
+    for _ in range(500):
+        current = ponder._ponders.get(session)
+        if current is not None and current.key is not None and current.future.done():
+            return current
+        time.sleep(0.01)
+    raise AssertionError("The ponder did not finish")
+
+class TestPonder(unittest.TestCase):
+    """
+    Contains tests for searching on the human player's time
+    """
+
+    def setUp(self):
+        """
+        Turn pondering on with a thread pool and start with an empty AI cache
+        """
+        self.enabled = ponder.ENABLED
+        ponder.ENABLED = True
+        self.addCleanup(setattr, ponder, "ENABLED", self.enabled)
+        self.addCleanup(ponder.clear)
+        ai_cache.cache.clear()
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(self.pool.shutdown)
+        self.settings = search.normalise_settings({"engine": "alphabeta", "depth": 3})
+
+        # Dark has played d6 so the AI (Light) is to move
+        board = fge.execute_move("Dark ", (4, 6), components.initialise_board(8))
+        self.dark, self.light = bitboard.from_board(board)
+        self.geo = bitboard.geometry(8)
+        self.square, _ = ai_cache.cached_best_move(self.dark, self.light, "Light", 8, self.settings)
+
+    def after_ai_move(self):
+        """
+        Gets the masks after the AI's move, with Dark to move.
+        """
+        light, dark = bitboard.play(self.light, self.dark, 1 << self.square, self.geo)
+        return dark, light
+
+    def test_predicted_move_is_reused(self):
+        """
+        Test the search of the predicted position is claimed and matches a normal search
+        """
+        self.assertTrue(ponder.start(None, self.dark, self.light, 8, self.settings, self.square, pool=self.pool))
+        current = wait_for_search()
+        dark, light = bitboard.play(*self.after_ai_move(), 1 << current.reply, self.geo)
+
+        key = ai_cache.canonical_position(dark, light, "Light", 8, self.settings)[1]
+        hits = ponder.HITS.value
+        ponder.collect(None, key, self.settings)
+        self.assertEqual(ponder.HITS.value, hits + 1)
+        self.assertIsNotNone(ai_cache.cache.get(key))
+
+        pondered = ai_cache.cached_best_move(dark, light, "Light", 8, self.settings)
+        ai_cache.cache.clear()
+        self.assertEqual(pondered, ai_cache.cached_best_move(dark, light, "Light", 8, self.settings))
+
+    def test_other_move_discards(self):
+        """
+        Test playing a different move throws the ponder away without touching the AI cache
+        """
+        ponder.start(None, self.dark, self.light, 8, self.settings, self.square, pool=self.pool)
+        current = wait_for_search()
+        dark, light = self.after_ai_move()
+        moves = bitboard.legal_moves(dark, light, self.geo) & ~(1 << current.reply)
+        dark, light = bitboard.play(dark, light, moves & -moves, self.geo)
+
+        entries = len(ai_cache.cache)
+        misses = ponder.MISSES.value
+        ponder.collect(None, ai_cache.canonical_position(dark, light, "Light", 8, self.settings)[1], self.settings)
+        self.assertEqual(ponder.MISSES.value, misses + 1)
+        self.assertTrue(current.discarded)
+        self.assertEqual(len(ai_cache.cache), entries)
+        self.assertNotIn(None, ponder._ponders)
+
+    def test_limits(self):
+        """
+        Test each session has one ponder and the server runs at most MAX_PONDERS at once
+        """
+        pool = PendingPool()
+        limit = ponder.MAX_PONDERS
+        self.addCleanup(setattr, ponder, "MAX_PONDERS", limit)
+        ponder.MAX_PONDERS = 2
+
+        self.assertTrue(ponder.start("a", self.dark, self.light, 8, self.settings, self.square, pool=pool))
+        first = ponder._ponders["a"]
+        self.assertTrue(ponder.start("a", self.dark, self.light, 8, self.settings, self.square, pool=pool))
+        self.assertTrue(first.discarded)
+        self.assertTrue(ponder.start("b", self.dark, self.light, 8, self.settings, self.square, pool=pool))
+        self.assertFalse(ponder.start("c", self.dark, self.light, 8, self.settings, self.square, pool=pool))
+        self.assertNotIn("c", ponder._ponders)
+
+    def test_greedy_and_disabled(self):
+        """
+        Test nothing is started for the greedy engine or when pondering is off
+        """
+        greedy = search.normalise_settings({})
+        self.assertFalse(ponder.start(None, self.dark, self.light, 8, greedy, self.square, pool=self.pool))
+        ponder.ENABLED = False
+        self.assertFalse(ponder.start(None, self.dark, self.light, 8, self.settings, self.square, pool=self.pool))
+
+class TestPonderRoute(unittest.TestCase):
+    """
+    Contains tests for pondering through the '/ai_move' route
+    """
+
+    def setUp(self):
+        """
+        Turn pondering on and reset the game
+        """
+        self.enabled = ponder.ENABLED
+        ponder.ENABLED = True
+        self.addCleanup(setattr, ponder, "ENABLED", self.enabled)
+        self.addCleanup(ponder.clear)
+        self.addCleanup(analysis.shutdown_pool)
+        ai_cache.cache.clear()
+        fge.game_state['board'] = components.initialise_board(8)
+        fge.game_state['current_player'] = 'Dark '
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        self.client = fge.app.test_client()
+
+    def test_ai_answers_from_ponder(self):
+        """
+        Test the AI's next move comes from the ponder when the player plays the predicted move
+        """
+        query = {'engine': 'alphabeta', 'depth': 2}
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        data = json.loads(self.client.get('/ai_move', query_string=query).data)
+        self.client.get('/move', query_string={'x': data['x'], 'y': data['y']})
+
+        reply = wait_for_search().reply
+        self.client.get('/move', query_string={'x': reply % 8 + 1, 'y': reply // 8 + 1})
+        hits = ponder.HITS.value
+        data = json.loads(self.client.get('/ai_move', query_string=query).data)
+        self.assertEqual(ponder.HITS.value, hits + 1)
+        self.assertTrue(components.legal_move('Light', (data['x'], data['y']), fge.game_state['board']))
+
+    def test_cached_position_not_claimed(self):
+        """
+        Test a position already in the AI cache is answered from the cache without claiming
+        the session's ponder, which is thrown away when the next one starts
+        """
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        settings = search.normalise_settings({'engine': 'alphabeta', 'depth': 2})
+        dark, light = bitboard.from_board(fge.game_state['board'])
+        square, score = ai_cache.cached_best_move(dark, light, 'Light', 8, settings)
+        key = ai_cache.canonical_position(dark, light, 'Light', 8, settings)[1]
+        entry = ai_cache.cache.get(key)
+
+        # A ponder of the same position with a different answer, which must not be used
+        current = ponder.Ponder(settings, 'Light', 8)
+        current.key = key
+        current.future = concurrent.futures.Future()
+        current.future.set_result({'square': None, 'score': score + 100, 'nodes': 1})
+        ponder._ponders[None] = current
+
+        hits = ponder.HITS.value
+        data = json.loads(self.client.get('/ai_move', query_string={'engine': 'alphabeta', 'depth': 2}).data)
+        self.assertEqual((data['x'], data['y']), (square % 8 + 1, square // 8 + 1))
+        self.assertEqual(ponder.HITS.value, hits)
+        self.assertEqual(ai_cache.cache.get(key), entry)
+        self.assertTrue(current.discarded)
+
+if __name__ == "__main__":
+    unittest.main()
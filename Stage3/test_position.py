@@ -0,0 +1,181 @@
+"""
+Tests for position.py
+"""
+
+import copy
+import pickle
+import random
+import unittest
+import bitboard
+import components
+import flask_game_engine as fge
+from position import Position
+
+class TestPosition(unittest.TestCase):
+    """
+    Contains tests for the immutable position type
+    """
+
+    def test_start(self):
+        """
+        Test the starting position matches the starting board
+        """
+        start = Position.start()
+        self.assertEqual(start, Position.from_board(components.initialise_board(8)))
+        self.assertEqual(start.to_board(), components.initialise_board(8))
+        self.assertEqual(start.counts(), {"dark": 2, "light": 2})
+        self.assertEqual(Position.start(6).size, 6)
+
+    def test_play_matches_execute_move(self):
+        """
+        Test random games played with positions match the list of lists board, and
+        that playing never changes the earlier positions
+        """
+        rng = random.Random(3)
+        for _ in range(5):
+            position = Position.start()
+            board = components.initialise_board(8)
+            history = []
+            while not position.game_over():
+                if not position.legal_moves():
+                    position = position.passed()
+                    continue
+                moves = [(x, y) for x in range(1, 9) for y in range(1, 9) if position.is_legal(x, y)]
+                self.assertEqual(moves, [(x, y) for x in range(1, 9) for y in range(1, 9)
+                                         if components.legal_move(position.player, (x, y), board)])
+                x, y = rng.choice(moves)
+                history.append((position, copy.deepcopy(board)))
+                board = fge.execute_move(position.player, (x, y), board)
+                position = position.play(x, y)
+                self.assertEqual(position.to_board(), board)
+            for old, old_board in history:
+                self.assertEqual(old.to_board(), old_board)
+
+    def test_mobility_and_status(self):
+        """
+        Test the legal moves of both colours match a scan of each, are kept when the turn is
+        passed, and give the pass and the final result of the game
+        """
+        rng = random.Random(5)
+        position = Position.start()
+        while True:
+            player, opponent = position.masks()
+            expected = (bitboard.legal_moves(player, opponent, position.geo),
+                        bitboard.legal_moves(opponent, player, position.geo))
+            self.assertEqual(position.mobility(), expected)
+            self.assertEqual(position.passed().mobility(), expected[::-1])
+            status = position.status()
+            self.assertEqual(sorted(status["mobility"].values()), sorted(moves.bit_count() for moves in expected))
+            self.assertEqual(status["pass"], not expected[0] and bool(expected[1]))
+            if status["game_over"]:
+                break
+            self.assertNotIn("counts", status)
+            if status["pass"]:
+                position = position.passed()
+            moves = [square for square in range(64) if position.legal_moves() >> square & 1]
+            square = rng.choice(moves)
+            position = position.play(square % 8 + 1, square // 8 + 1)
+
+        counts = position.counts()
+        self.assertEqual(status["counts"], counts)
+        self.assertEqual(status["winner"], "draw" if counts["dark"] == counts["light"]
+                         else max(counts, key=counts.get))
+        # Working out the moves does not change what the position is equal to
+        self.assertEqual(position, Position(position.dark, position.light, position.player))
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+
+    def test_immutable(self):
+        """
+        Test positions cannot be changed, and equal positions hash the same
+        """
+        position = Position.start()
+        with self.assertRaises(AttributeError):
+            position.dark = 0
+        with self.assertRaises(AttributeError):
+            del position.player
+        with self.assertRaises(AttributeError):
+            position.extra = 1
+        with self.assertRaises(ValueError):
+            position.play(1, 1)
+
+        same = Position(position.dark, position.light, "Dark ")
+        self.assertEqual({position: "start"}[same], "start")
+        self.assertNotEqual(position, position.passed())
+        self.assertEqual(pickle.loads(pickle.dumps(position)), position)
+
+    def test_invalid(self):
+        """
+        Test overlapping masks, masks off the board and unknown colours raise a ValueError
+        """
+        for args in ((1, 1, "Dark "), (1 << 64, 0, "Dark "), (1, 2, "Blue ")):
+            with self.subTest(args=args):
+                with self.assertRaises(ValueError):
+                    Position(*args)
+
+class TestSnapshots(unittest.TestCase):
+    """
+    Contains tests for the snapshots published by the web app
+    """
+
+    def setUp(self):
+        """
+        Reset the game
+        """
+        fge.game_state['board'] = components.initialise_board(8)
+        fge.game_state['current_player'] = 'Dark '
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        self.client = fge.app.test_client()
+
+    def test_snapshot_replaced_on_move(self):
+        """
+        Test a move publishes a new snapshot and leaves the one a reader already has alone
+        """
+        before = fge.position_index
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        after = fge.position_index
+        self.assertIsNot(before, after)
+        self.assertEqual(before["position"], Position.start())
+        self.assertEqual(after["position"], Position.start().play(4, 6))
+        self.assertEqual(after["position"].to_board(), fge.game_state['board'])
+
+    def test_pass_and_game_over(self):
+        """
+        Test a move that leaves the next player without a legal move passes the turn, a move
+        that leaves neither player a move ends the game, and the published position keeps
+        the legal moves that were worked out for the next request
+        """
+        board = [["None "] * 8 for _ in range(8)]
+        board[0][0], board[0][1] = "Dark ", "Light"
+        board[2][0], board[2][1] = "Dark ", "Light"
+        fge.game_state['board'] = board
+        fge.rebuild_position_index()
+
+        data = self.client.get('/move', query_string={'x': 3, 'y': 1}).get_json()
+        self.assertIn("Turn was passed", data['message'])
+        self.assertEqual(data['player'], 'Dark ')
+        snapshot = fge.position_index["position"]
+        self.assertEqual(snapshot.status(), {"mobility": {"dark": 1, "light": 0}, "pass": False, "game_over": False})
+        self.assertIs(fge.current_position(), snapshot)
+
+        data = self.client.get('/move', query_string={'x': 3, 'y': 3}).get_json()
+        self.assertIn("The player with dark counters won", data['finished'])
+        self.assertTrue(fge.game_state['game_won'])
+        self.assertEqual(fge.position_index["position"].status()["counts"], {"dark": 6, "light": 0})
+        # The AI does not search a position it has no move in
+        data = self.client.get('/ai_move', query_string={'player': 'Light'}).get_json()
+        self.assertEqual((data['x'], data['y']), (-1, -1))
+
+    def test_position_route(self):
+        """
+        Test spectators get the board, player and counts of the current game
+        """
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        data = self.client.get('/position', query_string={'board_format': 'compact'}).get_json()
+        self.assertEqual(data['player'], 'Light')
+        self.assertEqual(data['counts'], {'dark': 4, 'light': 1})
+        self.assertFalse(data['game_won'])
+        self.assertEqual(len(data['board']), 64)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Tests for position_db.py
+"""
+
+import os
+import random
+import tempfile
+import unittest
+import position_db
+import records
+import train_patterns
+from position import Position
+
+class TestPositionDatabase(unittest.TestCase):
+    """
+    Contains tests for building and querying the position database
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Generate some complete games, one unfinished game and one invalid game
+        """
+        rng = random.Random(4)
+        cls.games = [records.format_moves(train_patterns.self_play_game(rng, 0.3)) for _ in range(30)]
+        cls.archive = [(f"games.txt:{number}", text) for number, text in enumerate(cls.games + ["d6 c4", "d6 d6"], 1)]
+
+    def setUp(self):
+        """
+        Build a database of the archive in a temporary folder
+        """
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.database = position_db.PositionDatabase(os.path.join(folder.name, "positions.sqlite"))
+        self.addCleanup(self.database.close)
+        self.summary = self.database.add_games(self.archive)
+
+    def test_add_games(self):
+        """
+        Test valid games are added once and invalid games are counted
+        """
+        self.assertEqual(self.summary, {"added": 31, "skipped": 0, "invalid": 1})
+        self.assertEqual(self.database.add_games(self.archive[:5]), {"added": 0, "skipped": 5, "invalid": 0})
+        start = Position.start()
+        self.assertEqual(self.database.lookup(start.dark, start.light, "Dark ")["games"], 31)
+
+    def test_identical_games_counted(self):
+        """
+        Test identical games from different lines of an archive are separate games,
+        while adding the same lines again is skipped
+        """
+        archive = [("twins.txt:1", self.games[0]), ("twins.txt:2", self.games[0])]
+        self.assertEqual(self.database.add_games(archive), {"added": 2, "skipped": 0, "invalid": 0})
+        self.assertEqual(self.database.add_games(archive), {"added": 0, "skipped": 2, "invalid": 0})
+        dark, light, colour = records.replay(records.parse_moves(self.games[0]))[-1]
+        reaching = self.database.games_reaching(dark, light, colour)
+        self.assertEqual([game["source"] for game in reaching], ["games.txt:1", "twins.txt:1", "twins.txt:2"])
+
+        database = position_db.PositionDatabase(os.path.join(os.path.dirname(self.database.path), "twins.sqlite"))
+        self.addCleanup(database.close)
+        database.add_games(archive)
+        self.assertEqual(database.lookup(dark, light, colour)["games"], 2)
+
+    def test_lookup_matches_games(self):
+        """
+        Test the statistics of a position match the games that reached it, for every
+        rotation and reflection of it
+        """
+        dark, light, colour = records.replay(records.parse_moves("d6 c4"))[-1]
+        stats = self.database.lookup(dark, light, colour)
+        reaching = self.database.games_reaching(dark, light, colour)
+        self.assertEqual(stats["games"], len(reaching))
+        self.assertEqual(stats["unfinished"], 1)
+        for result in position_db.RESULTS:
+            self.assertEqual(stats[result], sum(game["result"] == result for game in reaching))
+        self.assertEqual({game["ply"] for game in reaching}, {2})
+
+        # Reflected along the diagonal: e3 f5 is d6 c4 seen the other way round
+        mirrored = records.replay(records.parse_moves("e3 f5"))[-1]
+        self.assertEqual(self.database.lookup(*mirrored), stats)
+        self.assertEqual(self.database.lookup(dark, light, "Light")["games"], 0)
+
+    def test_corners_match_brute_force(self):
+        """
+        Test corner queries count the same positions and games as checking every position
+        """
+        replayed = [records.replay(records.parse_moves(text)) for text in self.games + ["d6 c4"]]
+        a1, h8 = records.parse_move("a1"), records.parse_move("h8")
+        a1_square, h8_square = (a1[1] - 1) * 8 + a1[0] - 1, (h8[1] - 1) * 8 + h8[0] - 1
+        matches = [[dark >> a1_square & 1 and not (dark | light) >> h8_square & 1 for dark, light, _ in positions]
+                   for positions in replayed]
+        stats = self.database.corners({"a1": "dark", "h8": "empty"})
+        self.assertEqual(stats["positions"], sum(sum(game) for game in matches))
+        self.assertLessEqual(sum(any(game) for game in matches), stats["games"])
+        self.assertEqual(self.database.corners({})["positions"], sum(len(positions) for positions in replayed))
+        with self.assertRaises(ValueError):
+            self.database.corners({"a2": "dark"})
+        with self.assertRaises(ValueError):
+            self.database.corners({"a1": "black"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Tests for profiling.py
+"""
+
+import os
+import pstats
+import tempfile
+import unittest
+import ai_cache
+import bitboard
+import components
+import evaluation
+import profiling
+import records
+import search
+import flask_game_engine as fge
+
+class TestProfiling(unittest.TestCase):
+    """
+    Contains tests for the profiling wrappers
+    """
+
+    def search_start_position(self):
+        """
+        Runs a small alpha-beta search from the starting position.
+        """
+        dark, light = records.start_position(8)
+        return search.best_move(dark, light, 8, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 3})
+
+    def test_disabled_uses_original_functions(self):
+        """
+        Test nothing is wrapped when profiling is off, before and after a profiled block
+        """
+        originals = (components.legal_move, bitboard.legal_moves, search.Search.negamax, evaluation.EVALUATORS["heuristic"])
+        with profiling.profiled():
+            self.assertIsNot(bitboard.legal_moves, originals[1])
+        self.assertEqual((components.legal_move, bitboard.legal_moves, search.Search.negamax,
+                          evaluation.EVALUATORS["heuristic"]), originals)
+
+    def test_counts_and_cumulative_time(self):
+        """
+        Test calls are counted and recursive searches are only timed at the outermost call
+        """
+        expected = self.search_start_position()
+        with profiling.profiled() as profile:
+            result = self.search_start_position()
+        self.assertEqual(result, expected)
+
+        rows = {row["function"]: row for row in profile.report()}
+        self.assertEqual(rows["search.best_move"]["calls"], 1)
+        self.assertEqual(rows["search.Search.root"]["calls"], 1)
+        self.assertGreater(rows["search.Search.negamax"]["calls"], 10)
+        self.assertGreater(rows["evaluation.EVALUATORS[heuristic]"]["calls"], 10)
+        self.assertLessEqual(rows["search.Search.negamax"]["cumulative"], rows["search.best_move"]["cumulative"])
+        self.assertIn("search_best_move;dur=", profile.server_timing())
+
+    def test_cprofile_dump(self):
+        """
+        Test the cProfile results can be written and read back with pstats
+        """
+        with profiling.profiled(cprofile=True) as profile:
+            self.search_start_position()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search.pstats")
+            profile.dump(path)
+            self.assertGreater(pstats.Stats(path).total_calls, 0)
+
+    def test_process_profile(self):
+        """
+        Test the process profile records calls outside any per-request profile until it is disabled
+        """
+        profile = profiling.enable_process_profile()
+        try:
+            self.search_start_position()
+            self.assertEqual(profile.calls["search.best_move"], 1)
+        finally:
+            profiling.disable_process_profile()
+        self.assertIsNone(profiling.process_profile)
+        self.assertFalse(hasattr(search.best_move, "__wrapped__"))
+
+class TestProfilingRoutes(unittest.TestCase):
+    """
+    Contains tests for profiling requests to the web app
+    """
+
+    def setUp(self):
+        """
+        Start a new game and empty the AI cache for each test
+        """
+        fge.game_state['board'] = fge.components.initialise_board()
+        fge.game_state['current_player'] = 'Light'
+        fge.game_state['game_won'] = False
+        fge.rebuild_position_index()
+        ai_cache.cache.clear()
+        self.client = fge.app.test_client()
+
+    def test_request_profile(self):
+        """
+        Test a request can ask for its profile only when per-request profiling is allowed
+        """
+        query = {'engine': 'alphabeta', 'depth': 2, 'profile': '1'}
+        response = self.client.get('/ai_move', query_string=query)
+        self.assertNotIn('Server-Timing', response.headers)
+
+        fge.app.config['PROFILE_REQUESTS'] = True
+        self.addCleanup(fge.app.config.__setitem__, 'PROFILE_REQUESTS', False)
+        ai_cache.cache.clear()
+        response = self.client.get('/ai_move', query_string=query)
+        self.assertIn('search_Search_negamax', response.headers['Server-Timing'])
+
+    def test_process_profile_route(self):
+        """
+        Test '/profile' is only served when process profiling is enabled
+        """
+        self.assertEqual(self.client.get('/profile').status_code, 404)
+        profiling.enable_process_profile()
+        self.addCleanup(profiling.disable_process_profile)
+        self.client.get('/move', query_string={'x': 4, 'y': 6})
+        data = self.client.get('/profile').get_json()
+        self.assertIn('components.legal_move', [row['function'] for row in data['functions']])
+
+if __name__ == "__main__":
+    unittest.main()
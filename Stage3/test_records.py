@@ -0,0 +1,77 @@
+"""
+Tests for records.py
+"""
+
+import unittest
+import bitboard
+import components
+import records
+
+class TestNotation(unittest.TestCase):
+    """
+    Contains tests for reading and writing moves
+    """
+
+    def test_round_trip(self):
+        """
+        Test moves written by format_moves are read back the same by parse_moves
+        """
+
+        moves = [(5, 3), (6, 4), (3, 5), (16, 16)]
+        self.assertEqual(records.format_moves(moves), "e3 f4 c5 p16")
+        self.assertEqual(records.parse_moves(records.format_moves(moves)), moves)
+
+    def test_parse_without_separators(self):
+        """
+        Test a game written with no spaces between the moves is read correctly
+        """
+
+        self.assertEqual(records.parse_moves("E3f4,c5"), [(5, 3), (6, 4), (3, 5)])
+
+    def test_invalid_move(self):
+        """
+        Test a badly written move raises a ValueError
+        """
+
+        with self.assertRaises(ValueError):
+            records.parse_moves("e3 44")
+
+
+class TestReplay(unittest.TestCase):
+    """
+    Contains tests for replaying games
+    """
+
+    def test_start_position_matches_components(self):
+        """
+        Test the start position is the same as the one made by initialise_board
+        """
+
+        for size in (4, 8, 16):
+            with self.subTest(size=size):
+                expected = bitboard.from_board(components.initialise_board(size))
+                self.assertEqual(records.start_position(size), expected)
+
+    def test_replay_positions(self):
+        """
+        Test replay returns the position before every move and the final position
+        """
+
+        positions = records.replay(records.parse_moves("e3 f3"))
+        self.assertEqual(len(positions), 3)
+        self.assertEqual(positions[0][2], "Dark ")
+        self.assertEqual(positions[1][2], "Light")
+        dark, light, colour = positions[-1]
+        self.assertEqual((dark.bit_count(), light.bit_count()), (3, 3))
+        self.assertEqual(colour, "Dark ")
+
+    def test_replay_illegal_move(self):
+        """
+        Test replaying a game with an illegal move raises a ValueError
+        """
+
+        with self.assertRaises(ValueError):
+            records.replay([(1, 1)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests for savefile.py
+"""
+
+import io
+import json
+import unittest
+import components
+import encoding
+import savefile
+
+class TestReadCapped(unittest.TestCase):
+    """
+    Contains tests for reading uploads with a size limit
+    """
+
+    def test_reads_small_stream(self):
+        """
+        Test a stream under the limit is read in full
+        """
+
+        data = b"x" * (savefile.CHUNK_SIZE * 2 + 5)
+        self.assertEqual(savefile.read_capped(io.BytesIO(data), len(data)), data)
+
+    def test_stops_at_limit(self):
+        """
+        Test a stream over the limit raises a ValueError without reading all of it
+        """
+
+        stream = io.BytesIO(b"x" * (savefile.CHUNK_SIZE * 10))
+        with self.assertRaises(ValueError):
+            savefile.read_capped(stream, savefile.CHUNK_SIZE)
+        self.assertLess(stream.tell(), savefile.CHUNK_SIZE * 10)
+
+
+class TestParseGameState(unittest.TestCase):
+    """
+    Contains tests for checking parsed save files
+    """
+
+    def setUp(self):
+        """
+        Set up a valid save for each test to change
+        """
+
+        self.save = {"board": components.initialise_board(8), "current_player": "Dark ", "game_won": False}
+
+    def test_valid_save(self):
+        """
+        Test a valid save is returned as a game state
+        """
+
+        self.assertEqual(savefile.parse_game_state(self.save), self.save)
+
+    def test_compact_board(self):
+        """
+        Test a board in the compact encoding is decoded
+        """
+
+        self.save["board"] = encoding.encode_board(self.save["board"])
+        self.assertEqual(savefile.parse_game_state(self.save)["board"], components.initialise_board(8))
+
+    def test_counts_must_match(self):
+        """
+        Test counter counts that do not match the board are rejected
+        """
+
+        self.save["counts"] = {"dark": 2, "light": 2}
+        savefile.parse_game_state(self.save)
+        self.save["counts"] = {"dark": 3, "light": 2}
+        with self.assertRaises(ValueError):
+            savefile.parse_game_state(self.save)
+
+    def test_invalid_saves(self):
+        """
+        Test saves with a bad board, player or game_won value are rejected
+        """
+
+        changes = [
+            {"board": [["None "] * 8 for _ in range(8)]},
+            {"board": [["None "] * 7 for _ in range(8)]},
+            {"board": [["Blue "] * 8 for _ in range(8)]},
+            {"board": "not a list"},
+            {"current_player": "Dark"},
+            {"game_won": "no"},
+        ]
+        for change in changes:
+            with self.subTest(change=change):
+                with self.assertRaises(ValueError):
+                    savefile.parse_game_state({**self.save, **change})
+
+    def test_required_size(self):
+        """
+        Test a board of a different size is rejected when a size is required
+        """
+
+        self.save["board"] = components.initialise_board(10)
+        savefile.parse_game_state(self.save)
+        with self.assertRaises(ValueError):
+            savefile.parse_game_state(self.save, board_size=8)
+
+    def test_load_game_state_rejects_bad_json(self):
+        """
+        Test load_game_state raises a ValueError for text that is not JSON
+        """
+
+        with self.assertRaises(ValueError):
+            savefile.load_game_state(io.BytesIO(b"{"))
+        self.assertEqual(savefile.load_game_state(io.BytesIO(json.dumps(self.save).encode())), self.save)
+
+if __name__ == "__main__":
+    unittest.main()
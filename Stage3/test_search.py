@@ -0,0 +1,379 @@
+"""
+Tests for search.py and fit_probcut.py
+"""
+
+import time
+import unittest
+from unittest import mock
+import bitboard
+import components
+import evaluation
+import fit_probcut
+import search
+from benchmarks.common import random_positions
+
+def minimax(player, opponent, depth, geo, evaluator):
+    """
+    Plain minimax without any pruning, used to check the alpha-beta search.
+    """
+    if depth == 0:
+        return evaluator(player, opponent, geo.size)
+    moves = bitboard.legal_moves(player, opponent, geo)
+    if not moves:
+        if not bitboard.legal_moves(opponent, player, geo):
+            return search.WIN_SCALE * (player.bit_count() - opponent.bit_count())
+        return -minimax(opponent, player, depth, geo, evaluator)
+    best = None
+    while moves:
+        move = moves & -moves
+        moves ^= move
+        new_player, new_opponent = bitboard.play(player, opponent, move, geo)
+        score = -minimax(new_opponent, new_player, depth - 1, geo, evaluator)
+        if best is None or score > best:
+            best = score
+    return best
+
+class TestSettings(unittest.TestCase):
+    """
+    Contains tests for checking engine settings
+    """
+
+    def test_defaults(self):
+        """
+        Test empty settings use the greedy engine
+        """
+
+        self.assertEqual(search.normalise_settings({}), search.DEFAULT_SETTINGS)
+
+    def test_query_parameter_depth(self):
+        """
+        Test a depth given as text (like a query parameter) is converted to an integer
+        """
+
+        settings = search.normalise_settings({"engine": "alphabeta", "depth": "3"})
+        self.assertEqual(settings["depth"], 3)
+
+    def test_invalid_settings(self):
+        """
+        Test unknown engines, unknown evaluators and bad depths raise a ValueError
+        """
+
+        for settings in ({"engine": "magic"}, {"evaluator": "magic"}, {"depth": "deep"},
+                         {"depth": search.MAX_DEPTH + 1}):
+            with self.subTest(settings=settings):
+                with self.assertRaises(ValueError):
+                    search.normalise_settings(settings)
+
+    def test_greedy_ignores_depth(self):
+        """
+        Test the greedy engine settings do not depend on the depth so they share cache entries
+        """
+
+        self.assertEqual(search.normalise_settings({"engine": "greedy", "depth": 5}),
+                         search.normalise_settings({}))
+
+
+class TestEngines(unittest.TestCase):
+    """
+    Contains tests for the move choices of the engines
+    """
+
+    def test_greedy_matches_score_map(self):
+        """
+        Test the greedy engine picks a legal move with the highest score map value
+        """
+
+        board = components.initialise_board(8)
+        move = search.best_move_for_board(board, "Light")
+        legal_scores = [search.SCORE_MAP[y - 1][x - 1] for x in range(1, 9) for y in range(1, 9)
+                        if components.legal_move("Light", (x, y), board)]
+        self.assertTrue(components.legal_move("Light", move, board))
+        self.assertEqual(search.SCORE_MAP[move[1] - 1][move[0] - 1], max(legal_scores))
+
+    def test_alphabeta_matches_minimax(self):
+        """
+        Test the alpha-beta search gives the same score as a full minimax search
+        """
+
+        geo = bitboard.geometry(8)
+        for player, opponent in random_positions(40)[::5]:
+            engine = search.Search(8, evaluation.positional)
+            move, score = engine.root(player, opponent, 3)
+            if move is None:
+                continue
+            self.assertEqual(score, minimax(player, opponent, 3, geo, evaluation.positional))
+
+    def test_takes_corner(self):
+        """
+        Test the alpha-beta engine takes a corner when it is available
+        """
+
+        board = [["None " for _ in range(8)] for _ in range(8)]
+        board[0][1] = "Light"
+        board[0][2] = "Dark "
+        board[4][4] = "Light"
+        board[4][5] = "Dark "
+        move = search.best_move_for_board(board, "Dark ", {"engine": "alphabeta", "depth": 2})
+        self.assertEqual(move, (1, 1))
+
+    def test_no_legal_moves(self):
+        """
+        Test every engine returns None when the player cannot move
+        """
+
+        board = [["Dark " for _ in range(8)] for _ in range(8)]
+        for engine in search.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertIsNone(search.best_move_for_board(board, "Light", {"engine": engine}))
+
+class TestBudgets(unittest.TestCase):
+    """
+    Contains tests for node and time budgets
+    """
+
+    def test_settings(self):
+        """
+        Test budgets are read from query parameters, checked, and left out when not given
+        """
+
+        settings = search.normalise_settings({"engine": "alphabeta", "depth": "6", "nodes": "5000"})
+        self.assertEqual(settings, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 6, "nodes": 5000})
+        self.assertNotIn("time", settings)
+        self.assertTrue(search.deterministic(settings))
+        self.assertFalse(search.deterministic(search.normalise_settings({"engine": "alphabeta", "time": 100})))
+        for budget in ({"nodes": "0"}, {"nodes": "lots"}, {"time": search.MAX_TIME + 1}):
+            with self.subTest(budget=budget):
+                with self.assertRaises(ValueError):
+                    search.normalise_settings({"engine": "alphabeta", **budget})
+
+    def test_node_budget(self):
+        """
+        Test a node budget stops the search but always gives a legal move, and a
+        budget that is never reached gives the same move as searching to the full depth
+        """
+
+        geo = bitboard.geometry(8)
+        for player, opponent in random_positions(40)[::8]:
+            moves = bitboard.legal_moves(player, opponent, geo)
+            if not moves:
+                continue
+            tiny = search.best_move(player, opponent, 8, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 6, "nodes": 5})
+            self.assertTrue(moves >> tiny["square"] & 1)
+
+            full = search.best_move(player, opponent, 8, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 3})
+            budgeted = search.best_move(player, opponent, 8, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 3, "nodes": 10 ** 6})
+            self.assertEqual((budgeted["square"], budgeted["score"]), (full["square"], full["score"]))
+
+    def test_time_budget(self):
+        """
+        Test a time budget stops a deep search
+        """
+
+        player, opponent = random_positions(20)[10]
+        engine = search.BudgetedSearch(8, evaluation.get_evaluator("heuristic"), deadline=time.perf_counter() + 0.05)
+        start = time.perf_counter()
+        move, _, depth = engine.deepen(player, opponent, search.MAX_DEPTH)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertIsNotNone(move)
+        self.assertLess(depth, search.MAX_DEPTH)
+
+class TestMultiPV(unittest.TestCase):
+    """
+    Contains tests for ranking several moves in one search
+    """
+
+    def test_ranking_matches_separate_searches(self):
+        """
+        Test the ranked moves have the exact scores of the best moves searched one at a time,
+        and the first of them is the move root chooses
+        """
+
+        geo = bitboard.geometry(8)
+        for player, opponent in random_positions(40)[::5]:
+            scores = {}
+            moves = bitboard.legal_moves(player, opponent, geo)
+            while moves:
+                move = moves & -moves
+                moves ^= move
+                new_player, new_opponent = bitboard.play(player, opponent, move, geo)
+                scores[move] = -minimax(new_opponent, new_player, 2, geo, evaluation.positional)
+            for count in (1, 3):
+                ranked = search.Search(8, evaluation.positional).ranked_root(player, opponent, 3, count)
+                self.assertEqual([score for _, score, _ in ranked], sorted(scores.values(), reverse=True)[:count])
+                for move, score, _ in ranked:
+                    self.assertEqual(scores[move], score)
+            if ranked:
+                self.assertEqual(ranked[0][:2], search.Search(8, evaluation.positional).root(player, opponent, 3))
+
+    def test_principal_variation_reaches_score(self):
+        """
+        Test playing out a principal variation reaches a position with the move's score
+        """
+
+        geo = bitboard.geometry(8)
+        for player, opponent in random_positions(40)[::5]:
+            for move, score, line in search.Search(8, evaluation.positional).ranked_root(player, opponent, 3, 2):
+                self.assertEqual(line[0], move)
+                side, other, sign = player, opponent, 1
+                for step in line:
+                    if step:
+                        self.assertTrue(bitboard.legal_moves(side, other, geo) & step)
+                        side, other = bitboard.play(side, other, step, geo)
+                    side, other, sign = other, side, -sign
+                if len(line) == 3 and all(line):
+                    self.assertEqual(score, sign * evaluation.positional(side, other, 8))
+
+    def test_greedy_ranking(self):
+        """
+        Test the greedy engine ranks moves by score map value and puts its own choice first
+        """
+
+        board = components.initialise_board(8)
+        dark, light = bitboard.from_board(board)
+        result = search.ranked_moves(light, dark, 8, search.normalise_settings({}), 4)
+        self.assertEqual(len(result["moves"]), 4)
+        values = [move["score"] for move in result["moves"]]
+        self.assertEqual(values, sorted(values, reverse=True))
+        first = result["moves"][0]["square"]
+        self.assertEqual((first % 8 + 1, first // 8 + 1), search.best_move_for_board(board, "Light"))
+
+    def test_budgets(self):
+        """
+        Test rankings keep to node and time budgets and still rank legal moves
+        """
+
+        player, opponent = random_positions(30)[20]
+        moves = bitboard.legal_moves(player, opponent, bitboard.geometry(8))
+        deep = {"engine": "alphabeta", "evaluator": "heuristic", "depth": search.MAX_DEPTH}
+        result = search.ranked_moves(player, opponent, 8, dict(deep, nodes=2000), search.MAX_MULTI_PV)
+        # The one move ranking is always finished, which costs one node per legal move
+        self.assertLessEqual(result["nodes"], 2000 + moves.bit_count() + 1)
+        self.assertEqual(len(result["moves"]), moves.bit_count())
+        self.assertTrue(all(moves >> move["square"] & 1 for move in result["moves"]))
+
+        start = time.perf_counter()
+        search.ranked_moves(player, opponent, 8, dict(deep, time=30), search.MAX_MULTI_PV)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_switches(self):
+        """
+        Test principal variation search ranks the same moves with the same scores, and only
+        rankings without budgets or ProbCut are known to agree with best_move
+        """
+
+        plain = {"engine": "alphabeta", "evaluator": "heuristic", "depth": 4}
+        for player, opponent in random_positions(60)[::10]:
+            expected = search.ranked_moves(player, opponent, 8, plain, 3)["moves"]
+            for switches in ({"pvs": True}, {"pvs": True, "aspiration": True}):
+                with self.subTest(switches=switches):
+                    self.assertEqual(search.ranked_moves(player, opponent, 8, dict(plain, **switches), 3)["moves"], expected)
+            pruned = search.ranked_moves(player, opponent, 8, dict(plain, probcut=True), 3)["moves"]
+            self.assertEqual(len(pruned), len(expected))
+
+        self.assertTrue(search.ranking_agrees(dict(plain, pvs=True, aspiration=True)))
+        for extra in ({"nodes": 100}, {"time": 100}, {"probcut": True}):
+            self.assertFalse(search.ranking_agrees(dict(plain, **extra)))
+
+    def test_invalid_count(self):
+        """
+        Test counts that are not whole numbers or are out of range raise a ValueError
+        """
+
+        self.assertEqual(search.parse_multi_pv("3"), 3)
+        for value in ("0", "-1", "two", 0, search.MAX_MULTI_PV + 1):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    search.parse_multi_pv(value)
+
+class TestSelective(unittest.TestCase):
+    """
+    Contains tests for principal variation search, aspiration windows and ProbCut
+    """
+
+    def test_settings(self):
+        """
+        Test the switches are read from query parameters, checked, and left out when off
+        """
+
+        settings = search.normalise_settings({"engine": "alphabeta", "pvs": "1", "aspiration": "0", "probcut": True})
+        self.assertEqual(settings, {"engine": "alphabeta", "evaluator": "heuristic", "depth": 1, "pvs": True, "probcut": True})
+        self.assertNotIn("pvs", search.normalise_settings({"engine": "greedy", "pvs": "1"}))
+        with self.assertRaises(ValueError):
+            search.normalise_settings({"engine": "alphabeta", "pvs": "yes"})
+
+    def test_exact_techniques_match_alphabeta(self):
+        """
+        Test principal variation search and aspiration windows choose the same moves
+        with the same scores as plain alpha-beta, with and without a budget
+        """
+
+        for evaluator in ("heuristic", "positional"):
+            plain = {"engine": "alphabeta", "evaluator": evaluator, "depth": 4}
+            for player, opponent in random_positions(60)[::6]:
+                expected = search.best_move(player, opponent, 8, plain)
+                for switches in ({"pvs": True}, {"aspiration": True}, {"pvs": True, "aspiration": True},
+                                 {"pvs": True, "aspiration": True, "nodes": 10 ** 6}):
+                    with self.subTest(evaluator=evaluator, switches=switches):
+                        result = search.best_move(player, opponent, 8, {**plain, **switches})
+                        self.assertEqual((result["square"], result["score"]), (expected["square"], expected["score"]))
+
+    def test_aspiration_window_is_widened(self):
+        """
+        Test a guess far from the real score still gives the exact score
+        """
+
+        player, opponent = random_positions(30)[20]
+        engine = search.Search(8, evaluation.get_evaluator("heuristic"), window=1.0)
+        expected = engine.root(player, opponent, 3)
+        for guess in (-10 ** 6, 0, 10 ** 6):
+            with self.subTest(guess=guess):
+                self.assertEqual(engine.aspiration_root(player, opponent, 3, guess), expected)
+
+    def test_probcut(self):
+        """
+        Test ProbCut plays legal moves with fewer positions searched, and gives the
+        same scores as plain alpha-beta when its threshold is too high to ever cut
+        """
+
+        geo = bitboard.geometry(8)
+        evaluator = evaluation.get_evaluator("heuristic")
+        cuts = search.load_selective()["heuristic"]["cuts"]
+        positions = random_positions(60)[::10]
+        plain_nodes = pruned_nodes = 0
+        for player, opponent in positions:
+            plain = search.Search(8, evaluator)
+            pruned = search.Search(8, evaluator, cuts=cuts)
+            expected = plain.root(player, opponent, 5)
+            move, _ = pruned.root(player, opponent, 5)
+            self.assertTrue(bitboard.legal_moves(player, opponent, geo) & move)
+            plain_nodes += plain.nodes
+            pruned_nodes += pruned.nodes
+            with mock.patch.object(search, "PROBCUT_THRESHOLD", 10 ** 9):
+                self.assertEqual(search.Search(8, evaluator, cuts=cuts).root(player, opponent, 5), expected)
+        self.assertLess(pruned_nodes, plain_nodes)
+
+    def test_fit(self):
+        """
+        Test the fitter finds a known line and writes fits for every pair of depths
+        """
+
+        slope, intercept, deviation = fit_probcut.fit_line([1, 2, 3, 4], [5, 7, 9, 11])
+        self.assertAlmostEqual(slope, 2)
+        self.assertAlmostEqual(intercept, 3)
+        self.assertAlmostEqual(deviation, 0)
+
+        # Three games' worth of positions so every stage has some
+        positions = random_positions(180)[::3]
+        scores = fit_probcut.search_scores(positions, "positional", 3)
+        fitted = fit_probcut.fit(positions, scores, minimum=5)
+        self.assertGreater(fitted["window"], 0)
+        self.assertEqual(len(fitted["cuts"]), search.PROBCUT_STAGES)
+        for stage in fitted["cuts"]:
+            self.assertEqual(set(stage), {"3"})
+            (shallow, slope, _, deviation), = stage["3"]
+            self.assertEqual(shallow, 1)
+            self.assertGreater(slope, 0)
+            self.assertGreaterEqual(deviation, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,273 @@
+"""
+Tests for session_store.py and the per-session games of flask_game_engine.py
+"""
+
+import json
+import os
+import socketserver
+import tempfile
+import threading
+import unittest
+import components
+import encoding
+import session_store
+import flask_game_engine as fge
+
+
+class StandInRedisHandler(socketserver.StreamRequestHandler):
+    """
+    Answers the few Redis commands RedisBackend uses, with the same WATCH/MULTI/EXEC behaviour.
+    """
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            self.wfile.write(b"$-1\r\n")
+        elif isinstance(value, int):
+            self.wfile.write(b":%d\r\n" % value)
+        elif isinstance(value, list):
+            self.wfile.write(b"*%d\r\n" % len(value))
+            for item in value:
+                self.reply(item)
+        elif value in (b"OK", b"QUEUED"):
+            self.wfile.write(b"+" + value + b"\r\n")
+        else:
+            self.wfile.write(b"$%d\r\n%s\r\n" % (len(value), value))
+
+    def run(self, name, args):
+        data = self.server.data
+        if name == b"GET":
+            return data.get(args[0])
+        if name == b"SET":
+            data[args[0]] = args[1]
+            self.server.changes[args[0]] = self.server.changes.get(args[0], 0) + 1
+            return b"OK"
+        if name == b"DEL":
+            self.server.changes[args[0]] = self.server.changes.get(args[0], 0) + 1
+            return 1 if data.pop(args[0], None) is not None else 0
+        return b"OK"
+
+    def handle(self):
+        watched = {}
+        queued = None
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            name = args[0].upper()
+            with self.server.lock:
+                if name == b"WATCH":
+                    watched[args[1]] = self.server.changes.get(args[1], 0)
+                    self.reply(b"OK")
+                elif name == b"UNWATCH":
+                    watched = {}
+                    self.reply(b"OK")
+                elif name == b"MULTI":
+                    queued = []
+                    self.reply(b"OK")
+                elif name == b"EXEC":
+                    changed = any(self.server.changes.get(key, 0) != count for key, count in watched.items())
+                    results = None if changed else [self.run(command[0].upper(), command[1:]) for command in queued]
+                    watched = {}
+                    queued = None
+                    self.reply(results)
+                elif queued is not None:
+                    queued.append(args)
+                    self.reply(b"QUEUED")
+                else:
+                    self.reply(self.run(name, args[1:]))
+            self.wfile.flush()
+
+
+class StandInRedisServer(socketserver.ThreadingTCPServer):
+    """
+    Local stand-in for a Redis server so RedisBackend can be tested without one.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInRedisHandler)
+        self.data = {}
+        self.changes = {}
+        self.lock = threading.Lock()
+
+
+class BackendTests:
+    """
+    Tests every backend has to pass, mixed into one test case per backend
+    """
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.backend = self.make_backend()
+        self.game = {"board": components.initialise_board(8), "current_player": "Light", "game_won": False}
+
+    def test_get_missing(self):
+        """
+        Test a session without a game has version 0 and no game
+        """
+        self.assertEqual(self.backend.get("nobody"), (0, None))
+
+    def test_put_and_get(self):
+        """
+        Test a saved game is loaded back with the next version
+        """
+        self.assertEqual(self.backend.put("s1", self.game, 0), 1)
+        self.assertEqual(self.backend.get("s1"), (1, self.game))
+        self.game["game_won"] = True
+        self.assertEqual(self.backend.put("s1", self.game, 1), 2)
+        self.assertEqual(self.backend.get("s1"), (2, self.game))
+
+    def test_stale_version_conflicts(self):
+        """
+        Test two workers saving from the same version cannot both succeed
+        """
+        self.backend.put("s1", self.game, 0)
+        self.backend.put("s1", self.game, 1)
+        with self.assertRaises(session_store.VersionConflict):
+            self.backend.put("s1", self.game, 1)
+        with self.assertRaises(session_store.VersionConflict):
+            self.backend.put("s1", self.game, 0)
+        self.assertEqual(self.backend.get("s1")[0], 2)
+
+    def test_delete(self):
+        """
+        Test a deleted session has no game
+        """
+        self.backend.put("s1", self.game, 0)
+        self.backend.delete("s1")
+        self.assertEqual(self.backend.get("s1"), (0, None))
+
+    def test_concurrent_increments(self):
+        """
+        Test many threads retrying on conflicts never lose a save
+        """
+        def worker():
+            for _ in range(20):
+                while True:
+                    version, _ = self.backend.get("shared")
+                    try:
+                        self.backend.put("shared", self.game, version)
+                        break
+                    except session_store.VersionConflict:
+                        continue
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.backend.get("shared")[0], 80)
+
+
+class TestMemoryBackend(BackendTests, unittest.TestCase):
+    """
+    Contains tests for MemoryBackend
+    """
+
+    def make_backend(self):
+        return session_store.MemoryBackend()
+
+
+class TestSQLiteBackend(BackendTests, unittest.TestCase):
+    """
+    Contains tests for SQLiteBackend
+    """
+
+    def make_backend(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return session_store.SQLiteBackend(os.path.join(directory.name, "sessions.db"))
+
+
+class TestRedisBackend(BackendTests, unittest.TestCase):
+    """
+    Contains tests for RedisBackend against the local stand-in server
+    """
+
+    def make_backend(self):
+        server = StandInRedisServer()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return session_store.open_backend(f"redis://127.0.0.1:{server.server_address[1]}/0")
+
+    def test_stored_compactly(self):
+        """
+        Test the game is stored as a version and a short string
+        """
+        self.backend.put("s1", self.game, 0)
+        self.assertEqual(self.backend.command("GET", "reversi:session:s1"),
+                         b"1:L0" + encoding.encode_board(self.game["board"]).encode())
+
+
+class TestSessionGames(unittest.TestCase):
+    """
+    Contains tests for per-session games in the Flask app
+    """
+
+    def setUp(self):
+        """
+        Turn on sessions with an in-process backend for each test
+        """
+        self.backend = session_store.MemoryBackend()
+        fge.session_backend = self.backend
+        self.addCleanup(setattr, fge, "session_backend", None)
+        fge.app.config['TESTING'] = True
+
+    def test_sessions_have_separate_games(self):
+        """
+        Test two browsers play their own games
+        """
+        first = fge.app.test_client()
+        second = fge.app.test_client()
+        data = json.loads(first.get('/move', query_string={'x': 4, 'y': 6}).data)
+        self.assertEqual(data['player'], 'Light')
+
+        # The second browser still has a new game
+        data = json.loads(second.get('/move', query_string={'x': 4, 'y': 6}).data)
+        self.assertEqual(data['status'], 'success')
+        data = json.loads(first.get('/move', query_string={'x': 3, 'y': 4}).data)
+        self.assertEqual(data['player'], 'Dark ')
+
+        saved = json.loads(first.get('/save').data)
+        self.assertEqual(saved['counts'], {'dark': 3, 'light': 3})
+
+    def test_conflicting_save_is_retried(self):
+        """
+        Test a move is replayed on the latest game when another worker saved first
+        """
+        client = fge.app.test_client()
+        client.get('/move', query_string={'x': 4, 'y': 6})
+        session_id = client.get_cookie(fge.SESSION_COOKIE).value
+
+        # Another worker saves the same game between this request loading and saving it
+        original_put = self.backend.put
+        calls = []
+
+        def put(session_id, game_state, version):
+            if not calls:
+                calls.append(version)
+                original_put(session_id, self.backend.get(session_id)[1], version)
+            return original_put(session_id, game_state, version)
+
+        self.backend.put = put
+        data = json.loads(client.get('/move', query_string={'x': 3, 'y': 4}).data)
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(self.backend.get(session_id)[0], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests for benchmarks/simulate_players.py
+"""
+
+import random
+import unittest
+import bitboard
+import components
+import session_store
+import flask_game_engine as fge
+from benchmarks import simulate_players
+
+class TestSimulatePlayers(unittest.TestCase):
+    """
+    Contains tests for the simulated players load generator
+    """
+
+    def setUp(self):
+        """
+        Turn on sessions with an in-process backend so each player has its own game
+        """
+        self.backend = session_store.MemoryBackend()
+        fge.session_backend = self.backend
+        self.addCleanup(setattr, fge, "session_backend", None)
+
+    def test_random_legal_move(self):
+        """
+        Test a random move is legal, and there is none when the player cannot move
+        """
+        board = components.initialise_board(8)
+        rng = random.Random(0)
+        for _ in range(10):
+            self.assertTrue(components.legal_move("Dark ", simulate_players.random_legal_move(board, "Dark ", rng), board))
+        full = bitboard.to_board((1 << 64) - 1, 0, 8)
+        self.assertIsNone(simulate_players.random_legal_move(full, "Light", rng))
+
+    def test_players_finish_games(self):
+        """
+        Test players simulated at the same time finish games in their own sessions without errors
+        """
+        result = simulate_players.simulate(simulate_players.FlaskClient, players=3, think=0, games=3)
+        self.assertGreaterEqual(result["games"], 3)
+        self.assertEqual(result["errors"], 0)
+        self.assertEqual(set(result["routes"]), {"/reset", "/position", "/move", "/ai_move"})
+        self.assertLessEqual(result["routes"]["/move"]["p50"], result["routes"]["/move"]["p99"])
+        self.assertEqual(len(self.backend._games), 3)
+
+    def test_needs_a_limit(self):
+        """
+        Test a simulation without a duration or a number of games is refused
+        """
+        with self.assertRaises(ValueError):
+            simulate_players.simulate(simulate_players.FlaskClient, players=1)
+
+if __name__ == "__main__":
+    unittest.main()
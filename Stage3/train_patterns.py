@@ -0,0 +1,214 @@
+"""
+Offline trainer for the pattern table evaluation.
+
+Replays game records, collects the pattern codes of every position along with
+the final counter difference from the point of view of the player to move,
+and fits the weight tables with mini-batch stochastic gradient descent using
+NumPy. Game records can also be generated by self-play.
+
+Usage:
+    python train_patterns.py --self-play 2000 --records games.txt
+    python train_patterns.py --records games.txt --output pattern_weights.bin
+
+NumPy is only needed by this script, not by the game itself.
+"""
+
+import argparse
+import random
+from array import array
+import bitboard
+import evaluation
+import patterns
+import records
+
+def self_play_game(rng, randomness=0.1, evaluator=evaluation.positional):
+    """
+    Plays one game where each player picks the move with the best evaluation,
+    or a random legal move some of the time so the games are varied.
+
+    Parameters:
+        rng (random.Random): Source of random numbers.
+        randomness (float): The chance of playing a random move instead of the best one.
+        evaluator (callable): The evaluator used to pick the best move.
+
+    Returns:
+        list[tuple(int,int)]: The x and y position of every move.
+    """
+    geo = bitboard.geometry(8)
+    dark, light = records.start_position(8)
+    player, opponent = dark, light
+    moves = []
+    while True:
+        legal = bitboard.legal_moves(player, opponent, geo)
+        if not legal:
+            if not bitboard.legal_moves(opponent, player, geo):
+                return moves
+            player, opponent = opponent, player
+            continue
+
+        squares = [i for i in range(geo.cells) if legal >> i & 1]
+        if rng.random() < randomness:
+            square = rng.choice(squares)
+        else:
+            # The evaluation is from the opponent's side after the move, so lower is better
+            best_score = None
+            for candidate in squares:
+                after_player, after_opponent = bitboard.play(player, opponent, 1 << candidate, geo)
+                score = -evaluator(after_opponent, after_player, 8)
+                if best_score is None or score > best_score:
+                    best_score = score
+                    square = candidate
+
+        moves.append((square % 8 + 1, square // 8 + 1))
+        player, opponent = bitboard.play(player, opponent, 1 << square, geo)
+        player, opponent = opponent, player
+
+def canonical_codes():
+    """
+    Pairs up every pattern code with its reflection so both are trained as one weight.
+
+    Returns:
+        list[list[int]]: For each family, the smaller of each code and its reflected code.
+    """
+    canonical = []
+    for family, (_, squares) in enumerate(patterns.FAMILIES):
+        canonical.append([min(code, patterns.reflect_code(family, code)) for code in range(3 ** squares)])
+    return canonical
+
+def training_samples(games):
+    """
+    Replays games and turns every position into the indices of its pattern weights.
+
+    Parameters:
+        games (list[list[tuple(int,int)]]): The moves of each game.
+
+    Returns:
+        list[tuple(list[int], list[float])]: For each stage, the flattened weight indices
+            of every position and the final counter difference for the player to move.
+    """
+    # Start of each family's table when the tables of a stage are joined into one array
+    offsets = []
+    total = 0
+    for _, squares in patterns.FAMILIES:
+        offsets.append(total)
+        total += 3 ** squares
+    canonical = canonical_codes()
+
+    samples = [([], []) for _ in range(patterns.STAGES)]
+    for moves in games:
+        positions = records.replay(moves, 8)
+        final_dark, final_light, _ = positions[-1]
+        difference = final_dark.bit_count() - final_light.bit_count()
+
+        for dark, light, colour in positions[:-1]:
+            player, opponent = bitboard.split_colours(dark, light, colour)
+            indices, targets = samples[patterns.stage_of(player, opponent)]
+            for offset, family_canonical, codes in zip(offsets, canonical, patterns.pattern_codes(player, opponent)):
+                for code in codes:
+                    indices.append(offset + family_canonical[code])
+            targets.append(difference if colour == "Dark " else -difference)
+    return samples
+
+def fit_stage(indices, targets, size, epochs=20, batch_size=256, learning_rate=0.01,
+              regularisation=1e-4, seed=0):
+    """
+    Fits the weights of one stage with mini-batch stochastic gradient descent.
+
+    Parameters:
+        indices (list[int]): The weight indices of every position, the same number per position.
+        targets (list[float]): The final counter difference of every position.
+        size (int): The total number of weights in the stage.
+        epochs (int): How many times to go through every position.
+        batch_size (int): How many positions are used for each update.
+        learning_rate (float): How far each update moves the weights.
+        regularisation (float): How strongly weights are pulled towards 0.
+        seed (int): Seed for shuffling the positions.
+
+    Returns:
+        tuple(numpy.ndarray, float): The fitted weights and the bias.
+    """
+    import numpy
+
+    weights = numpy.zeros(size, dtype=numpy.float64)
+    bias = 0.0
+    if not targets:
+        return weights, bias
+
+    y = numpy.asarray(targets, dtype=numpy.float64)
+    x = numpy.asarray(indices, dtype=numpy.int64).reshape(len(y), -1)
+    rng = numpy.random.default_rng(seed)
+
+    for _ in range(epochs):
+        order = rng.permutation(len(y))
+        for start in range(0, len(y), batch_size):
+            batch = order[start:start + batch_size]
+            batch_x = x[batch]
+            error = y[batch] - (weights[batch_x].sum(axis=1) + bias)
+
+            # Every active weight of a position gets that position's error as its gradient
+            gradient = numpy.bincount(batch_x.ravel(), weights=numpy.repeat(error, batch_x.shape[1]),
+                                      minlength=size)
+            weights += learning_rate * (gradient / len(batch) - regularisation * weights)
+            bias += learning_rate * error.mean()
+    return weights, bias
+
+def train(games, **options):
+    """
+    Fits weight tables for every stage from game records.
+
+    Parameters:
+        games (list[list[tuple(int,int)]]): The moves of each game.
+        **options: Passed on to fit_stage.
+
+    Returns:
+        tuple(list[list[array]], array): The tables for each stage and family, and the bias of each stage.
+    """
+    tables, bias = patterns.empty_tables()
+    size = sum(3 ** squares for _, squares in patterns.FAMILIES)
+    canonical = canonical_codes()
+    for stage, (indices, targets) in enumerate(training_samples(games)):
+        weights, stage_bias = fit_stage(indices, targets, size, **options)
+        bias[stage] = stage_bias
+
+        # Split the joined array back into one table per family, copying the
+        # trained weight of each code to its reflected code
+        start = 0
+        for family, (_, squares) in enumerate(patterns.FAMILIES):
+            family_weights = weights[start:start + 3 ** squares][canonical[family]]
+            tables[stage][family] = array("f", family_weights.astype("float32").tobytes())
+            start += 3 ** squares
+    return tables, bias
+
+def main():
+    """
+    Reads the command line options, generates or reads the games and writes the weights file.
+    """
+    parser = argparse.ArgumentParser(description="Train the pattern evaluation weights")
+    parser.add_argument("--records", help="game record file to read (or write when using --self-play)")
+    parser.add_argument("--self-play", type=int, default=0, help="number of self-play games to generate")
+    parser.add_argument("--output", default=patterns.DEFAULT_WEIGHTS_PATH, help="weights file to write")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--learning-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = []
+    if args.self_play:
+        rng = random.Random(args.seed)
+        games = [self_play_game(rng) for _ in range(args.self_play)]
+        if args.records:
+            with open(args.records, "w", encoding="utf-8") as file:
+                for moves in games:
+                    file.write(records.format_moves(moves) + "\n")
+    elif args.records:
+        games = records.read_records(args.records)
+    else:
+        parser.error("either --records or --self-play is needed")
+
+    print(f"Training on {len(games)} games")
+    tables, bias = train(games, epochs=args.epochs, learning_rate=args.learning_rate, seed=args.seed)
+    patterns.save_weights(args.output, tables, bias)
+    print(f"Weights written to {args.output}")
+
+if __name__ == "__main__":
+    main()